@@ -0,0 +1,448 @@
+"""
+AccessCentral - Interfaccia a riga di comando
+
+Ricerca e consultazione delle credenziali senza avviare la GUI: non importa
+PyQt5 né pandas e carica crittografia e import/export solo nei comandi che
+li usano, quindi l'avvio resta nell'ordine delle decine di millisecondi.
+L'export in Excel (esporta file.xlsx) usa pandas come nell'applicazione:
+senza pandas installato resta disponibile l'export CSV.
+Con un agente di sblocco attivo (vedi utils.unlock_agent) la master
+password non viene richiesta.
+
+Esempi:
+    python cli.py cerca acme
+    python cli.py url https://crm.acme.it/login
+    python cli.py rete 10.20.0.0/16
+    python cli.py riassegna 10.20.0.0/16=10.30.0.0/16 --applica
+    python cli.py raggiungibilita --cliente 3 --timeout 2
+    python cli.py mostra 42 --password
+    python cli.py copia 42
+    python cli.py esporta credenziali.csv
+    python cli.py importa nuove.xlsx --applica
+    python cli.py backup
+    python cli.py reindicizza
+    python cli.py statistiche --json
+    python cli.py --json cerca acme
+    python cli.py servizio --porta 8765
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+# Cartella con database e configurazione (quella dell'applicazione)
+CARTELLA_DATI = os.environ.get('ACCESSCENTRAL_DIR') or os.path.dirname(os.path.abspath(__file__))
+
+COLONNE_RICERCA = ('id', 'cliente', 'servizio', 'username', 'host', 'porta')
+
+
+def _percorsi(args) -> None:
+    """Risolve database, configurazione e token rispetto alla cartella dati"""
+    args.db = os.path.join(args.dir, args.db)
+    args.config = os.path.join(args.dir, args.config)
+    args.token = os.path.join(args.dir, 'agente_sblocco.token')
+
+
+def _apri_database(args):
+    """
+    Apre il database (errore se non esiste: la CLI non crea vault vuoti)
+    
+    I messaggi delle migrazioni vanno su stderr: stdout resta riservato ai
+    risultati (es. --json)
+    """
+    from models.database import DatabaseManager
+    if not os.path.exists(args.db):
+        raise ValueError(f"Database non trovato: {args.db}")
+    with contextlib.redirect_stdout(sys.stderr):
+        return DatabaseManager(args.db)
+
+
+def _sblocca(args):
+    """
+    CryptoManager sbloccato: chiavi dell'agente di sblocco se attivo,
+    altrimenti master password da terminale
+    """
+    import getpass
+    from utils.crypto_manager import CryptoManager
+    from utils.unlock_agent import ClientAgente
+    
+    crypto_manager = CryptoManager()
+    if not crypto_manager.carica_config(args.config):
+        raise ValueError("Configurazione di sicurezza non trovata: avviare prima l'applicazione")
+    if crypto_manager.is_legacy():
+        raise ValueError("Aprire prima l'applicazione per aggiornare la configurazione")
+    
+    try:
+        if crypto_manager.importa_chiavi(ClientAgente(args.config, args.token).chiavi()):
+            return crypto_manager
+    except (ConnectionError, ValueError):
+        pass
+    
+    if not crypto_manager.sblocca(getpass.getpass("Master password: ")):
+        raise ValueError("Password errata")
+    return crypto_manager
+
+
+def _stampa(args, righe, colonne):
+    """Stampa righe (dizionari) come JSON o come tabella allineata"""
+    if args.json:
+        print(json.dumps(righe, ensure_ascii=False, indent=2, default=str))
+        return
+    if not righe:
+        print("Nessun risultato")
+        return
+    celle = [[("" if r.get(c) is None else str(r.get(c))) for c in colonne] for r in righe]
+    larghezze = [max(len(c), *(len(riga[i]) for riga in celle)) for i, c in enumerate(colonne)]
+    print("  ".join(c.upper().ljust(l) for c, l in zip(colonne, larghezze)).rstrip())
+    for riga in celle:
+        print("  ".join(v.ljust(l) for v, l in zip(riga, larghezze)).rstrip())
+
+
+def _dettaglio_credenziale(args, credenziale_id: int, con_password: bool) -> dict:
+    """Campi di una credenziale con cliente e servizio (password solo se richiesta)"""
+    from models.credenziale import Credenziale
+    from models.servizio import Servizio
+    from models.cliente import Cliente
+    
+    db = _apri_database(args)
+    credenziale = Credenziale.get_by_id(db, credenziale_id)
+    if not credenziale:
+        raise ValueError(f"Credenziale {credenziale_id} non trovata")
+    servizio = Servizio.get_by_id(db, credenziale.servizio_id)
+    cliente = Cliente.get_by_id(db, servizio.cliente_id) if servizio else None
+    
+    dettaglio = {
+        'id': credenziale.id,
+        'cliente': cliente.nome if cliente else "",
+        'servizio': servizio.nome if servizio else "",
+        'username': credenziale.username,
+        'host': credenziale.host or "",
+        'porta': credenziale.porta,
+        'link': credenziale.link or "",
+        'rdp_configurata': bool(credenziale.rdp_configurata),
+        'note': credenziale.note or "",
+    }
+    if con_password:
+        dettaglio['password'] = (_sblocca(args).decripta(credenziale.password)
+                                 if credenziale.password else "")
+    return dettaglio
+
+
+def _copia_negli_appunti(testo: str):
+    """Copia il testo negli appunti con lo strumento di sistema (niente Qt)"""
+    if sys.platform == 'win32':
+        comando, dati = ['clip'], testo.encode('utf-16')
+    elif sys.platform == 'darwin':
+        comando, dati = ['pbcopy'], testo.encode()
+    else:
+        candidati = (['wl-copy'], ['xclip', '-selection', 'clipboard'], ['xsel', '--clipboard', '--input'])
+        comando = next((c for c in candidati if shutil.which(c[0])), None)
+        if not comando:
+            raise ValueError("Nessuno strumento per gli appunti trovato (wl-copy, xclip o xsel)")
+        dati = testo.encode()
+    subprocess.run(comando, input=dati, check=True)
+
+
+# ===== Comandi =====
+
+def comando_cerca(args):
+    """Cerca credenziali per cliente, servizio, username o host"""
+    from models.credenziale import Credenziale
+    righe = Credenziale.search(_apri_database(args), args.testo, args.limite)
+    _stampa(args, [dict(r) for r in righe], COLONNE_RICERCA)
+
+
+def comando_url(args):
+    """
+    Credenziali associate a un URL o a un host, dalla più pertinente
+    
+    La colonna origine distingue l'host/link della credenziale dal link del
+    servizio (che abbina tutte le credenziali del servizio)
+    """
+    from models.credenziale import Credenziale
+    righe = Credenziale.find_by_url(_apri_database(args), args.url, args.limite)
+    _stampa(args, righe, COLONNE_RICERCA + ('corrispondenza', 'origine'))
+
+
+def comando_rete(args):
+    """Credenziali che puntano a indirizzi di reti CIDR, intervalli o IP"""
+    from controllers.credenziale_controller import CredenzialeController
+    righe = CredenzialeController(_apri_database(args)).trova_credenziali_per_rete(args.reti, args.limite)
+    _stampa(args, righe, ('indirizzo',) + COLONNE_RICERCA)
+
+
+def comando_riassegna(args):
+    """Mostra e, con --applica, esegue la riassegnazione di host e link tra reti"""
+    from controllers.credenziale_controller import CredenzialeController
+    mappa = {}
+    for voce in args.mappa:
+        vecchia, separatore, nuova = voce.partition('=')
+        if not separatore:
+            raise ValueError(f"Formato non valido: '{voce}' (atteso VECCHIA=NUOVA)")
+        mappa[vecchia] = nuova
+    controller = CredenzialeController(_apri_database(args))
+    modifiche = controller.anteprima_riassegnazione(mappa)
+    if not args.applica or not modifiche:
+        _stampa(args, modifiche, ('tabella', 'id', 'colonna', 'prima', 'dopo'))
+        if not args.json and modifiche:
+            print("\nNessuna modifica scritta: ripetere con --applica per riassegnare.")
+        return
+    controller.crypto_manager = _sblocca(args)  # per ricalcolare le impronte
+    conteggi = controller.riassegna_indirizzi(mappa)
+    if args.json:
+        print(json.dumps(conteggi, indent=2))
+        return
+    print(f"Aggiornate {conteggi['credenziali']} credenziali e {conteggi['servizi']} servizi"
+          + (f" ({conteggi['saltati']} saltati perché modificati nel frattempo)" if conteggi['saltati'] else ""))
+
+
+def comando_raggiungibilita(args):
+    """Verifica in parallelo se host e link delle credenziali accettano connessioni TCP"""
+    from controllers.raggiungibilita_controller import RaggiungibilitaController
+    from models.credenziale import Credenziale
+    from utils.reachability_probe import ReachabilityProbe
+    db = _apri_database(args)
+    controller = RaggiungibilitaController(
+        db, prober=ReachabilityProbe(concorrenza=args.concorrenza, timeout=args.timeout))
+    credenziali = [(dict(r), RaggiungibilitaController.destinazione(r['host'], r['porta'], r['link']))
+                   for r in Credenziale.get_endpoints(db, args.cliente)]
+    esiti = controller.verifica([d for _, d in credenziali if d], args.forza)
+    righe = []
+    for riga, destinazione in credenziali:
+        esito = esiti.get(destinazione)
+        if not esito:
+            continue
+        righe.append({'id': riga['id'], 'cliente': riga['cliente'], 'servizio': riga['servizio'],
+                      'username': riga['username'], 'destinazione': RaggiungibilitaController.etichetta(destinazione),
+                      'raggiungibile': esito['raggiungibile'], 'latenza_ms': esito['latenza_ms'],
+                      'errore': esito['errore'], 'verificato_il': esito.get('verificato_il')})
+    if not args.json:
+        for riga in righe:
+            riga['raggiungibile'] = "sì" if riga['raggiungibile'] else "NO"
+    _stampa(args, righe, ('id', 'cliente', 'servizio', 'username', 'destinazione',
+                          'raggiungibile', 'latenza_ms', 'errore'))
+
+
+def comando_mostra(args):
+    """Mostra i dettagli di una credenziale"""
+    dettaglio = _dettaglio_credenziale(args, args.id, args.password)
+    if args.json:
+        print(json.dumps(dettaglio, ensure_ascii=False, indent=2))
+        return
+    for campo, valore in dettaglio.items():
+        print(f"{campo.replace('_', ' ').capitalize() + ':':<17} {'' if valore is None else valore}")
+
+
+def comando_copia(args):
+    """Copia la password di una credenziale negli appunti"""
+    dettaglio = _dettaglio_credenziale(args, args.id, True)
+    _copia_negli_appunti(dettaglio['password'])
+    print(f"Password di {dettaglio['username']} ({dettaglio['servizio']}) copiata negli appunti",
+          file=sys.stderr)
+
+
+def comando_esporta(args):
+    """Esporta clienti, servizi e credenziali (password cifrate) in CSV o Excel"""
+    from utils.import_export import ImportExportManager
+    manager = ImportExportManager(_apri_database(args))
+    if args.file.lower().endswith(('.xlsx', '.xls')):
+        successo, messaggio = manager.export_to_excel(args.file)
+    else:
+        successo, messaggio = manager.export_to_csv(args.file)
+    if not successo:
+        raise ValueError(messaggio)
+    print(messaggio)
+
+
+def comando_importa(args):
+    """Mostra l'anteprima di un import e, con --applica, lo esegue"""
+    from utils.import_diff import CONFLITTI
+    from utils.import_export import ImportExportManager
+    manager = ImportExportManager(_apri_database(args), _sblocca(args))
+    successo, messaggio, diff = manager.analizza_import(args.file)
+    if not successo:
+        raise ValueError(messaggio)
+    print(messaggio)
+    for voce in diff.voci(CONFLITTI):
+        print(f"  ⚠ {voce.tipo} {voce.etichetta}: {voce.motivo}")
+    
+    if not args.applica:
+        print("\nNessuna modifica scritta: ripetere con --applica per importare.")
+        return
+    if not diff.ha_modifiche():
+        print("\nNiente da importare.")
+        return
+    successo, messaggio, _ = manager.applica_import(diff)
+    if not successo:
+        raise ValueError(messaggio)
+    print(f"\n{messaggio}")
+
+
+def comando_backup(args):
+    """Crea un backup del database (o elenca quelli esistenti)"""
+    from utils.backup_manager import BackupManager
+    manager = BackupManager(args.db)
+    if args.lista:
+        righe = [{'file': os.path.basename(percorso), 'data': data.strftime("%Y-%m-%d %H:%M:%S"),
+                  'dimensione': manager.formato_dimensione(dimensione)}
+                 for percorso, data, dimensione in manager.ottieni_lista_backup()]
+        _stampa(args, righe, ('file', 'data', 'dimensione'))
+        return
+    successo, percorso, messaggio = manager.crea_backup()
+    if not successo:
+        raise ValueError(messaggio)
+    print(percorso if args.json else messaggio)
+
+
+def comando_reindicizza(args):
+    """Ricostruisce l'indice host/link (ricerca per URL e rete)"""
+    righe = _apri_database(args).ricostruisci_indice_host()
+    print(json.dumps({'righe_indice': righe}) if args.json
+          else f"Indice host/link ricostruito: {righe} righe")
+
+
+def comando_statistiche(args):
+    """Conteggi del vault, dimensione del database e stato dell'agente"""
+    from utils.unlock_agent import ClientAgente
+    db = _apri_database(args)
+    statistiche = {
+        tabella: db.execute_query(f"SELECT COUNT(*) AS n FROM {tabella}")[0]['n']
+        for tabella in ('clienti', 'servizi', 'credenziali', 'pm', 'consulenti', 'contatti')
+    }
+    statistiche['password_formato_legacy'] = db.execute_query(
+        "SELECT COUNT(*) AS n FROM credenziali WHERE typeof(password) = 'text' AND password != ''"
+    )[0]['n']
+    statistiche['dimensione_db_kb'] = os.path.getsize(args.db) // 1024
+    try:
+        statistiche['agente_secondi_rimanenti'] = ClientAgente(args.config, args.token).stato()[
+            'secondi_rimanenti']
+    except (ConnectionError, ValueError):
+        statistiche['agente_secondi_rimanenti'] = None
+    
+    if args.json:
+        print(json.dumps(statistiche, indent=2))
+        return
+    for chiave, valore in statistiche.items():
+        if chiave == 'agente_secondi_rimanenti':
+            valore = f"attivo ({valore // 60} min rimanenti)" if valore is not None else "non attivo"
+            chiave = 'agente_sblocco'
+        print(f"{chiave.replace('_', ' ').capitalize() + ':':<27} {valore}")
+
+
+def comando_servizio(args):
+    """Avvia il servizio JSON-RPC locale (fino a Ctrl+C)"""
+    from utils.rpc_service import ServizioRPC, TOKEN_FILE
+    crypto_manager = None if args.senza_password else _sblocca(args)
+    servizio = ServizioRPC(args.db, crypto_manager, porta=args.porta, workers=args.workers,
+                           percorso_token=os.path.join(args.dir, TOKEN_FILE))
+    print(f"Servizio in ascolto (token in {servizio.percorso_token}), Ctrl+C per fermarlo",
+          file=sys.stderr)
+    servizio.esegui()
+
+
+def crea_parser() -> argparse.ArgumentParser:
+    """Parser degli argomenti (sottocomandi con alias inglesi)"""
+    parser = argparse.ArgumentParser(prog='accesscentral',
+                                     description="AccessCentral da riga di comando")
+    parser.add_argument('--dir', default=CARTELLA_DATI,
+                        help="cartella con database e configurazione (default: %(default)s)")
+    parser.add_argument('--db', default='credenziali_suite.db')
+    parser.add_argument('--config', default='security_config.json')
+    parser.add_argument('--json', action='store_true', help="output in formato JSON")
+    # --json accettato anche dopo il sottocomando (SUPPRESS: se assente vale quello globale)
+    comune = argparse.ArgumentParser(add_help=False)
+    comune.add_argument('--json', action='store_true', default=argparse.SUPPRESS,
+                        help="output in formato JSON")
+    comandi = parser.add_subparsers(dest='comando', required=True, metavar='COMANDO')
+    
+    def sottocomando(nome: str, **opzioni) -> argparse.ArgumentParser:
+        return comandi.add_parser(nome, parents=[comune], **opzioni)
+    
+    p = sottocomando('cerca', aliases=['search'], help="cerca credenziali")
+    p.add_argument('testo')
+    p.add_argument('--limite', type=int, default=50)
+    p.set_defaults(funzione=comando_cerca)
+    
+    p = sottocomando('url', aliases=['lookup'], help="credenziali per URL o host")
+    p.add_argument('url')
+    p.add_argument('--limite', type=int, default=10)
+    p.set_defaults(funzione=comando_url)
+    
+    p = sottocomando('rete', aliases=['subnet'], help="credenziali per rete CIDR, intervallo o IP")
+    p.add_argument('reti', nargs='+', metavar='RETE', help="es. 10.20.0.0/16, 10.0.0.1-10.0.0.9")
+    p.add_argument('--limite', type=int)
+    p.set_defaults(funzione=comando_rete)
+    
+    p = sottocomando('riassegna', aliases=['readdress'],
+                     help="riscrive host e link da una rete a un'altra")
+    p.add_argument('mappa', nargs='+', metavar='VECCHIA=NUOVA', help="es. 10.20.0.0/16=10.30.0.0/16")
+    p.add_argument('--applica', action='store_true', help="scrive le modifiche (default: solo anteprima)")
+    p.set_defaults(funzione=comando_riassegna)
+    
+    p = sottocomando('raggiungibilita', aliases=['probe'],
+                     help="verifica la raggiungibilità TCP di host e link")
+    p.add_argument('--cliente', type=int, help="solo le credenziali di un cliente (ID)")
+    p.add_argument('--forza', action='store_true', help="ignora gli esiti salvati ancora validi")
+    p.add_argument('--timeout', type=float, default=3.0, help="secondi per destinazione (default: 3)")
+    p.add_argument('--concorrenza', type=int, default=64, help="connessioni contemporanee (default: 64)")
+    p.set_defaults(funzione=comando_raggiungibilita)
+    
+    p = sottocomando('mostra', aliases=['show'], help="dettagli di una credenziale")
+    p.add_argument('id', type=int)
+    p.add_argument('--password', action='store_true', help="mostra anche la password")
+    p.set_defaults(funzione=comando_mostra)
+    
+    p = sottocomando('copia', aliases=['copy'], help="copia la password negli appunti")
+    p.add_argument('id', type=int)
+    p.set_defaults(funzione=comando_copia)
+    
+    p = sottocomando('esporta', aliases=['export'], help="esporta in CSV o Excel (Excel richiede pandas)")
+    p.add_argument('file')
+    p.set_defaults(funzione=comando_esporta)
+    
+    p = sottocomando('importa', aliases=['import'], help="anteprima/import da CSV o Excel")
+    p.add_argument('file')
+    p.add_argument('--applica', action='store_true', help="scrive le modifiche (default: solo anteprima)")
+    p.set_defaults(funzione=comando_importa)
+    
+    p = sottocomando('backup', help="crea un backup del database")
+    p.add_argument('--lista', action='store_true', help="elenca i backup esistenti")
+    p.set_defaults(funzione=comando_backup)
+    
+    p = sottocomando('reindicizza', aliases=['reindex'],
+                     help="ricostruisce l'indice host/link della ricerca per URL")
+    p.set_defaults(funzione=comando_reindicizza)
+    
+    p = sottocomando('statistiche', aliases=['stats'], help="conteggi e stato del vault")
+    p.set_defaults(funzione=comando_statistiche)
+    
+    p = sottocomando('servizio', aliases=['serve'], help="servizio JSON-RPC su localhost")
+    p.add_argument('--porta', type=int, default=8765)
+    p.add_argument('--workers', type=int, help="connessioni di lettura (default: CPU, max 8)")
+    p.add_argument('--senza-password', action='store_true',
+                   help="non sblocca il vault: credenziali.password non disponibile")
+    p.set_defaults(funzione=comando_servizio)
+    return parser
+
+
+def main(argv=None) -> int:
+    """Punto di ingresso: restituisce il codice di uscita"""
+    args = crea_parser().parse_args(argv)
+    _percorsi(args)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    try:
+        args.funzione(args)
+    except (ValueError, OSError, subprocess.CalledProcessError) as e:
+        print(f"Errore: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,5 +5,8 @@ Controllers per la logica business dell'applicazione
 from .cliente_controller import ClienteController
 from .credenziale_controller import CredenzialeController
 from .risorse_controller import RisorseController
+from .prefetch_controller import PrefetchController
+from .raggiungibilita_controller import RaggiungibilitaController
 
-__all__ = ['ClienteController', 'CredenzialeController', 'RisorseController']
+__all__ = ['ClienteController', 'CredenzialeController', 'RisorseController', 'PrefetchController',
+           'RaggiungibilitaController']
@@ -2,7 +2,8 @@
 Controller per gestire la logica dei clienti
 """
 
-from typing import List, Optional
+import sqlite3
+from typing import List, Optional, Sequence, Tuple
 from models.database import DatabaseManager
 from models.cliente import Cliente
 from models.servizio import Servizio
@@ -45,13 +46,15 @@ class ClienteController:
         
         nome = nome.strip()
         
-        # Verifica se esiste già un cliente con questo nome
-        clienti = Cliente.get_all(self.db)
-        if any(c.nome.lower() == nome.lower() for c in clienti):
-            raise ValueError(f"Esiste già un cliente con nome '{nome}'")
-        
-        return Cliente.create(self.db, nome, descrizione, 
-                            vpn_exe_path, vpn_windows_name, pm_id)
+        # L'unicità del nome (senza distinzione maiuscole/minuscole) è garantita
+        # dall'indice ux_clienti_nome_nocase
+        try:
+            return Cliente.create(self.db, nome, descrizione, 
+                                vpn_exe_path, vpn_windows_name, pm_id)
+        except sqlite3.IntegrityError as e:
+            if DatabaseManager.is_unique_violation(e):
+                raise ValueError(f"Esiste già un cliente con nome '{nome}'")
+            raise
     
     def ottieni_tutti_clienti(self) -> List[Cliente]:
         """
@@ -62,6 +65,15 @@ class ClienteController:
         """
         return Cliente.get_all(self.db)
     
+    def ottieni_riepilogo_clienti(self) -> List[Cliente]:
+        """
+        Recupera tutti i clienti con le sole colonne mostrate nelle liste
+        
+        Returns:
+            Lista di clienti (solo id e nome valorizzati)
+        """
+        return Cliente.get_all_summary(self.db)
+    
     def ottieni_cliente(self, cliente_id: int) -> Optional[Cliente]:
         """
         Recupera un cliente specifico
@@ -108,15 +120,15 @@ class ClienteController:
         
         nome = nome.strip()
         
-        # Verifica se esiste già un altro cliente con questo nome
-        clienti = Cliente.get_all(self.db)
-        if any(c.nome.lower() == nome.lower() and c.id != cliente_id for c in clienti):
-            raise ValueError(f"Esiste già un altro cliente con nome '{nome}'")
-        
-        return Cliente.update(self.db, cliente_id, nome, descrizione,
-                            vpn_exe_path, vpn_windows_name, pm_id,
-                            vpn_server, vpn_username, vpn_password,
-                            vpn_port, vpn_config_dir, vpn_procedure_dir)
+        try:
+            return Cliente.update(self.db, cliente_id, nome, descrizione,
+                                vpn_exe_path, vpn_windows_name, pm_id,
+                                vpn_server, vpn_username, vpn_password,
+                                vpn_port, vpn_config_dir, vpn_procedure_dir)
+        except sqlite3.IntegrityError as e:
+            if DatabaseManager.is_unique_violation(e):
+                raise ValueError(f"Esiste già un altro cliente con nome '{nome}'")
+            raise
     
     def elimina_cliente(self, cliente_id: int) -> bool:
         """
@@ -130,6 +142,36 @@ class ClienteController:
         """
         return Cliente.delete(self.db, cliente_id)
     
+    def clona_cliente(self, cliente_id: int, nuovo_nome: str) -> int:
+        """
+        Clona un cliente completo (servizi, credenziali, contatti, consulenti, allegati)
+        
+        Args:
+            cliente_id: ID del cliente da clonare
+            nuovo_nome: Nome del nuovo cliente
+            
+        Returns:
+            ID del cliente creato
+            
+        Raises:
+            ValueError: Se il nome è vuoto o già esistente o il cliente non esiste
+        """
+        if not nuovo_nome or not nuovo_nome.strip():
+            raise ValueError("Il nome del cliente è obbligatorio")
+        
+        nuovo_nome = nuovo_nome.strip()
+        
+        try:
+            nuovo_id = Cliente.clone(self.db, cliente_id, nuovo_nome)
+        except sqlite3.IntegrityError as e:
+            if DatabaseManager.is_unique_violation(e):
+                raise ValueError(f"Esiste già un cliente con nome '{nuovo_nome}'")
+            raise
+        
+        if nuovo_id is None:
+            raise ValueError("Cliente non trovato")
+        return nuovo_id
+    
     def ottieni_servizi_cliente(self, cliente_id: int) -> List[Servizio]:
         """
         Recupera tutti i servizi di un cliente
@@ -142,6 +184,18 @@ class ClienteController:
         """
         return Servizio.get_by_cliente(self.db, cliente_id)
     
+    def ottieni_riepilogo_servizi_cliente(self, cliente_id: int) -> List[Servizio]:
+        """
+        Recupera i servizi di un cliente con le sole colonne mostrate nelle liste
+        
+        Args:
+            cliente_id: ID del cliente
+            
+        Returns:
+            Lista di servizi (id, cliente_id, nome e tipo valorizzati)
+        """
+        return Servizio.get_by_cliente_summary(self.db, cliente_id)
+    
     def conta_servizi_cliente(self, cliente_id: int) -> int:
         """
         Conta quanti servizi ha un cliente
@@ -152,8 +206,7 @@ class ClienteController:
         Returns:
             Numero di servizi
         """
-        servizi = Servizio.get_by_cliente(self.db, cliente_id)
-        return len(servizi)
+        return Servizio.count_by_cliente(self.db, cliente_id)
     
     def crea_cliente_da_template(self, nome_cliente: str, template_cliente_id: int,
                                 credenziale_controller) -> int:
@@ -163,28 +216,70 @@ class ClienteController:
         Args:
             nome_cliente: Nome del nuovo cliente
             template_cliente_id: ID del template cliente da usare
-            credenziale_controller: Controller per creazione servizi (per evitare import circolare)
+            credenziale_controller: Controller credenziali (per la crittografia delle password)
             
         Returns:
             ID del cliente creato
+            
+        Raises:
+            ValueError: Se il template non esiste o il nome non è valido
+        """
+        nome, cliente_id, messaggio = self.crea_clienti_da_template(
+            [nome_cliente], template_cliente_id, credenziale_controller
+        )[0]
+        if cliente_id is None:
+            raise ValueError(messaggio)
+        return cliente_id
+    
+    def crea_clienti_da_template(self, nomi_clienti: Sequence[str], template_cliente_id: int,
+                                 credenziale_controller) -> List[Tuple[str, Optional[int], str]]:
+        """
+        Crea più clienti da un template in un'unica transazione
+        
+        Servizi e credenziali del template vengono copiati con query
+        set-based; i nomi non validi o già esistenti vengono saltati senza
+        bloccare gli altri.
+        
+        Args:
+            nomi_clienti: Nomi dei nuovi clienti
+            template_cliente_id: ID del template cliente da usare
+            credenziale_controller: Controller credenziali (per la crittografia delle password)
+            
+        Returns:
+            Lista di tuple (nome, ID cliente o None, messaggio) nell'ordine dei nomi
+            
+        Raises:
+            ValueError: Se il template non esiste
         """
-        # Recupera il template
         template = TemplateCliente.get_by_id(self.db, template_cliente_id)
         if not template:
             raise ValueError(f"Template cliente con ID {template_cliente_id} non trovato")
         
-        # Crea il cliente
-        cliente_id = self.crea_cliente(nome_cliente, template.descrizione_cliente)
+        esiti = []
+        da_creare = []
+        visti = set()
+        for nome in nomi_clienti:
+            nome = (nome or "").strip()
+            if not nome:
+                esiti.append((nome, None, "Il nome del cliente è obbligatorio"))
+            elif nome.casefold() in visti:
+                esiti.append((nome, None, f"Nome '{nome}' ripetuto nell'elenco"))
+            else:
+                visti.add(nome.casefold())
+                da_creare.append(nome)
+                esiti.append((nome, None, ""))
         
-        # Recupera i template servizi associati
-        template_servizi = TemplateCliente.get_servizi(self.db, template_cliente_id)
+        crypto = credenziale_controller.crypto_manager if credenziale_controller else None
+        creati = TemplateCliente.instantiate(self.db, template_cliente_id, da_creare,
+                                             crypto.cripta if crypto else None,
+                                             crypto.calcola_impronta if crypto else None)
         
-        # Crea ogni servizio dal suo template (con credenziali)
-        for template_servizio in template_servizi:
-            credenziale_controller.crea_servizio_da_template(
-                cliente_id,
-                template_servizio.nome_template,
-                template_servizio.id
-            )
-        
-        return cliente_id
+        for i, (nome, _, messaggio) in enumerate(esiti):
+            if messaggio:
+                continue
+            cliente_id = creati.get(nome)
+            if cliente_id is None:
+                esiti[i] = (nome, None, f"Esiste già un cliente con nome '{nome}'")
+            else:
+                esiti[i] = (nome, cliente_id, "Cliente creato")
+        return esiti
@@ -2,18 +2,25 @@
 Controller per gestire la logica di servizi e credenziali
 """
 
-from typing import List, Optional
-from models.database import DatabaseManager
+import ipaddress
+import re
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+from models.database import DatabaseManager, ip_binario
 from models.servizio import Servizio
 from models.credenziale import Credenziale
 from models.template_servizio import TemplateServizio
 from models.template_credenziale import TemplateCredenziale
 from models.template_cliente import TemplateCliente
+from utils.secret_cache import SecretCache
 
 
 class CredenzialeController:
     """Gestisce tutta la logica business relativa a servizi e credenziali"""
     
+    # Possibili indirizzi IP in un host o link (verificati con ipaddress)
+    _CANDIDATO_IP = re.compile(r'[0-9A-Fa-f:.]*[:.][0-9A-Fa-f:.]*')
+    
     def __init__(self, db: DatabaseManager, crypto_manager=None):
         """
         Inizializza il controller
@@ -24,11 +31,14 @@ class CredenzialeController:
         """
         self.db = db
         self.crypto_manager = crypto_manager
+        # Password decriptate su richiesta (copia, rivela, RDP), a vita breve
+        self.cache_password = SecretCache()
     
     # ===== GESTIONE SERVIZI =====
     
     def crea_servizio(self, cliente_id: int, nome: str, tipo: str,
-                     descrizione: str = "", link: str = "") -> int:
+                     descrizione: str = "", link: str = "",
+                     template_servizio_id: Optional[int] = None) -> int:
         """
         Crea un nuovo servizio
         
@@ -38,6 +48,7 @@ class CredenzialeController:
             tipo: Tipo di servizio
             descrizione: Descrizione opzionale
             link: Link/URL opzionale (per CRM e Web)
+            template_servizio_id: Template da cui deriva il servizio (lineage)
             
         Returns:
             ID del servizio creato
@@ -53,12 +64,14 @@ class CredenzialeController:
         
         nome = nome.strip()
         
-        # Verifica se esiste già un servizio con questo nome per il cliente
-        servizi = Servizio.get_by_cliente(self.db, cliente_id)
-        if any(s.nome.lower() == nome.lower() for s in servizi):
-            raise ValueError(f"Esiste già un servizio con nome '{nome}' per questo cliente")
-        
-        return Servizio.create(self.db, cliente_id, nome, tipo, descrizione, link)
+        # Unicità per cliente garantita dall'indice ux_servizi_cliente_nome_nocase
+        try:
+            return Servizio.create(self.db, cliente_id, nome, tipo, descrizione, link,
+                                   template_servizio_id)
+        except sqlite3.IntegrityError as e:
+            if DatabaseManager.is_unique_violation(e):
+                raise ValueError(f"Esiste già un servizio con nome '{nome}' per questo cliente")
+            raise
     
     def ottieni_servizi_cliente(self, cliente_id: int) -> List[Servizio]:
         """
@@ -110,17 +123,15 @@ class CredenzialeController:
         
         nome = nome.strip()
         
-        # Recupera il servizio corrente per ottenere il cliente_id
-        servizio_corrente = Servizio.get_by_id(self.db, servizio_id)
-        if not servizio_corrente:
+        if not Servizio.get_by_id(self.db, servizio_id):
             raise ValueError("Servizio non trovato")
         
-        # Verifica se esiste già un altro servizio con questo nome per il cliente
-        servizi = Servizio.get_by_cliente(self.db, servizio_corrente.cliente_id)
-        if any(s.nome.lower() == nome.lower() and s.id != servizio_id for s in servizi):
-            raise ValueError(f"Esiste già un altro servizio con nome '{nome}' per questo cliente")
-        
-        return Servizio.update(self.db, servizio_id, nome, tipo, descrizione, link)
+        try:
+            return Servizio.update(self.db, servizio_id, nome, tipo, descrizione, link)
+        except sqlite3.IntegrityError as e:
+            if DatabaseManager.is_unique_violation(e):
+                raise ValueError(f"Esiste già un altro servizio con nome '{nome}' per questo cliente")
+            raise
     
     def elimina_servizio(self, servizio_id: int) -> bool:
         """
@@ -134,6 +145,41 @@ class CredenzialeController:
         """
         return Servizio.delete(self.db, servizio_id)
     
+    def sposta_servizi(self, servizio_ids: List[int], cliente_id: int) -> List[tuple]:
+        """
+        Sposta più servizi (con le credenziali) in un altro cliente
+        
+        I nomi già presenti nella destinazione ricevono un suffisso " (2)", " (3)"...
+        
+        Args:
+            servizio_ids: ID dei servizi da spostare
+            cliente_id: ID del cliente di destinazione
+        
+        Returns:
+            Lista di tuple (id origine, id risultante, nome originale, nome finale)
+        """
+        if not servizio_ids:
+            raise ValueError("Nessun servizio selezionato")
+        return Servizio.move_to_cliente(self.db, servizio_ids, cliente_id)
+    
+    def copia_servizi(self, servizio_ids: List[int], cliente_id: int) -> List[tuple]:
+        """
+        Copia più servizi (con le credenziali) in un cliente
+        
+        Le password vengono copiate cifrate, senza decriptarle; i nomi già
+        presenti nella destinazione ricevono un suffisso " (2)", " (3)"...
+        
+        Args:
+            servizio_ids: ID dei servizi da copiare
+            cliente_id: ID del cliente di destinazione
+        
+        Returns:
+            Lista di tuple (id origine, id della copia, nome originale, nome finale)
+        """
+        if not servizio_ids:
+            raise ValueError("Nessun servizio selezionato")
+        return Servizio.copy_to_cliente(self.db, servizio_ids, cliente_id)
+    
     # ===== GESTIONE CREDENZIALI =====
     
     def crea_credenziale(self, servizio_id: int, username: str, password: str,
@@ -164,57 +210,286 @@ class CredenzialeController:
         if not password:
             raise ValueError("La password è obbligatoria")
         
+        impronta = self.calcola_impronta(username, password, host, porta, note, rdp_configurata)
+        
         # Cripta la password se disponibile il crypto manager
         password_da_salvare = password
         if self.crypto_manager:
             password_da_salvare = self.crypto_manager.cripta(password)
         
         return Credenziale.create(self.db, servizio_id, username.strip(),
-                                 password_da_salvare, host.strip(), porta, note, rdp_configurata, link.strip())
+                                 password_da_salvare, host.strip(), porta, note, rdp_configurata, link.strip(),
+                                 impronta)
     
     def ottieni_credenziali_servizio(self, servizio_id: int) -> List[Credenziale]:
         """
-        Recupera tutte le credenziali di un servizio (con password decriptate)
+        Recupera tutte le credenziali di un servizio
+        
+        Le password restano cifrate: usare rivela_password solo quando
+        serve il valore in chiaro.
         
         Args:
             servizio_id: ID del servizio
             
         Returns:
-            Lista di credenziali con password decriptate
+            Lista di credenziali con password cifrate
         """
-        credenziali = Credenziale.get_by_servizio(self.db, servizio_id)
-        
-        # Decripta le password se disponibile il crypto manager
-        if self.crypto_manager:
-            for cred in credenziali:
-                try:
-                    cred.password = self.crypto_manager.decripta(cred.password)
-                except:
-                    pass  # Mantieni la password come è se la decrittazione fallisce
-        
-        return credenziali
+        return Credenziale.get_by_servizio(self.db, servizio_id)
     
-    def ottieni_credenziale(self, credenziale_id: int) -> Optional[Credenziale]:
+    def ottieni_credenziale(self, credenziale_id: int, decripta: bool = True) -> Optional[Credenziale]:
         """
-        Recupera una credenziale specifica (con password decriptata)
+        Recupera una credenziale specifica
         
         Args:
             credenziale_id: ID della credenziale
+            decripta: Se False la password resta cifrata (es. semplice selezione)
             
         Returns:
             Credenziale trovata o None
+        
+        Raises:
+            ValueError: Se decripta è True e la password non è decifrabile
         """
         cred = Credenziale.get_by_id(self.db, credenziale_id)
         
-        # Decripta la password se disponibile il crypto manager
-        if cred and self.crypto_manager:
-            try:
-                cred.password = self.crypto_manager.decripta(cred.password)
-            except:
-                pass  # Mantieni la password come è se la decrittazione fallisce
+        if cred and decripta:
+            cred.password = self.rivela_password(cred)
         
         return cred
     
+    def rivela_password(self, credenziale: Credenziale) -> str:
+        """
+        Restituisce la password in chiaro di una credenziale
+        
+        La decrittazione avviene solo qui; il risultato resta per poco in una
+        cache limitata, così copie e connessioni ripetute non rifanno il
+        lavoro e in memoria non restano le password di tutta la lista.
+        
+        Args:
+            credenziale: Credenziale con la password cifrata
+            
+        Returns:
+            Password in chiaro
+        
+        Raises:
+            ValueError: Se la password è cifrata con una chiave non disponibile:
+                        il ciphertext non viene mai restituito al posto della password
+        """
+        cifrata = credenziale.password
+        if not cifrata or not self.crypto_manager:
+            return cifrata or ""
+        
+        password = self.cache_password.ottieni(cifrata)
+        if password is None:
+            password = self.crypto_manager.decripta(cifrata)
+            self.cache_password.memorizza(cifrata, password)
+        return password
+    
+    def svuota_cache_password(self):
+        """Dimentica tutte le password decriptate (es. cambio master password)"""
+        self.cache_password.svuota()
+    
+    def ottieni_riepilogo_credenziali_servizio(self, servizio_id: int) -> List[Credenziale]:
+        """
+        Recupera le credenziali di un servizio con le sole colonne della lista
+        
+        La password resta cifrata (usare rivela_password) e le note sono in
+        anteprima: per il dettaglio usare ottieni_credenziale.
+        
+        Args:
+            servizio_id: ID del servizio
+            
+        Returns:
+            Lista di credenziali (riepilogo)
+        """
+        return Credenziale.get_by_servizio_summary(self.db, servizio_id)
+    
+    def trova_credenziali_per_url(self, url: str, limite: int = 10) -> List[dict]:
+        """
+        Credenziali associate a un URL o a un host (autofill, launcher)
+        
+        Usa l'indice host/link: host identico, domini padre e sottodomini,
+        con la porta compatibile prima. Le password restano cifrate.
+        
+        Args:
+            url: URL, host o host:porta
+            limite: Numero massimo di risultati
+            
+        Returns:
+            Risultati dal più pertinente (vedi Credenziale.find_by_url)
+        """
+        return Credenziale.find_by_url(self.db, url, limite)
+    
+    @staticmethod
+    def _intervallo_rete(rete: str) -> Tuple[bytes, bytes]:
+        """
+        Estremi (forma ip_binario) di un indirizzo, una rete CIDR o un
+        intervallo "primo-ultimo"
+        
+        Raises:
+            ValueError: Se la rete non è valida
+        """
+        try:
+            if '-' in rete:
+                primo, ultimo = (ipaddress.ip_address(p.strip()) for p in rete.split('-', 1))
+                if primo.version != ultimo.version or primo > ultimo:
+                    raise ValueError
+            else:
+                rete_ip = ipaddress.ip_network(rete.strip(), strict=False)
+                primo, ultimo = rete_ip.network_address, rete_ip.broadcast_address
+        except ValueError:
+            raise ValueError(f"Indirizzo, rete o intervallo non valido: '{rete}'")
+        return ip_binario(primo), ip_binario(ultimo)
+    
+    def trova_credenziali_per_rete(self, reti: Sequence[str],
+                                   limite: Optional[int] = None) -> List[dict]:
+        """
+        Credenziali che puntano a indirizzi IP delle reti indicate
+        (host, link della credenziale o link del servizio)
+        
+        Args:
+            reti: Indirizzi ("10.20.1.5"), reti CIDR ("10.20.0.0/16") o
+                intervalli ("10.20.0.1-10.20.0.50"), anche IPv6
+            limite: Numero massimo di risultati (None = tutti)
+            
+        Returns:
+            Risultati ordinati per indirizzo (vedi Credenziale.find_by_ip_range)
+            
+        Raises:
+            ValueError: Se una rete non è valida
+        """
+        if isinstance(reti, str):
+            reti = [reti]
+        intervalli = [self._intervallo_rete(rete) for rete in reti]
+        return Credenziale.find_by_ip_range(self.db, intervalli, limite)
+    
+    @staticmethod
+    def _mappa_reti(mappa: Dict[str, str]) -> List[tuple]:
+        """
+        Valida una mappa rete di origine -> rete di destinazione
+        
+        Raises:
+            ValueError: Se una rete non è valida, famiglia o prefisso non
+                coincidono o le reti di origine si sovrappongono
+        """
+        reti = []
+        for vecchia, nuova in mappa.items():
+            try:
+                origine = ipaddress.ip_network(vecchia.strip(), strict=False)
+                destinazione = ipaddress.ip_network(nuova.strip(), strict=False)
+            except ValueError:
+                raise ValueError(f"Rete non valida: '{vecchia}' -> '{nuova}'")
+            if origine.version != destinazione.version or origine.prefixlen != destinazione.prefixlen:
+                raise ValueError(f"Le reti {origine} e {destinazione} devono avere "
+                                 f"stessa famiglia e stessa lunghezza del prefisso")
+            if any(origine.overlaps(altra) for altra, _ in reti):
+                raise ValueError(f"La rete {origine} si sovrappone a un'altra rete di origine")
+            reti.append((origine, destinazione))
+        if not reti:
+            raise ValueError("Nessuna rete da riassegnare")
+        return reti
+    
+    @classmethod
+    def _riscrivi_indirizzi(cls, testo: Optional[str], reti: List[tuple]) -> Optional[str]:
+        """Sostituisce nel testo gli indirizzi delle reti di origine (porta e percorso invariati)"""
+        if not testo:
+            return testo
+        
+        def sostituisci(corrispondenza):
+            candidato, porta = corrispondenza.group(0), ""
+            try:
+                ip = ipaddress.ip_address(candidato)
+            except ValueError:
+                # IPv4 seguito da :porta
+                indirizzo, separatore, numero = candidato.rpartition(':')
+                try:
+                    ip = ipaddress.IPv4Address(indirizzo)
+                except ValueError:
+                    return candidato
+                porta = separatore + numero
+            for origine, destinazione in reti:
+                if ip.version == origine.version and ip in origine:
+                    return str(destinazione.network_address + (int(ip) - int(origine.network_address))) + porta
+            return candidato
+        
+        return cls._CANDIDATO_IP.sub(sostituisci, testo)
+    
+    def _calcola_riassegnazione(self, mappa: Dict[str, str]) -> Tuple[List[tuple], List[tuple]]:
+        """
+        Righe da riscrivere per una mappa di reti
+        
+        Returns:
+            Tupla (credenziali, servizi) nel formato di Credenziale.update_addresses
+        """
+        reti = self._mappa_reti(mappa)
+        intervalli = [(ip_binario(origine.network_address), ip_binario(origine.broadcast_address))
+                      for origine, _ in reti]
+        credenziali, servizi = Credenziale.get_ip_references(self.db, intervalli)
+        
+        righe_credenziali = []
+        for riga in credenziali:
+            host = self._riscrivi_indirizzi(riga['host'], reti)
+            link = self._riscrivi_indirizzi(riga['link'], reti)
+            if host != riga['host'] or link != riga['link']:
+                righe_credenziali.append((host, link, riga['id'], riga['host'], riga['link']))
+        righe_servizi = []
+        for riga in servizi:
+            link = self._riscrivi_indirizzi(riga['link'], reti)
+            if link != riga['link']:
+                righe_servizi.append((link, riga['id'], riga['link']))
+        return righe_credenziali, righe_servizi
+    
+    def anteprima_riassegnazione(self, mappa: Dict[str, str]) -> List[dict]:
+        """
+        Modifiche che riassegna_indirizzi applicherebbe (niente viene scritto)
+        
+        Args:
+            mappa: Rete di origine -> rete di destinazione con lo stesso
+                prefisso (es. {"10.20.0.0/16": "10.30.0.0/16"}); gli indirizzi
+                mantengono la posizione nella rete
+            
+        Returns:
+            Dizionari con tabella, id, colonna, prima e dopo
+            
+        Raises:
+            ValueError: Se la mappa non è valida
+        """
+        credenziali, servizi = self._calcola_riassegnazione(mappa)
+        modifiche = []
+        for host, link, credenziale_id, host_attuale, link_attuale in credenziali:
+            for colonna, prima, dopo in (('host', host_attuale, host), ('link', link_attuale, link)):
+                if prima != dopo:
+                    modifiche.append({'tabella': 'credenziali', 'id': credenziale_id,
+                                      'colonna': colonna, 'prima': prima, 'dopo': dopo})
+        for link, servizio_id, link_attuale in servizi:
+            modifiche.append({'tabella': 'servizi', 'id': servizio_id, 'colonna': 'link',
+                              'prima': link_attuale, 'dopo': link})
+        return modifiche
+    
+    def riassegna_indirizzi(self, mappa: Dict[str, str]) -> Dict[str, int]:
+        """
+        Riscrive host e link di credenziali e servizi secondo una mappa di
+        reti, in un'unica transazione (es. cambio di indirizzamento di una subnet)
+        
+        Le impronte delle credenziali con host cambiato vengono ricalcolate
+        (subito se il vault è sbloccato, altrimenti al prossimo avvio).
+        
+        Args:
+            mappa: Rete di origine -> rete di destinazione (vedi anteprima_riassegnazione)
+            
+        Returns:
+            Conteggi: credenziali e servizi aggiornati, saltati (modificati
+            nel frattempo da un'altra connessione)
+            
+        Raises:
+            ValueError: Se la mappa non è valida
+        """
+        credenziali, servizi = self._calcola_riassegnazione(mappa)
+        aggiornate, servizi_aggiornati = Credenziale.update_addresses(self.db, credenziali, servizi)
+        self.aggiorna_impronte()
+        return {'credenziali': aggiornate, 'servizi': servizi_aggiornati,
+                'saltati': len(credenziali) + len(servizi) - aggiornate - servizi_aggiornati}
+    
     def modifica_credenziale(self, credenziale_id: int, username: str,
                             password: str, host: str = "",
                             porta: Optional[int] = None, note: str = "",
@@ -244,13 +519,17 @@ class CredenzialeController:
         if not password:
             raise ValueError("La password è obbligatoria")
         
+        impronta = self.calcola_impronta(username, password, host, porta, note, rdp_configurata)
+        
         # Cripta la password se disponibile il crypto manager
         password_da_salvare = password
         if self.crypto_manager:
             password_da_salvare = self.crypto_manager.cripta(password)
         
+        self._dimentica_password(credenziale_id)
         return Credenziale.update(self.db, credenziale_id, username.strip(),
-                                 password_da_salvare, host.strip(), porta, note, rdp_configurata, link.strip())
+                                 password_da_salvare, host.strip(), porta, note, rdp_configurata, link.strip(),
+                                 impronta)
     
     def elimina_credenziale(self, credenziale_id: int) -> bool:
         """
@@ -262,8 +541,107 @@ class CredenzialeController:
         Returns:
             True se l'eliminazione è riuscita
         """
+        self._dimentica_password(credenziale_id)
         return Credenziale.delete(self.db, credenziale_id)
     
+    def calcola_impronta(self, username: str, password: str, host: str = "",
+                         porta: Optional[int] = None, note: str = "",
+                         rdp_configurata: bool = False) -> Optional[str]:
+        """
+        Impronta HMAC dei campi in chiaro di una credenziale
+        
+        Returns:
+            Impronta esadecimale, None se il crypto manager non è disponibile
+        """
+        if not self.crypto_manager:
+            return None
+        return self.crypto_manager.calcola_impronta(username, password, host, porta,
+                                                    note, rdp_configurata)
+    
+    def aggiorna_impronte(self, blocco: int = 500) -> int:
+        """
+        Calcola l'impronta delle credenziali che ne sono prive (database
+        precedenti alla colonna), a blocchi da una transazione ciascuno
+        
+        Args:
+            blocco: Numero di credenziali per transazione
+            
+        Returns:
+            Numero di impronte calcolate
+        """
+        totale = 0
+        while True:
+            calcolate = self.aggiorna_blocco_impronte(blocco)
+            totale += calcolate
+            if calcolate < blocco:
+                return totale
+    
+    def aggiorna_blocco_impronte(self, blocco: int = 500) -> int:
+        """
+        Calcola le impronte mancanti di un solo blocco di credenziali (una
+        transazione): la GUI lo richiama dal timer finché restituisce meno
+        di blocco, senza bloccare l'interfaccia sui vault grandi
+        
+        Args:
+            blocco: Numero massimo di credenziali da aggiornare
+            
+        Returns:
+            Numero di impronte calcolate (0 = nessuna mancante)
+        """
+        if not self.crypto_manager:
+            return 0
+        
+        righe = Credenziale.get_senza_impronta(self.db, blocco)
+        impronte = []
+        for r in righe:
+            password = self.crypto_manager.testo_impronta(r['password'])
+            impronte.append((self.crypto_manager.calcola_impronta(
+                r['username'], password, r['host'], r['porta'], r['note'],
+                bool(r['rdp_configurata'])), r['id']))
+        if impronte:
+            Credenziale.set_impronte(self.db, impronte)
+        return len(impronte)
+    
+    def _dimentica_password(self, credenziale_id: int):
+        """Rimuove dalla cache la password corrente di una credenziale"""
+        cred = Credenziale.get_by_id(self.db, credenziale_id)
+        if cred and cred.password:
+            self.cache_password.rimuovi(cred.password)
+    
+    def sposta_credenziali(self, credenziale_ids: List[int], servizio_id: int) -> int:
+        """
+        Sposta più credenziali in un altro servizio
+        
+        Args:
+            credenziale_ids: ID delle credenziali da spostare
+            servizio_id: ID del servizio di destinazione
+        
+        Returns:
+            Numero di credenziali spostate
+        """
+        if not credenziale_ids:
+            raise ValueError("Nessuna credenziale selezionata")
+        return Credenziale.move_to_servizio(self.db, credenziale_ids, servizio_id)
+    
+    def copia_credenziali(self, credenziale_ids: List[int], servizio_id: int) -> int:
+        """
+        Copia più credenziali in un servizio (password copiate cifrate)
+        
+        Le credenziali identiche (stessa impronta) a una già presente nel
+        servizio di destinazione non vengono copiate.
+        
+        Args:
+            credenziale_ids: ID delle credenziali da copiare
+            servizio_id: ID del servizio di destinazione
+        
+        Returns:
+            Numero di credenziali copiate
+        """
+        if not credenziale_ids:
+            raise ValueError("Nessuna credenziale selezionata")
+        return Credenziale.copy_to_servizio(self.db, credenziale_ids, servizio_id,
+                                            salta_duplicati=True)
+    
     def conta_credenziali_servizio(self, servizio_id: int) -> int:
         """
         Conta quante credenziali ha un servizio
@@ -274,8 +652,7 @@ class CredenzialeController:
         Returns:
             Numero di credenziali
         """
-        credenziali = Credenziale.get_by_servizio(self.db, servizio_id)
-        return len(credenziali)
+        return Credenziale.count_by_servizio(self.db, servizio_id)
     
     # ===== GESTIONE TEMPLATE SERVIZI (v2.1) =====
     
@@ -328,11 +705,43 @@ class CredenzialeController:
         
         # Crea il servizio con i dati del template
         servizio_id = self.crea_servizio(cliente_id, nome_servizio, template.tipo,
-                                         template.descrizione, template.link)
+                                         template.descrizione, template.link, template.id)
         
         # Le credenziali vanno aggiunte manualmente dopo la creazione
         return servizio_id
     
+    def anteprima_propagazione_template(self, template_id: int) -> List[dict]:
+        """
+        Mostra quali servizi derivati dal template verrebbero modificati
+        
+        Args:
+            template_id: ID del template servizio
+            
+        Returns:
+            Lista di dizionari (servizio_id, cliente, servizio, modifiche)
+        """
+        return TemplateServizio.get_propagation_preview(self.db, template_id)
+    
+    def propaga_template(self, template_id: int) -> int:
+        """
+        Applica tipo, descrizione e link del template a tutti i servizi derivati
+        
+        Args:
+            template_id: ID del template servizio
+            
+        Returns:
+            Numero di servizi aggiornati
+        """
+        return TemplateServizio.propagate(self.db, template_id)
+    
+    def conta_servizi_omonimi_non_collegati(self, template_id: int) -> int:
+        """Conta i servizi senza template con lo stesso nome del template"""
+        return TemplateServizio.count_unlinked_same_name(self.db, template_id)
+    
+    def collega_servizi_omonimi(self, template_id: int) -> int:
+        """Collega al template i servizi senza template con lo stesso nome"""
+        return TemplateServizio.link_same_name(self.db, template_id)
+    
     # ===== GESTIONE TEMPLATE CREDENZIALI (v2.1 extended) =====
     
     def crea_template_credenziale(self, template_servizio_id: int, username: str = "",
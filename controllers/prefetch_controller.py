@@ -0,0 +1,173 @@
+"""
+Controller per il prefetch in background di servizi e credenziali
+"""
+
+import queue
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+from models.database import DatabaseManager
+from models.servizio import Servizio
+from models.credenziale import Credenziale
+
+
+class PrefetchController:
+    """
+    Precarica servizi e riepiloghi delle credenziali dei clienti evidenziati
+
+    Le letture avvengono in un thread worker con una connessione propria;
+    i risultati finiscono in una cache LRU limitata, letta dal thread della
+    GUI. Ogni voce è marcata con la versione dei dati (data_version del
+    database) al momento della richiesta: dopo una modifica, anche fatta da
+    un altro processo, le voci vecchie non vengono più restituite. Una nuova richiesta annulla
+    quelle ancora in coda; svuota scarta anche i caricamenti in corso.
+    """
+
+    # Numero massimo di clienti tenuti in cache
+    MAX_CLIENTI = 16
+
+    def __init__(self, db: DatabaseManager, max_clienti: int = MAX_CLIENTI):
+        """
+        Inizializza il controller
+
+        Args:
+            db: Gestore del database principale (usato solo dal thread GUI)
+            max_clienti: Numero massimo di clienti in cache
+        """
+        self.db = db
+        self.max_clienti = max_clienti
+        self._reader = db.open_reader()
+        self._cache: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._coda: "queue.Queue" = queue.Queue()
+        self._generazione = 0  # Cambia a ogni richiesta: annulla la coda
+        self._epoca = 0  # Cambia a ogni svuotamento: scarta i caricamenti in corso
+        self._thread = None
+
+    # ===== API (thread GUI) =====
+
+    def richiedi(self, cliente_ids: Iterable[int]):
+        """
+        Chiede il prefetch dei clienti indicati, in ordine di priorità
+
+        Le richieste precedenti non ancora eseguite vengono annullate.
+
+        Args:
+            cliente_ids: ID dei clienti (es. evidenziato e adiacenti)
+        """
+        versione = self.db.data_version()
+        with self._lock:
+            self._generazione += 1
+            generazione = self._generazione
+            epoca = self._epoca
+            da_caricare = [cid for cid in cliente_ids
+                           if cid is not None and not self._valida(cid, versione)]
+        for cliente_id in da_caricare:
+            self._coda.put((cliente_id, generazione, epoca, versione))
+        if da_caricare:
+            self._avvia()
+
+    def annulla(self):
+        """Annulla le richieste in coda senza toccare la cache"""
+        with self._lock:
+            self._generazione += 1
+
+    def ottieni_servizio(self, servizio_id: int) -> Optional[Servizio]:
+        """
+        Restituisce un servizio dalla cache
+
+        Args:
+            servizio_id: ID del servizio
+
+        Returns:
+            Servizio o None se non precaricato/non aggiornato
+        """
+        voce = self._cerca_servizio(servizio_id)
+        return voce[0].get(servizio_id) if voce else None
+
+    def ottieni_credenziali_servizio(self, servizio_id: int) -> Optional[List[Credenziale]]:
+        """
+        Restituisce il riepilogo delle credenziali di un servizio dalla cache
+
+        Args:
+            servizio_id: ID del servizio
+
+        Returns:
+            Lista di credenziali (password cifrate) o None se non disponibile
+        """
+        voce = self._cerca_servizio(servizio_id)
+        return list(voce[1].get(servizio_id, [])) if voce else None
+
+    def svuota(self):
+        """Svuota la cache e annulla le richieste in coda"""
+        with self._lock:
+            self._generazione += 1
+            self._epoca += 1
+            self._cache.clear()
+
+    def ferma(self):
+        """Ferma il thread worker (alla chiusura dell'applicazione)"""
+        self.svuota()
+        if self._thread and self._thread.is_alive():
+            self._coda.put(None)
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    # ===== Interni =====
+
+    def _valida(self, cliente_id: int, versione: tuple) -> bool:
+        """Indica se la voce del cliente è in cache e aggiornata (con lock)"""
+        voce = self._cache.get(cliente_id)
+        return voce is not None and voce[0] == versione
+
+    def _cerca_servizio(self, servizio_id: int) -> Optional[tuple]:
+        """Trova la voce aggiornata che contiene il servizio"""
+        versione = self.db.data_version()
+        with self._lock:
+            for cliente_id, (versione_voce, servizi, credenziali) in self._cache.items():
+                if servizio_id in servizi:
+                    if versione_voce != versione:
+                        return None
+                    self._cache.move_to_end(cliente_id)
+                    return servizi, credenziali
+        return None
+
+    def _avvia(self):
+        """Avvia il thread worker se non è già attivo"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._esegui, name="prefetch", daemon=True)
+            self._thread.start()
+
+    def _esegui(self):
+        """Ciclo del worker: carica i clienti richiesti finché non viene fermato"""
+        try:
+            while True:
+                richiesta = self._coda.get()
+                if richiesta is None:
+                    break
+                cliente_id, generazione, epoca, versione = richiesta
+                with self._lock:
+                    if generazione != self._generazione or self._valida(cliente_id, versione):
+                        continue
+                try:
+                    servizi = Servizio.get_by_cliente(self._reader, cliente_id)
+                    credenziali: Dict[int, List[Credenziale]] = {s.id: [] for s in servizi}
+                    for cred in Credenziale.get_by_cliente_summary(self._reader, cliente_id):
+                        credenziali.setdefault(cred.servizio_id, []).append(cred)
+                except Exception:
+                    continue  # Il prefetch è solo un'ottimizzazione
+                self._memorizza(cliente_id, epoca, versione,
+                                {s.id: s for s in servizi}, credenziali)
+        finally:
+            self._reader.close()
+
+    def _memorizza(self, cliente_id: int, epoca: int, versione: tuple,
+                   servizi: Dict[int, Servizio], credenziali: Dict[int, List[Credenziale]]):
+        """Salva una voce in cache se nel frattempo la cache non è stata svuotata"""
+        with self._lock:
+            if epoca != self._epoca:
+                return
+            self._cache[cliente_id] = (versione, servizi, credenziali)
+            self._cache.move_to_end(cliente_id)
+            while len(self._cache) > self.max_clienti:
+                self._cache.popitem(last=False)
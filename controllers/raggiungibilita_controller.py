@@ -0,0 +1,231 @@
+"""
+Controller per le verifiche di raggiungibilità degli host delle credenziali
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from models.database import DatabaseManager, analizza_host
+from models.raggiungibilita import Raggiungibilita
+from utils.reachability_probe import ReachabilityProbe
+
+Destinazione = Tuple[str, int]
+
+
+class RaggiungibilitaController:
+    """
+    Verifica se host e porte delle credenziali accettano connessioni TCP
+    
+    La destinazione di una credenziale è quella del suo pulsante di azione:
+    il link (porta esplicita o dello schema, HTTPS se manca) oppure l'host
+    con la porta della credenziale (RDP se manca). Gli esiti sono salvati e
+    riusati per `ttl` secondi, quindi riaprire un servizio non ripete le
+    connessioni.
+    
+    Gli esiti stanno in un file accanto al vault (percorso_esiti), non nel
+    vault: data_version vede anche i commit delle altre connessioni, quindi
+    scriverli nel vault svuoterebbe la cache di prefetch e farebbe scadere
+    le anteprime di import a ogni verifica.
+    
+    verifica attende gli esiti (CLI); avvia li calcola in un thread worker
+    con una connessione propria al file degli esiti e la GUI li raccoglie
+    con raccogli mentre arrivano.
+    """
+    
+    # Validità in secondi degli esiti salvati
+    TTL = 300
+    
+    # Porte usate quando link e host non ne indicano una
+    PORTA_LINK = 443
+    PORTA_HOST = 3389
+    
+    def __init__(self, db: DatabaseManager, ttl: int = TTL,
+                 prober: Optional[ReachabilityProbe] = None):
+        """
+        Inizializza il controller
+        
+        Args:
+            db: Gestore del database principale
+            ttl: Validità in secondi degli esiti salvati
+            prober: Prober da usare (default: ReachabilityProbe con i valori predefiniti)
+        """
+        self.db = db
+        self.ttl = ttl
+        self.prober = prober or ReachabilityProbe()
+        self.esiti_db = DatabaseManager(self.percorso_esiti(db.db_path), inizializza=False)
+        Raggiungibilita.create_table(self.esiti_db)
+        self._scrittore = self.esiti_db.open_reader()  # usato solo dal thread worker
+        self._richieste: "queue.Queue" = queue.Queue()
+        self._esiti: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._generazione = 0  # Cambia a ogni avvia: le richieste precedenti decadono
+        self._in_corso = 0
+        self._thread = None
+    
+    @staticmethod
+    def percorso_esiti(db_path: str) -> str:
+        """File degli esiti accanto al database (es. credenziali_suite_raggiungibilita.db)"""
+        if db_path == ':memory:':
+            return db_path
+        return os.path.splitext(db_path)[0] + '_raggiungibilita.db'
+    
+    @classmethod
+    def destinazione(cls, host: Optional[str], porta, link: Optional[str]) -> Optional[Destinazione]:
+        """
+        Coppia (host, porta) da contattare per una credenziale
+        
+        Args:
+            host: Campo host della credenziale
+            porta: Porta della credenziale (anche None o stringa)
+            link: Link della credenziale
+        
+        Returns:
+            Tupla (host normalizzato, porta) o None se non c'è nulla da contattare
+        """
+        if link and link.strip():
+            nome, porta_link = analizza_host(link)
+            if nome:
+                return nome, porta_link or cls.PORTA_LINK
+        if host and host.strip():
+            nome, porta_host = analizza_host(host)
+            if nome:
+                try:
+                    porta = int(porta) if porta not in (None, "") else None
+                except (TypeError, ValueError):
+                    porta = None
+                return nome, porta or porta_host or cls.PORTA_HOST
+        return None
+    
+    @staticmethod
+    def etichetta(destinazione: Destinazione) -> str:
+        """Destinazione come testo "host:porta" (IPv6 tra parentesi quadre)"""
+        host, porta = destinazione
+        return f"[{host}]:{porta}" if ':' in host else f"{host}:{porta}"
+    
+    def stato(self, destinazioni: Iterable[Destinazione]) -> Dict[Destinazione, dict]:
+        """
+        Esiti salvati e ancora validi, senza nuove connessioni
+        
+        Args:
+            destinazioni: Coppie (host, porta)
+        
+        Returns:
+            Dizionario (host, porta) -> esito, solo per le destinazioni note
+        """
+        salvati = Raggiungibilita.get_fresh(self.esiti_db, self.ttl)
+        return {d: salvati[d] for d in destinazioni if d in salvati}
+    
+    def verifica(self, destinazioni: Iterable[Destinazione], forza: bool = False) -> Dict[Destinazione, dict]:
+        """
+        Verifica le destinazioni e attende gli esiti (salvati nel file degli esiti)
+        
+        Args:
+            destinazioni: Coppie (host, porta)
+            forza: Verifica anche le destinazioni con un esito ancora valido
+        
+        Returns:
+            Dizionario (host, porta) -> esito
+        """
+        destinazioni = list(dict.fromkeys(destinazioni))
+        esiti = {} if forza else self.stato(destinazioni)
+        nuovi = self.prober.verifica(d for d in destinazioni if d not in esiti)
+        Raggiungibilita.save_results(self.esiti_db, nuovi.values())
+        esiti.update(nuovi)
+        return esiti
+    
+    # ===== Verifica in background (GUI) =====
+    
+    def avvia(self, destinazioni: Iterable[Destinazione], forza: bool = False) -> Dict[Destinazione, dict]:
+        """
+        Avvia in background la verifica delle destinazioni senza esito valido
+        
+        Annulla le verifiche avviate in precedenza e non ancora iniziate.
+        Gli esiti nuovi si ottengono con raccogli().
+        
+        Args:
+            destinazioni: Coppie (host, porta)
+            forza: Verifica anche le destinazioni con un esito ancora valido
+        
+        Returns:
+            Esiti salvati ancora validi (da mostrare subito)
+        """
+        destinazioni = list(dict.fromkeys(destinazioni))
+        validi = {} if forza else self.stato(destinazioni)
+        da_verificare = [d for d in destinazioni if d not in validi]
+        with self._lock:
+            self._generazione += 1
+            generazione = self._generazione
+            if da_verificare:
+                self._in_corso += 1
+        self.prober.annulla()
+        if da_verificare:
+            self._richieste.put((generazione, da_verificare))
+            self._avvia_thread()
+        return validi
+    
+    def raccogli(self) -> List[dict]:
+        """
+        Esiti arrivati dal worker dall'ultima chiamata (non blocca)
+        
+        Returns:
+            Lista di esiti (vedi ReachabilityProbe.verifica_async)
+        """
+        esiti = []
+        while True:
+            try:
+                esiti.append(self._esiti.get_nowait())
+            except queue.Empty:
+                return esiti
+    
+    def in_corso(self) -> bool:
+        """Indica se ci sono verifiche in coda o in esecuzione"""
+        with self._lock:
+            return self._in_corso > 0
+    
+    def annulla(self):
+        """Annulla le verifiche in coda e quelle non ancora iniziate"""
+        with self._lock:
+            self._generazione += 1
+        self.prober.annulla()
+    
+    def ferma(self):
+        """Ferma il thread worker (alla chiusura dell'applicazione)"""
+        self.annulla()
+        if self._thread and self._thread.is_alive():
+            self._richieste.put(None)
+            self._thread.join(timeout=self.prober.timeout + 1)
+        self._thread = None
+        self.esiti_db.close()
+    
+    # ===== Interni =====
+    
+    def _avvia_thread(self):
+        """Avvia il thread worker se non è già attivo"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._esegui, name="raggiungibilita", daemon=True)
+            self._thread.start()
+    
+    def _esegui(self):
+        """Ciclo del worker: verifica le richieste e salva gli esiti"""
+        try:
+            while True:
+                richiesta = self._richieste.get()
+                if richiesta is None:
+                    break
+                generazione, destinazioni = richiesta
+                try:
+                    with self._lock:
+                        if generazione != self._generazione:
+                            continue
+                    esiti = self.prober.verifica(destinazioni, self._esiti.put)
+                    try:
+                        Raggiungibilita.save_results(self._scrittore, esiti.values())
+                    except sqlite3.Error:
+                        pass  # File occupato: gli esiti restano comunque nella GUI
+                finally:
+                    with self._lock:
+                        self._in_corso -= 1
+        finally:
+            self._scrittore.close()
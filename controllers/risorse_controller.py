@@ -2,7 +2,7 @@
 Controller per gestire la logica di PM, Consulenti e Contatti
 """
 
-from typing import List, Optional
+from typing import List, Optional, Set, Tuple
 from models.database import DatabaseManager
 from models.pm import PM
 from models.consulente import Consulente
@@ -191,6 +191,78 @@ class RisorseController:
         """Conta quanti clienti sono associati a un consulente"""
         return Consulente.get_clienti_count(self.db, consulente_id)
     
+    # ===== ASSEGNAZIONI IN BLOCCO =====
+    
+    def associa_consulenti_clienti(self, consulente_ids: List[int], cliente_ids: List[int]) -> int:
+        """
+        Associa ogni consulente a ogni cliente indicato (un'unica transazione)
+        
+        Args:
+            consulente_ids: ID dei consulenti (anche uno solo)
+            cliente_ids: ID dei clienti (anche uno solo)
+        
+        Returns:
+            Numero di nuove associazioni
+        """
+        return Consulente.associa_a_clienti(self.db, consulente_ids, cliente_ids)
+    
+    def disassocia_consulenti_clienti(self, consulente_ids: List[int], cliente_ids: List[int]) -> int:
+        """
+        Rimuove le associazioni tra i consulenti e i clienti indicati
+        
+        Args:
+            consulente_ids: ID dei consulenti
+            cliente_ids: ID dei clienti
+        
+        Returns:
+            Numero di associazioni rimosse
+        """
+        return Consulente.disassocia_da_clienti(self.db, consulente_ids, cliente_ids)
+    
+    def imposta_consulenti_cliente(self, cliente_id: int, consulente_ids: List[int]) -> Tuple[int, int]:
+        """
+        Sostituisce l'insieme dei consulenti di un cliente
+        
+        Args:
+            cliente_id: ID del cliente
+            consulente_ids: ID dei consulenti da associare
+        
+        Returns:
+            Tupla (associazioni aggiunte, associazioni rimosse)
+        """
+        return Consulente.imposta_per_cliente(self.db, cliente_id, consulente_ids)
+    
+    def ottieni_matrice_consulenti(self) -> Set[Tuple[int, int]]:
+        """Restituisce tutte le coppie (cliente_id, consulente_id) associate"""
+        return Consulente.get_associazioni(self.db)
+    
+    def applica_matrice_consulenti(self, aggiunte: List[Tuple[int, int]],
+                                   rimozioni: List[Tuple[int, int]]) -> Tuple[int, int]:
+        """
+        Salva le modifiche dell'editor a matrice in un'unica transazione
+        
+        Args:
+            aggiunte: Coppie (cliente_id, consulente_id) da associare
+            rimozioni: Coppie (cliente_id, consulente_id) da disassociare
+        
+        Returns:
+            Tupla (associazioni aggiunte, associazioni rimosse)
+        """
+        return Consulente.applica_modifiche_associazioni(self.db, aggiunte, rimozioni)
+    
+    def assegna_pm_clienti(self, pm_id: Optional[int], cliente_ids: List[int]) -> int:
+        """
+        Assegna un PM a più clienti (None rimuove l'assegnazione)
+        
+        Args:
+            pm_id: ID del PM o None
+            cliente_ids: ID dei clienti
+        
+        Returns:
+            Numero di clienti aggiornati
+        """
+        return PM.assegna_a_clienti(self.db, pm_id, cliente_ids)
+    
     # ===== GESTIONE CONTATTI =====
     
     def crea_contatto(self, cliente_id: int, nome: str, email: str = "",
@@ -222,6 +294,14 @@ class RisorseController:
         """Recupera tutti i contatti di un cliente"""
         return Contatto.get_by_cliente(self.db, cliente_id)
     
+    def ottieni_riepilogo_contatti_cliente(self, cliente_id: int) -> List[Contatto]:
+        """Recupera i contatti di un cliente con le sole colonne mostrate in rubrica"""
+        return Contatto.get_by_cliente_summary(self.db, cliente_id)
+    
+    def conta_contatti_cliente(self, cliente_id: int) -> int:
+        """Conta i contatti in rubrica di un cliente"""
+        return Contatto.count_by_cliente(self.db, cliente_id)
+    
     def ottieni_contatto(self, contatto_id: int) -> Optional[Contatto]:
         """Recupera un contatto specifico"""
         return Contatto.get_by_id(self.db, contatto_id)
@@ -11,43 +11,34 @@ Architettura: MVC (Model-View-Controller)
 
 import sys
 import os
-import json
 from PyQt5.QtWidgets import QApplication, QMessageBox
 from PyQt5.QtGui import QIcon
 from PyQt5.QtCore import QSystemSemaphore, QSharedMemory
 from views.main_window import MainWindow
-from views.security_dialogs import MasterPasswordDialog
+from views.security_dialogs import MasterPasswordDialog, esegui_in_attesa
 from utils.crypto_manager import CryptoManager
 from utils.backup_manager import BackupManager
 
 
-def verifica_prima_esecuzione():
-    """Verifica se è la prima esecuzione dell'app con crittografia"""
-    config_file = 'security_config.json'
-    return not os.path.exists(config_file)
+def mostra_recovery_code(recovery_code: str, titolo_messaggio: str):
+    """Mostra il codice di recupero (visibile una sola volta)"""
+    QMessageBox.information(
+        None, "⚠️ CODICE DI RECUPERO - SALVALO!",
+        f"{titolo_messaggio}\n\n"
+        f"🔑 CODICE DI RECUPERO:\n{recovery_code}\n\n"
+        f"⚠️ IMPORTANTE: Salva questo codice in un posto sicuro!\n"
+        f"Ti servirà per recuperare l'accesso se dimentichi la password.\n\n"
+        f"Questo codice verrà mostrato solo ora!"
+    )
 
 
-def salva_config_sicurezza(salt: bytes, password_hash: str, recovery_code_hash: str = None):
-    """Salva la configurazione di sicurezza"""
-    config = {
-        'salt': salt.hex(),
-        'password_hash': password_hash
-    }
-    if recovery_code_hash:
-        config['recovery_code_hash'] = recovery_code_hash
-    with open('security_config.json', 'w') as f:
-        json.dump(config, f)
-
-
-def carica_config_sicurezza():
-    """Carica la configurazione di sicurezza"""
+def sblocca_da_agente(crypto_manager: CryptoManager) -> bool:
+    """Sblocca con le chiavi di un agente di sblocco attivo (nessuna password)"""
+    from utils.unlock_agent import ClientAgente
     try:
-        with open('security_config.json', 'r') as f:
-            config = json.load(f)
-            recovery_hash = config.get('recovery_code_hash', None)
-            return bytes.fromhex(config['salt']), config['password_hash'], recovery_hash
-    except:
-        return None, None, None
+        return crypto_manager.importa_chiavi(ClientAgente().chiavi())
+    except (ConnectionError, ValueError):
+        return False
 
 
 def main():
@@ -80,45 +71,33 @@ def main():
     
     # === SISTEMA CRITTOGRAFIA E MASTER PASSWORD ===
     crypto_manager = CryptoManager()
-    prima_volta = verifica_prima_esecuzione()
+    prima_volta = not CryptoManager.config_esistente()
     
     if prima_volta:
-        # Prima esecuzione: crea configurazione
+        # Prima esecuzione: crea il vault (DEK casuale avvolta)
         dialog = MasterPasswordDialog(None, prima_volta)
         if dialog.exec_() != MasterPasswordDialog.Accepted:
             return  # Utente ha annullato
         
-        password = dialog.get_password()
-        salt = crypto_manager.inizializza_con_password(password)
-        
-        # Genera codice di recupero
-        recovery_code = crypto_manager.genera_recovery_code()
-        recovery_hash = crypto_manager.calcola_hash_password(recovery_code)
-        
-        salva_config_sicurezza(salt, crypto_manager.master_password_hash, recovery_hash)
-        
-        QMessageBox.information(
-            None, "⚠️ CODICE DI RECUPERO - SALVALO!",
-            f"Master password impostata con successo!\n\n"
-            f"🔑 CODICE DI RECUPERO:\n{recovery_code}\n\n"
-            f"⚠️ IMPORTANTE: Salva questo codice in un posto sicuro!\n"
-            f"Ti servirà per recuperare l'accesso se dimentichi la password.\n\n"
-            f"Questo codice verrà mostrato solo ora!"
-        )
+        # Calibrazione della KDF e avvolgimento della DEK (password e codice di recupero)
+        recovery_code = esegui_in_attesa(
+            None, "Creazione del vault in corso...", crypto_manager.crea_vault,
+            dialog.get_password(), durata_stimata_ms=2 * CryptoManager.DURATA_SBLOCCO_MS)
+        crypto_manager.salva_config()
+        mostra_recovery_code(recovery_code, "Master password impostata con successo!")
     else:
         # Carica configurazione esistente
-        salt, password_hash, recovery_hash = carica_config_sicurezza()
-        if not salt:
+        if not crypto_manager.carica_config():
             QMessageBox.critical(
                 None, "Errore", 
                 "Configurazione di sicurezza corrotta!"
             )
             return
         
-        # Sistema di tentativi (max 3)
+        # Sistema di tentativi (max 3), saltato se un agente ha già il vault sbloccato
         tentativi = 0
         max_tentativi = 3
-        password_corretta = False
+        password_corretta = sblocca_da_agente(crypto_manager)
         
         while tentativi < max_tentativi and not password_corretta:
             # Mostra dialog master password
@@ -128,12 +107,22 @@ def main():
             
             password = dialog.get_password()
             
-            # Verifica password
-            password_hash_inserita = crypto_manager.calcola_hash_password(password)
-            if password_hash_inserita == password_hash:
+            # Verifica password (sblocco della DEK)
+            if esegui_in_attesa(None, "Sblocco in corso...", crypto_manager.sblocca, password,
+                                durata_stimata_ms=crypto_manager.durata_stimata_ms()):
                 password_corretta = True
-                crypto_manager.inizializza_con_password(password, salt)
-                crypto_manager.master_password_hash = password_hash
+                if crypto_manager.is_legacy():
+                    # Formato precedente: la chiave attuale diventa la DEK avvolta
+                    recovery_code = esegui_in_attesa(
+                        None, "Aggiornamento della configurazione...",
+                        crypto_manager.migra_config_legacy, password,
+                        durata_stimata_ms=2 * CryptoManager.DURATA_SBLOCCO_MS)
+                    crypto_manager.salva_config()
+                    mostra_recovery_code(
+                        recovery_code,
+                        "Configurazione di sicurezza aggiornata.\n"
+                        "Il vecchio codice di recupero non è più valido."
+                    )
             else:
                 tentativi += 1
                 rimanenti = max_tentativi - tentativi
@@ -159,15 +148,30 @@ def main():
                         recovery_dialog = RecoveryCodeDialog(None)
                         if recovery_dialog.exec_() == RecoveryCodeDialog.Accepted:
                             recovery_code = recovery_dialog.get_code()
-                            recovery_hash_inserito = crypto_manager.calcola_hash_password(recovery_code)
+                            legacy = crypto_manager.is_legacy()
                             
-                            if recovery_hash and recovery_hash_inserito == recovery_hash:
+                            if (esegui_in_attesa(None, "Verifica del codice di recupero...",
+                                                 crypto_manager.sblocca_con_recovery, recovery_code)
+                                    or (legacy and crypto_manager.verifica_recovery_legacy(recovery_code))):
                                 # Codice corretto, permetti di impostare nuova password
                                 new_pass_dialog = MasterPasswordDialog(None, prima_volta=True)
                                 if new_pass_dialog.exec_() == MasterPasswordDialog.Accepted:
                                     nuova_password = new_pass_dialog.get_password()
-                                    salt = crypto_manager.inizializza_con_password(nuova_password)
-                                    salva_config_sicurezza(salt, crypto_manager.master_password_hash, recovery_hash)
+                                    if legacy:
+                                        # Il formato precedente non conserva la chiave:
+                                        # si riparte da un nuovo vault
+                                        recovery_code = esegui_in_attesa(
+                                            None, "Creazione del vault in corso...",
+                                            crypto_manager.crea_vault, nuova_password,
+                                            durata_stimata_ms=2 * CryptoManager.DURATA_SBLOCCO_MS)
+                                        crypto_manager.salva_config()
+                                        mostra_recovery_code(recovery_code, "Password reimpostata con successo!")
+                                    else:
+                                        # Stessa DEK: basta riavvolgerla con la nuova password
+                                        esegui_in_attesa(None, "Cifratura della chiave...",
+                                                         crypto_manager.cambia_password, nuova_password,
+                                                         durata_stimata_ms=crypto_manager.durata_stimata_ms())
+                                        crypto_manager.salva_config()
                                     
                                     QMessageBox.information(
                                         None, "Password Reimpostata",
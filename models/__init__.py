@@ -13,7 +13,8 @@ from .template_servizio import TemplateServizio
 from .template_credenziale import TemplateCredenziale
 from .template_cliente import TemplateCliente
 from .allegato import Allegato
+from .raggiungibilita import Raggiungibilita
 
 __all__ = ['DatabaseManager', 'Cliente', 'Servizio', 'Credenziale', 
            'PM', 'Consulente', 'Contatto', 'TemplateServizio', 'TemplateCredenziale',
-           'TemplateCliente', 'Allegato']
+           'TemplateCliente', 'Allegato', 'Raggiungibilita']
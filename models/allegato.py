@@ -4,13 +4,28 @@ Modello Allegato (file allegati ai clienti)
 
 import os
 import shutil
-from typing import Optional, List
+from typing import Iterator, Optional, List, Tuple
 from models.database import DatabaseManager
 
 
 class Allegato:
     """Rappresenta un allegato associato a un cliente"""
     
+    __slots__ = ('id', 'cliente_id', 'nome_file', 'nome_originale', 'percorso_file',
+                 'dimensione_kb', 'tipo_mime', 'descrizione', 'creato_il')
+    
+    _CAMPI = (
+        ('id', None, None),
+        ('cliente_id', 0, None),
+        ('nome_file', "", None),
+        ('nome_originale', "", None),
+        ('percorso_file', "", None),
+        ('dimensione_kb', 0, None),
+        ('tipo_mime', "", None),
+        ('descrizione', "", None),
+        ('creato_il', "", None),
+    )
+    
     BASE_DIR = "documenti"
     MAX_SIZE_MB = 10
     MAX_SIZE_BYTES = MAX_SIZE_MB * 1024 * 1024
@@ -100,45 +115,53 @@ class Allegato:
     def get_by_cliente(db: DatabaseManager, cliente_id: int) -> List['Allegato']:
         """Recupera tutti gli allegati di un cliente"""
         query = "SELECT * FROM allegati WHERE cliente_id = ? ORDER BY creato_il DESC"
-        rows = db.execute_query(query, (cliente_id,))
-        
-        allegati = []
-        for row in rows:
-            allegato = Allegato(
-                id=row['id'],
-                cliente_id=row['cliente_id'],
-                nome_file=row['nome_file'],
-                nome_originale=row['nome_originale'],
-                percorso_file=row['percorso_file'],
-                dimensione_kb=row['dimensione_kb'] if 'dimensione_kb' in row.keys() else 0,
-                tipo_mime=row['tipo_mime'] if 'tipo_mime' in row.keys() else "",
-                descrizione=row['descrizione'] if 'descrizione' in row.keys() else "",
-                creato_il=row['creato_il'] if 'creato_il' in row.keys() else ""
-            )
-            allegati.append(allegato)
-        
-        return allegati
+        return db.execute_query_objects(query, (cliente_id,), Allegato)
+    
+    @staticmethod
+    def get_by_cliente_summary(db: DatabaseManager, cliente_id: int) -> List['Allegato']:
+        """Recupera gli allegati di un cliente con le sole colonne della lista (descrizione in anteprima)"""
+        query = f"""
+            SELECT id, cliente_id, nome_file, dimensione_kb,
+                   substr(descrizione, 1, {DatabaseManager.LUNGHEZZA_ANTEPRIMA}) AS descrizione,
+                   creato_il
+            FROM allegati WHERE cliente_id = ? ORDER BY creato_il DESC
+        """
+        return db.execute_query_objects(query, (cliente_id,), Allegato)
+    
+    @staticmethod
+    def get_page_by_cliente(db: DatabaseManager, cliente_id: int,
+                            after: Optional[Tuple[str, int]] = None,
+                            limit: int = DatabaseManager.DIMENSIONE_PAGINA) -> List['Allegato']:
+        """Recupera una pagina di allegati (più recenti prima) con keyset su (creato_il, id)"""
+        if after is None:
+            query = """
+                SELECT * FROM allegati WHERE cliente_id = ?
+                ORDER BY creato_il DESC, id DESC LIMIT ?
+            """
+            return db.execute_query_objects(query, (cliente_id, limit), Allegato)
+        query = """
+            SELECT * FROM allegati 
+            WHERE cliente_id = ? AND (creato_il, id) < (?, ?)
+            ORDER BY creato_il DESC, id DESC LIMIT ?
+        """
+        return db.execute_query_objects(query, (cliente_id, after[0], after[1], limit), Allegato)
+    
+    @staticmethod
+    def iter_by_cliente(db: DatabaseManager, cliente_id: int,
+                        page_size: int = DatabaseManager.DIMENSIONE_PAGINA) -> Iterator['Allegato']:
+        """Scorre gli allegati di un cliente pagina per pagina"""
+        return DatabaseManager.iter_pages(
+            lambda after, limit: Allegato.get_page_by_cliente(db, cliente_id, after, limit),
+            lambda allegato: (allegato.creato_il, allegato.id),
+            page_size
+        )
     
     @staticmethod
     def get_by_id(db: DatabaseManager, allegato_id: int) -> Optional['Allegato']:
         """Recupera un allegato per ID"""
         query = "SELECT * FROM allegati WHERE id = ?"
-        rows = db.execute_query(query, (allegato_id,))
-        
-        if rows:
-            row = rows[0]
-            return Allegato(
-                id=row['id'],
-                cliente_id=row['cliente_id'],
-                nome_file=row['nome_file'],
-                nome_originale=row['nome_originale'],
-                percorso_file=row['percorso_file'],
-                dimensione_kb=row['dimensione_kb'] if 'dimensione_kb' in row.keys() else 0,
-                tipo_mime=row['tipo_mime'] if 'tipo_mime' in row.keys() else "",
-                descrizione=row['descrizione'] if 'descrizione' in row.keys() else "",
-                creato_il=row['creato_il'] if 'creato_il' in row.keys() else ""
-            )
-        return None
+        allegati = db.execute_query_objects(query, (allegato_id,), Allegato)
+        return allegati[0] if allegati else None
     
     @staticmethod
     def update_descrizione(db: DatabaseManager, allegato_id: int, descrizione: str) -> bool:
@@ -154,7 +177,12 @@ class Allegato:
         if not allegato:
             return False
         
-        if os.path.exists(allegato.percorso_file):
+        # Il file può essere condiviso con i cloni del cliente: si rimuove solo
+        # quando nessun altro allegato lo referenzia
+        query = "SELECT COUNT(*) as count FROM allegati WHERE percorso_file = ? AND id != ?"
+        condiviso = db.execute_query(query, (allegato.percorso_file, allegato_id))[0]['count'] > 0
+        
+        if not condiviso and os.path.exists(allegato.percorso_file):
             try:
                 os.remove(allegato.percorso_file)
             except:
@@ -167,14 +195,16 @@ class Allegato:
     @staticmethod
     def conta_allegati_cliente(db: DatabaseManager, cliente_id: int) -> int:
         """Conta allegati di un cliente"""
-        allegati = Allegato.get_by_cliente(db, cliente_id)
-        return len(allegati)
+        query = "SELECT COUNT(*) as count FROM allegati WHERE cliente_id = ?"
+        rows = db.execute_query(query, (cliente_id,))
+        return rows[0]['count'] if rows else 0
     
     @staticmethod
     def get_dimensione_totale_cliente(db: DatabaseManager, cliente_id: int) -> int:
         """Calcola dimensione totale in KB"""
-        allegati = Allegato.get_by_cliente(db, cliente_id)
-        return sum(a.dimensione_kb for a in allegati)
+        query = "SELECT COALESCE(SUM(dimensione_kb), 0) as totale FROM allegati WHERE cliente_id = ?"
+        rows = db.execute_query(query, (cliente_id,))
+        return rows[0]['totale'] if rows else 0
     
     def get_dimensione_formattata(self) -> str:
         """Dimensione formattata"""
@@ -2,13 +2,32 @@
 Modello Cliente
 """
 
-from typing import Optional, List
+from typing import Iterator, Optional, List, Tuple
 from .database import DatabaseManager
 
 
 class Cliente:
     """Rappresenta un cliente con i suoi servizi e VPN"""
     
+    __slots__ = ('id', 'nome', 'descrizione', 'vpn_exe_path', 'vpn_windows_name',
+                 'pm_id', 'vpn_server', 'vpn_username', 'vpn_password',
+                 'vpn_port', 'vpn_config_dir', 'vpn_procedure_dir')
+    
+    _CAMPI = (
+        ('id', None, None),
+        ('nome', "", None),
+        ('descrizione', "", None),
+        ('vpn_exe_path', "", None),
+        ('vpn_windows_name', "", None),
+        ('pm_id', None, None),
+        ('vpn_server', "", None),
+        ('vpn_username', "", None),
+        ('vpn_password', "", None),
+        ('vpn_port', None, None),
+        ('vpn_config_dir', "", None),
+        ('vpn_procedure_dir', "", None),
+    )
+    
     def __init__(self, id: Optional[int] = None, nome: str = "", 
                  descrizione: str = "", vpn_exe_path: str = "", 
                  vpn_windows_name: str = "", pm_id: Optional[int] = None,
@@ -64,28 +83,63 @@ class Cliente:
         Returns:
             Lista di clienti
         """
-        query = "SELECT * FROM clienti ORDER BY nome"
-        rows = db.execute_query(query)
+        query = "SELECT * FROM clienti ORDER BY nome COLLATE NATURALE"
+        return db.execute_query_objects(query, (), Cliente)
+    
+    @staticmethod
+    def get_all_summary(db: DatabaseManager) -> List['Cliente']:
+        """
+        Recupera tutti i clienti proiettando solo le colonne mostrate nelle liste
         
-        clienti = []
-        for row in rows:
-            cliente = Cliente(
-                id=row['id'],
-                nome=row['nome'],
-                descrizione=row['descrizione'],
-                vpn_exe_path=row['vpn_exe_path'],
-                vpn_windows_name=row['vpn_windows_name'],
-                pm_id=row['pm_id'] if 'pm_id' in row.keys() else None,
-                vpn_server=row['vpn_server'] if 'vpn_server' in row.keys() else "",
-                vpn_username=row['vpn_username'] if 'vpn_username' in row.keys() else "",
-                vpn_password=row['vpn_password'] if 'vpn_password' in row.keys() else "",
-                vpn_port=row['vpn_port'] if 'vpn_port' in row.keys() else None,
-                vpn_config_dir=row['vpn_config_dir'] if 'vpn_config_dir' in row.keys() else "",
-                vpn_procedure_dir=row['vpn_procedure_dir'] if 'vpn_procedure_dir' in row.keys() else ""
-            )
-            clienti.append(cliente)
+        Gli oggetti restituiti hanno valorizzati solo id e nome; gli altri
+        campi restano ai valori di default. Usare get_by_id per il dettaglio.
         
-        return clienti
+        Args:
+            db: Gestore del database
+            
+        Returns:
+            Lista di clienti (riepilogo)
+        """
+        query = "SELECT id, nome FROM clienti ORDER BY nome COLLATE NATURALE"
+        return db.execute_query_objects(query, (), Cliente)
+    
+    @staticmethod
+    def get_page(db: DatabaseManager, after: Optional[Tuple[str, int]] = None,
+                 limit: int = DatabaseManager.DIMENSIONE_PAGINA) -> List['Cliente']:
+        """
+        Recupera una pagina di clienti ordinati per (nome, id) con paginazione keyset
+        
+        Args:
+            db: Gestore del database
+            after: Chiave (nome, id) dell'ultimo elemento della pagina precedente
+            limit: Numero massimo di righe
+            
+        Returns:
+            Lista di clienti della pagina
+        """
+        if after is None:
+            query = "SELECT * FROM clienti ORDER BY nome, id LIMIT ?"
+            return db.execute_query_objects(query, (limit,), Cliente)
+        query = "SELECT * FROM clienti WHERE (nome, id) > (?, ?) ORDER BY nome, id LIMIT ?"
+        return db.execute_query_objects(query, (after[0], after[1], limit), Cliente)
+    
+    @staticmethod
+    def iter_all(db: DatabaseManager, page_size: int = DatabaseManager.DIMENSIONE_PAGINA) -> Iterator['Cliente']:
+        """
+        Scorre tutti i clienti pagina per pagina senza caricarli tutti in memoria
+        
+        Args:
+            db: Gestore del database
+            page_size: Righe per pagina
+            
+        Yields:
+            Cliente in ordine di nome
+        """
+        return DatabaseManager.iter_pages(
+            lambda after, limit: Cliente.get_page(db, after, limit),
+            lambda cliente: (cliente.nome, cliente.id),
+            page_size
+        )
     
     @staticmethod
     def get_by_id(db: DatabaseManager, cliente_id: int) -> Optional['Cliente']:
@@ -100,25 +154,8 @@ class Cliente:
             Cliente trovato o None
         """
         query = "SELECT * FROM clienti WHERE id = ?"
-        rows = db.execute_query(query, (cliente_id,))
-        
-        if rows:
-            row = rows[0]
-            return Cliente(
-                id=row['id'],
-                nome=row['nome'],
-                descrizione=row['descrizione'],
-                vpn_exe_path=row['vpn_exe_path'],
-                vpn_windows_name=row['vpn_windows_name'],
-                pm_id=row['pm_id'] if 'pm_id' in row.keys() else None,
-                vpn_server=row['vpn_server'] if 'vpn_server' in row.keys() else "",
-                vpn_username=row['vpn_username'] if 'vpn_username' in row.keys() else "",
-                vpn_password=row['vpn_password'] if 'vpn_password' in row.keys() else "",
-                vpn_port=row['vpn_port'] if 'vpn_port' in row.keys() else None,
-                vpn_config_dir=row['vpn_config_dir'] if 'vpn_config_dir' in row.keys() else "",
-                vpn_procedure_dir=row['vpn_procedure_dir'] if 'vpn_procedure_dir' in row.keys() else ""
-            )
-        return None
+        clienti = db.execute_query_objects(query, (cliente_id,), Cliente)
+        return clienti[0] if clienti else None
     
     @staticmethod
     def update(db: DatabaseManager, cliente_id: int, nome: str, 
@@ -180,5 +217,78 @@ class Cliente:
         rowcount = db.execute_update(query, (cliente_id,))
         return rowcount > 0
     
+    @staticmethod
+    def clone(db: DatabaseManager, cliente_id: int, nuovo_nome: str) -> Optional[int]:
+        """
+        Clona un cliente con servizi, credenziali, contatti, consulenti e
+        allegati in un'unica transazione, con sole query INSERT ... SELECT
+        
+        Le password vengono copiate come ciphertext (nessuna decrittazione);
+        gli allegati puntano agli stessi file del cliente di origine.
+        
+        Args:
+            db: Gestore del database
+            cliente_id: ID del cliente da clonare
+            nuovo_nome: Nome del nuovo cliente
+            
+        Returns:
+            ID del nuovo cliente o None se il cliente di origine non esiste
+            
+        Raises:
+            sqlite3.IntegrityError: Se il nome è già usato da un altro cliente
+        """
+        with db.transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO clienti (nome, descrizione, vpn_exe_path, vpn_windows_name, pm_id,
+                                     vpn_server, vpn_username, vpn_password, vpn_port,
+                                     vpn_config_dir, vpn_procedure_dir, template_cliente_id)
+                SELECT ?, descrizione, vpn_exe_path, vpn_windows_name, pm_id,
+                       vpn_server, vpn_username, vpn_password, vpn_port,
+                       vpn_config_dir, vpn_procedure_dir, template_cliente_id
+                FROM clienti WHERE id = ?
+            """, (nuovo_nome, cliente_id))
+            if cursor.rowcount == 0:
+                return None
+            nuovo_id = cursor.lastrowid
+            
+            cursor.execute("""
+                INSERT INTO servizi (cliente_id, nome, tipo, descrizione, link, template_servizio_id)
+                SELECT ?, nome, tipo, descrizione, link, template_servizio_id
+                FROM servizi WHERE cliente_id = ?
+            """, (nuovo_id, cliente_id))
+            
+            # I servizi clonati si riconoscono dal nome (univoco per cliente)
+            cursor.execute("""
+                INSERT INTO credenziali (servizio_id, username, password, host, porta,
+                                         note, rdp_configurata, link, impronta)
+                SELECT sn.id, c.username, c.password, c.host, c.porta,
+                       c.note, c.rdp_configurata, c.link, c.impronta
+                FROM credenziali c
+                JOIN servizi so ON so.id = c.servizio_id
+                JOIN servizi sn ON sn.cliente_id = ? AND sn.nome = so.nome
+                WHERE so.cliente_id = ?
+            """, (nuovo_id, cliente_id))
+            
+            cursor.execute("""
+                INSERT INTO contatti (cliente_id, nome, email, telefono, cellulare, ruolo)
+                SELECT ?, nome, email, telefono, cellulare, ruolo
+                FROM contatti WHERE cliente_id = ?
+            """, (nuovo_id, cliente_id))
+            
+            cursor.execute("""
+                INSERT INTO clienti_consulenti (cliente_id, consulente_id)
+                SELECT ?, consulente_id FROM clienti_consulenti WHERE cliente_id = ?
+            """, (nuovo_id, cliente_id))
+            
+            cursor.execute("""
+                INSERT INTO allegati (cliente_id, nome_file, nome_originale, percorso_file,
+                                      dimensione_kb, tipo_mime, descrizione, creato_il)
+                SELECT ?, nome_file, nome_originale, percorso_file,
+                       dimensione_kb, tipo_mime, descrizione, creato_il
+                FROM allegati WHERE cliente_id = ?
+            """, (nuovo_id, cliente_id))
+        
+        return nuovo_id
+    
     def __str__(self):
         return f"Cliente: {self.nome} (ID: {self.id})"
@@ -2,13 +2,24 @@
 Modello Consulente
 """
 
-from typing import Optional, List
+from typing import Iterable, Iterator, Optional, List, Set, Tuple
 from .database import DatabaseManager
 
 
 class Consulente:
     """Rappresenta un Consulente"""
     
+    __slots__ = ('id', 'nome', 'email', 'telefono', 'cellulare', 'competenza')
+    
+    _CAMPI = (
+        ('id', None, None),
+        ('nome', "", None),
+        ('email', "", None),
+        ('telefono', "", None),
+        ('cellulare', "", None),
+        ('competenza', "", None),
+    )
+    
     def __init__(self, id: Optional[int] = None, nome: str = "", 
                  email: str = "", telefono: str = "", cellulare: str = "",
                  competenza: str = ""):
@@ -54,21 +65,45 @@ class Consulente:
             Lista di consulenti
         """
         query = "SELECT * FROM consulenti ORDER BY nome"
-        rows = db.execute_query(query)
+        return db.execute_query_objects(query, (), Consulente)
+    
+    @staticmethod
+    def get_page(db: DatabaseManager, after: Optional[Tuple[str, int]] = None,
+                 limit: int = DatabaseManager.DIMENSIONE_PAGINA) -> List['Consulente']:
+        """
+        Recupera una pagina di consulenti ordinati per (nome, id) con paginazione keyset
         
-        consulenti = []
-        for row in rows:
-            consulente = Consulente(
-                id=row['id'],
-                nome=row['nome'],
-                email=row['email'],
-                telefono=row['telefono'],
-                cellulare=row['cellulare'],
-                competenza=row['competenza']
-            )
-            consulenti.append(consulente)
+        Args:
+            db: Gestore del database
+            after: Chiave (nome, id) dell'ultimo elemento della pagina precedente
+            limit: Numero massimo di righe
+            
+        Returns:
+            Lista di consulenti della pagina
+        """
+        if after is None:
+            query = "SELECT * FROM consulenti ORDER BY nome, id LIMIT ?"
+            return db.execute_query_objects(query, (limit,), Consulente)
+        query = "SELECT * FROM consulenti WHERE (nome, id) > (?, ?) ORDER BY nome, id LIMIT ?"
+        return db.execute_query_objects(query, (after[0], after[1], limit), Consulente)
+    
+    @staticmethod
+    def iter_all(db: DatabaseManager, page_size: int = DatabaseManager.DIMENSIONE_PAGINA) -> Iterator['Consulente']:
+        """
+        Scorre tutti i consulenti pagina per pagina senza caricarli tutti in memoria
         
-        return consulenti
+        Args:
+            db: Gestore del database
+            page_size: Righe per pagina
+            
+        Yields:
+            Consulente in ordine di nome
+        """
+        return DatabaseManager.iter_pages(
+            lambda after, limit: Consulente.get_page(db, after, limit),
+            lambda consulente: (consulente.nome, consulente.id),
+            page_size
+        )
     
     @staticmethod
     def get_by_id(db: DatabaseManager, consulente_id: int) -> Optional['Consulente']:
@@ -83,19 +118,8 @@ class Consulente:
             Consulente trovato o None
         """
         query = "SELECT * FROM consulenti WHERE id = ?"
-        rows = db.execute_query(query, (consulente_id,))
-        
-        if rows:
-            row = rows[0]
-            return Consulente(
-                id=row['id'],
-                nome=row['nome'],
-                email=row['email'],
-                telefono=row['telefono'],
-                cellulare=row['cellulare'],
-                competenza=row['competenza']
-            )
-        return None
+        consulenti = db.execute_query_objects(query, (consulente_id,), Consulente)
+        return consulenti[0] if consulenti else None
     
     @staticmethod
     def update(db: DatabaseManager, consulente_id: int, nome: str, 
@@ -160,21 +184,7 @@ class Consulente:
             WHERE cc.cliente_id = ?
             ORDER BY c.nome
         """
-        rows = db.execute_query(query, (cliente_id,))
-        
-        consulenti = []
-        for row in rows:
-            consulente = Consulente(
-                id=row['id'],
-                nome=row['nome'],
-                email=row['email'],
-                telefono=row['telefono'],
-                cellulare=row['cellulare'],
-                competenza=row['competenza']
-            )
-            consulenti.append(consulente)
-        
-        return consulenti
+        return db.execute_query_objects(query, (cliente_id,), Consulente)
     
     @staticmethod
     def associa_a_cliente(db: DatabaseManager, cliente_id: int, consulente_id: int) -> bool:
@@ -216,6 +226,143 @@ class Consulente:
         rowcount = db.execute_update(query, (cliente_id, consulente_id))
         return rowcount > 0
     
+    @staticmethod
+    def associa_a_clienti(db: DatabaseManager, consulente_ids: Iterable[int],
+                          cliente_ids: Iterable[int]) -> int:
+        """
+        Associa ogni consulente indicato a ogni cliente indicato con un unico
+        INSERT OR IGNORE ... SELECT (le associazioni esistenti restano)
+        
+        Args:
+            db: Gestore del database
+            consulente_ids: ID dei consulenti
+            cliente_ids: ID dei clienti
+            
+        Returns:
+            Numero di nuove associazioni create
+        """
+        with db.transaction() as cursor:
+            DatabaseManager.load_temp_ids(cursor, "_sel_consulenti", consulente_ids)
+            DatabaseManager.load_temp_ids(cursor, "_sel_clienti", cliente_ids)
+            cursor.execute("""
+                INSERT OR IGNORE INTO clienti_consulenti (cliente_id, consulente_id)
+                SELECT cl.id, co.id
+                FROM clienti cl CROSS JOIN consulenti co
+                WHERE cl.id IN (SELECT id FROM _sel_clienti)
+                  AND co.id IN (SELECT id FROM _sel_consulenti)
+            """)
+            return cursor.rowcount
+    
+    @staticmethod
+    def disassocia_da_clienti(db: DatabaseManager, consulente_ids: Iterable[int],
+                              cliente_ids: Iterable[int]) -> int:
+        """
+        Rimuove con un unico DELETE le associazioni tra i consulenti e i
+        clienti indicati
+        
+        Args:
+            db: Gestore del database
+            consulente_ids: ID dei consulenti
+            cliente_ids: ID dei clienti
+            
+        Returns:
+            Numero di associazioni rimosse
+        """
+        with db.transaction() as cursor:
+            DatabaseManager.load_temp_ids(cursor, "_sel_consulenti", consulente_ids)
+            DatabaseManager.load_temp_ids(cursor, "_sel_clienti", cliente_ids)
+            cursor.execute("""
+                DELETE FROM clienti_consulenti
+                WHERE cliente_id IN (SELECT id FROM _sel_clienti)
+                  AND consulente_id IN (SELECT id FROM _sel_consulenti)
+            """)
+            return cursor.rowcount
+    
+    @staticmethod
+    def imposta_per_cliente(db: DatabaseManager, cliente_id: int,
+                            consulente_ids: Iterable[int]) -> Tuple[int, int]:
+        """
+        Rende l'insieme dei consulenti di un cliente uguale a quello indicato
+        (differenza calcolata in SQL, un'unica transazione)
+        
+        Args:
+            db: Gestore del database
+            cliente_id: ID del cliente
+            consulente_ids: ID dei consulenti da associare
+            
+        Returns:
+            Tupla (associazioni aggiunte, associazioni rimosse)
+        """
+        with db.transaction() as cursor:
+            DatabaseManager.load_temp_ids(cursor, "_sel_consulenti", consulente_ids)
+            cursor.execute("""
+                DELETE FROM clienti_consulenti
+                WHERE cliente_id = ? AND consulente_id NOT IN (SELECT id FROM _sel_consulenti)
+            """, (cliente_id,))
+            rimosse = cursor.rowcount
+            cursor.execute("""
+                INSERT OR IGNORE INTO clienti_consulenti (cliente_id, consulente_id)
+                SELECT ?, id FROM consulenti WHERE id IN (SELECT id FROM _sel_consulenti)
+            """, (cliente_id,))
+            return cursor.rowcount, rimosse
+    
+    @staticmethod
+    def get_associazioni(db: DatabaseManager) -> Set[Tuple[int, int]]:
+        """
+        Recupera tutte le associazioni cliente-consulente
+        
+        Args:
+            db: Gestore del database
+            
+        Returns:
+            Insieme di coppie (cliente_id, consulente_id)
+        """
+        rows = db.execute_query("SELECT cliente_id, consulente_id FROM clienti_consulenti")
+        return {(row[0], row[1]) for row in rows}
+    
+    @staticmethod
+    def applica_modifiche_associazioni(db: DatabaseManager,
+                                       aggiunte: Iterable[Tuple[int, int]],
+                                       rimozioni: Iterable[Tuple[int, int]]) -> Tuple[int, int]:
+        """
+        Applica in un'unica transazione un insieme di coppie da aggiungere e
+        da rimuovere (es. le modifiche dell'editor a matrice)
+        
+        Args:
+            db: Gestore del database
+            aggiunte: Coppie (cliente_id, consulente_id) da associare
+            rimozioni: Coppie (cliente_id, consulente_id) da disassociare
+            
+        Returns:
+            Tupla (associazioni aggiunte, associazioni rimosse)
+        """
+        with db.transaction() as cursor:
+            cursor.executemany("""
+                DELETE FROM clienti_consulenti WHERE cliente_id = ? AND consulente_id = ?
+            """, list(rimozioni))
+            rimosse = cursor.rowcount
+            cursor.executemany("""
+                INSERT OR IGNORE INTO clienti_consulenti (cliente_id, consulente_id)
+                VALUES (?, ?)
+            """, list(aggiunte))
+            return cursor.rowcount, rimosse
+    
+    @staticmethod
+    def upsert_many(db: DatabaseManager,
+                    righe: Iterable[Tuple[str, str, str, str, str]]) -> Tuple[int, int, int]:
+        """
+        Importa in blocco dei consulenti usando il nome (UNIQUE) come chiave
+        
+        Args:
+            db: Gestore del database
+            righe: Tuple (nome, email, telefono, cellulare, competenza)
+            
+        Returns:
+            Tupla (creati, aggiornati, invariati)
+        """
+        return db.upsert_rows("consulenti", "nome",
+                              ("email", "telefono", "cellulare", "competenza"), righe)
+    
     @staticmethod
     def get_clienti_count(db: DatabaseManager, consulente_id: int) -> int:
         """
@@ -2,13 +2,25 @@
 Modello Contatto (Rubrica del cliente)
 """
 
-from typing import Optional, List
+from typing import Iterator, Optional, List, Tuple
 from .database import DatabaseManager
 
 
 class Contatto:
     """Rappresenta un contatto nella rubrica di un cliente"""
     
+    __slots__ = ('id', 'cliente_id', 'nome', 'email', 'telefono', 'cellulare', 'ruolo')
+    
+    _CAMPI = (
+        ('id', None, None),
+        ('cliente_id', 0, None),
+        ('nome', "", None),
+        ('email', "", None),
+        ('telefono', "", None),
+        ('cellulare', "", None),
+        ('ruolo', "", None),
+    )
+    
     def __init__(self, id: Optional[int] = None, cliente_id: int = 0,
                  nome: str = "", email: str = "", telefono: str = "",
                  cellulare: str = "", ruolo: str = ""):
@@ -63,22 +75,89 @@ class Contatto:
             WHERE cliente_id = ?
             ORDER BY nome
         """
+        return db.execute_query_objects(query, (cliente_id,), Contatto)
+    
+    @staticmethod
+    def get_by_cliente_summary(db: DatabaseManager, cliente_id: int) -> List['Contatto']:
+        """
+        Recupera i contatti di un cliente proiettando solo le colonne della lista
+        
+        Args:
+            db: Gestore del database
+            cliente_id: ID del cliente
+            
+        Returns:
+            Lista di contatti del cliente (riepilogo)
+        """
+        query = """
+            SELECT id, cliente_id, nome, email, telefono, cellulare, ruolo
+            FROM contatti 
+            WHERE cliente_id = ?
+            ORDER BY nome
+        """
+        return db.execute_query_objects(query, (cliente_id,), Contatto)
+    
+    @staticmethod
+    def count_by_cliente(db: DatabaseManager, cliente_id: int) -> int:
+        """
+        Conta i contatti di un cliente
+        
+        Args:
+            db: Gestore del database
+            cliente_id: ID del cliente
+            
+        Returns:
+            Numero di contatti
+        """
+        query = "SELECT COUNT(*) as count FROM contatti WHERE cliente_id = ?"
         rows = db.execute_query(query, (cliente_id,))
+        return rows[0]['count'] if rows else 0
+    
+    @staticmethod
+    def get_page_by_cliente(db: DatabaseManager, cliente_id: int,
+                            after: Optional[Tuple[str, int]] = None,
+                            limit: int = DatabaseManager.DIMENSIONE_PAGINA) -> List['Contatto']:
+        """
+        Recupera una pagina di contatti di un cliente ordinati per (nome, id)
         
-        contatti = []
-        for row in rows:
-            contatto = Contatto(
-                id=row['id'],
-                cliente_id=row['cliente_id'],
-                nome=row['nome'],
-                email=row['email'],
-                telefono=row['telefono'],
-                cellulare=row['cellulare'],
-                ruolo=row['ruolo']
-            )
-            contatti.append(contatto)
+        Args:
+            db: Gestore del database
+            cliente_id: ID del cliente
+            after: Chiave (nome, id) dell'ultimo contatto della pagina precedente
+            limit: Numero massimo di righe
+            
+        Returns:
+            Lista di contatti della pagina
+        """
+        if after is None:
+            query = "SELECT * FROM contatti WHERE cliente_id = ? ORDER BY nome, id LIMIT ?"
+            return db.execute_query_objects(query, (cliente_id, limit), Contatto)
+        query = """
+            SELECT * FROM contatti 
+            WHERE cliente_id = ? AND (nome, id) > (?, ?)
+            ORDER BY nome, id LIMIT ?
+        """
+        return db.execute_query_objects(query, (cliente_id, after[0], after[1], limit), Contatto)
+    
+    @staticmethod
+    def iter_by_cliente(db: DatabaseManager, cliente_id: int,
+                        page_size: int = DatabaseManager.DIMENSIONE_PAGINA) -> Iterator['Contatto']:
+        """
+        Scorre i contatti di un cliente pagina per pagina
         
-        return contatti
+        Args:
+            db: Gestore del database
+            cliente_id: ID del cliente
+            page_size: Righe per pagina
+            
+        Yields:
+            Contatti in ordine di nome
+        """
+        return DatabaseManager.iter_pages(
+            lambda after, limit: Contatto.get_page_by_cliente(db, cliente_id, after, limit),
+            lambda contatto: (contatto.nome, contatto.id),
+            page_size
+        )
     
     @staticmethod
     def get_by_id(db: DatabaseManager, contatto_id: int) -> Optional['Contatto']:
@@ -93,20 +172,8 @@ class Contatto:
             Contatto trovato o None
         """
         query = "SELECT * FROM contatti WHERE id = ?"
-        rows = db.execute_query(query, (contatto_id,))
-        
-        if rows:
-            row = rows[0]
-            return Contatto(
-                id=row['id'],
-                cliente_id=row['cliente_id'],
-                nome=row['nome'],
-                email=row['email'],
-                telefono=row['telefono'],
-                cellulare=row['cellulare'],
-                ruolo=row['ruolo']
-            )
-        return None
+        contatti = db.execute_query_objects(query, (contatto_id,), Contatto)
+        return contatti[0] if contatti else None
     
     @staticmethod
     def update(db: DatabaseManager, contatto_id: int, nome: str,
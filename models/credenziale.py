@@ -2,13 +2,29 @@
 Modello Credenziale
 """
 
-from typing import Optional, List
-from .database import DatabaseManager
+from typing import Iterable, Optional, List, Sequence, Tuple
+from .database import DatabaseManager, analizza_host, chiave_host, indirizzo_ip
+from .row_mapper import CONV_BOOL, CONV_STR
 
 
 class Credenziale:
     """Rappresenta una credenziale di accesso a un servizio"""
     
+    __slots__ = ('id', 'servizio_id', 'username', 'password', 'host', 'porta',
+                 'note', 'rdp_configurata', 'link')
+    
+    _CAMPI = (
+        ('id', None, None),
+        ('servizio_id', 0, None),
+        ('username', "", None),
+        ('password', "", None),
+        ('host', "", None),
+        ('porta', None, None),
+        ('note', "", None),
+        ('rdp_configurata', False, CONV_BOOL),
+        ('link', "", CONV_STR),
+    )
+    
     def __init__(self, id: Optional[int] = None, servizio_id: int = 0,
                  username: str = "", password: str = "", host: str = "",
                  porta: Optional[int] = None, note: str = "", rdp_configurata: bool = False,
@@ -26,7 +42,8 @@ class Credenziale:
     @staticmethod
     def create(db: DatabaseManager, servizio_id: int, username: str,
                password: str, host: str = "", porta: Optional[int] = None,
-               note: str = "", rdp_configurata: bool = False, link: str = "") -> int:
+               note: str = "", rdp_configurata: bool = False, link: str = "",
+               impronta: Optional[str] = None) -> int:
         """
         Crea una nuova credenziale nel database
         
@@ -40,16 +57,19 @@ class Credenziale:
             note: Note aggiuntive
             rdp_configurata: Se True, è una RDP già configurata da lanciare direttamente
             link: Link/URL del servizio (per aprire nel browser)
+            impronta: Impronta HMAC dei campi in chiaro (None se non calcolabile)
             
         Returns:
             ID della credenziale creata
         """
         query = """
-            INSERT INTO credenziali (servizio_id, username, password, host, porta, note, rdp_configurata, link)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO credenziali (servizio_id, username, password, host, porta, note, rdp_configurata, link,
+                                     impronta)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
         return db.execute_update(query, (servizio_id, username, password, 
-                                         host, porta, note, 1 if rdp_configurata else 0, link))
+                                         host, porta, note, 1 if rdp_configurata else 0, link,
+                                         impronta))
     
     @staticmethod
     def get_by_servizio(db: DatabaseManager, servizio_id: int) -> List['Credenziale']:
@@ -68,36 +88,73 @@ class Credenziale:
             WHERE servizio_id = ?
             ORDER BY username
         """
-        rows = db.execute_query(query, (servizio_id,))
+        return db.execute_query_objects(query, (servizio_id,), Credenziale)
+    
+    @staticmethod
+    def get_by_servizio_summary(db: DatabaseManager, servizio_id: int) -> List['Credenziale']:
+        """
+        Recupera le credenziali di un servizio proiettando solo le colonne della lista
         
-        credenziali = []
-        for row in rows:
-            # Gestisci rdp_configurata con try-except per compatibilità
-            try:
-                rdp_conf = bool(row['rdp_configurata'])
-            except (KeyError, IndexError):
-                rdp_conf = False
+        La password resta il ciphertext memorizzato (da decriptare solo su
+        richiesta) e le note sono troncate a un'anteprima; usare get_by_id
+        per il dettaglio completo.
+        
+        Args:
+            db: Gestore del database
+            servizio_id: ID del servizio
+            
+        Returns:
+            Lista di credenziali del servizio (riepilogo)
+        """
+        query = f"""
+            SELECT id, servizio_id, username, password, host, porta,
+                   substr(note, 1, {DatabaseManager.LUNGHEZZA_ANTEPRIMA}) AS note,
+                   rdp_configurata, link
+            FROM credenziali 
+            WHERE servizio_id = ?
+            ORDER BY username
+        """
+        return db.execute_query_objects(query, (servizio_id,), Credenziale)
+    
+    @staticmethod
+    def get_by_cliente_summary(db: DatabaseManager, cliente_id: int) -> List['Credenziale']:
+        """
+        Recupera in una sola query il riepilogo delle credenziali di tutti i
+        servizi di un cliente (stesse colonne di get_by_servizio_summary)
+        
+        Args:
+            db: Gestore del database
+            cliente_id: ID del cliente
             
-            # Gestisci link con try-except per compatibilità
-            try:
-                link_val = row['link'] or ""
-            except (KeyError, IndexError):
-                link_val = ""
+        Returns:
+            Lista di credenziali ordinate per servizio e username
+        """
+        query = f"""
+            SELECT c.id, c.servizio_id, c.username, c.password, c.host, c.porta,
+                   substr(c.note, 1, {DatabaseManager.LUNGHEZZA_ANTEPRIMA}) AS note,
+                   c.rdp_configurata, c.link
+            FROM credenziali c
+            JOIN servizi s ON s.id = c.servizio_id
+            WHERE s.cliente_id = ?
+            ORDER BY c.servizio_id, c.username
+        """
+        return db.execute_query_objects(query, (cliente_id,), Credenziale)
+    
+    @staticmethod
+    def count_by_servizio(db: DatabaseManager, servizio_id: int) -> int:
+        """
+        Conta le credenziali di un servizio
+        
+        Args:
+            db: Gestore del database
+            servizio_id: ID del servizio
             
-            credenziale = Credenziale(
-                id=row['id'],
-                servizio_id=row['servizio_id'],
-                username=row['username'],
-                password=row['password'],
-                host=row['host'],
-                porta=row['porta'],
-                note=row['note'],
-                rdp_configurata=rdp_conf,
-                link=link_val
-            )
-            credenziali.append(credenziale)
-        
-        return credenziali
+        Returns:
+            Numero di credenziali
+        """
+        query = "SELECT COUNT(*) as count FROM credenziali WHERE servizio_id = ?"
+        rows = db.execute_query(query, (servizio_id,))
+        return rows[0]['count'] if rows else 0
     
     @staticmethod
     def get_by_id(db: DatabaseManager, credenziale_id: int) -> Optional['Credenziale']:
@@ -112,39 +169,14 @@ class Credenziale:
             Credenziale trovata o None
         """
         query = "SELECT * FROM credenziali WHERE id = ?"
-        rows = db.execute_query(query, (credenziale_id,))
-        
-        if rows:
-            row = rows[0]
-            # Gestisci rdp_configurata con try-except per compatibilità
-            try:
-                rdp_conf = bool(row['rdp_configurata'])
-            except (KeyError, IndexError):
-                rdp_conf = False
-            
-            # Gestisci link con try-except per compatibilità
-            try:
-                link_val = row['link'] or ""
-            except (KeyError, IndexError):
-                link_val = ""
-            
-            return Credenziale(
-                id=row['id'],
-                servizio_id=row['servizio_id'],
-                username=row['username'],
-                password=row['password'],
-                host=row['host'],
-                porta=row['porta'],
-                note=row['note'],
-                rdp_configurata=rdp_conf,
-                link=link_val
-            )
-        return None
+        credenziali = db.execute_query_objects(query, (credenziale_id,), Credenziale)
+        return credenziali[0] if credenziali else None
     
     @staticmethod
     def update(db: DatabaseManager, credenziale_id: int, username: str,
                password: str, host: str = "", porta: Optional[int] = None,
-               note: str = "", rdp_configurata: bool = False, link: str = "") -> bool:
+               note: str = "", rdp_configurata: bool = False, link: str = "",
+               impronta: Optional[str] = None) -> bool:
         """
         Aggiorna una credenziale esistente
         
@@ -158,6 +190,7 @@ class Credenziale:
             note: Nuove note
             rdp_configurata: Se True, è una RDP già configurata
             link: Link/URL del servizio
+            impronta: Impronta HMAC dei campi in chiaro (None se non calcolabile)
             
         Returns:
             True se l'aggiornamento è riuscito
@@ -165,13 +198,291 @@ class Credenziale:
         query = """
             UPDATE credenziali 
             SET username = ?, password = ?, host = ?, porta = ?, note = ?, rdp_configurata = ?, link = ?,
-                modificato_il = CURRENT_TIMESTAMP
+                impronta = ?, modificato_il = CURRENT_TIMESTAMP
             WHERE id = ?
         """
         rowcount = db.execute_update(query, (username, password, host, 
-                                             porta, note, 1 if rdp_configurata else 0, link, credenziale_id))
+                                             porta, note, 1 if rdp_configurata else 0, link,
+                                             impronta, credenziale_id))
         return rowcount > 0
     
+    @staticmethod
+    def get_senza_impronta(db: DatabaseManager, limite: int) -> list:
+        """
+        Recupera un blocco di credenziali ancora prive di impronta
+        
+        Args:
+            db: Gestore del database
+            limite: Numero massimo di righe
+            
+        Returns:
+            Righe con id e campi necessari al calcolo dell'impronta
+        """
+        return db.execute_query("""
+            SELECT id, username, password, host, porta, note, rdp_configurata
+            FROM credenziali WHERE impronta IS NULL
+            ORDER BY id LIMIT ?
+        """, (limite,))
+    
+    @staticmethod
+    def set_impronte(db: DatabaseManager, impronte: Iterable[Tuple[str, int]]) -> int:
+        """
+        Salva le impronte calcolate in un'unica transazione
+        
+        Args:
+            db: Gestore del database
+            impronte: Coppie (impronta, id credenziale)
+            
+        Returns:
+            Numero di credenziali aggiornate
+        """
+        with db.transaction() as cursor:
+            cursor.executemany("UPDATE credenziali SET impronta = ? WHERE id = ?", impronte)
+            return cursor.rowcount
+    
+    @staticmethod
+    def search(db: DatabaseManager, testo: str, limite: int = 50) -> list:
+        """
+        Cerca le credenziali per cliente, servizio, username o host (senza
+        decifrare le password)
+        
+        Args:
+            db: Gestore del database
+            testo: Testo da cercare (sottostringa, maiuscole indifferenti)
+            limite: Numero massimo di risultati
+            
+        Returns:
+            Righe con id, cliente, servizio, username, host, porta, link
+        """
+        modello = "%" + testo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return db.execute_query("""
+            SELECT c.id, cl.nome AS cliente, s.nome AS servizio, c.username, c.host,
+                   c.porta, c.link
+            FROM credenziali c
+            JOIN servizi s ON s.id = c.servizio_id
+            JOIN clienti cl ON cl.id = s.cliente_id
+            WHERE cl.nome LIKE :t ESCAPE '\\' OR s.nome LIKE :t ESCAPE '\\'
+               OR c.username LIKE :t ESCAPE '\\' OR c.host LIKE :t ESCAPE '\\'
+            ORDER BY cl.nome COLLATE NATURALE, s.nome COLLATE NATURALE, c.username
+            LIMIT :limite
+        """, {'t': modello, 'limite': limite})
+    
+    @staticmethod
+    def get_endpoints(db: DatabaseManager, cliente_id: Optional[int] = None) -> list:
+        """
+        Credenziali con un host o un link da contattare (verifiche di
+        raggiungibilità), con cliente e servizio
+        
+        Args:
+            db: Gestore del database
+            cliente_id: Limita ai servizi di un cliente (None = tutti)
+        
+        Returns:
+            Righe con id, cliente, servizio, username, host, porta, link
+        """
+        filtro = "AND s.cliente_id = ?" if cliente_id is not None else ""
+        return db.execute_query(f"""
+            SELECT c.id, cl.nome AS cliente, s.nome AS servizio, c.username, c.host,
+                   c.porta, c.link
+            FROM credenziali c
+            JOIN servizi s ON s.id = c.servizio_id
+            JOIN clienti cl ON cl.id = s.cliente_id
+            WHERE (c.host != '' OR c.link != '') {filtro}
+            ORDER BY cl.nome COLLATE NATURALE, s.nome COLLATE NATURALE, c.username
+        """, (cliente_id,) if cliente_id is not None else ())
+    
+    @staticmethod
+    def find_by_url(db: DatabaseManager, url: str, limite: int = 10) -> List[dict]:
+        """
+        Credenziali associate a un URL o a un host, dalla più pertinente
+        (ricerca su indice_host: qualche accesso all'indice, non una scansione)
+        
+        Considera host e link delle credenziali e il link dei servizi (tutte
+        le credenziali del servizio). Ordine: porta compatibile prima di porta
+        diversa; host identico, poi dominio padre (più specifico prima), poi
+        sottodominio; host/link della credenziale prima del link del servizio.
+        
+        Args:
+            db: Gestore del database
+            url: URL, host o host:porta (es. "https://crm.acme.it/login")
+            limite: Numero massimo di risultati
+            
+        Returns:
+            Dizionari con id, cliente, servizio, username, host, porta, link,
+            corrispondenza ('host', 'dominio' o 'sottodominio') e origine
+            ('credenziale' o 'servizio')
+        """
+        host, porta = analizza_host(url)
+        if not host:
+            return []
+        chiave = chiave_host(host)
+        etichette = chiave.split('.')
+        if len(etichette) < 2 or indirizzo_ip(host):
+            # Indirizzo IP o nome di una sola etichetta: solo l'host stesso
+            candidate, intervallo = [chiave], ('', '')
+        else:
+            # Host e domini padre con almeno due etichette (mai il solo TLD),
+            # sottodomini come intervallo contiguo di chiavi
+            candidate = ['.'.join(etichette[:n]) for n in range(len(etichette), 1, -1)]
+            intervallo = (chiave + '.', chiave + '/')
+        segnaposti = ', '.join('?' * len(candidate))
+        parametri = (*candidate, *intervallo)
+        rows = db.execute_query(f"""
+            SELECT i.chiave, i.porta AS porta_indice, 'credenziale' AS origine,
+                   c.id, cl.nome AS cliente, s.nome AS servizio, c.username, c.host, c.porta, c.link
+            FROM indice_host i
+            JOIN credenziali c ON c.id = i.credenziale_id
+            JOIN servizi s ON s.id = c.servizio_id
+            JOIN clienti cl ON cl.id = s.cliente_id
+            WHERE i.chiave IN ({segnaposti}) OR (i.chiave >= ? AND i.chiave < ?)
+            UNION ALL
+            SELECT i.chiave, i.porta, 'servizio',
+                   c.id, cl.nome, s.nome, c.username, c.host, c.porta, c.link
+            FROM indice_host i
+            JOIN servizi s ON s.id = i.servizio_id
+            JOIN clienti cl ON cl.id = s.cliente_id
+            JOIN credenziali c ON c.servizio_id = s.id
+            WHERE i.chiave IN ({segnaposti}) OR (i.chiave >= ? AND i.chiave < ?)
+        """, parametri * 2)
+        
+        migliori = {}
+        for row in rows:
+            if row['chiave'] == chiave:
+                corrispondenza, distanza = 'host', 0
+            elif row['chiave'] in candidate:
+                corrispondenza, distanza = 'dominio', len(etichette) - row['chiave'].count('.') - 1
+            else:
+                corrispondenza, distanza = 'sottodominio', row['chiave'].count('.') + 1 - len(etichette)
+            porta_diversa = porta is not None and row['porta_indice'] is not None \
+                and row['porta_indice'] != porta
+            ordine = (porta_diversa, ('host', 'dominio', 'sottodominio').index(corrispondenza),
+                      distanza, row['origine'] == 'servizio')
+            if row['id'] not in migliori or ordine < migliori[row['id']][0]:
+                risultato = {k: row[k] for k in ('id', 'cliente', 'servizio', 'username',
+                                                 'host', 'porta', 'link', 'origine')}
+                risultato['corrispondenza'] = corrispondenza
+                migliori[row['id']] = (ordine, risultato)
+        ordinati = sorted(migliori.values(), key=lambda v: (v[0], v[1]['cliente'].casefold(),
+                                                            v[1]['servizio'].casefold(),
+                                                            v[1]['username']))
+        return [risultato for _, risultato in ordinati[:limite]]
+    
+    @staticmethod
+    def _filtro_intervalli(intervalli: Sequence[Tuple[bytes, bytes]]) -> Tuple[str, tuple]:
+        """Condizione SQL su indice_host.ip per una lista di intervalli (estremi inclusi)"""
+        condizione = " OR ".join("i.ip BETWEEN ? AND ?" for _ in intervalli)
+        return f"({condizione})", tuple(estremo for intervallo in intervalli for estremo in intervallo)
+    
+    @staticmethod
+    def find_by_ip_range(db: DatabaseManager, intervalli: Sequence[Tuple[bytes, bytes]],
+                         limite: Optional[int] = None) -> List[dict]:
+        """
+        Credenziali il cui host o link (o il link del servizio) è un
+        indirizzo IP compreso negli intervalli (ricerca sull'indice ip)
+        
+        Args:
+            db: Gestore del database
+            intervalli: Coppie (primo, ultimo) di indirizzi in forma ip_binario
+            limite: Numero massimo di risultati (None = tutti)
+            
+        Returns:
+            Dizionari con id, cliente, servizio, username, host, porta, link,
+            indirizzo e origine ('credenziale' o 'servizio'), per indirizzo
+        """
+        if not intervalli:
+            return []
+        filtro, parametri = Credenziale._filtro_intervalli(intervalli)
+        rows = db.execute_query(f"""
+            SELECT i.ip, i.chiave AS indirizzo, 'credenziale' AS origine,
+                   c.id, cl.nome AS cliente, s.nome AS servizio, c.username, c.host, c.porta, c.link
+            FROM indice_host i
+            JOIN credenziali c ON c.id = i.credenziale_id
+            JOIN servizi s ON s.id = c.servizio_id
+            JOIN clienti cl ON cl.id = s.cliente_id
+            WHERE {filtro}
+            UNION ALL
+            SELECT i.ip, i.chiave, 'servizio',
+                   c.id, cl.nome, s.nome, c.username, c.host, c.porta, c.link
+            FROM indice_host i
+            JOIN servizi s ON s.id = i.servizio_id
+            JOIN clienti cl ON cl.id = s.cliente_id
+            JOIN credenziali c ON c.servizio_id = s.id
+            WHERE {filtro}
+            ORDER BY 1, 3, 4
+        """, parametri * 2)
+        
+        risultati = {}
+        for row in rows:
+            if row['id'] not in risultati:
+                risultati[row['id']] = {k: row[k] for k in (
+                    'id', 'cliente', 'servizio', 'username', 'host', 'porta', 'link',
+                    'indirizzo', 'origine')}
+                if limite is not None and len(risultati) >= limite:
+                    break
+        return list(risultati.values())
+    
+    @staticmethod
+    def get_ip_references(db: DatabaseManager, intervalli: Sequence[Tuple[bytes, bytes]]
+                          ) -> Tuple[List, List]:
+        """
+        Righe che contengono un indirizzo negli intervalli (per la riassegnazione)
+        
+        Args:
+            db: Gestore del database
+            intervalli: Coppie (primo, ultimo) di indirizzi in forma ip_binario
+            
+        Returns:
+            Tupla (credenziali con id, host, link; servizi con id, link)
+        """
+        if not intervalli:
+            return [], []
+        filtro, parametri = Credenziale._filtro_intervalli(intervalli)
+        credenziali = db.execute_query(f"""
+            SELECT id, host, link FROM credenziali WHERE id IN (
+                SELECT i.credenziale_id FROM indice_host i WHERE {filtro}
+            ) ORDER BY id
+        """, parametri)
+        servizi = db.execute_query(f"""
+            SELECT id, link FROM servizi WHERE id IN (
+                SELECT i.servizio_id FROM indice_host i WHERE {filtro}
+            ) ORDER BY id
+        """, parametri)
+        return credenziali, servizi
+    
+    @staticmethod
+    def update_addresses(db: DatabaseManager, credenziali: Iterable[Tuple[str, str, int, str, str]],
+                         servizi: Iterable[Tuple[str, int, str]]) -> Tuple[int, int]:
+        """
+        Riscrive host e link di credenziali e servizi in un'unica transazione
+        
+        Ogni UPDATE verifica che i valori non siano cambiati nel frattempo.
+        Se l'host cambia l'impronta viene azzerata (va ricalcolata, vedi
+        CredenzialeController.aggiorna_impronte); indice_host si aggiorna
+        tramite i trigger.
+        
+        Args:
+            db: Gestore del database
+            credenziali: Tuple (nuovo host, nuovo link, id, host attuale, link attuale)
+            servizi: Tuple (nuovo link, id, link attuale)
+        
+        Returns:
+            Tupla (credenziali aggiornate, servizi aggiornati)
+        """
+        credenziali, servizi = list(credenziali), list(servizi)
+        with db.transaction() as cursor:
+            cursor.executemany("""
+                UPDATE credenziali SET
+                    impronta = CASE WHEN host IS ?1 THEN impronta END,
+                    host = ?1, link = ?2, modificato_il = CURRENT_TIMESTAMP
+                WHERE id = ?3 AND host IS ?4 AND link IS ?5
+            """, credenziali)
+            aggiornate = cursor.rowcount if credenziali else 0
+            cursor.executemany("""
+                UPDATE servizi SET link = ?1, modificato_il = CURRENT_TIMESTAMP
+                WHERE id = ?2 AND link IS ?3
+            """, servizi)
+            return aggiornate, cursor.rowcount if servizi else 0
+    
     @staticmethod
     def delete(db: DatabaseManager, credenziale_id: int) -> bool:
         """
@@ -188,5 +499,64 @@ class Credenziale:
         rowcount = db.execute_update(query, (credenziale_id,))
         return rowcount > 0
     
+    @staticmethod
+    def move_to_servizio(db: DatabaseManager, credenziale_ids: Sequence[int],
+                         servizio_id: int) -> int:
+        """
+        Sposta un insieme di credenziali in un altro servizio con un unico UPDATE
+        
+        Args:
+            db: Gestore del database
+            credenziale_ids: ID delle credenziali da spostare
+            servizio_id: ID del servizio di destinazione
+        
+        Returns:
+            Numero di credenziali spostate
+        """
+        with db.transaction() as cursor:
+            DatabaseManager.load_temp_ids(cursor, "_selezione_credenziali", credenziale_ids)
+            cursor.execute("""
+                UPDATE credenziali SET servizio_id = ?, modificato_il = CURRENT_TIMESTAMP
+                WHERE id IN (SELECT id FROM _selezione_credenziali) AND servizio_id != ?
+            """, (servizio_id, servizio_id))
+            spostate = cursor.rowcount
+            cursor.execute("DELETE FROM _selezione_credenziali")
+        return spostate
+    
+    @staticmethod
+    def copy_to_servizio(db: DatabaseManager, credenziale_ids: Sequence[int],
+                         servizio_id: int, salta_duplicati: bool = False) -> int:
+        """
+        Copia un insieme di credenziali (ciphertext e impronta invariati) in un
+        servizio con INSERT ... SELECT
+        
+        Args:
+            db: Gestore del database
+            credenziale_ids: ID delle credenziali da copiare
+            servizio_id: ID del servizio di destinazione (anche lo stesso)
+            salta_duplicati: Se True non copia le credenziali di altri servizi
+                la cui impronta è già presente nella destinazione
+        
+        Returns:
+            Numero di credenziali copiate
+        """
+        with db.transaction() as cursor:
+            DatabaseManager.load_temp_ids(cursor, "_selezione_credenziali", credenziale_ids)
+            cursor.execute("""
+                INSERT INTO credenziali (servizio_id, username, password, host, porta,
+                                         note, rdp_configurata, link, impronta)
+                SELECT ?, c.username, c.password, c.host, c.porta,
+                       c.note, c.rdp_configurata, c.link, c.impronta
+                FROM credenziali c JOIN _selezione_credenziali t ON t.id = c.id
+                WHERE NOT (? AND c.servizio_id != ? AND EXISTS (
+                    SELECT 1 FROM credenziali d
+                    WHERE d.servizio_id = ? AND d.impronta = c.impronta
+                ))
+                ORDER BY c.id
+            """, (servizio_id, 1 if salta_duplicati else 0, servizio_id, servizio_id))
+            copiate = cursor.rowcount
+            cursor.execute("DELETE FROM _selezione_credenziali")
+        return copiate
+    
     def __str__(self):
         return f"Credenziale: {self.username} @ {self.host or 'N/A'}"
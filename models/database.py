@@ -2,38 +2,290 @@
 Gestione del database SQLite per l'applicazione
 """
 
+import ipaddress
+import re
 import sqlite3
 import os
-from typing import List, Tuple, Optional
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Iterator, List, Sequence, Tuple, Optional
+from urllib.parse import urlsplit
+from .row_mapper import compila_mapper
+
+# Porte implicite degli schemi più comuni (link senza porta esplicita)
+PORTE_SCHEMA = {
+    'http': 80, 'https': 443, 'ftp': 21, 'sftp': 22, 'ssh': 22, 'telnet': 23,
+    'rdp': 3389, 'vnc': 5900, 'smb': 445, 'ldap': 389, 'ldaps': 636,
+    'mysql': 3306, 'postgresql': 5432, 'postgres': 5432, 'mssql': 1433,
+}
+
+
+@lru_cache(maxsize=4096)
+def _chiave_naturale(testo: str) -> tuple:
+    """Spezza il testo in blocchi di cifre (confrontati come numeri) e di testo"""
+    return tuple((0, int(blocco), "") if blocco.isdigit() else (1, 0, blocco.casefold())
+                 for blocco in re.split(r'(\d+)', testo) if blocco)
+
+
+def confronta_naturale(a: str, b: str) -> int:
+    """
+    Collation NATURALE: ordina "Cliente 2" prima di "Cliente 10", senza
+    distinguere maiuscole e minuscole
+    """
+    ka, kb = _chiave_naturale(a), _chiave_naturale(b)
+    if ka == kb:
+        return (a > b) - (a < b)
+    return -1 if ka < kb else 1
+
+
+_CARATTERI_IP = frozenset('0123456789abcdefABCDEF.:')
+
+
+def indirizzo_ip(host: str) -> bool:
+    """Indica se l'host è un indirizzo IPv4/IPv6 e non un nome"""
+    if not _CARATTERI_IP.issuperset(host):
+        return False  # scarta subito i nomi (ipaddress è lento a fallire)
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+@lru_cache(maxsize=4096)
+def analizza_host(valore: str) -> Tuple[Optional[str], Optional[int]]:
+    """
+    Host normalizzato e porta di un link o di un campo host
+    
+    Schema, credenziali, percorso e maiuscole vengono ignorati; la porta è
+    quella esplicita o, in mancanza, quella implicita dello schema.
+    Es. "https://CRM.acme.it/login" -> ("crm.acme.it", 443),
+    "10.0.0.5:8080" -> ("10.0.0.5", 8080), "\\\\srv01\\share" -> ("srv01", None).
+    
+    Returns:
+        Tupla (host, porta); (None, None) se il valore non contiene un host
+    """
+    testo = (valore or "").strip()
+    if indirizzo_ip(testo.strip('[]')):
+        return ipaddress.ip_address(testo.strip('[]')).compressed, None  # anche IPv6 senza parentesi
+    if testo.startswith('\\\\'):
+        testo = testo[2:].split('\\')[0]  # percorso UNC
+    if '://' not in testo:
+        testo = '//' + testo
+    try:
+        parti = urlsplit(testo)
+        host, porta = parti.hostname, parti.port
+    except ValueError:
+        return None, None
+    host = (host or "").rstrip('.')
+    if not host or ' ' in host:
+        return None, None
+    if indirizzo_ip(host):
+        host = ipaddress.ip_address(host).compressed
+    if porta is None:
+        porta = PORTE_SCHEMA.get(parti.scheme.lower())
+    return host, porta
+
+
+def ip_binario(indirizzo) -> bytes:
+    """
+    Indirizzo IP come 16 byte big-endian (IPv4 mappato in ::ffff:0:0/96):
+    l'ordine dei BLOB in SQLite coincide con quello numerico, quindi reti
+    e intervalli diventano BETWEEN su un indice
+    """
+    ip = ipaddress.ip_address(indirizzo)
+    if ip.version == 4:
+        return ((0xffff << 32) | int(ip)).to_bytes(16, 'big')
+    return ip.packed
+
+
+def chiave_host(host: str) -> str:
+    """
+    Chiave dell'indice host: etichette invertite per i nomi, così i
+    sottodomini di un dominio sono contigui ("crm.acme.it" -> "it.acme.crm");
+    gli indirizzi IP restano invariati
+    """
+    return host if indirizzo_ip(host) else '.'.join(reversed(host.split('.')))
+
+
+def _sql_chiave_host(valore) -> Optional[str]:
+    """Funzione SQL CHIAVE_HOST(valore)"""
+    host, _ = analizza_host(valore) if isinstance(valore, str) else (None, None)
+    return chiave_host(host) if host else None
+
+
+def _sql_ip_binario(chiave) -> Optional[bytes]:
+    """Funzione SQL IP_BINARIO(chiave di indice_host): NULL per i nomi"""
+    return ip_binario(chiave) if isinstance(chiave, str) and indirizzo_ip(chiave) else None
+
+
+def _sql_porta_host(valore, porta) -> Optional[int]:
+    """Funzione SQL PORTA_HOST(valore, porta esplicita)"""
+    try:
+        if porta not in (None, ""):
+            return int(porta)
+    except (TypeError, ValueError):
+        pass
+    return analizza_host(valore)[1] if isinstance(valore, str) else None
+
+
+# Trigger che mantengono indice_host a ogni scrittura di host, link e porta.
+# Sono temporanei (installati da connect su ogni connessione dell'applicazione)
+# perché usano le funzioni Python CHIAVE_HOST/PORTA_HOST: strumenti esterni
+# che scrivono sul file senza queste funzioni non falliscono, ma non
+# aggiornano l'indice. Per accorgersene, trigger permanenti in solo SQL
+# contano in indice_host_stato.scritture ogni scrittura, da qualunque
+# connessione, e quelli temporanei contano in indicizzate le scritture
+# indicizzate: se all'avvio i contatori differiscono l'indice viene
+# ricostruito (vedi DatabaseManager.ricostruisci_indice_host).
+_CONTA_INDICIZZATA = "UPDATE indice_host_stato SET indicizzate = indicizzate + 1;"
+_INDICIZZA_CREDENZIALE = f"""
+    DELETE FROM indice_host WHERE credenziale_id = NEW.id;
+    INSERT INTO indice_host (chiave, porta, credenziale_id, ip)
+    SELECT chiave, porta, NEW.id, IP_BINARIO(chiave) FROM (
+        SELECT CHIAVE_HOST(NEW.host) AS chiave, PORTA_HOST(NEW.host, NEW.porta) AS porta
+        UNION SELECT CHIAVE_HOST(NEW.link), PORTA_HOST(NEW.link, NULL)
+    ) WHERE chiave IS NOT NULL;
+    {_CONTA_INDICIZZATA}
+"""
+_INDICIZZA_SERVIZIO = f"""
+    DELETE FROM indice_host WHERE servizio_id = NEW.id;
+    INSERT INTO indice_host (chiave, porta, servizio_id, ip)
+    SELECT CHIAVE_HOST(NEW.link), PORTA_HOST(NEW.link, NULL), NEW.id,
+           IP_BINARIO(CHIAVE_HOST(NEW.link))
+    WHERE CHIAVE_HOST(NEW.link) IS NOT NULL;
+    {_CONTA_INDICIZZATA}
+"""
+TRIGGER_INDICE_HOST = (
+    f"""CREATE TEMP TRIGGER IF NOT EXISTS indice_host_credenziali_ins
+        AFTER INSERT ON main.credenziali BEGIN {_INDICIZZA_CREDENZIALE} END""",
+    f"""CREATE TEMP TRIGGER IF NOT EXISTS indice_host_credenziali_upd
+        AFTER UPDATE OF host, link, porta ON main.credenziali BEGIN {_INDICIZZA_CREDENZIALE} END""",
+    f"""CREATE TEMP TRIGGER IF NOT EXISTS indice_host_credenziali_del
+        AFTER DELETE ON main.credenziali BEGIN
+            DELETE FROM indice_host WHERE credenziale_id = OLD.id;
+            {_CONTA_INDICIZZATA}
+        END""",
+    f"""CREATE TEMP TRIGGER IF NOT EXISTS indice_host_servizi_ins
+        AFTER INSERT ON main.servizi BEGIN {_INDICIZZA_SERVIZIO} END""",
+    f"""CREATE TEMP TRIGGER IF NOT EXISTS indice_host_servizi_upd
+        AFTER UPDATE OF link ON main.servizi BEGIN {_INDICIZZA_SERVIZIO} END""",
+    f"""CREATE TEMP TRIGGER IF NOT EXISTS indice_host_servizi_del
+        AFTER DELETE ON main.servizi BEGIN
+            DELETE FROM indice_host WHERE servizio_id = OLD.id;
+            {_CONTA_INDICIZZATA}
+        END""",
+)
+
+# Trigger permanenti (stessi eventi) che contano tutte le scritture
+_CONTA_SCRITTURA = "BEGIN UPDATE indice_host_stato SET scritture = scritture + 1; END"
+TRIGGER_SCRITTURE_INDICE_HOST = tuple(
+    f"CREATE TRIGGER IF NOT EXISTS indice_host_scritture_{nome} {evento} {_CONTA_SCRITTURA}"
+    for nome, evento in (
+        ('credenziali_ins', "AFTER INSERT ON credenziali"),
+        ('credenziali_upd', "AFTER UPDATE OF host, link, porta ON credenziali"),
+        ('credenziali_del', "AFTER DELETE ON credenziali"),
+        ('servizi_ins', "AFTER INSERT ON servizi"),
+        ('servizi_upd', "AFTER UPDATE OF link ON servizi"),
+        ('servizi_del', "AFTER DELETE ON servizi"),
+    )
+)
+
+# Popolamento completo di indice_host da credenziali e servizi
+_POPOLA_INDICE_HOST = (
+    """
+    INSERT INTO indice_host (chiave, porta, credenziale_id, ip)
+    SELECT chiave, porta, id, IP_BINARIO(chiave) FROM (
+        SELECT id, CHIAVE_HOST(host) AS chiave, PORTA_HOST(host, porta) AS porta
+        FROM credenziali
+        UNION SELECT id, CHIAVE_HOST(link), PORTA_HOST(link, NULL) FROM credenziali
+    ) WHERE chiave IS NOT NULL
+    """,
+    """
+    INSERT INTO indice_host (chiave, porta, servizio_id, ip)
+    SELECT CHIAVE_HOST(link), PORTA_HOST(link, NULL), id,
+           IP_BINARIO(CHIAVE_HOST(link)) FROM servizi
+    WHERE CHIAVE_HOST(link) IS NOT NULL
+    """,
+)
 
 
 class DatabaseManager:
     """Gestisce tutte le operazioni sul database SQLite"""
     
-    def __init__(self, db_path: str = "credenziali_suite.db"):
+    # Caratteri di note/descrizioni caricati nelle query di riepilogo (liste)
+    LUNGHEZZA_ANTEPRIMA = 120
+    
+    # Righe per pagina nella paginazione keyset (iter_* dei modelli)
+    DIMENSIONE_PAGINA = 500
+    
+    def __init__(self, db_path: str = "credenziali_suite.db", inizializza: bool = True):
         """
         Inizializza il gestore del database
         
         Args:
             db_path: Percorso del file database
+            inizializza: Crea/migra lo schema e apre subito la connessione;
+                False per gestori secondari (connessione aperta al primo uso)
         """
         self.db_path = db_path
         self.connection = None
-        self.initialize_database()
+        if inizializza:
+            self.initialize_database()
     
     def connect(self) -> sqlite3.Connection:
         """Crea una connessione al database"""
         if self.connection is None:
             self.connection = sqlite3.connect(self.db_path)
             self.connection.row_factory = sqlite3.Row
+            self.connection.create_collation("NATURALE", confronta_naturale)
+            self.connection.create_function("CHIAVE_HOST", 1, _sql_chiave_host, deterministic=True)
+            self.connection.create_function("PORTA_HOST", 2, _sql_porta_host, deterministic=True)
+            self.connection.create_function("IP_BINARIO", 1, _sql_ip_binario, deterministic=True)
+            self._installa_trigger_indice_host()
         return self.connection
     
+    def _installa_trigger_indice_host(self):
+        """Installa i trigger temporanei di indice_host (se le tabelle esistono già)"""
+        conn = self.connection
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'indice_host_stato'").fetchone():
+            for trigger in TRIGGER_INDICE_HOST:
+                conn.execute(trigger)
+    
     def close(self):
         """Chiude la connessione al database"""
         if self.connection:
             self.connection.close()
             self.connection = None
     
+    def open_reader(self) -> 'DatabaseManager':
+        """
+        Crea un gestore sullo stesso file senza inizializzare lo schema
+        
+        La connessione viene aperta al primo utilizzo, quindi nel thread che
+        la usa (es. worker di prefetch). Con database ':memory:' il gestore
+        vede un database separato.
+        
+        Returns:
+            Nuovo DatabaseManager con connessione propria
+        """
+        return DatabaseManager(self.db_path, inizializza=False)
+    
+    def data_version(self) -> Tuple[int, int]:
+        """
+        Versione dei dati del file, da confrontare con una lettura precedente
+        
+        Cambia a ogni modifica: PRAGMA data_version copre i commit di altre
+        connessioni (CLI, servizio RPC, altre istanze), total_changes le
+        scritture di questa connessione, che PRAGMA data_version non conta.
+        Serve a invalidare le cache costruite su letture precedenti.
+        
+        Returns:
+            Tupla opaca (versione del file, modifiche della connessione)
+        """
+        conn = self.connect()
+        return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+    
     def initialize_database(self):
         """Crea le tabelle del database se non esistono"""
         conn = self.connect()
@@ -210,6 +462,25 @@ class DatabaseManager:
             )
         """)
         
+        # Avanzamento della rotazione della chiave (ripresa dopo interruzione)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS rotazione_chiave (
+                tabella TEXT PRIMARY KEY,
+                rotazione_id TEXT NOT NULL,
+                ultimo_id INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        
+        # Password legacy (testo) che la conversione in BLOB non ha potuto
+        # decifrare: escluse dalle conversioni successive finché il valore non cambia
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS password_non_convertibili (
+                credenziale_id INTEGER PRIMARY KEY,
+                password TEXT NOT NULL,
+                FOREIGN KEY (credenziale_id) REFERENCES credenziali(id) ON DELETE CASCADE
+            )
+        """)
+        
         # Indici per migliorare le performance
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_contatti_cliente 
@@ -226,6 +497,17 @@ class DatabaseManager:
             ON credenziali(servizio_id)
         """)
         
+        # Indici per la paginazione keyset di contatti e allegati
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_contatti_cliente_nome 
+            ON contatti(cliente_id, nome, id)
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_allegati_cliente_data 
+            ON allegati(cliente_id, creato_il, id)
+        """)
+        
         conn.commit()
         
         # Migrazione: aggiungi colonne mancanti alle tabelle esistenti
@@ -238,6 +520,9 @@ class DatabaseManager:
         """)
         
         conn.commit()
+        
+        # Su un database appena creato indice_host esiste solo da ora
+        self._installa_trigger_indice_host()
     
     def migrate_database(self):
         """Esegue migrazioni per aggiornare database esistenti"""
@@ -318,11 +603,201 @@ class DatabaseManager:
                 cursor.execute("ALTER TABLE template_credenziali ADD COLUMN link TEXT")
                 print("Migrazione v2.2: Aggiunta colonna link alla tabella template_credenziali")
             
+            # Lineage dei template: da quale template servizio/cliente deriva
+            cursor.execute("PRAGMA table_info(servizi)")
+            if 'template_servizio_id' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute("ALTER TABLE servizi ADD COLUMN template_servizio_id INTEGER")
+                print("Migrazione: Aggiunta colonna template_servizio_id alla tabella servizi")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_servizi_template 
+                ON servizi(template_servizio_id)
+            """)
+            
+            cursor.execute("PRAGMA table_info(clienti)")
+            if 'template_cliente_id' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute("ALTER TABLE clienti ADD COLUMN template_cliente_id INTEGER")
+                print("Migrazione: Aggiunta colonna template_cliente_id alla tabella clienti")
+            
+            # Impronta HMAC delle credenziali per il rilevamento dei duplicati;
+            # calcolata dopo lo sblocco del vault per le righe esistenti
+            cursor.execute("PRAGMA table_info(credenziali)")
+            if 'impronta' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute("ALTER TABLE credenziali ADD COLUMN impronta TEXT")
+                print("Migrazione: Aggiunta colonna impronta alla tabella credenziali")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_credenziali_impronta
+                ON credenziali(servizio_id, impronta)
+            """)
+            
+            # Indice host/link -> credenziali e servizi per la ricerca per URL
+            # (autofill): una riga per host distinto, con credenziale_id per
+            # host e link delle credenziali, servizio_id per il link dei servizi;
+            # ip è l'indirizzo in forma binaria (vedi ip_binario) se l'host è un IP
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'indice_host'")
+            if not cursor.fetchone():
+                cursor.execute("""
+                    CREATE TABLE indice_host (
+                        chiave TEXT NOT NULL,
+                        porta INTEGER,
+                        credenziale_id INTEGER,
+                        servizio_id INTEGER,
+                        ip BLOB
+                    )
+                """)
+                cursor.execute("CREATE INDEX idx_indice_host_chiave ON indice_host(chiave, porta)")
+                cursor.execute("CREATE INDEX idx_indice_host_credenziale ON indice_host(credenziale_id)")
+                cursor.execute("CREATE INDEX idx_indice_host_servizio ON indice_host(servizio_id)")
+                print("Migrazione: Creato indice host/link per la ricerca per URL")
+            
+            cursor.execute("PRAGMA table_info(indice_host)")
+            if 'ip' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute("ALTER TABLE indice_host ADD COLUMN ip BLOB")
+                cursor.execute("UPDATE indice_host SET ip = IP_BINARIO(chiave)")
+                print("Migrazione: Aggiunta colonna ip alla tabella indice_host")
+            # Indice parziale: solo gli host che sono indirizzi IP
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_indice_host_ip
+                ON indice_host(ip) WHERE ip IS NOT NULL
+            """)
+            
+            # Contatori delle scritture (vedi TRIGGER_SCRITTURE_INDICE_HOST):
+            # alla creazione l'indice viene (ri)popolato, perché strumenti
+            # esterni potrebbero averlo già reso incompleto
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'indice_host_stato'")
+            if not cursor.fetchone():
+                cursor.execute("""
+                    CREATE TABLE indice_host_stato (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        scritture INTEGER NOT NULL DEFAULT 0,
+                        indicizzate INTEGER NOT NULL DEFAULT 0
+                    )
+                """)
+                cursor.execute("INSERT INTO indice_host_stato (id) VALUES (1)")
+                for trigger in TRIGGER_SCRITTURE_INDICE_HOST:
+                    cursor.execute(trigger)
+                self._ricostruisci_indice_host(cursor)
+                print("Migrazione: Aggiunto controllo di coerenza dell'indice host/link")
+            elif not self._indice_host_allineato(cursor):
+                self._ricostruisci_indice_host(cursor)
+                print("Indice host/link ricostruito dopo modifiche esterne al database")
+            
+            # Unicità senza distinzione maiuscole/minuscole: nome cliente e
+            # nome servizio per cliente (eventuali duplicati vengono rinominati)
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+            indici = {row[0] for row in cursor.fetchall()}
+            
+            if 'ux_clienti_nome_nocase' not in indici:
+                self._rendi_nomi_univoci(cursor, "clienti", "")
+                cursor.execute("CREATE UNIQUE INDEX ux_clienti_nome_nocase ON clienti(nome COLLATE NOCASE)")
+                print("Migrazione: Aggiunto indice univoco case-insensitive su clienti.nome")
+            
+            if 'ux_servizi_cliente_nome_nocase' not in indici:
+                self._rendi_nomi_univoci(cursor, "servizi", "cliente_id")
+                cursor.execute("""
+                    CREATE UNIQUE INDEX ux_servizi_cliente_nome_nocase 
+                    ON servizi(cliente_id, nome COLLATE NOCASE)
+                """)
+                print("Migrazione: Aggiunto indice univoco case-insensitive su servizi(cliente_id, nome)")
+            
             conn.commit()
         except Exception as e:
             print(f"Errore durante la migrazione: {e}")
             conn.rollback()
     
+    def ricostruisci_indice_host(self) -> int:
+        """
+        Ricostruisce indice_host da credenziali e servizi in un'unica transazione
+        
+        All'avvio avviene da sé se strumenti esterni hanno modificato host o
+        link; serve anche a forzarla (comando CLI reindicizza).
+        
+        Returns:
+            Numero di righe dell'indice
+        """
+        with self.transaction() as cursor:
+            self._ricostruisci_indice_host(cursor)
+            cursor.execute("SELECT COUNT(*) FROM indice_host")
+            return cursor.fetchone()[0]
+    
+    def indice_host_allineato(self) -> bool:
+        """Indica se indice_host riflette tutte le scritture su credenziali e servizi"""
+        return self._indice_host_allineato(self.connect().cursor())
+    
+    @staticmethod
+    def _indice_host_allineato(cursor: sqlite3.Cursor) -> bool:
+        """Confronta i contatori di indice_host_stato"""
+        cursor.execute("SELECT scritture = indicizzate FROM indice_host_stato")
+        riga = cursor.fetchone()
+        return bool(riga and riga[0])
+    
+    @staticmethod
+    def _ricostruisci_indice_host(cursor: sqlite3.Cursor):
+        """Ripopola indice_host e allinea i contatori (nella transazione del chiamante)"""
+        cursor.execute("DELETE FROM indice_host")
+        for query in _POPOLA_INDICE_HOST:
+            cursor.execute(query)
+        cursor.execute("UPDATE indice_host_stato SET indicizzate = scritture")
+    
+    @staticmethod
+    def _rendi_nomi_univoci(cursor: sqlite3.Cursor, tabella: str, gruppo: str):
+        """
+        Rinomina i nomi duplicati (senza distinzione maiuscole/minuscole)
+        aggiungendo " (2)", " (3)"... a tutti tranne il primo inserito
+        
+        Args:
+            cursor: Cursore della migrazione in corso
+            tabella: Tabella con colonna nome
+            gruppo: Colonna entro cui il nome deve essere univoco ("" = tutta la tabella)
+        """
+        partizione = f"{gruppo}, nome COLLATE NOCASE" if gruppo else "nome COLLATE NOCASE"
+        colonna_gruppo = gruppo or "NULL"
+        cursor.execute(f"""
+            SELECT id, {colonna_gruppo}, nome FROM (
+                SELECT id, {colonna_gruppo}, nome,
+                       ROW_NUMBER() OVER (PARTITION BY {partizione} ORDER BY id) AS n
+                FROM {tabella}
+            ) WHERE n > 1
+        """)
+        for riga_id, valore_gruppo, nome in cursor.fetchall():
+            filtro = f"{gruppo} IS ? AND " if gruppo else ""
+            parametri_gruppo = (valore_gruppo,) if gruppo else ()
+            suffisso = 2
+            while True:
+                nuovo_nome = f"{nome} ({suffisso})"
+                cursor.execute(
+                    f"SELECT 1 FROM {tabella} WHERE {filtro}nome = ? COLLATE NOCASE",
+                    parametri_gruppo + (nuovo_nome,)
+                )
+                if not cursor.fetchone():
+                    break
+                suffisso += 1
+            cursor.execute(f"UPDATE {tabella} SET nome = ? WHERE id = ?", (nuovo_nome, riga_id))
+            print(f"Migrazione: {tabella} '{nome}' duplicato rinominato in '{nuovo_nome}'")
+    
+    @staticmethod
+    def load_temp_ids(cursor: sqlite3.Cursor, tabella: str, ids: Iterable[int]):
+        """
+        Carica un insieme di ID in una tabella temporanea (id INTEGER PRIMARY KEY)
+        
+        La tabella viene creata se manca e svuotata prima del caricamento, così
+        le operazioni in blocco possono usarla in JOIN/IN invece di costruire
+        liste di segnaposto.
+        
+        Args:
+            cursor: Cursore della transazione in corso
+            tabella: Nome della tabella temporanea
+            ids: ID da caricare (i duplicati vengono ignorati)
+        """
+        cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {tabella} (id INTEGER PRIMARY KEY)")
+        cursor.execute(f"DELETE FROM {tabella}")
+        cursor.executemany(f"INSERT OR IGNORE INTO {tabella} (id) VALUES (?)",
+                           ((i,) for i in ids))
+    
+    @staticmethod
+    def is_unique_violation(errore: sqlite3.IntegrityError) -> bool:
+        """Indica se l'IntegrityError deriva da un vincolo/indice UNIQUE"""
+        return "UNIQUE constraint failed" in str(errore)
+    
     def execute_query(self, query: str, params: Tuple = ()) -> List[sqlite3.Row]:
         """
         Esegue una query SELECT e restituisce i risultati
@@ -339,6 +814,81 @@ class DatabaseManager:
         cursor.execute(query, params)
         return cursor.fetchall()
     
+    def execute_query_objects(self, query: str, params: Tuple = (),
+                              model_cls: type = None) -> List[Any]:
+        """
+        Esegue una query SELECT e restituisce i risultati come oggetti modello
+        
+        Il layout delle colonne viene risolto una volta per cursore tramite
+        un mapper compilato (vedi models.row_mapper); le righe sono lette
+        come tuple semplici senza passare da sqlite3.Row.
+        
+        Args:
+            query: Query SQL da eseguire
+            params: Parametri per la query
+            model_cls: Classe modello con attributo _CAMPI
+            
+        Returns:
+            Lista di oggetti modello
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(query, params)
+        mapper = compila_mapper(model_cls, [d[0] for d in cursor.description])
+        return list(map(mapper, cursor))
+    
+    @staticmethod
+    def iter_pages(fetch_page: Callable[[Optional[Tuple], int], List[Any]],
+                   key: Callable[[Any], Tuple],
+                   page_size: int = None) -> Iterator[Any]:
+        """
+        Scorre una query paginata a keyset restituendo un oggetto alla volta
+        
+        In memoria resta al massimo una pagina: ogni pagina riparte dalla
+        chiave dell'ultimo elemento letto, senza OFFSET.
+        
+        Args:
+            fetch_page: Funzione (chiave_dopo, limite) -> lista della pagina
+            key: Funzione oggetto -> chiave keyset (es. (nome, id))
+            page_size: Righe per pagina (default DIMENSIONE_PAGINA)
+            
+        Yields:
+            Oggetti nell'ordine della query
+        """
+        page_size = page_size or DatabaseManager.DIMENSIONE_PAGINA
+        after = None
+        while True:
+            page = fetch_page(after, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = key(page[-1])
+    
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Esegue un blocco di operazioni in un'unica transazione
+        
+        Commit all'uscita dal blocco, rollback se viene sollevata
+        un'eccezione. Dentro il blocco usare il cursore restituito e non
+        execute_update (che fa commit a ogni chiamata).
+        
+        Yields:
+            Cursore sulla connessione principale
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN")
+            yield cursor
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    
     def execute_update(self, query: str, params: Tuple = ()) -> int:
         """
         Esegue una query di modifica (INSERT, UPDATE, DELETE)
@@ -354,4 +904,82 @@ class DatabaseManager:
         cursor = conn.cursor()
         cursor.execute(query, params)
         conn.commit()
-        return cursor.lastrowid if cursor.lastrowid else cursor.rowcount
+        # lastrowid resta valorizzato anche dopo UPDATE/DELETE: usarlo solo per gli INSERT
+        if cursor.lastrowid and query.lstrip().upper().startswith(("INSERT", "REPLACE")):
+            return cursor.lastrowid
+        return cursor.rowcount
+    
+    def compatta(self) -> Tuple[int, int]:
+        """
+        Ricostruisce il file del database (VACUUM) liberando lo spazio inutilizzato
+        
+        Da chiamare dopo riscritture in blocco (es. conversione delle
+        password in BLOB): SQLite non restituisce da solo le pagine liberate.
+        
+        Returns:
+            Tupla (byte prima, byte dopo)
+        """
+        conn = self.connect()
+        prima = os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
+        conn.execute("VACUUM")
+        dopo = os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
+        return prima, dopo
+    
+    def upsert_rows(self, tabella: str, chiave: str, campi: Sequence[str],
+                    righe: Iterable[Sequence[Any]]) -> Tuple[int, int, int]:
+        """
+        Inserisce o aggiorna righe identificate da una colonna UNIQUE
+        
+        Un valore vuoto (o None) significa "non fornito": non sovrascrive
+        il valore memorizzato, quindi un file senza una colonna o con celle
+        vuote non cancella i dati esistenti. Le righe esistenti vengono lette
+        una sola volta e confrontate in memoria sui soli valori forniti; solo
+        le righe nuove o cambiate vengono scritte, con un unico executemany
+        di INSERT ... ON CONFLICT DO UPDATE nella stessa transazione. Se la
+        stessa chiave compare più volte, i valori forniti dalle occorrenze
+        successive prevalgono.
+        
+        Args:
+            tabella: Tabella di destinazione (con colonna modificato_il)
+            chiave: Colonna UNIQUE usata come chiave (es. nome)
+            campi: Altre colonne da scrivere
+            righe: Sequenze (valore chiave, *valori dei campi; "" = non fornito)
+            
+        Returns:
+            Tupla (create, aggiornate, invariate)
+        """
+        colonne = (chiave,) + tuple(campi)
+        insert = f"""
+            INSERT INTO {tabella} ({', '.join(colonne)})
+            VALUES ({', '.join('?' * len(colonne))})
+            ON CONFLICT({chiave}) DO UPDATE SET
+                {', '.join(f"{c} = COALESCE(NULLIF(excluded.{c}, ''), {c})" for c in campi)},
+                modificato_il = CURRENT_TIMESTAMP
+        """
+        
+        nuove = {}
+        for riga in righe:
+            valori = tuple(v or "" for v in riga[1:])
+            precedenti = nuove.get(riga[0])
+            if precedenti:
+                valori = tuple(v or p for v, p in zip(valori, precedenti))
+            nuove[riga[0]] = valori
+        
+        with self.transaction() as cursor:
+            cursor.execute(f"SELECT {', '.join(colonne)} FROM {tabella}")
+            esistenti = {r[0]: tuple(v or "" for v in r[1:]) for r in cursor}
+            
+            create = aggiornate = invariate = 0
+            da_scrivere = []
+            for valore_chiave, valori in nuove.items():
+                attuali = esistenti.get(valore_chiave)
+                if attuali is not None and all(not v or v == a for v, a in zip(valori, attuali)):
+                    invariate += 1
+                    continue
+                if attuali is None:
+                    create += 1
+                else:
+                    aggiornate += 1
+                da_scrivere.append((valore_chiave,) + valori)
+            cursor.executemany(insert, da_scrivere)
+        return create, aggiornate, invariate
@@ -2,13 +2,23 @@
 Modello Project Manager (PM)
 """
 
-from typing import Optional, List
+from typing import Iterable, Iterator, Optional, List, Tuple
 from .database import DatabaseManager
 
 
 class PM:
     """Rappresenta un Project Manager"""
     
+    __slots__ = ('id', 'nome', 'email', 'telefono', 'cellulare')
+    
+    _CAMPI = (
+        ('id', None, None),
+        ('nome', "", None),
+        ('email', "", None),
+        ('telefono', "", None),
+        ('cellulare', "", None),
+    )
+    
     def __init__(self, id: Optional[int] = None, nome: str = "", 
                  email: str = "", telefono: str = "", cellulare: str = ""):
         self.id = id
@@ -51,20 +61,45 @@ class PM:
             Lista di PM
         """
         query = "SELECT * FROM pm ORDER BY nome"
-        rows = db.execute_query(query)
+        return db.execute_query_objects(query, (), PM)
+    
+    @staticmethod
+    def get_page(db: DatabaseManager, after: Optional[Tuple[str, int]] = None,
+                 limit: int = DatabaseManager.DIMENSIONE_PAGINA) -> List['PM']:
+        """
+        Recupera una pagina di PM ordinati per (nome, id) con paginazione keyset
         
-        pms = []
-        for row in rows:
-            pm = PM(
-                id=row['id'],
-                nome=row['nome'],
-                email=row['email'],
-                telefono=row['telefono'],
-                cellulare=row['cellulare']
-            )
-            pms.append(pm)
+        Args:
+            db: Gestore del database
+            after: Chiave (nome, id) dell'ultimo elemento della pagina precedente
+            limit: Numero massimo di righe
+            
+        Returns:
+            Lista di PM della pagina
+        """
+        if after is None:
+            query = "SELECT * FROM pm ORDER BY nome, id LIMIT ?"
+            return db.execute_query_objects(query, (limit,), PM)
+        query = "SELECT * FROM pm WHERE (nome, id) > (?, ?) ORDER BY nome, id LIMIT ?"
+        return db.execute_query_objects(query, (after[0], after[1], limit), PM)
+    
+    @staticmethod
+    def iter_all(db: DatabaseManager, page_size: int = DatabaseManager.DIMENSIONE_PAGINA) -> Iterator['PM']:
+        """
+        Scorre tutti i PM pagina per pagina senza caricarli tutti in memoria
         
-        return pms
+        Args:
+            db: Gestore del database
+            page_size: Righe per pagina
+            
+        Yields:
+            PM in ordine di nome
+        """
+        return DatabaseManager.iter_pages(
+            lambda after, limit: PM.get_page(db, after, limit),
+            lambda pm: (pm.nome, pm.id),
+            page_size
+        )
     
     @staticmethod
     def get_by_id(db: DatabaseManager, pm_id: int) -> Optional['PM']:
@@ -79,18 +114,8 @@ class PM:
             PM trovato o None
         """
         query = "SELECT * FROM pm WHERE id = ?"
-        rows = db.execute_query(query, (pm_id,))
-        
-        if rows:
-            row = rows[0]
-            return PM(
-                id=row['id'],
-                nome=row['nome'],
-                email=row['email'],
-                telefono=row['telefono'],
-                cellulare=row['cellulare']
-            )
-        return None
+        pms = db.execute_query_objects(query, (pm_id,), PM)
+        return pms[0] if pms else None
     
     @staticmethod
     def update(db: DatabaseManager, pm_id: int, nome: str, 
@@ -134,6 +159,43 @@ class PM:
         rowcount = db.execute_update(query, (pm_id,))
         return rowcount > 0
     
+    @staticmethod
+    def assegna_a_clienti(db: DatabaseManager, pm_id: Optional[int],
+                          cliente_ids: Iterable[int]) -> int:
+        """
+        Assegna (o rimuove, con pm_id None) il PM a più clienti con un unico UPDATE
+        
+        Args:
+            db: Gestore del database
+            pm_id: ID del PM o None per togliere l'assegnazione
+            cliente_ids: ID dei clienti
+            
+        Returns:
+            Numero di clienti aggiornati
+        """
+        with db.transaction() as cursor:
+            DatabaseManager.load_temp_ids(cursor, "_sel_clienti", cliente_ids)
+            cursor.execute("""
+                UPDATE clienti SET pm_id = ?, modificato_il = CURRENT_TIMESTAMP
+                WHERE id IN (SELECT id FROM _sel_clienti) AND pm_id IS NOT ?
+            """, (pm_id, pm_id))
+            return cursor.rowcount
+    
+    @staticmethod
+    def upsert_many(db: DatabaseManager,
+                    righe: Iterable[Tuple[str, str, str, str]]) -> Tuple[int, int, int]:
+        """
+        Importa in blocco dei PM usando il nome (UNIQUE) come chiave
+        
+        Args:
+            db: Gestore del database
+            righe: Tuple (nome, email, telefono, cellulare)
+            
+        Returns:
+            Tupla (creati, aggiornati, invariati)
+        """
+        return db.upsert_rows("pm", "nome", ("email", "telefono", "cellulare"), righe)
+    
     @staticmethod
     def get_clienti_count(db: DatabaseManager, pm_id: int) -> int:
         """
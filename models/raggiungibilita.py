@@ -0,0 +1,89 @@
+"""
+Modello per l'ultimo esito delle verifiche di raggiungibilità
+"""
+
+from typing import Dict, Iterable, Tuple
+from .database import DatabaseManager
+
+
+class Raggiungibilita:
+    """
+    Ultimo esito della connessione TCP a una coppia (host, porta)
+    
+    Gli esiti sono condivisi da tutte le credenziali che puntano alla stessa
+    destinazione e restano validi per un TTL scelto da chi li legge. Sono
+    salvati in un file separato dal vault (vedi RaggiungibilitaController):
+    scriverli non cambia il data_version del database principale.
+    """
+    
+    @staticmethod
+    def create_table(db: DatabaseManager):
+        """
+        Crea la tabella degli esiti se non esiste
+        
+        Args:
+            db: Gestore del database degli esiti
+        """
+        db.execute_update("""
+            CREATE TABLE IF NOT EXISTS raggiungibilita (
+                host TEXT NOT NULL,
+                porta INTEGER NOT NULL,
+                raggiungibile INTEGER NOT NULL,
+                latenza_ms REAL,
+                indirizzo TEXT,
+                errore TEXT,
+                verificato_il TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (host, porta)
+            )
+        """)
+    
+    @staticmethod
+    def get_fresh(db: DatabaseManager, ttl: int) -> Dict[Tuple[str, int], dict]:
+        """
+        Recupera gli esiti verificati negli ultimi ttl secondi
+        
+        Args:
+            db: Gestore del database
+            ttl: Validità degli esiti in secondi
+        
+        Returns:
+            Dizionario (host, porta) -> esito (con verificato_il)
+        """
+        query = """
+            SELECT host, porta, raggiungibile, latenza_ms, indirizzo, errore, verificato_il
+            FROM raggiungibilita
+            WHERE verificato_il >= datetime('now', ?)
+        """
+        esiti = {}
+        for row in db.execute_query(query, (f'-{int(ttl)} seconds',)):
+            esito = dict(row)
+            esito['raggiungibile'] = bool(esito['raggiungibile'])
+            esiti[(esito['host'], esito['porta'])] = esito
+        return esiti
+    
+    @staticmethod
+    def save_results(db: DatabaseManager, esiti: Iterable[dict]) -> int:
+        """
+        Salva gli esiti (uno per destinazione) in un'unica transazione
+        
+        Args:
+            db: Gestore del database
+            esiti: Dizionari con host, porta, raggiungibile, latenza_ms,
+                   indirizzo ed errore
+        
+        Returns:
+            Numero di esiti salvati
+        """
+        query = """
+            INSERT INTO raggiungibilita (host, porta, raggiungibile, latenza_ms, indirizzo, errore)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(host, porta) DO UPDATE SET
+                raggiungibile = excluded.raggiungibile, latenza_ms = excluded.latenza_ms,
+                indirizzo = excluded.indirizzo, errore = excluded.errore,
+                verificato_il = CURRENT_TIMESTAMP
+        """
+        righe = [(e['host'], e['porta'], int(e['raggiungibile']), e['latenza_ms'],
+                  e['indirizzo'], e['errore']) for e in esiti]
+        with db.transaction() as cursor:
+            cursor.executemany(query, righe)
+        return len(righe)
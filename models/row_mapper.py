@@ -0,0 +1,63 @@
+"""
+Mapper compilati riga SQL -> oggetto modello
+
+Ogni modello dichiara in ``_CAMPI`` le tuple (attributo, default se la
+colonna manca dalla query, conversione). Le query di riepilogo possono così
+proiettare solo alcune colonne: gli attributi mancanti prendono il default
+invece di richiedere ``row.keys()`` riga per riga.
+"""
+
+from typing import Any, Callable, Dict, Sequence, Tuple
+
+# Conversioni supportate per i campi dei modelli
+CONV_BOOL = "bool({})"
+CONV_STR = "({} or '')"
+
+# Cache dei mapper: (classe, colonne) -> funzione di mapping
+_mapper_cache: Dict[Tuple[type, Tuple[str, ...]], Callable[[Sequence], Any]] = {}
+
+
+def compila_mapper(cls: type, colonne: Sequence[str]) -> Callable[[Sequence], Any]:
+    """
+    Restituisce una funzione che costruisce un oggetto ``cls`` da una riga
+
+    Il layout delle colonne viene risolto una sola volta: il mapper generato
+    accede alle righe per indice, applica default e conversioni dichiarati in
+    ``cls._CAMPI`` e non passa per ``__init__``. I mapper sono messi in cache
+    per classe e layout di colonne.
+
+    Args:
+        cls: Classe modello con attributo ``_CAMPI`` (attributo, default, conversione)
+        colonne: Nomi delle colonne restituite dalla query (cursor.description)
+
+    Returns:
+        Funzione riga -> oggetto
+    """
+    colonne = tuple(colonne)
+    chiave = (cls, colonne)
+    mapper = _mapper_cache.get(chiave)
+    if mapper is not None:
+        return mapper
+
+    indici = {}
+    for i, nome in enumerate(colonne):
+        # In caso di colonne duplicate (JOIN) vince la prima
+        indici.setdefault(nome, i)
+
+    namespace = {'_new': object.__new__, '_cls': cls}
+    righe = ["def _mappa(r):", "    o = _new(_cls)"]
+    for n, (attributo, default, conversione) in enumerate(cls._CAMPI):
+        if attributo in indici:
+            valore = f"r[{indici[attributo]}]"
+            if conversione:
+                valore = conversione.format(valore)
+        else:
+            namespace[f"_d{n}"] = default
+            valore = f"_d{n}"
+        righe.append(f"    o.{attributo} = {valore}")
+    righe.append("    return o")
+
+    exec("\n".join(righe), namespace)
+    mapper = namespace['_mappa']
+    _mapper_cache[chiave] = mapper
+    return mapper
@@ -2,13 +2,27 @@
 Modello Servizio
 """
 
-from typing import Optional, List
+from typing import Iterable, Optional, List, Sequence, Tuple
 from .database import DatabaseManager
+from .row_mapper import CONV_STR
 
 
 class Servizio:
     """Rappresenta un servizio associato a un cliente"""
     
+    __slots__ = ('id', 'cliente_id', 'nome', 'tipo', 'descrizione', 'link',
+                 'template_servizio_id')
+    
+    _CAMPI = (
+        ('id', None, None),
+        ('cliente_id', 0, None),
+        ('nome', "", None),
+        ('tipo', "Altro", None),
+        ('descrizione', "", None),
+        ('link', "", CONV_STR),
+        ('template_servizio_id', None, None),
+    )
+    
     # Tipi di servizio supportati
     TIPO_RDP = "RDP"
     TIPO_CRM = "CRM"
@@ -22,17 +36,20 @@ class Servizio:
                         TIPO_SSH, TIPO_FTP, TIPO_ALTRO]
     
     def __init__(self, id: Optional[int] = None, cliente_id: int = 0, 
-                 nome: str = "", tipo: str = TIPO_ALTRO, descrizione: str = "", link: str = ""):
+                 nome: str = "", tipo: str = TIPO_ALTRO, descrizione: str = "", link: str = "",
+                 template_servizio_id: Optional[int] = None):
         self.id = id
         self.cliente_id = cliente_id
         self.nome = nome
         self.tipo = tipo
         self.descrizione = descrizione
         self.link = link
+        self.template_servizio_id = template_servizio_id
     
     @staticmethod
     def create(db: DatabaseManager, cliente_id: int, nome: str, 
-               tipo: str, descrizione: str = "", link: str = "") -> int:
+               tipo: str, descrizione: str = "", link: str = "",
+               template_servizio_id: Optional[int] = None) -> int:
         """
         Crea un nuovo servizio nel database
         
@@ -43,15 +60,17 @@ class Servizio:
             tipo: Tipo di servizio
             descrizione: Descrizione opzionale
             link: Link/URL del servizio (per CRM, Web, etc.)
+            template_servizio_id: Template da cui deriva il servizio (lineage)
             
         Returns:
             ID del servizio creato
         """
         query = """
-            INSERT INTO servizi (cliente_id, nome, tipo, descrizione, link)
-            VALUES (?, ?, ?, ?, ?)
+            INSERT INTO servizi (cliente_id, nome, tipo, descrizione, link, template_servizio_id)
+            VALUES (?, ?, ?, ?, ?, ?)
         """
-        return db.execute_update(query, (cliente_id, nome, tipo, descrizione, link))
+        return db.execute_update(query, (cliente_id, nome, tipo, descrizione, link,
+                                         template_servizio_id))
     
     @staticmethod
     def get_by_cliente(db: DatabaseManager, cliente_id: int) -> List['Servizio']:
@@ -68,29 +87,47 @@ class Servizio:
         query = """
             SELECT * FROM servizi 
             WHERE cliente_id = ?
-            ORDER BY tipo, nome
+            ORDER BY tipo, nome COLLATE NATURALE
         """
-        rows = db.execute_query(query, (cliente_id,))
+        return db.execute_query_objects(query, (cliente_id,), Servizio)
+    
+    @staticmethod
+    def get_by_cliente_summary(db: DatabaseManager, cliente_id: int) -> List['Servizio']:
+        """
+        Recupera i servizi di un cliente proiettando solo le colonne della lista
+        
+        Descrizione e link restano ai valori di default; usare get_by_id
+        per il dettaglio.
         
-        servizi = []
-        for row in rows:
-            # Gestisci link con try-except per compatibilità
-            try:
-                link_val = row['link'] or ""
-            except (KeyError, IndexError):
-                link_val = ""
+        Args:
+            db: Gestore del database
+            cliente_id: ID del cliente
             
-            servizio = Servizio(
-                id=row['id'],
-                cliente_id=row['cliente_id'],
-                nome=row['nome'],
-                tipo=row['tipo'],
-                descrizione=row['descrizione'],
-                link=link_val
-            )
-            servizi.append(servizio)
+        Returns:
+            Lista di servizi del cliente (riepilogo)
+        """
+        query = """
+            SELECT id, cliente_id, nome, tipo FROM servizi 
+            WHERE cliente_id = ?
+            ORDER BY tipo, nome COLLATE NATURALE
+        """
+        return db.execute_query_objects(query, (cliente_id,), Servizio)
+    
+    @staticmethod
+    def count_by_cliente(db: DatabaseManager, cliente_id: int) -> int:
+        """
+        Conta i servizi di un cliente
         
-        return servizi
+        Args:
+            db: Gestore del database
+            cliente_id: ID del cliente
+            
+        Returns:
+            Numero di servizi
+        """
+        query = "SELECT COUNT(*) as count FROM servizi WHERE cliente_id = ?"
+        rows = db.execute_query(query, (cliente_id,))
+        return rows[0]['count'] if rows else 0
     
     @staticmethod
     def get_by_id(db: DatabaseManager, servizio_id: int) -> Optional['Servizio']:
@@ -105,25 +142,8 @@ class Servizio:
             Servizio trovato o None
         """
         query = "SELECT * FROM servizi WHERE id = ?"
-        rows = db.execute_query(query, (servizio_id,))
-        
-        if rows:
-            row = rows[0]
-            # Gestisci link con try-except per compatibilità
-            try:
-                link_val = row['link'] or ""
-            except (KeyError, IndexError):
-                link_val = ""
-            
-            return Servizio(
-                id=row['id'],
-                cliente_id=row['cliente_id'],
-                nome=row['nome'],
-                tipo=row['tipo'],
-                descrizione=row['descrizione'],
-                link=link_val
-            )
-        return None
+        servizi = db.execute_query_objects(query, (servizio_id,), Servizio)
+        return servizi[0] if servizi else None
     
     @staticmethod
     def update(db: DatabaseManager, servizio_id: int, nome: str, 
@@ -167,5 +187,119 @@ class Servizio:
         rowcount = db.execute_update(query, (servizio_id,))
         return rowcount > 0
     
+    @staticmethod
+    def _risolvi_nomi(nomi: Sequence[str], occupati: Iterable[str]) -> List[str]:
+        """
+        Assegna a ogni nome un nome libero (senza distinzione maiuscole/minuscole)
+        aggiungendo " (2)", " (3)"... in caso di collisione
+        """
+        occupati = {nome.casefold() for nome in occupati}
+        risultato = []
+        for nome in nomi:
+            nuovo_nome, suffisso = nome, 2
+            while nuovo_nome.casefold() in occupati:
+                nuovo_nome = f"{nome} ({suffisso})"
+                suffisso += 1
+            occupati.add(nuovo_nome.casefold())
+            risultato.append(nuovo_nome)
+        return risultato
+    
+    @staticmethod
+    def _prepara_trasferimento(cursor, servizio_ids: Sequence[int], cliente_id: int,
+                               escludi_destinazione: bool) -> List[Tuple[int, str, str]]:
+        """
+        Riempie la tabella temporanea _trasferimento (id, nome, nuovo_nome)
+        calcolando in blocco i nomi liberi nel cliente di destinazione
+        """
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS _trasferimento (id INTEGER PRIMARY KEY, nome TEXT, nuovo_nome TEXT, nuovo_id INTEGER)")
+        cursor.execute("DELETE FROM _trasferimento")
+        cursor.executemany("INSERT OR IGNORE INTO _trasferimento (id) VALUES (?)",
+                           ((sid,) for sid in servizio_ids))
+        cursor.execute("""
+            UPDATE _trasferimento SET nome = s.nome FROM servizi s WHERE s.id = _trasferimento.id
+        """)
+        # Scarta ID inesistenti e (per lo spostamento) servizi già nella destinazione
+        cursor.execute("DELETE FROM _trasferimento WHERE nome IS NULL")
+        if escludi_destinazione:
+            cursor.execute("""
+                DELETE FROM _trasferimento
+                WHERE id IN (SELECT id FROM servizi WHERE cliente_id = ?)
+            """, (cliente_id,))
+        cursor.execute("SELECT id, nome FROM _trasferimento ORDER BY id")
+        da_trasferire = cursor.fetchall()
+        
+        # Nomi già occupati nella destinazione (in copia anche dagli originali)
+        cursor.execute("SELECT nome FROM servizi WHERE cliente_id = ?", (cliente_id,))
+        nuovi_nomi = Servizio._risolvi_nomi([row[1] for row in da_trasferire],
+                                            [row[0] for row in cursor.fetchall()])
+        esiti = [(row[0], row[1], nuovo) for row, nuovo in zip(da_trasferire, nuovi_nomi)]
+        cursor.executemany("UPDATE _trasferimento SET nuovo_nome = ? WHERE id = ?",
+                           ((nuovo, sid) for sid, _, nuovo in esiti))
+        return esiti
+    
+    @staticmethod
+    def move_to_cliente(db: DatabaseManager, servizio_ids: Sequence[int],
+                        cliente_id: int) -> List[Tuple[int, int, str, str]]:
+        """
+        Sposta un insieme di servizi (con le loro credenziali) in un altro
+        cliente con un unico UPDATE ... FROM
+        
+        Args:
+            db: Gestore del database
+            servizio_ids: ID dei servizi da spostare
+            cliente_id: ID del cliente di destinazione
+            
+        Returns:
+            Lista di tuple (id origine, id risultante, nome originale, nome finale)
+        """
+        with db.transaction() as cursor:
+            esiti = Servizio._prepara_trasferimento(cursor, servizio_ids, cliente_id, True)
+            cursor.execute("""
+                UPDATE servizi
+                SET cliente_id = ?, nome = t.nuovo_nome, modificato_il = CURRENT_TIMESTAMP
+                FROM _trasferimento t WHERE t.id = servizi.id
+            """, (cliente_id,))
+            cursor.execute("DELETE FROM _trasferimento")
+        return [(sid, sid, nome, nuovo) for sid, nome, nuovo in esiti]
+    
+    @staticmethod
+    def copy_to_cliente(db: DatabaseManager, servizio_ids: Sequence[int],
+                        cliente_id: int) -> List[Tuple[int, int, str, str]]:
+        """
+        Copia un insieme di servizi e delle loro credenziali (ciphertext
+        invariato) in un cliente con INSERT ... SELECT
+        
+        Args:
+            db: Gestore del database
+            servizio_ids: ID dei servizi da copiare
+            cliente_id: ID del cliente di destinazione (anche lo stesso)
+            
+        Returns:
+            Lista di tuple (id origine, id della copia, nome originale, nome finale)
+        """
+        with db.transaction() as cursor:
+            esiti = Servizio._prepara_trasferimento(cursor, servizio_ids, cliente_id, False)
+            cursor.execute("""
+                INSERT INTO servizi (cliente_id, nome, tipo, descrizione, link, template_servizio_id)
+                SELECT ?, t.nuovo_nome, s.tipo, s.descrizione, s.link, s.template_servizio_id
+                FROM _trasferimento t JOIN servizi s ON s.id = t.id
+                ORDER BY t.id
+            """, (cliente_id,))
+            cursor.execute("""
+                UPDATE _trasferimento SET nuovo_id = s.id
+                FROM servizi s WHERE s.cliente_id = ? AND s.nome = _trasferimento.nuovo_nome
+            """, (cliente_id,))
+            cursor.execute("""
+                INSERT INTO credenziali (servizio_id, username, password, host, porta,
+                                         note, rdp_configurata, link, impronta)
+                SELECT t.nuovo_id, c.username, c.password, c.host, c.porta,
+                       c.note, c.rdp_configurata, c.link, c.impronta
+                FROM credenziali c JOIN _trasferimento t ON t.id = c.servizio_id
+            """)
+            cursor.execute("SELECT id, nuovo_id FROM _trasferimento")
+            nuovi_id = dict(cursor.fetchall())
+            cursor.execute("DELETE FROM _trasferimento")
+        return [(sid, nuovi_id[sid], nome, nuovo) for sid, nome, nuovo in esiti]
+    
     def __str__(self):
         return f"Servizio: {self.nome} ({self.tipo}) - ID: {self.id}"
@@ -2,14 +2,24 @@
 Modello per i template cliente (cliente + servizi + credenziali)
 """
 
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Sequence
 from models.database import DatabaseManager
+from models.row_mapper import CONV_STR
 from models.template_servizio import TemplateServizio
 
 
 class TemplateCliente:
     """Rappresenta un template per creare un cliente completo con servizi"""
     
+    __slots__ = ('id', 'nome_template', 'descrizione_cliente', 'note_template')
+    
+    _CAMPI = (
+        ('id', None, None),
+        ('nome_template', "", None),
+        ('descrizione_cliente', "", CONV_STR),
+        ('note_template', "", CONV_STR),
+    )
+    
     def __init__(self, id: Optional[int] = None, nome_template: str = "",
                  descrizione_cliente: str = "", note_template: str = ""):
         self.id = id
@@ -31,35 +41,14 @@ class TemplateCliente:
     def get_all(db: DatabaseManager) -> List['TemplateCliente']:
         """Recupera tutti i template cliente"""
         query = "SELECT * FROM template_cliente ORDER BY nome_template"
-        rows = db.execute_query(query)
-        
-        templates = []
-        for row in rows:
-            template = TemplateCliente(
-                id=row['id'],
-                nome_template=row['nome_template'],
-                descrizione_cliente=row['descrizione_cliente'] or "",
-                note_template=row['note_template'] or ""
-            )
-            templates.append(template)
-        
-        return templates
+        return db.execute_query_objects(query, (), TemplateCliente)
     
     @staticmethod
     def get_by_id(db: DatabaseManager, id: int) -> Optional['TemplateCliente']:
         """Recupera un template cliente per ID"""
         query = "SELECT * FROM template_cliente WHERE id = ?"
-        rows = db.execute_query(query, (id,))
-        
-        if rows:
-            row = rows[0]
-            return TemplateCliente(
-                id=row['id'],
-                nome_template=row['nome_template'],
-                descrizione_cliente=row['descrizione_cliente'] or "",
-                note_template=row['note_template'] or ""
-            )
-        return None
+        templates = db.execute_query_objects(query, (id,), TemplateCliente)
+        return templates[0] if templates else None
     
     @staticmethod
     def update(db: DatabaseManager, id: int, nome_template: str,
@@ -113,21 +102,104 @@ class TemplateCliente:
             WHERE tcs.template_cliente_id = ?
             ORDER BY ts.tipo, ts.nome_template
         """
-        rows = db.execute_query(query, (template_cliente_id,))
+        return db.execute_query_objects(query, (template_cliente_id,), TemplateServizio)
+    
+    @staticmethod
+    def instantiate(db: DatabaseManager, template_cliente_id: int, nomi_clienti: Sequence[str],
+                    cripta: Optional[Callable[[str], str]] = None,
+                    impronta: Optional[Callable[..., str]] = None) -> Dict[str, Optional[int]]:
+        """
+        Crea in un'unica transazione un cliente per ogni nome, con i servizi
+        e le credenziali del template, tramite INSERT ... SELECT
         
-        servizi = []
-        for row in rows:
-            servizio = TemplateServizio(
-                id=row['id'],
-                nome_template=row['nome_template'],
-                tipo=row['tipo'],
-                descrizione=row['descrizione'] or "",
-                link=row['link'] or "",
-                note_template=row['note_template'] or ""
-            )
-            servizi.append(servizio)
+        I servizi prendono il nome del template servizio; le credenziali
+        template con username vuoto vengono saltate. Le password template
+        sono criptate una sola volta (non per cliente).
+        
+        Args:
+            db: Gestore del database
+            template_cliente_id: ID del template cliente
+            nomi_clienti: Nomi dei clienti da creare (già validati, senza duplicati)
+            cripta: Funzione di crittografia delle password (None = in chiaro)
+            impronta: Funzione che calcola l'impronta dai campi in chiaro
+                (username, password, host, porta, note); None = nessuna impronta
+            
+        Returns:
+            Dizionario nome -> ID del cliente creato, None se il nome esisteva già
+        """
+        with db.transaction() as cursor:
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS _onboarding (nome TEXT PRIMARY KEY, cliente_id INTEGER)")
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS _onboarding_cred (template_servizio_id INTEGER, username TEXT, password TEXT, host TEXT, porta INTEGER, note TEXT, link TEXT, impronta TEXT)")
+            cursor.execute("DELETE FROM _onboarding")
+            cursor.execute("DELETE FROM _onboarding_cred")
+            try:
+                cursor.executemany("INSERT INTO _onboarding (nome) VALUES (?)",
+                                   ((nome,) for nome in nomi_clienti))
+                
+                # Nomi già presenti (senza distinzione maiuscole/minuscole): saltati
+                cursor.execute("""
+                    SELECT o.nome FROM _onboarding o
+                    JOIN clienti c ON c.nome = o.nome COLLATE NOCASE
+                """)
+                esistenti = [row[0] for row in cursor.fetchall()]
+                cursor.executemany("DELETE FROM _onboarding WHERE nome = ?", ((n,) for n in esistenti))
+                
+                cursor.execute("""
+                    INSERT INTO clienti (nome, descrizione, template_cliente_id)
+                    SELECT o.nome, tc.descrizione_cliente, tc.id
+                    FROM _onboarding o, template_cliente tc
+                    WHERE tc.id = ?
+                """, (template_cliente_id,))
+                cursor.execute("""
+                    UPDATE _onboarding SET cliente_id = c.id
+                    FROM clienti c WHERE c.nome = _onboarding.nome
+                """)
+                
+                cursor.execute("""
+                    INSERT INTO servizi (cliente_id, nome, tipo, descrizione, link, template_servizio_id)
+                    SELECT o.cliente_id, ts.nome_template, ts.tipo, ts.descrizione, ts.link, ts.id
+                    FROM _onboarding o
+                    CROSS JOIN template_cliente_servizi tcs
+                    JOIN template_servizi ts ON ts.id = tcs.template_servizio_id
+                    WHERE tcs.template_cliente_id = ?
+                """, (template_cliente_id,))
+                
+                # Credenziali template: dominio anteposto allo username come nel dialog
+                cursor.execute("""
+                    SELECT tcr.template_servizio_id,
+                           CASE WHEN COALESCE(tcr.dominio, '') != ''
+                                THEN tcr.dominio || '\\' || tcr.username
+                                ELSE tcr.username END,
+                           COALESCE(tcr.password, ''), COALESCE(tcr.host, ''), tcr.porta,
+                           COALESCE(tcr.note, ''), COALESCE(tcr.link, '')
+                    FROM template_credenziali tcr
+                    JOIN template_cliente_servizi tcs ON tcs.template_servizio_id = tcr.template_servizio_id
+                    WHERE tcs.template_cliente_id = ? AND COALESCE(tcr.username, '') != ''
+                """, (template_cliente_id,))
+                credenziali = [
+                    (r[0], r[1], cripta(r[2]) if cripta and r[2] else r[2]) + tuple(r[3:])
+                    + (impronta(r[1], r[2], r[3], r[4], r[5]) if impronta else None,)
+                    for r in cursor.fetchall()
+                ]
+                cursor.executemany("INSERT INTO _onboarding_cred VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                   credenziali)
+                
+                cursor.execute("""
+                    INSERT INTO credenziali (servizio_id, username, password, host, porta, note, link, impronta)
+                    SELECT s.id, oc.username, oc.password, oc.host, oc.porta, oc.note, oc.link, oc.impronta
+                    FROM _onboarding o
+                    JOIN servizi s ON s.cliente_id = o.cliente_id
+                    JOIN _onboarding_cred oc ON oc.template_servizio_id = s.template_servizio_id
+                """)
+                
+                cursor.execute("SELECT nome, cliente_id FROM _onboarding")
+                risultato = {row[0]: row[1] for row in cursor.fetchall()}
+            finally:
+                cursor.execute("DELETE FROM _onboarding")
+                cursor.execute("DELETE FROM _onboarding_cred")
         
-        return servizi
+        risultato.update((nome, None) for nome in esistenti)
+        return risultato
     
     def __str__(self):
         return f"TemplateCliente: {self.nome_template}"
@@ -4,11 +4,27 @@ Modello per le credenziali predefinite nei template servizio
 
 from typing import List, Optional
 from models.database import DatabaseManager
+from models.row_mapper import CONV_STR
 
 
 class TemplateCredenziale:
     """Rappresenta una credenziale predefinita per un template servizio"""
     
+    __slots__ = ('id', 'template_servizio_id', 'username', 'password', 'host',
+                 'porta', 'dominio', 'link', 'note')
+    
+    _CAMPI = (
+        ('id', None, None),
+        ('template_servizio_id', 0, None),
+        ('username', "", CONV_STR),
+        ('password', "", CONV_STR),
+        ('host', "", CONV_STR),
+        ('porta', None, None),
+        ('dominio', "", CONV_STR),
+        ('link', "", CONV_STR),
+        ('note', "", CONV_STR),
+    )
+    
     def __init__(self, id: Optional[int] = None, template_servizio_id: int = 0,
                  username: str = "", password: str = "", host: str = "",
                  porta: Optional[int] = None, dominio: str = "", link: str = "", note: str = ""):
@@ -39,57 +55,14 @@ class TemplateCredenziale:
     def get_by_template_servizio(db: DatabaseManager, template_servizio_id: int) -> List['TemplateCredenziale']:
         """Recupera tutte le credenziali di un template servizio"""
         query = "SELECT * FROM template_credenziali WHERE template_servizio_id = ?"
-        rows = db.execute_query(query, (template_servizio_id,))
-        
-        credenziali = []
-        for row in rows:
-            # Gestione retrocompatibilità per campo link
-            try:
-                link = row['link'] or ""
-            except (KeyError, IndexError):
-                link = ""
-            
-            cred = TemplateCredenziale(
-                id=row['id'],
-                template_servizio_id=row['template_servizio_id'],
-                username=row['username'] or "",
-                password=row['password'] or "",
-                host=row['host'] or "",
-                porta=row['porta'],
-                dominio=row['dominio'] or "",
-                link=link,
-                note=row['note'] or ""
-            )
-            credenziali.append(cred)
-        
-        return credenziali
+        return db.execute_query_objects(query, (template_servizio_id,), TemplateCredenziale)
     
     @staticmethod
     def get_by_id(db: DatabaseManager, id: int) -> Optional['TemplateCredenziale']:
         """Recupera una credenziale template per ID"""
         query = "SELECT * FROM template_credenziali WHERE id = ?"
-        rows = db.execute_query(query, (id,))
-        
-        if rows:
-            row = rows[0]
-            # Gestione retrocompatibilità per campo link
-            try:
-                link = row['link'] or ""
-            except (KeyError, IndexError):
-                link = ""
-            
-            return TemplateCredenziale(
-                id=row['id'],
-                template_servizio_id=row['template_servizio_id'],
-                username=row['username'] or "",
-                password=row['password'] or "",
-                host=row['host'] or "",
-                porta=row['porta'],
-                dominio=row['dominio'] or "",
-                link=link,
-                note=row['note'] or ""
-            )
-        return None
+        credenziali = db.execute_query_objects(query, (id,), TemplateCredenziale)
+        return credenziali[0] if credenziali else None
     
     @staticmethod
     def update(db: DatabaseManager, id: int, username: str = "", password: str = "",
@@ -2,13 +2,25 @@
 Modello Template Servizio
 """
 
-from typing import Optional, List
+from typing import Dict, Optional, List
 from models.database import DatabaseManager
+from models.row_mapper import CONV_STR
 
 
 class TemplateServizio:
     """Rappresenta un template per creare servizi rapidamente"""
     
+    __slots__ = ('id', 'nome_template', 'tipo', 'descrizione', 'link', 'note_template')
+    
+    _CAMPI = (
+        ('id', None, None),
+        ('nome_template', "", None),
+        ('tipo', "", None),
+        ('descrizione', "", CONV_STR),
+        ('link', "", CONV_STR),
+        ('note_template', "", CONV_STR),
+    )
+    
     def __init__(self, id: Optional[int] = None, nome_template: str = "",
                  tipo: str = "", descrizione: str = "", link: str = "",
                  note_template: str = ""):
@@ -33,59 +45,20 @@ class TemplateServizio:
     def get_all(db: DatabaseManager) -> List['TemplateServizio']:
         """Recupera tutti i template"""
         query = "SELECT * FROM template_servizi ORDER BY nome_template"
-        rows = db.execute_query(query)
-        
-        templates = []
-        for row in rows:
-            template = TemplateServizio(
-                id=row['id'],
-                nome_template=row['nome_template'],
-                tipo=row['tipo'],
-                descrizione=row['descrizione'],
-                link=row['link'] if 'link' in row.keys() else "",
-                note_template=row['note_template'] if 'note_template' in row.keys() else ""
-            )
-            templates.append(template)
-        
-        return templates
+        return db.execute_query_objects(query, (), TemplateServizio)
     
     @staticmethod
     def get_by_id(db: DatabaseManager, template_id: int) -> Optional['TemplateServizio']:
         """Recupera un template per ID"""
         query = "SELECT * FROM template_servizi WHERE id = ?"
-        rows = db.execute_query(query, (template_id,))
-        
-        if rows:
-            row = rows[0]
-            return TemplateServizio(
-                id=row['id'],
-                nome_template=row['nome_template'],
-                tipo=row['tipo'],
-                descrizione=row['descrizione'],
-                link=row['link'] if 'link' in row.keys() else "",
-                note_template=row['note_template'] if 'note_template' in row.keys() else ""
-            )
-        return None
+        templates = db.execute_query_objects(query, (template_id,), TemplateServizio)
+        return templates[0] if templates else None
     
     @staticmethod
     def get_by_tipo(db: DatabaseManager, tipo: str) -> List['TemplateServizio']:
         """Recupera template filtrati per tipo"""
         query = "SELECT * FROM template_servizi WHERE tipo = ? ORDER BY nome_template"
-        rows = db.execute_query(query, (tipo,))
-        
-        templates = []
-        for row in rows:
-            template = TemplateServizio(
-                id=row['id'],
-                nome_template=row['nome_template'],
-                tipo=row['tipo'],
-                descrizione=row['descrizione'],
-                link=row['link'] if 'link' in row.keys() else "",
-                note_template=row['note_template'] if 'note_template' in row.keys() else ""
-            )
-            templates.append(template)
-        
-        return templates
+        return db.execute_query_objects(query, (tipo,), TemplateServizio)
     
     @staticmethod
     def update(db: DatabaseManager, template_id: int, nome_template: str,
@@ -104,10 +77,96 @@ class TemplateServizio:
     
     @staticmethod
     def delete(db: DatabaseManager, template_id: int) -> bool:
-        """Elimina un template"""
-        query = "DELETE FROM template_servizi WHERE id = ?"
-        rowcount = db.execute_update(query, (template_id,))
-        return rowcount > 0
+        """Elimina un template (i servizi derivati perdono il collegamento)"""
+        with db.transaction() as cursor:
+            cursor.execute("UPDATE servizi SET template_servizio_id = NULL WHERE template_servizio_id = ?",
+                           (template_id,))
+            cursor.execute("DELETE FROM template_servizi WHERE id = ?", (template_id,))
+            return cursor.rowcount > 0
+    
+    # Campi del servizio allineati al template durante la propagazione
+    CAMPI_PROPAGATI = ('tipo', 'descrizione', 'link')
+    
+    # Servizi derivati che differiscono dal template (stessa condizione per anteprima e UPDATE)
+    _CONDIZIONE_DIFFERENZE = """
+        (servizi.tipo IS NOT ts.tipo
+         OR COALESCE(servizi.descrizione, '') != COALESCE(ts.descrizione, '')
+         OR COALESCE(servizi.link, '') != COALESCE(ts.link, ''))
+    """
+    
+    @staticmethod
+    def get_propagation_preview(db: DatabaseManager, template_id: int) -> List[Dict]:
+        """
+        Elenca i servizi derivati dal template che verrebbero modificati
+        
+        Returns:
+            Lista di dizionari con servizio_id, cliente, servizio e modifiche
+            (lista di tuple campo, valore attuale, nuovo valore)
+        """
+        query = f"""
+            SELECT servizi.id, c.nome, servizi.nome,
+                   servizi.tipo, servizi.descrizione, servizi.link,
+                   ts.tipo, ts.descrizione, ts.link
+            FROM servizi
+            JOIN template_servizi ts ON ts.id = servizi.template_servizio_id
+            JOIN clienti c ON c.id = servizi.cliente_id
+            WHERE ts.id = ? AND {TemplateServizio._CONDIZIONE_DIFFERENZE}
+            ORDER BY c.nome COLLATE NATURALE, servizi.nome
+        """
+        anteprima = []
+        for row in db.execute_query(query, (template_id,)):
+            attuali, nuovi = tuple(row)[3:6], tuple(row)[6:9]
+            modifiche = [(campo, attuale or "", nuovo or "")
+                         for campo, attuale, nuovo in zip(TemplateServizio.CAMPI_PROPAGATI, attuali, nuovi)
+                         if (attuale or "") != (nuovo or "")]
+            anteprima.append({'servizio_id': row[0], 'cliente': row[1],
+                              'servizio': row[2], 'modifiche': modifiche})
+        return anteprima
+    
+    @staticmethod
+    def propagate(db: DatabaseManager, template_id: int) -> int:
+        """
+        Allinea tipo, descrizione e link di tutti i servizi derivati dal
+        template con un unico UPDATE ... FROM
+        
+        Returns:
+            Numero di servizi aggiornati
+        """
+        query = f"""
+            UPDATE servizi
+            SET tipo = ts.tipo, descrizione = ts.descrizione, link = ts.link,
+                modificato_il = CURRENT_TIMESTAMP
+            FROM template_servizi ts
+            WHERE ts.id = servizi.template_servizio_id AND ts.id = ?
+              AND {TemplateServizio._CONDIZIONE_DIFFERENZE}
+        """
+        return db.execute_update(query, (template_id,))
+    
+    @staticmethod
+    def count_unlinked_same_name(db: DatabaseManager, template_id: int) -> int:
+        """Conta i servizi senza template che hanno lo stesso nome del template"""
+        query = """
+            SELECT COUNT(*) AS count FROM servizi
+            WHERE template_servizio_id IS NULL
+              AND nome = (SELECT nome_template FROM template_servizi WHERE id = ?) COLLATE NOCASE
+        """
+        return db.execute_query(query, (template_id,))[0]['count']
+    
+    @staticmethod
+    def link_same_name(db: DatabaseManager, template_id: int) -> int:
+        """
+        Collega al template i servizi esistenti (senza template) con lo stesso nome,
+        ad esempio quelli creati prima dell'introduzione del lineage
+        
+        Returns:
+            Numero di servizi collegati
+        """
+        query = """
+            UPDATE servizi SET template_servizio_id = ?
+            WHERE template_servizio_id IS NULL
+              AND nome = (SELECT nome_template FROM template_servizi WHERE id = ?) COLLATE NOCASE
+        """
+        return db.execute_update(query, (template_id, template_id))
     
     def __str__(self):
         return f"Template: {self.nome_template} ({self.tipo})"
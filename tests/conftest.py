@@ -0,0 +1,30 @@
+"""
+Configurazione comune dei test
+
+Esecuzione dalla cartella del progetto:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.cliente import Cliente
+from models.credenziale import Credenziale
+from models.database import DatabaseManager
+from models.servizio import Servizio
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Database con un cliente, un servizio e una credenziale"""
+    percorso = str(tmp_path / 'credenziali_suite.db')
+    db = DatabaseManager(percorso)
+    cliente_id = Cliente.create(db, "Rossi Srl", "Cliente di prova")
+    servizio_id = Servizio.create(db, cliente_id, "Gestionale", "Web", link="https://gestionale.local")
+    Credenziale.create(db, servizio_id, "admin", "segreta", host="10.0.0.5", porta=3389)
+    db.close()
+    return percorso
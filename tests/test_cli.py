@@ -0,0 +1,37 @@
+"""
+Test della riga di comando (cli.py) sui comandi di sola lettura
+"""
+
+import json
+import os
+
+import cli
+
+
+def _esegui(db_path, capsys, *argomenti):
+    """Esegue la CLI sul database di prova: (codice di uscita, stdout)"""
+    codice = cli.main(['--dir', os.path.dirname(db_path), '--db', os.path.basename(db_path),
+                       *argomenti])
+    return codice, capsys.readouterr().out
+
+
+def test_json_accettato_prima_e_dopo_il_sottocomando(db_path, capsys):
+    _, prima = _esegui(db_path, capsys, '--json', 'cerca', 'admin')
+    codice, dopo = _esegui(db_path, capsys, 'cerca', 'admin', '--json')
+    
+    assert codice == 0
+    assert json.loads(dopo) == json.loads(prima)
+    assert [r['username'] for r in json.loads(dopo)] == ["admin"]
+
+
+def test_url_indica_l_origine_della_corrispondenza(db_path, capsys):
+    _, per_host = _esegui(db_path, capsys, 'url', '10.0.0.5:3389', '--json')
+    _, per_servizio = _esegui(db_path, capsys, 'url', 'https://gestionale.local/login', '--json')
+    codice, tabella = _esegui(db_path, capsys, 'url', 'gestionale.local')
+    
+    assert [(r['corrispondenza'], r['origine']) for r in json.loads(per_host)] == [('host', 'credenziale')]
+    assert [(r['corrispondenza'], r['origine']) for r in json.loads(per_servizio)] == [('host', 'servizio')]
+    assert codice == 0
+    intestazione, riga = tabella.splitlines()
+    assert intestazione.split()[-2:] == ['CORRISPONDENZA', 'ORIGINE']
+    assert riga.split()[-2:] == ['host', 'servizio']
@@ -0,0 +1,178 @@
+"""
+Test dell'import con anteprima (utils.import_diff tramite
+utils.import_export): classificazione dry-run e applicazione
+"""
+
+import csv
+
+import pytest
+
+from models.credenziale import Credenziale
+from models.database import DatabaseManager
+from utils.crypto_manager import CryptoManager
+from utils.import_diff import CONFLITTI, IDENTICI, MODIFICATI, NUOVI
+from utils.import_export import ImportExportManager
+
+KDF_TEST = {'algoritmo': 'pbkdf2', 'iterazioni': 1000}
+
+COLONNE = ['Cliente', 'Cliente_Descrizione', 'Servizio', 'Servizio_Tipo', 'Servizio_Link',
+           'Username', 'Password', 'Host', 'Porta', 'Note', 'RDP_Configurata']
+
+
+def _vault(password: str = "master") -> CryptoManager:
+    crypto = CryptoManager()
+    crypto.crea_vault(password, KDF_TEST)
+    return crypto
+
+
+@pytest.fixture
+def ambiente(db_path):
+    """
+    Database di prova con una seconda credenziale cifrata (root su 10.0.0.6)
+    e gestore di import/export con il vault sbloccato
+    """
+    crypto = _vault()
+    db = DatabaseManager(db_path)
+    servizio_id = db.execute_query("SELECT id FROM servizi")[0]['id']
+    Credenziale.create(db, servizio_id, "root", crypto.cripta("vecchia"), host="10.0.0.6",
+                       impronta=crypto.calcola_impronta("root", "vecchia", "10.0.0.6"))
+    yield db, crypto, ImportExportManager(db, crypto)
+    db.close()
+
+
+def _scrivi_csv(percorso, righe):
+    with open(percorso, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=COLONNE)
+        writer.writeheader()
+        for riga in righe:
+            writer.writerow({colonna: riga.get(colonna, '') for colonna in COLONNE})
+    return str(percorso)
+
+
+def _riga(username, password, host, **altri):
+    riga = {'Cliente': "Rossi Srl", 'Cliente_Descrizione': "Cliente di prova",
+            'Servizio': "Gestionale", 'Servizio_Tipo': "Web",
+            'Servizio_Link': "https://gestionale.local",
+            'Username': username, 'Password': password, 'Host': host}
+    riga.update(altri)
+    return riga
+
+
+@pytest.fixture
+def file_import(tmp_path):
+    """Una credenziale per categoria più un cliente nuovo"""
+    estranea = _vault("altro").cripta_testo("di un altro vault")
+    return _scrivi_csv(tmp_path / 'import.csv', [
+        _riga("admin", "segreta", "10.0.0.5", Porta="3389"),
+        _riga("root", "nuova", "10.0.0.6"),
+        _riga("ospite", "benvenuto", "10.0.0.7"),
+        _riga("estraneo", estranea, "10.0.0.8"),
+        {'Cliente': "Bianchi SpA", 'Servizio': "CRM", 'Username': "commerciale",
+         'Password': "crm-pw"},
+    ])
+
+
+def _nomi(voci):
+    return sorted(voce.nome for voce in voci)
+
+
+def _password(db, crypto) -> dict:
+    return {r['username']: crypto.decripta(r['password'])
+            for r in db.execute_query("SELECT username, password FROM credenziali")}
+
+
+# ===== Anteprima =====
+
+def test_anteprima_classifica_senza_scrivere(ambiente, file_import):
+    db, _, manager = ambiente
+    versione = db.data_version()
+    
+    ok, messaggio, diff = manager.analizza_import(file_import)
+    
+    assert ok, messaggio
+    assert db.data_version() == versione
+    assert _nomi(diff.credenziali[IDENTICI]) == ["admin"]
+    assert _nomi(diff.credenziali[MODIFICATI]) == ["root"]
+    assert _nomi(diff.credenziali[NUOVI]) == ["commerciale", "ospite"]
+    assert _nomi(diff.credenziali[CONFLITTI]) == ["estraneo"]
+    assert "chiave che questo vault non ha" in diff.credenziali[CONFLITTI][0].motivo
+    assert diff.credenziali[MODIFICATI][0].modifiche() == [('password', "••••", "•••• (nuova)")]
+    assert _nomi(diff.clienti[IDENTICI]) == ["Rossi Srl"]
+    assert _nomi(diff.clienti[NUOVI]) == ["Bianchi SpA"]
+    assert _nomi(diff.servizi[NUOVI]) == ["CRM"]
+    assert diff.servizi[NUOVI][0].valori['tipo'] == 'Altro'
+
+
+def test_valori_discordanti_in_conflitto(ambiente, tmp_path):
+    _, _, manager = ambiente
+    percorso = _scrivi_csv(tmp_path / 'discordante.csv', [
+        _riga("admin", "segreta", "10.0.0.5", Porta="3389"),
+        _riga("admin", "segreta", "10.0.0.5", Porta="3389", Cliente_Descrizione="Altra"),
+    ])
+    
+    ok, _, diff = manager.analizza_import(percorso)
+    
+    assert ok
+    assert _nomi(diff.clienti[CONFLITTI]) == ["Rossi Srl"]
+    assert "descrizione" in diff.clienti[CONFLITTI][0].motivo
+
+
+def test_export_reimportato_identico(ambiente, tmp_path):
+    _, _, manager = ambiente
+    percorso = str(tmp_path / 'export.csv')
+    assert manager.export_to_csv(percorso)[0]
+    
+    ok, _, diff = manager.analizza_import(percorso)
+    
+    assert ok
+    assert not diff.ha_modifiche()
+    assert not diff.voci(CONFLITTI)
+    assert _nomi(diff.credenziali[IDENTICI]) == ["admin", "root"]
+
+
+# ===== Applicazione =====
+
+def test_applica_cifra_e_non_scrive_i_conflitti(ambiente, file_import):
+    db, crypto, manager = ambiente
+    _, _, diff = manager.analizza_import(file_import)
+    
+    ok, messaggio, stats = manager.applica_import(diff)
+    
+    assert ok, messaggio
+    assert (stats['clienti'], stats['servizi'], stats['credenziali']) == (1, 1, 2)
+    assert stats['aggiornati'] == 1
+    assert stats['conflitti'] == 1
+    password = _password(db, crypto)
+    assert password == {'admin': "segreta", 'root': "nuova", 'ospite': "benvenuto",
+                        'commerciale': "crm-pw"}
+    nuova = db.execute_query("SELECT password, impronta FROM credenziali WHERE username = 'ospite'")[0]
+    assert isinstance(nuova['password'], bytes)
+    assert nuova['impronta'] == crypto.calcola_impronta("ospite", "benvenuto", "10.0.0.7")
+    
+    # Lo stesso file riapplicato non cambia più nulla
+    _, _, diff = manager.analizza_import(file_import)
+    assert not diff.ha_modifiche()
+
+
+def test_applica_rifiuta_un_diff_superato(ambiente, file_import):
+    db, crypto, manager = ambiente
+    _, _, diff = manager.analizza_import(file_import)
+    servizio_id = db.execute_query("SELECT id FROM servizi")[0]['id']
+    Credenziale.create(db, servizio_id, "intruso", crypto.cripta("x"))
+    
+    ok, messaggio, _ = manager.applica_import(diff)
+    
+    assert not ok
+    assert "ripeti l'analisi" in messaggio
+    assert "ospite" not in _password(db, crypto)
+
+
+def test_applica_una_sola_volta(ambiente, file_import):
+    _, _, manager = ambiente
+    _, _, diff = manager.analizza_import(file_import)
+    assert manager.applica_import(diff)[0]
+    
+    ok, messaggio, _ = manager.applica_import(diff)
+    
+    assert not ok
+    assert "già stato applicato" in messaggio
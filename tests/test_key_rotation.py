@@ -0,0 +1,198 @@
+"""
+Test della rotazione della DEK e della conversione di formato
+(utils.key_rotation) e dei valori non decifrabili (utils.crypto_manager)
+"""
+
+import pytest
+
+from models.credenziale import Credenziale
+from models.database import DatabaseManager
+from utils.crypto_manager import CryptoManager
+from utils.key_rotation import KeyRotationManager
+
+# KDF veloce: i test non misurano la resistenza della master password
+KDF_TEST = {'algoritmo': 'pbkdf2', 'iterazioni': 1000}
+
+
+def _vault(password: str = "master") -> CryptoManager:
+    crypto = CryptoManager()
+    crypto.crea_vault(password, KDF_TEST)
+    return crypto
+
+
+def _ricarica(password: str = "master") -> CryptoManager:
+    """Nuova istanza dalla configurazione salvata (simula un riavvio)"""
+    crypto = CryptoManager()
+    assert crypto.carica_config()
+    assert crypto.sblocca(password)
+    return crypto
+
+
+@pytest.fixture
+def ambiente(db_path, tmp_path, monkeypatch):
+    """
+    Vault salvato nella cartella di lavoro (esegui salva la configurazione
+    nel percorso predefinito) e database con cinque credenziali cifrate
+    oltre a quella in chiaro del db di prova
+    """
+    monkeypatch.chdir(tmp_path)
+    crypto = _vault()
+    crypto.salva_config()
+    db = DatabaseManager(db_path)
+    servizio_id = db.execute_query("SELECT id FROM servizi")[0]['id']
+    for i in range(5):
+        Credenziale.create(db, servizio_id, f"utente{i}", crypto.cripta(f"password{i}"),
+                           host=f"10.0.0.{10 + i}")
+    yield db, crypto
+    db.close()
+
+
+def _password(db, crypto) -> dict:
+    """Password in chiaro per username"""
+    return {r['username']: crypto.decripta(r['password'])
+            for r in db.execute_query("SELECT username, password FROM credenziali")}
+
+
+PASSWORD_ATTESE = {'admin': "segreta", **{f"utente{i}": f"password{i}" for i in range(5)}}
+
+
+# ===== Rotazione =====
+
+def test_rotazione_ricifra_tutte_le_password(ambiente):
+    db, crypto = ambiente
+    vecchia = _vault()
+    vecchia.importa_chiavi(crypto.esporta_chiavi())
+    crypto.avvia_rotazione("master")
+    
+    stats = KeyRotationManager(db, crypto, workers=2).esegui()
+    
+    assert stats['completata']
+    assert stats['segreti'] == 6
+    assert stats['ruotati'] == 5
+    assert stats['cifrati'] == 1  # La password in chiaro del db di prova
+    assert not crypto.rotazione_in_corso()
+    assert db.execute_query("SELECT COUNT(*) AS n FROM rotazione_chiave")[0]['n'] == 0
+    assert _password(db, crypto) == PASSWORD_ATTESE
+    # La DEK precedente non decifra più nulla
+    blob = db.execute_query("SELECT password FROM credenziali WHERE username = 'utente0'")[0]['password']
+    assert vecchia.prova_decripta(blob) is None
+
+
+def test_rotazione_con_blob_di_altro_vault(ambiente):
+    db, crypto = ambiente
+    estraneo = _vault("altro").cripta("di un altro vault")
+    servizio_id = db.execute_query("SELECT id FROM servizi")[0]['id']
+    cid = Credenziale.create(db, servizio_id, "estraneo", estraneo, host="10.0.0.99")
+    crypto.avvia_rotazione("master")
+    
+    stats = KeyRotationManager(db, crypto, workers=2).esegui()
+    
+    assert stats['completata']
+    assert stats['invariati'] == 1
+    riga = db.execute_query("SELECT password, impronta FROM credenziali WHERE id = ?", (cid,))[0]
+    assert bytes(riga['password']) == estraneo
+    assert riga['impronta'] == crypto.calcola_impronta("estraneo", CryptoManager.a_testo(estraneo),
+                                                       "10.0.0.99")
+
+
+def test_rotazione_interrotta_riprende_dal_checkpoint(ambiente, monkeypatch):
+    db, crypto = ambiente
+    monkeypatch.setattr(KeyRotationManager, 'DIMENSIONE_BLOCCO', 2)
+    nuovo_recovery = crypto.avvia_rotazione("master")
+    crypto.salva_config()
+    blocchi = []
+    
+    stats = KeyRotationManager(db, crypto, workers=2).esegui(
+        avanzamento=lambda tabella, fatti, totale: blocchi.append(fatti),
+        interrompi=lambda: len(blocchi) >= 1)
+    
+    assert not stats['completata']
+    assert stats['segreti'] == 2
+    checkpoint = db.execute_query("SELECT tabella, rotazione_id, ultimo_id FROM rotazione_chiave")
+    ids = [r['id'] for r in db.execute_query("SELECT id FROM credenziali ORDER BY id")]
+    assert [tuple(r) for r in checkpoint] == [('credenziali', crypto.id_rotazione(), ids[1])]
+    
+    # Riavvio: la rotazione in corso è nella configurazione salvata
+    ripreso = _ricarica()
+    assert ripreso.rotazione_in_corso()
+    assert _password(db, ripreso) == PASSWORD_ATTESE  # Righe vecchie e nuove leggibili
+    stats = KeyRotationManager(db, ripreso, workers=2).esegui()
+    
+    assert stats['completata']
+    assert stats['segreti'] == 4
+    assert _password(db, _ricarica()) == PASSWORD_ATTESE
+    recupero = CryptoManager()
+    assert recupero.carica_config()
+    assert recupero.sblocca_con_recovery(nuovo_recovery)
+    assert _password(db, recupero) == PASSWORD_ATTESE
+
+
+def test_cambia_password_e_recovery_dopo_la_rotazione(ambiente):
+    db, crypto = ambiente
+    nuovo_recovery = crypto.avvia_rotazione("master")
+    KeyRotationManager(db, crypto, workers=2).esegui()
+    
+    crypto.cambia_password("nuova master")
+    crypto.salva_config()
+    
+    riavvio = CryptoManager()
+    assert riavvio.carica_config()
+    assert not riavvio.sblocca("master")
+    assert riavvio.sblocca("nuova master")
+    assert _password(db, riavvio) == PASSWORD_ATTESE
+    
+    recupero = CryptoManager()
+    assert recupero.carica_config()
+    assert recupero.sblocca_con_recovery(nuovo_recovery)
+    assert _password(db, recupero) == PASSWORD_ATTESE
+
+
+def test_rotazione_senza_avvio_rifiutata(ambiente):
+    db, crypto = ambiente
+    with pytest.raises(ValueError):
+        KeyRotationManager(db, crypto).esegui()
+
+
+# ===== Conversione di formato =====
+
+def test_converti_formato_salta_i_valori_non_decifrabili(ambiente):
+    db, crypto = ambiente
+    servizio_id = db.execute_query("SELECT id FROM servizi")[0]['id']
+    Credenziale.create(db, servizio_id, "estraneo", _vault("altro").cripta_testo("x"))
+    rotazione = KeyRotationManager(db, crypto, workers=2)
+    assert rotazione.conta_da_convertire() == 2  # In chiaro ed estranea
+    
+    stats = rotazione.converti_formato()
+    
+    assert stats['cifrati'] == 1
+    assert stats['invariati'] == 1
+    assert rotazione.conta_da_convertire() == 0
+    admin = db.execute_query("SELECT password FROM credenziali WHERE username = 'admin'")[0]
+    assert isinstance(admin['password'], bytes)
+    assert crypto.decripta(admin['password']) == "segreta"
+
+
+# ===== Valori non decifrabili =====
+
+def test_decripta_non_restituisce_mai_il_testo_cifrato():
+    crypto = _vault()
+    estraneo = _vault("altro").cripta("segreto")
+    
+    assert crypto.prova_decripta(estraneo) is None
+    with pytest.raises(ValueError):
+        crypto.decripta(estraneo)
+    with pytest.raises(ValueError):
+        crypto.decripta(CryptoManager.a_testo(estraneo))
+    # Password legacy in chiaro: restituite invariate
+    assert crypto.decripta("in chiaro") == "in chiaro"
+    assert crypto.decripta(crypto.cripta_testo("ok")) == "ok"
+
+
+def test_testo_impronta():
+    crypto = _vault()
+    estraneo = _vault("altro").cripta("segreto")
+    
+    assert crypto.testo_impronta(crypto.cripta("chiaro")) == "chiaro"
+    assert crypto.testo_impronta(estraneo) == CryptoManager.a_testo(estraneo)
+    assert crypto.testo_impronta("in chiaro") == "in chiaro"
+    assert crypto.testo_impronta(None) == ""
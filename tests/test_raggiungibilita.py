@@ -0,0 +1,156 @@
+"""
+Test della verifica di raggiungibilità (utils.reachability_probe e
+controllers.raggiungibilita_controller) su porte locali
+"""
+
+import os
+import socket
+import time
+
+import pytest
+
+from controllers.prefetch_controller import PrefetchController
+from controllers.raggiungibilita_controller import RaggiungibilitaController
+from models.database import DatabaseManager
+from utils.reachability_probe import ReachabilityProbe
+
+
+@pytest.fixture
+def porta_in_ascolto():
+    """Porta locale che accetta connessioni"""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(8)
+    yield server.getsockname()[1]
+    server.close()
+
+
+@pytest.fixture
+def porta_chiusa():
+    """Porta locale senza processi in ascolto (connessione rifiutata)"""
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(('127.0.0.1', 0))
+    porta = s.getsockname()[1]
+    s.close()
+    return porta
+
+
+@pytest.fixture
+def porta_bloccata():
+    """
+    Porta locale che non completa l'handshake: coda di accept piena e
+    nessun accept, quindi i nuovi SYN vengono ignorati
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(0)
+    porta = server.getsockname()[1]
+    occupanti = []
+    for _ in range(4):
+        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        client.setblocking(False)
+        client.connect_ex(('127.0.0.1', porta))
+        occupanti.append(client)
+    time.sleep(0.1)
+    yield porta
+    for client in occupanti:
+        client.close()
+    server.close()
+
+
+def _attendi(condizione, secondi: float = 5.0):
+    limite = time.monotonic() + secondi
+    while not condizione():
+        if time.monotonic() > limite:
+            raise AssertionError("Condizione non raggiunta in tempo")
+        time.sleep(0.02)
+
+
+# ===== ReachabilityProbe =====
+
+def test_porta_in_ascolto_raggiungibile(porta_in_ascolto):
+    esiti = ReachabilityProbe(timeout=2).verifica([('127.0.0.1', porta_in_ascolto)])
+    esito = esiti[('127.0.0.1', porta_in_ascolto)]
+    assert esito['raggiungibile'] is True
+    assert esito['errore'] is None
+    assert esito['indirizzo'] == '127.0.0.1'
+    assert esito['latenza_ms'] is not None
+
+
+def test_porta_chiusa_rifiutata(porta_chiusa):
+    esito = ReachabilityProbe(timeout=2).verifica([('127.0.0.1', porta_chiusa)])[('127.0.0.1', porta_chiusa)]
+    assert esito['raggiungibile'] is False
+    assert esito['errore'] == "Connessione rifiutata"
+    assert esito['latenza_ms'] is None
+
+
+def test_timeout_non_rallenta_le_altre(porta_bloccata, porta_in_ascolto, porta_chiusa):
+    prober = ReachabilityProbe(timeout=0.5)
+    destinazioni = [('127.0.0.1', porta_bloccata), ('127.0.0.1', porta_in_ascolto),
+                    ('127.0.0.1', porta_chiusa)]
+    arrivati = []
+    inizio = time.perf_counter()
+    esiti = prober.verifica(destinazioni, arrivati.append)
+    durata = time.perf_counter() - inizio
+    
+    assert esiti[destinazioni[0]]['errore'] == "Timeout dopo 0.5 s"
+    assert esiti[destinazioni[1]]['raggiungibile'] is True
+    assert esiti[destinazioni[2]]['errore'] == "Connessione rifiutata"
+    assert durata < 2
+    # La destinazione bloccata arriva per ultima: le altre non la aspettano
+    assert arrivati[-1]['porta'] == porta_bloccata
+
+
+def test_duplicati_verificati_una_volta(porta_in_ascolto):
+    arrivati = []
+    ReachabilityProbe(timeout=2).verifica([('127.0.0.1', porta_in_ascolto)] * 3, arrivati.append)
+    assert len(arrivati) == 1
+
+
+# ===== RaggiungibilitaController =====
+
+def test_destinazione():
+    destinazione = RaggiungibilitaController.destinazione
+    assert destinazione("10.0.0.5", 22, "") == ('10.0.0.5', 22)
+    assert destinazione("10.0.0.5", None, "") == ('10.0.0.5', 3389)
+    assert destinazione("10.0.0.5", 22, "http://crm.acme.it/login") == ('crm.acme.it', 80)
+    assert destinazione("", None, "https://crm.acme.it:8443") == ('crm.acme.it', 8443)
+    assert destinazione("", None, "") is None
+
+
+def test_esiti_salvati_e_riusati(db_path, porta_in_ascolto):
+    db = DatabaseManager(db_path)
+    controller = RaggiungibilitaController(db, prober=ReachabilityProbe(timeout=2))
+    destinazione = ('127.0.0.1', porta_in_ascolto)
+    try:
+        assert controller.stato([destinazione]) == {}
+        controller.verifica([destinazione])
+        assert controller.stato([destinazione])[destinazione]['raggiungibile'] is True
+        assert os.path.exists(RaggiungibilitaController.percorso_esiti(db_path))
+    finally:
+        controller.ferma()
+        db.close()
+
+
+def test_worker_non_invalida_la_cache_di_prefetch(db_path, porta_in_ascolto, porta_chiusa):
+    db = DatabaseManager(db_path)
+    prefetch = PrefetchController(db)
+    controller = RaggiungibilitaController(db, prober=ReachabilityProbe(timeout=2))
+    try:
+        servizio_id = db.execute_query("SELECT id FROM servizi")[0]['id']
+        prefetch.richiedi([1])
+        _attendi(lambda: prefetch.ottieni_servizio(servizio_id) is not None)
+        versione = db.data_version()
+        
+        destinazioni = [('127.0.0.1', porta_in_ascolto), ('127.0.0.1', porta_chiusa)]
+        assert controller.avvia(destinazioni) == {}
+        _attendi(lambda: not controller.in_corso())
+        assert {(e['host'], e['porta']) for e in controller.raccogli()} == set(destinazioni)
+        assert set(controller.stato(destinazioni)) == set(destinazioni)
+        
+        assert db.data_version() == versione
+        assert prefetch.ottieni_servizio(servizio_id) is not None
+    finally:
+        controller.ferma()
+        prefetch.ferma()
+        db.close()
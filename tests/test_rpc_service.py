@@ -0,0 +1,111 @@
+"""
+Test del servizio JSON-RPC locale (utils.rpc_service)
+"""
+
+import http.client
+import json
+import sqlite3
+
+import pytest
+
+from utils.rpc_service import ClientRPC, ServizioRPC
+
+
+@pytest.fixture
+def servizio(db_path):
+    """Servizio in ascolto su una porta libera, fermato a fine test"""
+    servizio = ServizioRPC(db_path, porta=0, percorso_token=None, workers=2)
+    servizio.avvia_in_thread()
+    yield servizio
+    servizio.ferma()
+
+
+@pytest.fixture
+def client(servizio):
+    client = ClientRPC(servizio.url, servizio.token)
+    yield client
+    client.chiudi()
+
+
+def _post(servizio, corpo: bytes, token=None):
+    """Richiesta HTTP grezza: (stato, corpo)"""
+    conn = http.client.HTTPConnection(servizio.host, servizio.porta, timeout=5)
+    try:
+        intestazioni = {'Content-Type': 'application/json'}
+        if token is not None:
+            intestazioni['Authorization'] = f"Bearer {token}"
+        conn.request('POST', '/', corpo, intestazioni)
+        risposta = conn.getresponse()
+        return risposta.status, risposta.read()
+    finally:
+        conn.close()
+
+
+# ===== Autenticazione =====
+
+def test_token_mancante_rifiutato(servizio):
+    stato, corpo = _post(servizio, b'{"jsonrpc":"2.0","id":1,"method":"stato"}')
+    assert stato == 401
+    assert corpo == b''
+
+
+def test_token_errato_rifiutato(servizio):
+    stato, _ = _post(servizio, b'{"jsonrpc":"2.0","id":1,"method":"stato"}', "non-valido")
+    assert stato == 401
+    with pytest.raises(ConnectionError):
+        ClientRPC(servizio.url, "non-valido").chiama('clienti.elenco')
+
+
+def test_token_valido_accettato(servizio, client):
+    stato, corpo = _post(servizio, b'{"jsonrpc":"2.0","id":1,"method":"pm.elenco"}', servizio.token)
+    assert stato == 200
+    assert json.loads(corpo) == {'jsonrpc': '2.0', 'id': 1, 'result': []}
+    assert [c['nome'] for c in client.chiama('clienti.elenco')] == ["Rossi Srl"]
+
+
+# ===== Sola lettura =====
+
+def test_nessun_metodo_di_scrittura(client):
+    metodi = client.chiama('stato')['metodi']
+    assert all(m.split('.')[-1] in ('elenco', 'dettaglio', 'password', 'per_url', 'per_rete')
+               or m in ('stato', 'cerca') for m in metodi)
+    with pytest.raises(ValueError, match="Metodo non supportato"):
+        client.chiama('clienti.elimina', id=1)
+
+
+def test_connessioni_di_lettura_rifiutano_le_scritture(servizio, client):
+    client.chiama('stato')  # contesto del servizio inizializzato
+    contesto = servizio._contesto()
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        contesto.db.execute_update("UPDATE clienti SET nome = 'x'")
+
+
+def test_password_mai_restituite(client):
+    servizio_id = client.chiama('servizi.elenco', cliente_id=1)[0]['id']
+    credenziale = client.chiama('credenziali.elenco', servizio_id)[0]
+    assert 'password' not in credenziale
+    assert 'password' not in client.chiama('credenziali.dettaglio', id=credenziale['id'])
+    with pytest.raises(ValueError, match="senza chiavi"):
+        client.chiama('credenziali.password', id=credenziale['id'])
+
+
+# ===== Cache =====
+
+def test_cache_riusata_senza_modifiche(client):
+    primo = client.chiama('clienti.dettaglio', 1)
+    assert client.chiama('clienti.dettaglio', 1) == primo
+    assert client.chiama('stato')['cache']['da_cache'] == 1
+
+
+def test_cache_invalidata_da_scrittura_esterna(db_path, client):
+    assert client.chiama('clienti.dettaglio', 1)['descrizione'] == "Cliente di prova"
+    versione = client.chiama('stato')['versione_dati']
+    
+    esterna = sqlite3.connect(db_path)
+    esterna.execute("UPDATE clienti SET descrizione = 'Aggiornata' WHERE id = 1")
+    esterna.commit()
+    esterna.close()
+    
+    assert client.chiama('stato')['versione_dati'] != versione
+    assert client.chiama('clienti.dettaglio', 1)['descrizione'] == "Aggiornata"
+    assert client.chiama('stato')['cache']['da_cache'] == 0
@@ -0,0 +1,100 @@
+"""
+Micro-benchmark: factory legacy (sqlite3.Row + row.keys()) vs row mapper compilati
+
+Uso: python tools/bench_row_mapper.py [numero_credenziali]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import DatabaseManager
+from models.credenziale import Credenziale
+
+
+class CredenzialeLegacy:
+    """Credenziale con __dict__ per istanza, come prima dei row mapper"""
+
+    def __init__(self, id=None, servizio_id=0, username="", password="", host="",
+                 porta=None, note="", rdp_configurata=False, link=""):
+        self.id = id
+        self.servizio_id = servizio_id
+        self.username = username
+        self.password = password
+        self.host = host
+        self.porta = porta
+        self.note = note
+        self.rdp_configurata = rdp_configurata
+        self.link = link
+
+
+def carica_legacy(db: DatabaseManager, servizio_id: int) -> list:
+    """Replica la vecchia Credenziale.get_by_servizio campo per campo"""
+    rows = db.execute_query(
+        "SELECT * FROM credenziali WHERE servizio_id = ? ORDER BY username", (servizio_id,)
+    )
+    credenziali = []
+    for row in rows:
+        try:
+            rdp_conf = bool(row['rdp_configurata'])
+        except (KeyError, IndexError):
+            rdp_conf = False
+        try:
+            link_val = row['link'] or ""
+        except (KeyError, IndexError):
+            link_val = ""
+        credenziali.append(CredenzialeLegacy(
+            id=row['id'], servizio_id=row['servizio_id'], username=row['username'],
+            password=row['password'], host=row['host'], porta=row['porta'],
+            note=row['note'], rdp_configurata=rdp_conf, link=link_val
+        ))
+    return credenziali
+
+
+def misura(nome: str, funzione, ripetizioni: int = 3):
+    """Esegue la funzione e stampa tempo migliore e picco di memoria allocata"""
+    tempi = []
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        risultato = funzione()
+        tempi.append(time.perf_counter() - inizio)
+        del risultato
+
+    tracemalloc.start()
+    risultato = funzione()
+    _, memoria = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{nome:<12} {min(tempi) * 1000:9.1f} ms   {memoria / (1024 * 1024):8.1f} MB   "
+          f"({len(risultato)} oggetti)")
+    return min(tempi), memoria
+
+
+def main():
+    numero = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    db = DatabaseManager(":memory:")
+    conn = db.connect()
+    conn.execute("INSERT INTO clienti (nome) VALUES ('Bench')")
+    conn.execute("INSERT INTO servizi (cliente_id, nome, tipo) VALUES (1, 'Bench', 'RDP')")
+    conn.executemany(
+        "INSERT INTO credenziali (servizio_id, username, password, host, porta, note, link) "
+        "VALUES (1, ?, ?, ?, 3389, ?, ?)",
+        ((f"utente{i:06d}", "gAAAAA" + "x" * 90, f"10.0.{i // 256 % 256}.{i % 256}",
+          "nota", "") for i in range(numero))
+    )
+    conn.commit()
+
+    print(f"Caricamento di {numero} credenziali\n")
+    t_old, m_old = misura("legacy", lambda: carica_legacy(db, 1))
+    t_new, m_new = misura("row mapper", lambda: Credenziale.get_by_servizio(db, 1))
+    print(f"\nTempo: {t_new / t_old:.0%} del legacy   Memoria: {m_new / m_old:.0%} del legacy")
+
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
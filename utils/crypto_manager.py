@@ -4,26 +4,91 @@ Gestore crittografia per proteggere le password
 
 import base64
 import hashlib
-from cryptography.fernet import Fernet
+import hmac
+import json
+import math
+import time
+from typing import Dict, Optional, Tuple
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 import os
 
 
 class CryptoManager:
-    """Gestisce la crittografia delle password"""
+    """
+    Gestisce la crittografia delle password
+    
+    Cifratura a busta: le credenziali sono cifrate con una chiave dati (DEK)
+    casuale, salvata in security_config.json cifrata ("avvolta") con una
+    chiave derivata dalla master password (KEK) e, separatamente, con una
+    derivata dal codice di recupero. Cambiare password o recuperare
+    l'accesso riavvolge solo i 32 byte della DEK: i dati non vengono
+    ricifrati.
+    
+    Durante una rotazione della chiave (vedi utils.key_rotation) sono attive
+    due DEK: si cifra con la nuova e si decifra con entrambe.
+    
+    Le password sono salvate come BLOB AES-256-GCM:
+    versione (1 byte) | id chiave (4 byte) | nonce (12 byte) | testo cifrato + tag.
+    Intestazione autenticata come dato associato; l'id chiave indica quale
+    DEK ha cifrato il valore. I valori legacy (token Fernet in base64)
+    restano leggibili finché non vengono convertiti in blocco.
+    """
+    
+    # File di configurazione della sicurezza
+    CONFIG_FILE = 'security_config.json'
+    
+    # Versione del formato con la DEK avvolta (le precedenti derivano la
+    # chiave direttamente dalla password)
+    VERSIONE_CONFIG = 2
+    
+    # Formato binario dei segreti
+    VERSIONE_BLOB = 1
+    LUNGHEZZA_INTESTAZIONE = 5
+    LUNGHEZZA_NONCE = 12
+    
+    # Prefisso della forma testuale dei BLOB (export/import e colonne di testo)
+    PREFISSO_TESTO = "ac1:"
+    
+    # Parametri KDF dei vault creati prima della calibrazione (e delle
+    # configurazioni che non li salvano)
+    KDF_PREDEFINITO = {'algoritmo': 'pbkdf2', 'iterazioni': 100000}
+    ALGORITMI_KDF = ('pbkdf2', 'scrypt')
+    # Tempo di sblocco cercato dalla calibrazione
+    DURATA_SBLOCCO_MS = 500
+    # Limiti della calibrazione: mai più deboli dei parametri storici,
+    # scrypt al massimo 256 MiB di memoria (oltre si aumenta il parallelismo)
+    ITERAZIONI_MINIME = 100000
+    SCRYPT_N_MINIMO = 2 ** 14
+    SCRYPT_N_MASSIMO = 2 ** 18
+    SCRYPT_R = 8
     
     def __init__(self):
         self.cipher = None
-        self.master_password_hash = None
+        # Chiave HMAC per le impronte delle credenziali (derivata dalla chiave del vault)
+        self.chiave_impronta = None
+        # Configurazione corrente (salt e DEK avvolte), da salvare dopo le modifiche
+        self.config = {}
+        self._dek = None
+        self._dek_nuova = None  # DEK di destinazione di una rotazione in corso
+        self._aead = {}  # id chiave -> AESGCM
+        self._intestazione = None  # intestazione dei nuovi BLOB (DEK con cui si cifra)
+        # Parametri KDF con cui avvolgere la DEK (password e codice di recupero)
+        self.parametri_kdf = dict(self.KDF_PREDEFINITO)
     
-    def genera_chiave_da_password(self, password: str, salt: bytes = None) -> tuple:
+    def genera_chiave_da_password(self, password: str, salt: bytes = None,
+                                  kdf: Optional[Dict] = None) -> tuple:
         """
         Genera una chiave di crittografia da una password
         
         Args:
             password: Password master
             salt: Sale per KDF (se None, ne genera uno nuovo)
+            kdf: Parametri KDF (default: KDF_PREDEFINITO)
             
         Returns:
             Tupla (chiave, salt)
@@ -31,33 +96,350 @@ class CryptoManager:
         if salt is None:
             salt = os.urandom(16)
         
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
+        key = base64.urlsafe_b64encode(self._deriva(password, salt, kdf or self.KDF_PREDEFINITO))
         return key, salt
     
-    def inizializza_con_password(self, password: str, salt: bytes = None) -> bytes:
+    @staticmethod
+    def _deriva(segreto: str, salt: bytes, kdf: Dict) -> bytes:
+        """Deriva 32 byte dal segreto con i parametri KDF indicati"""
+        if kdf['algoritmo'] == 'scrypt':
+            funzione = Scrypt(salt=salt, length=32, n=kdf['n'], r=kdf['r'], p=kdf['p'])
+        elif kdf['algoritmo'] == 'pbkdf2':
+            funzione = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt,
+                                  iterations=kdf['iterazioni'])
+        else:
+            raise ValueError(f"Algoritmo KDF non supportato: {kdf['algoritmo']}")
+        return funzione.derive(segreto.encode())
+    
+    @classmethod
+    def calibra_kdf(cls, algoritmo: str = 'pbkdf2',
+                    obiettivo_ms: int = DURATA_SBLOCCO_MS) -> Dict:
         """
-        Inizializza il sistema di crittografia con una password master
+        Sceglie i parametri KDF perché una derivazione duri circa
+        obiettivo_ms su questa macchina
+        
+        Misura una derivazione di prova e scala il costo in proporzione
+        (scrypt: n a potenze di due, poi il parallelismo p oltre il limite
+        di memoria). Il risultato non scende mai sotto i minimi della classe.
         
         Args:
-            password: Password master
-            salt: Sale (opzionale, per caricare configurazione esistente)
+            algoritmo: 'pbkdf2' o 'scrypt'
+            obiettivo_ms: Durata cercata di una derivazione (millisecondi)
+            
+        Returns:
+            Parametri KDF da salvare nella configurazione
+            
+        Raises:
+            ValueError: Se l'algoritmo non è supportato
+        """
+        if algoritmo not in cls.ALGORITMI_KDF:
+            raise ValueError(f"Algoritmo KDF non supportato: {algoritmo}")
+        
+        def misura(kdf: Dict) -> float:
+            inizio = time.perf_counter()
+            cls._deriva("calibrazione", os.urandom(16), kdf)
+            return max(time.perf_counter() - inizio, 1e-4) * 1000
+        
+        if algoritmo == 'pbkdf2':
+            prova = {'algoritmo': 'pbkdf2', 'iterazioni': cls.ITERAZIONI_MINIME // 2}
+            scala = obiettivo_ms / misura(prova)
+            iterazioni = int(prova['iterazioni'] * scala) // 1000 * 1000
+            kdf = {'algoritmo': 'pbkdf2', 'iterazioni': max(cls.ITERAZIONI_MINIME, iterazioni)}
+        else:
+            prova = {'algoritmo': 'scrypt', 'n': cls.SCRYPT_N_MINIMO, 'r': cls.SCRYPT_R, 'p': 1}
+            scala = obiettivo_ms / misura(prova)
+            n = cls.SCRYPT_N_MINIMO
+            while n * 2 <= min(cls.SCRYPT_N_MASSIMO, cls.SCRYPT_N_MINIMO * scala):
+                n *= 2
+            p = max(1, math.floor(scala * cls.SCRYPT_N_MINIMO / n))
+            kdf = {'algoritmo': 'scrypt', 'n': n, 'r': cls.SCRYPT_R, 'p': p}
+        kdf['obiettivo_ms'] = obiettivo_ms
+        return kdf
+    
+    def durata_stimata_ms(self) -> int:
+        """Durata prevista di uno sblocco con la password (per le barre di avanzamento)"""
+        return self.config.get('kdf', {}).get('obiettivo_ms', 0)
+    
+    # ===== Configurazione =====
+    
+    @staticmethod
+    def config_esistente(percorso: str = CONFIG_FILE) -> bool:
+        """Indica se il vault è già stato configurato"""
+        return os.path.exists(percorso)
+    
+    def carica_config(self, percorso: str = CONFIG_FILE) -> bool:
+        """
+        Carica la configurazione di sicurezza
+        
+        Args:
+            percorso: File di configurazione
+            
+        Returns:
+            True se la configurazione è valida
+        """
+        try:
+            with open(percorso, 'r') as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if 'salt' not in config or not ('dek_password' in config or 'password_hash' in config):
+            return False
+        self.config = config
+        self.parametri_kdf = dict(config.get('kdf', self.KDF_PREDEFINITO))
+        return True
+    
+    def salva_config(self, percorso: str = CONFIG_FILE):
+        """
+        Salva la configurazione corrente (scrittura atomica)
+        
+        Args:
+            percorso: File di configurazione
+        """
+        temporaneo = percorso + '.tmp'
+        with open(temporaneo, 'w') as f:
+            json.dump(self.config, f)
+        os.replace(temporaneo, percorso)
+    
+    def is_legacy(self) -> bool:
+        """Indica se la configurazione caricata è nel formato senza DEK avvolta"""
+        return bool(self.config) and 'dek_password' not in self.config
+    
+    # ===== Chiave dati (DEK) =====
+    
+    def _avvolgi(self, segreto: str, dek: bytes = None) -> Tuple[str, str, Dict]:
+        """
+        Cifra una DEK (default quella attiva) con una chiave derivata dal
+        segreto (salt nuovo, parametri_kdf correnti)
+        
+        Returns:
+            Tupla (salt esadecimale, DEK avvolta, parametri KDF usati)
+        """
+        kdf = dict(self.parametri_kdf)
+        kek, salt = self.genera_chiave_da_password(segreto, kdf=kdf)
+        return salt.hex(), Fernet(kek).encrypt(dek or self._dek).decode(), kdf
+    
+    def _svolgi(self, segreto: str, salt_hex: str, avvolta: str,
+                kdf: Optional[Dict] = None) -> Optional[bytes]:
+        """Decifra una DEK avvolta; None se il segreto è errato"""
+        kek, _ = self.genera_chiave_da_password(segreto, bytes.fromhex(salt_hex), kdf)
+        try:
+            return Fernet(kek).decrypt(avvolta.encode())
+        except InvalidToken:
+            return None
+    
+    def _imposta_dek(self, dek: bytes, dek_nuova: bytes = None):
+        """Attiva la DEK (e l'eventuale DEK di rotazione) per cifratura e impronte"""
+        self._dek = dek
+        self._dek_nuova = dek_nuova
+        self.cipher = Fernet(base64.urlsafe_b64encode(dek))
+        if dek_nuova:
+            # MultiFernet cifra con la prima chiave e decifra con tutte
+            self.cipher = MultiFernet([Fernet(base64.urlsafe_b64encode(dek_nuova)), self.cipher])
+        # I BLOB si cifrano con la DEK più recente e si decifrano con quella indicata dall'id
+        self._aead = {}
+        for chiave in filter(None, (dek, dek_nuova)):
+            id_chiave = self._id_chiave(chiave)
+            self._aead[id_chiave] = AESGCM(hmac.new(chiave, b"aead-segreti", hashlib.sha256).digest())
+        self._intestazione = bytes([self.VERSIONE_BLOB]) + self._id_chiave(dek_nuova or dek)
+        # Chiave separata per dominio: l'impronta non rivela nulla della chiave di cifratura
+        self.chiave_impronta = hmac.new(dek_nuova or dek, b"impronta-credenziale",
+                                        hashlib.sha256).digest()
+    
+    @staticmethod
+    def _id_chiave(dek: bytes) -> bytes:
+        """Identificativo (4 byte) di una DEK, salvato nell'intestazione dei BLOB"""
+        return hmac.new(dek, b"id-chiave", hashlib.sha256).digest()[:4]
+    
+    def _attiva_rotazione(self):
+        """Dopo lo sblocco con la DEK corrente, recupera la DEK di una rotazione in corso"""
+        rotazione = self.config.get('rotazione')
+        if rotazione:
+            vecchia = Fernet(base64.urlsafe_b64encode(self._dek))
+            self._imposta_dek(self._dek, vecchia.decrypt(rotazione['dek_nuova'].encode()))
+    
+    @staticmethod
+    def _normalizza_recovery_code(codice: str) -> str:
+        """Codice di recupero senza spazi, in maiuscolo"""
+        return codice.replace(" ", "").strip().upper()
+    
+    def crea_vault(self, password: str, kdf: Optional[Dict] = None) -> str:
+        """
+        Inizializza un nuovo vault: DEK casuale avvolta con password e
+        codice di recupero
+        
+        Args:
+            password: Master password
+            kdf: Parametri KDF (default: calibrati su questa macchina)
             
         Returns:
-            Salt utilizzato
+            Codice di recupero (da mostrare una sola volta)
+        """
+        self.parametri_kdf = dict(kdf or self.calibra_kdf())
+        self._imposta_dek(os.urandom(32))
+        recovery_code = self.genera_recovery_code()
+        self.config = {'versione': self.VERSIONE_CONFIG}
+        self.cambia_password(password)
+        self._avvolgi_recovery(recovery_code)
+        return recovery_code
+    
+    def sblocca(self, password: str) -> bool:
+        """
+        Sblocca il vault con la master password
+        
+        Con una configurazione legacy la chiave derivata dalla password
+        diventa la DEK e viene avvolta: i dati esistenti restano leggibili
+        senza ricifrarli. In quel caso viene generato un nuovo codice di
+        recupero (restituito da migra_config_legacy).
+        
+        Args:
+            password: Master password
+            
+        Returns:
+            True se la password è corretta
+        """
+        if self.is_legacy():
+            if self.calcola_hash_password(password) != self.config.get('password_hash'):
+                return False
+            key, _ = self.genera_chiave_da_password(password, bytes.fromhex(self.config['salt']))
+            self._imposta_dek(base64.urlsafe_b64decode(key))
+            return True
+        
+        dek = self._svolgi(password, self.config['salt'], self.config['dek_password'],
+                           self.config.get('kdf'))
+        if dek is None:
+            return False
+        self._imposta_dek(dek)
+        self._attiva_rotazione()
+        return True
+    
+    def migra_config_legacy(self, password: str, kdf: Optional[Dict] = None) -> str:
+        """
+        Converte una configurazione legacy (già sbloccata) nel formato con
+        DEK avvolta
+        
+        Args:
+            password: Master password usata per lo sblocco
+            kdf: Parametri KDF (default: calibrati su questa macchina)
+            
+        Returns:
+            Nuovo codice di recupero (il precedente non può avvolgere la DEK)
+        """
+        if self._dek is None:
+            raise ValueError("Sistema di crittografia non inizializzato")
+        self.parametri_kdf = dict(kdf or self.calibra_kdf())
+        recovery_code = self.genera_recovery_code()
+        self.config = {'versione': self.VERSIONE_CONFIG}
+        self.cambia_password(password)
+        self._avvolgi_recovery(recovery_code)
+        return recovery_code
+    
+    def sblocca_con_recovery(self, recovery_code: str) -> bool:
+        """
+        Sblocca il vault con il codice di recupero (la DEK è la stessa)
+        
+        Durante una rotazione vale sia il codice precedente sia quello
+        emesso all'avvio della rotazione.
+        
+        Args:
+            recovery_code: Codice di recupero
+            
+        Returns:
+            True se il codice è corretto
+        """
+        if 'dek_recovery' not in self.config:
+            return False
+        codice = self._normalizza_recovery_code(recovery_code)
+        dek = self._svolgi(codice, self.config['salt_recovery'], self.config['dek_recovery'],
+                           self.config.get('kdf_recovery'))
+        if dek is not None:
+            self._imposta_dek(dek)
+            self._attiva_rotazione()
+            return True
+        
+        rotazione = self.config.get('rotazione')
+        if rotazione:
+            dek_nuova = self._svolgi(codice, rotazione['salt_recovery'], rotazione['dek_recovery'],
+                                     rotazione.get('kdf_recovery'))
+            if dek_nuova is not None:
+                nuova = Fernet(base64.urlsafe_b64encode(dek_nuova))
+                self._imposta_dek(nuova.decrypt(rotazione['dek_vecchia'].encode()), dek_nuova)
+                return True
+        return False
+    
+    def esporta_chiavi(self) -> Dict[str, Optional[str]]:
+        """
+        Chiavi attive del vault sbloccato, per l'agente di sblocco (vedi
+        utils.unlock_agent)
+        
+        Returns:
+            Dizionario con dek, dek_nuova (esadecimali) e id della rotazione
+        """
+        if self._dek is None:
+            raise ValueError("Sistema di crittografia non inizializzato")
+        return {
+            'dek': self._dek.hex(),
+            'dek_nuova': self._dek_nuova.hex() if self._dek_nuova else None,
+            'rotazione': self.id_rotazione(),
+        }
+    
+    def importa_chiavi(self, chiavi: Dict[str, Optional[str]]) -> bool:
         """
-        key, salt = self.genera_chiave_da_password(password, salt)
-        self.cipher = Fernet(key)
+        Sblocca il vault con chiavi ottenute dall'agente, senza derivazione
+        
+        Le chiavi vengono rifiutate se non corrispondono alla configurazione
+        caricata (es. rotazione avviata o completata dopo l'avvio dell'agente).
         
-        # Salva hash della password per verifiche future
-        self.master_password_hash = hashlib.sha256(password.encode()).hexdigest()
+        Args:
+            chiavi: Dizionario restituito da esporta_chiavi
+            
+        Returns:
+            True se le chiavi sono state accettate
+        """
+        if self.is_legacy() or chiavi.get('rotazione') != self.id_rotazione():
+            return False
+        try:
+            dek = bytes.fromhex(chiavi['dek'])
+            dek_nuova = bytes.fromhex(chiavi['dek_nuova']) if chiavi.get('dek_nuova') else None
+        except (KeyError, TypeError, ValueError):
+            return False
+        if bool(dek_nuova) != self.rotazione_in_corso():
+            return False
+        id_dek = self.config.get('id_dek')
+        if id_dek and self._id_chiave(dek).hex() != id_dek:
+            return False
+        self._imposta_dek(dek, dek_nuova)
+        return True
+    
+    def verifica_recovery_legacy(self, recovery_code: str) -> bool:
+        """Verifica un codice di recupero di una configurazione legacy (solo hash)"""
+        atteso = self.config.get('recovery_code_hash')
+        return bool(atteso) and self.calcola_hash_password(
+            self._normalizza_recovery_code(recovery_code)) == atteso
+    
+    def cambia_password(self, nuova_password: str):
+        """
+        Riavvolge la DEK con una nuova master password (i dati non cambiano)
         
-        return salt
+        Args:
+            nuova_password: Nuova master password
+        """
+        if self._dek is None:
+            raise ValueError("Sistema di crittografia non inizializzato")
+        self.config['salt'], self.config['dek_password'], self.config['kdf'] = self._avvolgi(
+            nuova_password)
+        self.config['id_dek'] = self._id_chiave(self._dek).hex()
+        self.config.pop('password_hash', None)
+        rotazione = self.config.get('rotazione')
+        if rotazione:
+            # La DEK nuova diventerà quella principale: stessa password
+            rotazione['salt'], rotazione['dek_password'], rotazione['kdf'] = self._avvolgi(
+                nuova_password, self._dek_nuova)
+    
+    def _avvolgi_recovery(self, recovery_code: str):
+        """Avvolge la DEK con il codice di recupero"""
+        (self.config['salt_recovery'], self.config['dek_recovery'],
+         self.config['kdf_recovery']) = self._avvolgi(self._normalizza_recovery_code(recovery_code))
+        self.config.pop('recovery_code_hash', None)
     
     def verifica_password(self, password: str) -> bool:
         """
@@ -69,8 +451,96 @@ class CryptoManager:
         Returns:
             True se corretta
         """
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
-        return password_hash == self.master_password_hash
+        if self.is_legacy():
+            return self.calcola_hash_password(password) == self.config.get('password_hash')
+        if 'dek_password' not in self.config:
+            return False
+        return self._svolgi(password, self.config['salt'], self.config['dek_password'],
+                            self.config.get('kdf')) is not None
+    
+    def imposta_kdf(self, password: str, kdf: Dict):
+        """
+        Riavvolge la DEK con la master password usando nuovi parametri KDF
+        
+        Il codice di recupero non è noto all'applicazione: il suo
+        avvolgimento mantiene i parametri con cui è stato creato.
+        Salvare la configurazione dopo la chiamata.
+        
+        Args:
+            password: Master password
+            kdf: Parametri KDF (es. da calibra_kdf)
+            
+        Raises:
+            ValueError: Se la password è errata
+        """
+        if self._dek is None or self.is_legacy():
+            raise ValueError("Sistema di crittografia non inizializzato")
+        if not self.verifica_password(password):
+            raise ValueError("Password errata")
+        self.parametri_kdf = dict(kdf)
+        self.cambia_password(password)
+    
+    # ===== Rotazione della chiave =====
+    
+    def rotazione_in_corso(self) -> bool:
+        """Indica se è in corso (o è stata interrotta) una rotazione della DEK"""
+        return 'rotazione' in self.config
+    
+    def id_rotazione(self) -> Optional[str]:
+        """Identificativo della rotazione in corso (per i checkpoint)"""
+        return self.config.get('rotazione', {}).get('id')
+    
+    def avvia_rotazione(self, password: str) -> str:
+        """
+        Genera una nuova DEK e la affianca a quella corrente
+        
+        La nuova DEK viene avvolta subito con la master password e con un
+        nuovo codice di recupero, e in modo incrociato con la DEK corrente:
+        qualunque sblocco successivo recupera entrambe, quindi una rotazione
+        interrotta può riprendere. Salvare la configurazione dopo la chiamata.
+        
+        Args:
+            password: Master password (necessaria per avvolgere la nuova DEK)
+            
+        Returns:
+            Nuovo codice di recupero (valido al termine della rotazione)
+            
+        Raises:
+            ValueError: Se la password è errata o una rotazione è già in corso
+        """
+        if self._dek is None or self.is_legacy():
+            raise ValueError("Sistema di crittografia non inizializzato")
+        if self.rotazione_in_corso():
+            raise ValueError("Una rotazione della chiave è già in corso")
+        if not self.verifica_password(password):
+            raise ValueError("Password errata")
+        
+        dek_nuova = os.urandom(32)
+        recovery_code = self.genera_recovery_code()
+        rotazione = {'id': os.urandom(8).hex()}
+        rotazione['salt'], rotazione['dek_password'], rotazione['kdf'] = self._avvolgi(
+            password, dek_nuova)
+        (rotazione['salt_recovery'], rotazione['dek_recovery'],
+         rotazione['kdf_recovery']) = self._avvolgi(self._normalizza_recovery_code(recovery_code),
+                                                    dek_nuova)
+        rotazione['dek_nuova'] = Fernet(base64.urlsafe_b64encode(self._dek)).encrypt(dek_nuova).decode()
+        rotazione['dek_vecchia'] = Fernet(base64.urlsafe_b64encode(dek_nuova)).encrypt(self._dek).decode()
+        self.config['rotazione'] = rotazione
+        self._imposta_dek(self._dek, dek_nuova)
+        return recovery_code
+    
+    def completa_rotazione(self):
+        """
+        Rende la nuova DEK quella principale (tutti i dati sono già ricifrati)
+        e dimentica la precedente. Salvare la configurazione dopo la chiamata.
+        """
+        rotazione = self.config.pop('rotazione', None)
+        if not rotazione:
+            return
+        for campo in ('salt', 'dek_password', 'kdf', 'salt_recovery', 'dek_recovery', 'kdf_recovery'):
+            self.config[campo] = rotazione[campo]
+        self.config['id_dek'] = self._id_chiave(self._dek_nuova).hex()
+        self._imposta_dek(self._dek_nuova)
     
     @staticmethod
     def calcola_hash_password(password: str) -> str:
@@ -105,7 +575,7 @@ class CryptoManager:
         
         return '-'.join(gruppi)
     
-    def cripta(self, testo: str) -> str:
+    def cripta(self, testo: str) -> bytes:
         """
         Cripta un testo
         
@@ -113,26 +583,62 @@ class CryptoManager:
             testo: Testo in chiaro
             
         Returns:
-            Testo criptato (base64)
+            BLOB cifrato (stringa vuota se il testo è vuoto)
         """
-        if not self.cipher:
+        if not self._aead:
             raise ValueError("Sistema di crittografia non inizializzato")
         
         if not testo:
             return ""
         
-        encrypted = self.cipher.encrypt(testo.encode())
-        return base64.urlsafe_b64encode(encrypted).decode()
+        nonce = os.urandom(self.LUNGHEZZA_NONCE)
+        aead = self._aead[self._intestazione[1:]]
+        return self._intestazione + nonce + aead.encrypt(nonce, testo.encode(), self._intestazione)
+    
+    def cripta_testo(self, testo: str) -> str:
+        """Cripta un testo per una colonna di testo (forma testuale del BLOB)"""
+        return self.a_testo(self.cripta(testo))
+    
+    @classmethod
+    def a_testo(cls, valore) -> str:
+        """
+        Forma testuale di un valore cifrato, per export e colonne di testo
+        
+        Args:
+            valore: BLOB cifrato oppure testo (restituito invariato)
+        """
+        if isinstance(valore, (bytes, memoryview)):
+            return cls.PREFISSO_TESTO + base64.urlsafe_b64encode(bytes(valore)).decode()
+        return valore
     
-    def decripta(self, testo_criptato: str) -> str:
+    @classmethod
+    def da_testo(cls, valore):
+        """
+        Inverso di a_testo: BLOB dalla forma testuale, altri valori invariati
+        
+        Args:
+            valore: Valore letto da un file o da una colonna di testo
+        """
+        if isinstance(valore, str) and valore.startswith(cls.PREFISSO_TESTO):
+            try:
+                return base64.urlsafe_b64decode(valore[len(cls.PREFISSO_TESTO):].encode())
+            except Exception:
+                return valore
+        return valore
+    
+    def decripta(self, testo_criptato) -> str:
         """
         Decripta un testo
         
         Args:
-            testo_criptato: Testo criptato (base64)
+            testo_criptato: BLOB cifrato, sua forma testuale o token Fernet legacy
             
         Returns:
-            Testo in chiaro
+            Testo in chiaro (i valori legacy salvati in chiaro sono restituiti invariati)
+        
+        Raises:
+            ValueError: Se il valore è cifrato ma nessuna chiave attiva lo decifra
+                        (es. esportato da un altro vault)
         """
         if not self.cipher:
             raise ValueError("Sistema di crittografia non inizializzato")
@@ -140,13 +646,114 @@ class CryptoManager:
         if not testo_criptato:
             return ""
         
+        decrypted = self.prova_decripta(testo_criptato)
+        if decrypted is not None:
+            return decrypted
+        if self.sembra_cifrato(testo_criptato):
+            raise ValueError("Password non decifrabile con le chiavi di questo vault")
+        # Valore legacy ancora in chiaro (database precedenti alla cifratura)
+        return testo_criptato
+    
+    def testo_impronta(self, valore) -> str:
+        """
+        Testo della password su cui calcolare l'impronta
+        
+        Args:
+            valore: Password come salvata (BLOB, forma testuale, token legacy o chiaro)
+        
+        Returns:
+            Password in chiaro se decifrabile o legacy in chiaro, altrimenti la
+            forma testuale del valore cifrato (stabile finché non cambia)
+        """
+        if not valore:
+            return ""
+        chiaro = self.prova_decripta(valore)
+        if chiaro is not None:
+            return chiaro
+        return self.a_testo(valore) if self.sembra_cifrato(valore) else valore
+    
+    def prova_decripta(self, testo_criptato) -> Optional[str]:
+        """
+        Decripta un testo senza ripiegare sul valore originale
+        
+        Args:
+            testo_criptato: BLOB cifrato, sua forma testuale o token Fernet legacy
+            
+        Returns:
+            Testo in chiaro, None se il valore non è decifrabile con le chiavi attive
+        """
+        valore = self.da_testo(testo_criptato)
+        if isinstance(valore, (bytes, memoryview)):
+            return self._decripta_blob(bytes(valore))
         try:
-            encrypted = base64.urlsafe_b64decode(testo_criptato.encode())
-            decrypted = self.cipher.decrypt(encrypted)
-            return decrypted.decode()
-        except Exception as e:
-            # Se fallisce la decrittazione, potrebbe essere già in chiaro (migrazione)
-            return testo_criptato
+            encrypted = base64.urlsafe_b64decode(valore.encode())
+            return self.cipher.decrypt(encrypted).decode()
+        except Exception:
+            return None
+    
+    def _decripta_blob(self, blob: bytes) -> Optional[str]:
+        """Decifra un BLOB con la DEK indicata dal suo id chiave"""
+        inizio = self.LUNGHEZZA_INTESTAZIONE + self.LUNGHEZZA_NONCE
+        if len(blob) < inizio + 16 or blob[0] != self.VERSIONE_BLOB:
+            return None
+        aead = self._aead.get(blob[1:self.LUNGHEZZA_INTESTAZIONE])
+        if aead is None:
+            return None
+        try:
+            return aead.decrypt(blob[self.LUNGHEZZA_INTESTAZIONE:inizio], blob[inizio:],
+                                blob[:self.LUNGHEZZA_INTESTAZIONE]).decode()
+        except (InvalidTag, UnicodeDecodeError):
+            return None
+    
+    @classmethod
+    def sembra_cifrato(cls, testo) -> bool:
+        """
+        Indica se un valore ha la forma di un testo cifrato (BLOB, sua forma
+        testuale o token Fernet in base64)
+        
+        Serve a distinguere le password in chiaro (da cifrare) da quelle
+        cifrate con una chiave non più disponibile (da lasciare invariate).
+        """
+        if isinstance(testo, (bytes, memoryview)) or testo.startswith(cls.PREFISSO_TESTO):
+            return True
+        try:
+            return base64.urlsafe_b64decode(testo.encode()).startswith(b"gAAAAA")
+        except Exception:
+            return False
+    
+    def calcola_impronta(self, username: str, password: str, host: str = "",
+                         porta=None, note: str = "", rdp_configurata: bool = False) -> str:
+        """
+        Calcola l'impronta HMAC-SHA256 di una credenziale dai campi in chiaro
+        
+        Due credenziali con gli stessi valori normalizzati hanno la stessa
+        impronta anche se le password cifrate differiscono (IV casuale), quindi
+        il rilevamento dei duplicati è un semplice confronto sulla colonna.
+        
+        Args:
+            username: Nome utente
+            password: Password in chiaro
+            host: Host/IP
+            porta: Porta
+            note: Note
+            rdp_configurata: Flag RDP configurata
+            
+        Returns:
+            Impronta esadecimale
+        """
+        if not self.chiave_impronta:
+            raise ValueError("Sistema di crittografia non inizializzato")
+        
+        campi = [
+            (username or "").strip(),
+            password or "",
+            (host or "").strip().casefold(),
+            str(porta).strip() if porta not in (None, "") else "",
+            (note or "").strip(),
+            1 if rdp_configurata else 0,
+        ]
+        messaggio = json.dumps(campi, ensure_ascii=False, separators=(",", ":")).encode()
+        return hmac.new(self.chiave_impronta, messaggio, hashlib.sha256).hexdigest()
     
     def cripta_se_necessario(self, testo: str) -> str:
         """
@@ -161,12 +768,7 @@ class CryptoManager:
         if not testo:
             return ""
         
-        # Prova a decriptare, se fallisce allora è in chiaro
-        try:
-            self.decripta(testo)
-            return testo  # Già criptato
-        except:
-            return self.cripta(testo)  # Cripta
+        return testo if self.sembra_cifrato(testo) else self.cripta(testo)
     
     @staticmethod
     def genera_password_sicura(lunghezza: int = 16, 
@@ -0,0 +1,474 @@
+"""
+Anteprima (dry-run) e applicazione dell'import di clienti, servizi e credenziali
+"""
+
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from models.database import DatabaseManager
+from models.servizio import Servizio
+from utils.crypto_manager import CryptoManager
+
+# Categorie del diff
+NUOVI = 'nuovi'
+MODIFICATI = 'modificati'
+IDENTICI = 'identici'
+CONFLITTI = 'conflitti'
+CATEGORIE = (NUOVI, MODIFICATI, IDENTICI, CONFLITTI)
+
+# Valori della colonna RDP_Configurata considerati veri
+VALORI_SI = ('sì', 'si', 'yes', '1', 'true')
+
+# Campi confrontati per ogni entità (oltre al nome/chiave)
+CAMPI_CLIENTE = ('descrizione', 'vpn_exe_path', 'vpn_windows_name')
+CAMPI_SERVIZIO = ('tipo', 'descrizione', 'link')
+CAMPI_CREDENZIALE = ('username', 'password', 'host', 'porta', 'note', 'rdp_configurata')
+
+
+def _testo(valore) -> str:
+    """Normalizza un valore di cella/colonna in testo senza spazi esterni"""
+    return '' if valore is None else str(valore).strip()
+
+
+def _chiave(valore) -> str:
+    """Chiave di confronto: testo normalizzato senza maiuscole/minuscole"""
+    return _testo(valore).casefold()
+
+
+class VoceImport:
+    """Un elemento del file (cliente, servizio o credenziale) confrontato con il vault"""
+    
+    __slots__ = ('tipo', 'nome', 'etichetta', 'valori', 'id', 'attuali', 'categoria',
+                 'motivo', 'genitore')
+    
+    def __init__(self, tipo: str, nome: str, valori: dict,
+                 genitore: Optional['VoceImport'] = None):
+        self.tipo = tipo
+        self.nome = nome
+        # Percorso leggibile, es. "Cliente / Servizio / utente"
+        self.etichetta = f"{genitore.etichetta} / {nome}" if genitore else nome
+        self.valori = valori  # Solo i campi specificati nel file
+        self.id = None  # ID nel vault (esistente o assegnato all'applicazione)
+        self.attuali = {}  # Valori nel vault, se l'elemento esiste
+        self.categoria = NUOVI
+        self.motivo = ""
+        self.genitore = genitore
+    
+    def modifiche(self) -> List[Tuple[str, str, str]]:
+        """
+        Campi che l'import cambierebbe (password mascherate)
+        
+        Returns:
+            Lista di tuple (campo, valore attuale, nuovo valore)
+        """
+        risultato = []
+        for campo, nuovo in self.valori.items():
+            attuale = self.attuali.get(campo)
+            if attuale == nuovo:
+                continue
+            if campo == 'password':
+                risultato.append((campo, "••••", "•••• (nuova)"))
+            else:
+                risultato.append((campo, _testo(attuale), _testo(nuovo)))
+        return risultato
+    
+    def valori_finali(self, campi: Tuple[str, ...]) -> tuple:
+        """Valori da scrivere: quelli del vault sovrascritti da quelli del file"""
+        return tuple(self.valori.get(campo, self.attuali.get(campo, '')) for campo in campi)
+
+
+class DiffImport:
+    """
+    Confronto tra un file di import e il contenuto del vault
+    
+    Il vault viene letto con tre query (clienti, servizi, credenziali) e
+    indicizzato per chiavi normalizzate; le righe del file vengono
+    raggruppate per entità e confrontate con un hash join, quindi il tempo è
+    lineare nella dimensione di file e vault. Nessuna scrittura avviene
+    finché non si chiama applica, che esegue tutto in una transazione.
+    
+    Clienti e servizi si riconoscono dal nome (senza distinzione maiuscole/
+    minuscole); le credenziali da username e host all'interno del servizio.
+    Se è disponibile la funzione di impronta, due credenziali sono identiche
+    quando coincidono le impronte HMAC dei campi in chiaro (le password
+    cifrate differiscono a ogni cifratura e non sono confrontabili).
+    Un campo vuoto nel file non viene considerato una modifica. Sono in
+    conflitto gli elementi con valori discordanti nel file, le credenziali
+    che non si possono abbinare in modo univoco, quelle con una password
+    cifrata che le chiavi del vault non decifrano (export di un altro vault
+    o precedente a una rotazione) e gli elementi il cui cliente/servizio
+    nuovo è in conflitto.
+    """
+    
+    def __init__(self):
+        self.clienti: Dict[str, List[VoceImport]] = {c: [] for c in CATEGORIE}
+        self.servizi: Dict[str, List[VoceImport]] = {c: [] for c in CATEGORIE}
+        self.credenziali: Dict[str, List[VoceImport]] = {c: [] for c in CATEGORIE}
+        self.errori = 0
+        self.versione = None  # DatabaseManager.data_version() al momento dell'analisi
+        self.applicato = False
+        # Impronta dei campi di una credenziale (password come nel file/vault)
+        self.impronta: Optional[Callable[..., str]] = None
+        self.crypto_manager = None
+    
+    # ===== Analisi =====
+    
+    @staticmethod
+    def calcola(db: DatabaseManager, righe: Iterable[Dict[str, str]],
+                impronta: Optional[Callable[..., str]] = None,
+                crypto_manager=None) -> 'DiffImport':
+        """
+        Analizza le righe del file senza scrivere nel database
+        
+        Args:
+            db: Gestore del database
+            righe: Dizionari colonna -> valore (CSV o Excel)
+            impronta: Funzione (username, password, host, porta, note, rdp)
+                -> impronta; None = confronto sui valori memorizzati
+            crypto_manager: Gestore crittografia sbloccato, per verificare che
+                le password cifrate del file siano decifrabili (None = nessuna verifica)
+        
+        Returns:
+            Diff categorizzato
+        """
+        diff = DiffImport()
+        diff.versione = db.data_version()
+        diff.impronta = impronta
+        diff.crypto_manager = crypto_manager
+        file_clienti, file_servizi, file_credenziali = diff._raggruppa(righe)
+        
+        # Vault indicizzato per chiavi normalizzate (una query per tabella)
+        clienti_db = {_chiave(r['nome']): r for r in db.execute_query(
+            "SELECT id, nome, descrizione, vpn_exe_path, vpn_windows_name FROM clienti")}
+        servizi_db = {(r['cliente_id'], _chiave(r['nome'])): r for r in db.execute_query(
+            "SELECT id, cliente_id, nome, tipo, descrizione, link FROM servizi")}
+        credenziali_db: Dict[tuple, list] = {}
+        for r in db.execute_query("""
+            SELECT id, servizio_id, username, password, host, porta, note, rdp_configurata,
+                   impronta
+            FROM credenziali
+        """):
+            chiave = (r['servizio_id'], _chiave(r['username']), _chiave(r['host']))
+            credenziali_db.setdefault(chiave, []).append(DiffImport._valori_credenziale_db(r))
+        
+        voci_clienti = {}
+        for chiave_c, (nome, campi) in file_clienti.items():
+            voce = VoceImport('cliente', nome, {})
+            diff._classifica(voce, campi, clienti_db.get(chiave_c), CAMPI_CLIENTE)
+            voci_clienti[chiave_c] = voce
+            diff.clienti[voce.categoria].append(voce)
+        
+        voci_servizi = {}
+        for (chiave_c, chiave_s), (nome, campi) in file_servizi.items():
+            cliente = voci_clienti[chiave_c]
+            voce = VoceImport('servizio', nome, {}, cliente)
+            esistente = servizi_db.get((cliente.id, chiave_s)) if cliente.id else None
+            diff._classifica(voce, campi, esistente, CAMPI_SERVIZIO)
+            if voce.categoria == NUOVI and 'tipo' not in voce.valori:
+                voce.valori['tipo'] = 'Altro'
+            voci_servizi[(chiave_c, chiave_s)] = voce
+            diff.servizi[voce.categoria].append(voce)
+        
+        for (chiave_c, chiave_s, chiave_u, chiave_h), tuple_file in file_credenziali.items():
+            servizio = voci_servizi[(chiave_c, chiave_s)]
+            vault = credenziali_db.get((servizio.id, chiave_u, chiave_h), []) if servizio.id else []
+            diff._classifica_credenziali(servizio, tuple_file, vault)
+        return diff
+    
+    def _raggruppa(self, righe: Iterable[Dict[str, str]]) -> tuple:
+        """
+        Raggruppa le righe del file per cliente, servizio e credenziale
+        
+        Returns:
+            Tupla di dizionari ordinati:
+            clienti {chiave: (nome, {campo: valori})},
+            servizi {(cliente, servizio): (nome, {campo: valori})},
+            credenziali {(cliente, servizio, username, host): [tuple valori distinte]}
+        """
+        clienti: "OrderedDict[str, tuple]" = OrderedDict()
+        servizi: "OrderedDict[tuple, tuple]" = OrderedDict()
+        credenziali: "OrderedDict[tuple, list]" = OrderedDict()
+        
+        for row in righe:
+            try:
+                cliente_nome = _testo(row.get('Cliente'))
+                if not cliente_nome:
+                    continue
+                chiave_c = _chiave(cliente_nome)
+                campi = clienti.setdefault(chiave_c, (cliente_nome, {}))[1]
+                DiffImport._raccogli(campi, {
+                    'descrizione': row.get('Cliente_Descrizione'),
+                    'vpn_exe_path': row.get('VPN_EXE'),
+                    'vpn_windows_name': row.get('VPN_Windows'),
+                })
+                
+                servizio_nome = _testo(row.get('Servizio'))
+                if not servizio_nome:
+                    continue
+                chiave_s = _chiave(servizio_nome)
+                tipo = _testo(row.get('Servizio_Tipo'))
+                if tipo and tipo not in Servizio.TIPI_DISPONIBILI:
+                    tipo = 'Altro'
+                campi = servizi.setdefault((chiave_c, chiave_s), (servizio_nome, {}))[1]
+                DiffImport._raccogli(campi, {
+                    'tipo': tipo,
+                    'descrizione': row.get('Servizio_Descrizione'),
+                    'link': row.get('Servizio_Link'),
+                })
+                
+                username = _testo(row.get('Username'))
+                password = _testo(row.get('Password'))
+                # Se Username vuoto ma ci sono Dominio/Utente, costruisci username
+                if not username:
+                    dominio = _testo(row.get('Dominio'))
+                    utente = _testo(row.get('Utente'))
+                    username = f"{dominio}\\{utente}" if dominio and utente else utente
+                if not (username or password):
+                    continue
+                
+                porta = _testo(row.get('Porta'))
+                valori = (
+                    username,
+                    password,
+                    _testo(row.get('Host')),
+                    int(porta) if porta.isdigit() else None,
+                    _testo(row.get('Note')),
+                    _chiave(row.get('RDP_Configurata')) in VALORI_SI,
+                )
+                chiave = (chiave_c, chiave_s, _chiave(username), _chiave(valori[2]))
+                distinti = credenziali.setdefault(chiave, [])
+                if valori not in distinti:
+                    distinti.append(valori)
+            except Exception as e:
+                self.errori += 1
+                print(f"Errore riga: {e}")
+        return clienti, servizi, credenziali
+    
+    @staticmethod
+    def _raccogli(campi: Dict[str, set], valori: dict):
+        """Aggiunge i valori non vuoti di una riga all'insieme dei valori visti per campo"""
+        for campo, valore in valori.items():
+            valore = _testo(valore)
+            if valore:
+                campi.setdefault(campo, set()).add(valore)
+    
+    @staticmethod
+    def _valori_credenziale_db(row) -> tuple:
+        """
+        Credenziale del vault per il confronto
+        
+        Returns:
+            Tupla (id, valori nello stesso ordine di CAMPI_CREDENZIALE, impronta)
+        """
+        return (row['id'], (
+            row['username'] or '',
+            CryptoManager.a_testo(row['password'] or ''),  # come nel file di export
+            row['host'] or '',
+            row['porta'],
+            row['note'] or '',
+            bool(row['rdp_configurata']),
+        ), row['impronta'])
+    
+    def _classifica(self, voce: VoceImport, campi: Dict[str, set], esistente,
+                    nomi_campi: Tuple[str, ...]):
+        """Assegna la categoria a un cliente o servizio"""
+        genitore = voce.genitore
+        discordanti = sorted(campo for campo, valori in campi.items() if len(valori) > 1)
+        voce.valori = {campo: next(iter(valori)) for campo, valori in campi.items()
+                       if len(valori) == 1}
+        
+        if esistente is not None:
+            voce.id = esistente['id']
+            voce.attuali = {campo: esistente[campo] or '' for campo in nomi_campi}
+        
+        if discordanti:
+            voce.categoria = CONFLITTI
+            voce.motivo = "Valori diversi nel file per: " + ", ".join(discordanti)
+        elif voce.id is not None:
+            voce.categoria = MODIFICATI if voce.modifiche() else IDENTICI
+        elif genitore is not None and genitore.categoria == CONFLITTI and genitore.id is None:
+            voce.categoria = CONFLITTI
+            voce.motivo = f"Il {genitore.tipo} '{genitore.etichetta}' è in conflitto"
+        else:
+            voce.categoria = NUOVI
+    
+    def _classifica_credenziali(self, servizio: VoceImport, tuple_file: List[tuple],
+                                vault: List[tuple]):
+        """
+        Abbina le credenziali del file con stesso username/host a quelle del vault
+        
+        Le corrispondenze esatte (stessa impronta o, senza impronte, stessi
+        valori) sono identiche; ciò che resta è nuovo se nel vault non c'è
+        nulla da abbinare, modificato se resta esattamente una credenziale per
+        parte, altrimenti in conflitto.
+        """
+        per_impronta = {imp: cid for cid, _, imp in vault if imp}
+        per_valori = {valori: cid for cid, valori, _ in vault}
+        abbinate = set()
+        viste = set()
+        non_abbinate_file = []
+        
+        for valori in tuple_file:
+            impronta = self.impronta(*valori) if self.impronta else None
+            if impronta in viste:
+                continue  # Stessa credenziale ripetuta nel file con grafia diversa
+            viste.add(impronta)
+            voce = VoceImport('credenziale', valori[0],
+                              dict(zip(CAMPI_CREDENZIALE, valori)), servizio)
+            cid = per_impronta.get(impronta) if impronta else None
+            if cid is None:
+                cid = per_valori.get(valori)
+            if cid is not None:
+                voce.id = cid
+                voce.attuali = dict(voce.valori)
+                voce.categoria = IDENTICI
+                abbinate.add(cid)
+                self.credenziali[IDENTICI].append(voce)
+            else:
+                non_abbinate_file.append(voce)
+        
+        non_abbinate_vault = [(cid, valori) for cid, valori, _ in vault if cid not in abbinate]
+        
+        for voce in non_abbinate_file:
+            if not self._decifrabile(voce.valori['password'], self.crypto_manager):
+                voce.categoria = CONFLITTI
+                voce.motivo = ("Password cifrata con una chiave che questo vault non ha "
+                               "(export di un altro vault o precedente a una rotazione)")
+            elif servizio.id is None and servizio.categoria == CONFLITTI:
+                voce.categoria = CONFLITTI
+                voce.motivo = f"Il servizio '{servizio.etichetta}' è in conflitto"
+            elif not non_abbinate_vault:
+                voce.categoria = NUOVI
+            elif len(non_abbinate_vault) == 1 and len(non_abbinate_file) == 1:
+                voce.id, attuali = non_abbinate_vault[0]
+                voce.attuali = dict(zip(CAMPI_CREDENZIALE, attuali))
+                voce.categoria = MODIFICATI
+            else:
+                voce.categoria = CONFLITTI
+                voce.motivo = "Più credenziali con lo stesso username e host: abbinamento ambiguo"
+            self.credenziali[voce.categoria].append(voce)
+    
+    @staticmethod
+    def _decifrabile(password: str, crypto) -> bool:
+        """Indica se una password del file si può scrivere (in chiaro o decifrabile)"""
+        if not crypto or not password or not CryptoManager.sembra_cifrato(password):
+            return True
+        return crypto.prova_decripta(password) is not None
+    
+    # ===== Riepilogo =====
+    
+    def conteggi(self) -> Dict[str, Dict[str, int]]:
+        """Numero di elementi per entità e categoria"""
+        return {
+            nome: {categoria: len(voci[categoria]) for categoria in CATEGORIE}
+            for nome, voci in (('clienti', self.clienti), ('servizi', self.servizi),
+                               ('credenziali', self.credenziali))
+        }
+    
+    def ha_modifiche(self) -> bool:
+        """Indica se l'applicazione del diff scriverebbe qualcosa"""
+        return any(voci[NUOVI] or voci[MODIFICATI]
+                   for voci in (self.clienti, self.servizi, self.credenziali))
+    
+    def voci(self, categoria: str) -> List[VoceImport]:
+        """Tutte le voci (clienti, servizi, credenziali) di una categoria"""
+        return self.clienti[categoria] + self.servizi[categoria] + self.credenziali[categoria]
+    
+    def riepilogo(self) -> str:
+        """Descrizione testuale dei conteggi"""
+        righe = []
+        for nome, conteggio in self.conteggi().items():
+            righe.append(f"- {nome.capitalize()}: {conteggio[NUOVI]} nuovi, "
+                         f"{conteggio[MODIFICATI]} modificati, {conteggio[IDENTICI]} identici, "
+                         f"{conteggio[CONFLITTI]} in conflitto")
+        if self.errori:
+            righe.append(f"- Righe con errori: {self.errori}")
+        return "\n".join(righe)
+    
+    # ===== Applicazione =====
+    
+    def applica(self, db: DatabaseManager, crypto_manager=None) -> Dict[str, int]:
+        """
+        Applica nuovi e modificati in un'unica transazione
+        
+        Identici e conflitti non vengono toccati. Le password in chiaro del
+        file vengono cifrate prima della scrittura.
+        
+        Args:
+            db: Gestore del database (lo stesso usato per l'analisi)
+            crypto_manager: Gestore crittografia sbloccato (None = password
+                in chiaro scritte come sono, convertite al successivo avvio)
+        
+        Returns:
+            Statistiche: clienti/servizi/credenziali creati, aggiornati,
+            identici, conflitti, errori
+        
+        Raises:
+            ValueError: Se il diff è già stato applicato o il database è
+                cambiato dopo l'analisi
+        """
+        if self.applicato:
+            raise ValueError("Questo import è già stato applicato")
+        if self.versione is not None and db.data_version() != self.versione:
+            raise ValueError("I dati sono cambiati dopo l'anteprima: ripeti l'analisi del file")
+        
+        with db.transaction() as cursor:
+            for voce in self.clienti[NUOVI]:
+                cursor.execute("""
+                    INSERT INTO clienti (nome, descrizione, vpn_exe_path, vpn_windows_name)
+                    VALUES (?, ?, ?, ?)
+                """, (voce.nome,) + voce.valori_finali(CAMPI_CLIENTE))
+                voce.id = cursor.lastrowid
+            cursor.executemany("""
+                UPDATE clienti SET descrizione = ?, vpn_exe_path = ?, vpn_windows_name = ?,
+                    modificato_il = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, [voce.valori_finali(CAMPI_CLIENTE) + (voce.id,) for voce in self.clienti[MODIFICATI]])
+            
+            for voce in self.servizi[NUOVI]:
+                cursor.execute("""
+                    INSERT INTO servizi (cliente_id, nome, tipo, descrizione, link)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (voce.genitore.id, voce.nome) + voce.valori_finali(CAMPI_SERVIZIO))
+                voce.id = cursor.lastrowid
+            cursor.executemany("""
+                UPDATE servizi SET tipo = ?, descrizione = ?, link = ?,
+                    modificato_il = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, [voce.valori_finali(CAMPI_SERVIZIO) + (voce.id,) for voce in self.servizi[MODIFICATI]])
+            
+            cursor.executemany("""
+                INSERT INTO credenziali (servizio_id, username, password, host, porta, note, rdp_configurata,
+                                         impronta)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(voce.genitore.id,) + self._valori_scrittura(voce, crypto_manager)
+                  for voce in self.credenziali[NUOVI]])
+            cursor.executemany("""
+                UPDATE credenziali SET username = ?, password = ?, host = ?, porta = ?, note = ?,
+                    rdp_configurata = ?, impronta = ?, modificato_il = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, [self._valori_scrittura(voce, crypto_manager) + (voce.id,)
+                  for voce in self.credenziali[MODIFICATI]])
+        
+        self.applicato = True
+        return {
+            'clienti': len(self.clienti[NUOVI]),
+            'servizi': len(self.servizi[NUOVI]),
+            'credenziali': len(self.credenziali[NUOVI]),
+            'aggiornati': len(self.voci(MODIFICATI)),
+            'identici': len(self.voci(IDENTICI)),
+            'conflitti': len(self.voci(CONFLITTI)),
+            'errori': self.errori,
+        }
+    
+    def _valori_scrittura(self, voce: VoceImport, crypto_manager=None) -> tuple:
+        """Valori di una credenziale pronti per INSERT/UPDATE (impronta per ultima)"""
+        valori = voce.valori_finali(CAMPI_CREDENZIALE)
+        impronta = self.impronta(*valori) if self.impronta else None
+        if not self._decifrabile(valori[1], crypto_manager):
+            # Già in conflitto in calcola: mai scrivere una password illeggibile
+            raise ValueError(f"Password non decifrabile per '{valori[0]}'")
+        # Le password esportate dal vault tornano BLOB, quelle in chiaro vengono cifrate
+        password = CryptoManager.da_testo(valori[1])
+        if crypto_manager and password and not CryptoManager.sembra_cifrato(password):
+            password = crypto_manager.cripta(password)
+        return (valori[0], password) + valori[2:5] + (1 if valori[5] else 0, impronta)
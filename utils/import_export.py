@@ -4,20 +4,28 @@ Modulo per import/export dati in formato CSV/Excel
 
 import csv
 import os
-from typing import List, Dict, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from models.database import DatabaseManager
 from models.cliente import Cliente
 from models.servizio import Servizio
 from models.credenziale import Credenziale
 from models.pm import PM
 from models.consulente import Consulente
+from utils.crypto_manager import CryptoManager
+from utils.import_diff import DiffImport
 
 
 class ImportExportManager:
     """Gestisce import ed export di dati in formato CSV/Excel"""
     
-    def __init__(self, db: DatabaseManager):
+    # Colonne dei file di PM e Consulenti (la prima è la chiave di import)
+    COLONNE_PM = ('Nome', 'Email', 'Telefono', 'Cellulare')
+    COLONNE_CONSULENTI = COLONNE_PM + ('Competenza',)
+    
+    def __init__(self, db: DatabaseManager, crypto_manager=None):
         self.db = db
+        # Necessario solo per le impronte delle credenziali importate
+        self.crypto_manager = crypto_manager
     
     def export_to_csv(self, file_path: str) -> Tuple[bool, str]:
         """
@@ -30,7 +38,8 @@ class ImportExportManager:
             Tupla (successo, messaggio)
         """
         try:
-            clienti = Cliente.get_all(self.db)
+            # Clienti letti a pagine: il file viene scritto in streaming
+            clienti = Cliente.iter_all(self.db)
             
             with open(file_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
                 fieldnames = [
@@ -117,7 +126,7 @@ class ImportExportManager:
                                 'Dominio': dominio,
                                 'Utente': utente,
                                 'Username': username,
-                                'Password': credenziale.password,
+                                'Password': CryptoManager.a_testo(credenziale.password),
                                 'Host': credenziale.host,
                                 'Porta': credenziale.porta if credenziale.porta else '',
                                 'Note': credenziale.note,
@@ -218,7 +227,7 @@ class ImportExportManager:
                             'Dominio': dominio,
                             'Utente': utente,
                             'Username': username,
-                            'Password': credenziale.password,
+                            'Password': CryptoManager.a_testo(credenziale.password),
                             'Host': credenziale.host,
                             'Porta': credenziale.porta if credenziale.porta else '',
                             'Note': credenziale.note,
@@ -237,7 +246,7 @@ class ImportExportManager:
     
     def import_from_file(self, file_path: str) -> Tuple[bool, str, Dict[str, int]]:
         """
-        Importa dati da file CSV o Excel
+        Importa dati da file CSV o Excel (analisi e applicazione in un colpo)
         
         Args:
             file_path: Percorso file da importare
@@ -245,301 +254,132 @@ class ImportExportManager:
         Returns:
             Tupla (successo, messaggio, statistiche)
         """
+        successo, messaggio, diff = self.analizza_import(file_path)
+        if not successo:
+            return False, messaggio, {}
+        return self.applica_import(diff)
+    
+    def analizza_import(self, file_path: str) -> Tuple[bool, str, Optional[DiffImport]]:
+        """
+        Analizza un file di import senza scrivere nel database (dry-run)
+        
+        Args:
+            file_path: Percorso file CSV o Excel
+            
+        Returns:
+            Tupla (successo, messaggio con il riepilogo, diff da confermare)
+        """
         ext = os.path.splitext(file_path)[1].lower()
         
-        if ext == '.csv':
-            return self._import_from_csv(file_path)
-        elif ext in ['.xlsx', '.xls']:
-            return self._import_from_excel(file_path)
-        else:
-            return False, "Formato file non supportato. Usa .csv, .xlsx o .xls", {}
-    
-    def _import_from_csv(self, file_path: str) -> Tuple[bool, str, Dict[str, int]]:
-        """Importa dati da file CSV"""
         try:
-            stats = {'clienti': 0, 'servizi': 0, 'credenziali': 0, 'errori': 0}
-            clienti_map = {}  # nome_cliente -> id
-            servizi_map = {}  # (cliente_id, nome_servizio) -> id
-            
-            with open(file_path, 'r', encoding='utf-8-sig') as csvfile:
-                reader = csv.DictReader(csvfile)
-                
-                for row in reader:
-                    try:
-                        cliente_nome = row.get('Cliente', '').strip()
-                        if not cliente_nome:
-                            continue
-                        
-                        # Crea o recupera cliente
-                        if cliente_nome not in clienti_map:
-                            # Verifica se il cliente esiste già
-                            clienti_esistenti = Cliente.get_all(self.db)
-                            cliente_esistente = next((c for c in clienti_esistenti if c.nome == cliente_nome), None)
-                            
-                            if cliente_esistente:
-                                clienti_map[cliente_nome] = cliente_esistente.id
-                            else:
-                                cliente_id = Cliente.create(
-                                    self.db,
-                                    nome=cliente_nome,
-                                    descrizione=row.get('Cliente_Descrizione', '').strip(),
-                                    vpn_exe_path=row.get('VPN_EXE', '').strip(),
-                                    vpn_windows_name=row.get('VPN_Windows', '').strip()
-                                )
-                                clienti_map[cliente_nome] = cliente_id
-                                stats['clienti'] += 1
-                        
-                        cliente_id = clienti_map[cliente_nome]
-                        
-                        # Crea servizio se presente
-                        servizio_nome = row.get('Servizio', '').strip()
-                        if servizio_nome:
-                            servizio_key = (cliente_id, servizio_nome)
-                            
-                            if servizio_key not in servizi_map:
-                                # Verifica se il servizio esiste già
-                                servizi_esistenti = Servizio.get_by_cliente(self.db, cliente_id)
-                                servizio_esistente = next((s for s in servizi_esistenti if s.nome == servizio_nome), None)
-                                
-                                if servizio_esistente:
-                                    servizi_map[servizio_key] = servizio_esistente.id
-                                else:
-                                    servizio_tipo = row.get('Servizio_Tipo', 'Altro').strip()
-                                    if servizio_tipo not in Servizio.TIPI_DISPONIBILI:
-                                        servizio_tipo = 'Altro'
-                                    
-                                    servizio_id = Servizio.create(
-                                        self.db,
-                                        cliente_id=cliente_id,
-                                        nome=servizio_nome,
-                                        tipo=servizio_tipo,
-                                        descrizione=row.get('Servizio_Descrizione', '').strip(),
-                                        link=row.get('Servizio_Link', '').strip()
-                                    )
-                                    servizi_map[servizio_key] = servizio_id
-                                    stats['servizi'] += 1
-                            
-                            servizio_id = servizi_map[servizio_key]
-                            
-                            # Crea credenziale se presente
-                            username = row.get('Username', '').strip()
-                            password = row.get('Password', '').strip()
-                            
-                            # Se Username vuoto ma ci sono Dominio/Utente, costruisci username
-                            if not username:
-                                dominio = row.get('Dominio', '').strip()
-                                utente = row.get('Utente', '').strip()
-                                if dominio and utente:
-                                    username = f"{dominio}\\{utente}"
-                                elif utente:
-                                    username = utente
-                            
-                            if username or password:
-                                porta_str = row.get('Porta', '').strip()
-                                porta = int(porta_str) if porta_str and porta_str.isdigit() else None
-                                
-                                rdp_config = row.get('RDP_Configurata', '').strip().lower()
-                                rdp_configurata = rdp_config in ['sì', 'si', 'yes', '1', 'true']
-                                
-                                host = row.get('Host', '').strip()
-                                note = row.get('Note', '').strip()
-                                
-                                # Verifica se la credenziale esiste già
-                                credenziali_esistenti = Credenziale.get_by_servizio(self.db, servizio_id)
-                                credenziale_duplicata = False
-                                
-                                for cred in credenziali_esistenti:
-                                    if (cred.username == username and 
-                                        cred.password == password and
-                                        cred.host == host and
-                                        cred.porta == porta and
-                                        cred.note == note and
-                                        cred.rdp_configurata == rdp_configurata):
-                                        credenziale_duplicata = True
-                                        break
-                                
-                                if not credenziale_duplicata:
-                                    Credenziale.create(
-                                        self.db,
-                                        servizio_id=servizio_id,
-                                        username=username,
-                                        password=password,
-                                        host=host,
-                                        porta=porta,
-                                        note=note,
-                                        rdp_configurata=rdp_configurata
-                                    )
-                                    stats['credenziali'] += 1
-                    
-                    except Exception as e:
-                        stats['errori'] += 1
-                        print(f"Errore riga: {e}")
-                        continue
-            
-            msg = f"Import completato:\n"
-            msg += f"- Clienti: {stats['clienti']}\n"
-            msg += f"- Servizi: {stats['servizi']}\n"
-            msg += f"- Credenziali: {stats['credenziali']}\n"
-            if stats['errori'] > 0:
-                msg += f"- Errori: {stats['errori']}"
-            
-            return True, msg, stats
-            
+            if ext == '.csv':
+                with open(file_path, 'r', encoding='utf-8-sig') as csvfile:
+                    diff = DiffImport.calcola(self.db, csv.DictReader(csvfile),
+                                              self._funzione_impronta(), self.crypto_manager)
+            elif ext in ['.xlsx', '.xls']:
+                diff = DiffImport.calcola(self.db, self._righe_excel(file_path),
+                                          self._funzione_impronta(), self.crypto_manager)
+            else:
+                return False, "Formato file non supportato. Usa .csv, .xlsx o .xls", None
+        except ImportError:
+            return False, "Errore: openpyxl non installato. Usa import CSV.", None
         except Exception as e:
-            return False, f"Errore durante l'import: {str(e)}", {}
+            return False, f"Errore durante l'analisi del file: {str(e)}", None
+        
+        return True, f"Anteprima import:\n{diff.riepilogo()}", diff
     
-    def _import_from_excel(self, file_path: str) -> Tuple[bool, str, Dict[str, int]]:
-        """Importa dati da file Excel"""
-        try:
-            import pandas as pd
-            
-            df = pd.read_excel(file_path, engine='openpyxl')
-            df = df.fillna('')  # Sostituisci NaN con stringhe vuote
-            
-            stats = {'clienti': 0, 'servizi': 0, 'credenziali': 0, 'errori': 0}
-            clienti_map = {}  # nome_cliente -> id
-            servizi_map = {}  # (cliente_id, nome_servizio) -> id
-            
-            for _, row in df.iterrows():
-                try:
-                    cliente_nome = str(row.get('Cliente', '')).strip()
-                    if not cliente_nome:
-                        continue
-                    
-                    # Crea o recupera cliente
-                    if cliente_nome not in clienti_map:
-                        # Verifica se il cliente esiste già
-                        clienti_esistenti = Cliente.get_all(self.db)
-                        cliente_esistente = next((c for c in clienti_esistenti if c.nome == cliente_nome), None)
-                        
-                        if cliente_esistente:
-                            clienti_map[cliente_nome] = cliente_esistente.id
-                        else:
-                            cliente_id = Cliente.create(
-                                self.db,
-                                nome=cliente_nome,
-                                descrizione=str(row.get('Cliente_Descrizione', '')).strip(),
-                                vpn_exe_path=str(row.get('VPN_EXE', '')).strip(),
-                                vpn_windows_name=str(row.get('VPN_Windows', '')).strip()
-                            )
-                            clienti_map[cliente_nome] = cliente_id
-                            stats['clienti'] += 1
-                    
-                    cliente_id = clienti_map[cliente_nome]
-                    
-                    # Crea servizio se presente
-                    servizio_nome = str(row.get('Servizio', '')).strip()
-                    if servizio_nome:
-                        servizio_key = (cliente_id, servizio_nome)
-                        
-                        if servizio_key not in servizi_map:
-                            # Verifica se il servizio esiste già
-                            servizi_esistenti = Servizio.get_by_cliente(self.db, cliente_id)
-                            servizio_esistente = next((s for s in servizi_esistenti if s.nome == servizio_nome), None)
-                            
-                            if servizio_esistente:
-                                servizi_map[servizio_key] = servizio_esistente.id
-                            else:
-                                servizio_tipo = str(row.get('Servizio_Tipo', 'Altro')).strip()
-                                if servizio_tipo not in Servizio.TIPI_DISPONIBILI:
-                                    servizio_tipo = 'Altro'
-                                
-                                servizio_id = Servizio.create(
-                                    self.db,
-                                    cliente_id=cliente_id,
-                                    nome=servizio_nome,
-                                    tipo=servizio_tipo,
-                                    descrizione=str(row.get('Servizio_Descrizione', '')).strip(),
-                                    link=str(row.get('Servizio_Link', '')).strip()
-                                )
-                                servizi_map[servizio_key] = servizio_id
-                                stats['servizi'] += 1
-                        
-                        servizio_id = servizi_map[servizio_key]
-                        
-                        # Crea credenziale se presente
-                        username = str(row.get('Username', '')).strip()
-                        password = str(row.get('Password', '')).strip()
-                        
-                        # Se Username vuoto ma ci sono Dominio/Utente, costruisci username
-                        if not username:
-                            dominio = str(row.get('Dominio', '')).strip()
-                            utente = str(row.get('Utente', '')).strip()
-                            if dominio and utente:
-                                username = f"{dominio}\\{utente}"
-                            elif utente:
-                                username = utente
-                        
-                        if username or password:
-                            porta_val = row.get('Porta', '')
-                            try:
-                                porta = int(porta_val) if porta_val and str(porta_val).strip() else None
-                            except:
-                                porta = None
-                            
-                            rdp_config = str(row.get('RDP_Configurata', '')).strip().lower()
-                            rdp_configurata = rdp_config in ['sì', 'si', 'yes', '1', 'true']
-                            
-                            host = str(row.get('Host', '')).strip()
-                            note = str(row.get('Note', '')).strip()
-                            
-                            # Verifica se la credenziale esiste già
-                            credenziali_esistenti = Credenziale.get_by_servizio(self.db, servizio_id)
-                            credenziale_duplicata = False
-                            
-                            for cred in credenziali_esistenti:
-                                if (cred.username == username and 
-                                    cred.password == password and
-                                    cred.host == host and
-                                    cred.porta == porta and
-                                    cred.note == note and
-                                    cred.rdp_configurata == rdp_configurata):
-                                    credenziale_duplicata = True
-                                    break
-                            
-                            if not credenziale_duplicata:
-                                Credenziale.create(
-                                    self.db,
-                                    servizio_id=servizio_id,
-                                    username=username,
-                                    password=password,
-                                    host=host,
-                                    porta=porta,
-                                    note=note,
-                                    rdp_configurata=rdp_configurata
-                                )
-                                stats['credenziali'] += 1
-                
-                except Exception as e:
-                    stats['errori'] += 1
-                    print(f"Errore riga: {e}")
-                    continue
-            
-            msg = f"Import completato:\n"
-            msg += f"- Clienti: {stats['clienti']}\n"
-            msg += f"- Servizi: {stats['servizi']}\n"
-            msg += f"- Credenziali: {stats['credenziali']}\n"
-            if stats['errori'] > 0:
-                msg += f"- Errori: {stats['errori']}"
-            
-            return True, msg, stats
+    def applica_import(self, diff: DiffImport) -> Tuple[bool, str, Dict[str, int]]:
+        """
+        Applica un diff calcolato da analizza_import in un'unica transazione
+        
+        Args:
+            diff: Diff confermato dall'utente
             
-        except ImportError:
-            return False, "Errore: pandas e openpyxl non installati. Usa import CSV.", {}
+        Returns:
+            Tupla (successo, messaggio, statistiche)
+        """
+        try:
+            stats = diff.applica(self.db, self.crypto_manager)
+        except ValueError as e:
+            return False, str(e), {}
         except Exception as e:
             return False, f"Errore durante l'import: {str(e)}", {}
+        
+        msg = f"Import completato:\n"
+        msg += f"- Clienti: {stats['clienti']}\n"
+        msg += f"- Servizi: {stats['servizi']}\n"
+        msg += f"- Credenziali: {stats['credenziali']}\n"
+        msg += f"- Aggiornati: {stats['aggiornati']}\n"
+        msg += f"- Identici: {stats['identici']}\n"
+        if stats['conflitti'] > 0:
+            msg += f"- Conflitti (non importati): {stats['conflitti']}\n"
+        if stats['errori'] > 0:
+            msg += f"- Errori: {stats['errori']}"
+        
+        return True, msg, stats
+    
+    def _funzione_impronta(self) -> Optional[Callable[..., str]]:
+        """
+        Funzione di impronta per le credenziali del file e del vault
+        
+        La password può essere il ciphertext di un export o un valore in
+        chiaro (vedi CryptoManager.testo_impronta).
+        """
+        crypto = self.crypto_manager
+        if not crypto:
+            return None
+        
+        def impronta(username, password, host, porta, note, rdp_configurata):
+            return crypto.calcola_impronta(username, crypto.testo_impronta(password), host,
+                                           porta, note, rdp_configurata)
+        return impronta
+    
+    @staticmethod
+    def _righe_excel(file_path: str) -> Iterator[Dict[str, str]]:
+        """
+        Legge il primo foglio di un file Excel una riga alla volta
+        
+        Usa openpyxl in modalità read_only: il foglio non viene caricato in
+        memoria e ogni riga arriva come dizionario intestazione -> testo,
+        come da csv.DictReader, così CSV ed Excel seguono la stessa pipeline.
+        
+        Args:
+            file_path: Percorso del file .xlsx
+            
+        Yields:
+            Dizionari colonna -> valore (celle vuote come stringa vuota)
+        """
+        from openpyxl import load_workbook
+        
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            righe = workbook.active.iter_rows(values_only=True)
+            intestazioni = [ImportExportManager._testo_cella(v).strip() for v in next(righe, ())]
+            for valori in righe:
+                yield {nome: ImportExportManager._testo_cella(valore)
+                       for nome, valore in zip(intestazioni, valori) if nome}
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def _testo_cella(valore) -> str:
+        """Converte una cella Excel in testo come apparirebbe in un CSV"""
+        if valore is None:
+            return ''
+        if isinstance(valore, float) and valore.is_integer():
+            return str(int(valore))  # Porte e telefoni salvati come numeri
+        return str(valore)
     
     def export_pm_to_csv(self, file_path: str) -> Tuple[bool, str]:
         """Esporta tutti i PM in formato CSV"""
         try:
-            pms = PM.get_all(self.db)
-            
             with open(file_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
                 fieldnames = ['Nome', 'Email', 'Telefono', 'Cellulare']
                 writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
                 writer.writeheader()
                 
-                for pm in pms:
+                esportati = 0
+                for esportati, pm in enumerate(PM.iter_all(self.db), 1):
                     writer.writerow({
                         'Nome': pm.nome,
                         'Email': pm.email or '',
@@ -547,7 +387,7 @@ class ImportExportManager:
                         'Cellulare': pm.cellulare or ''
                     })
                 
-                return True, f"Export completato: {len(pms)} PM esportati"
+                return True, f"Export completato: {esportati} PM esportati"
         except Exception as e:
             return False, f"Errore durante l'export: {str(e)}"
     
@@ -587,112 +427,66 @@ class ImportExportManager:
     def _import_pm_from_csv(self, file_path: str) -> Tuple[bool, str, Dict[str, int]]:
         """Importa PM da file CSV"""
         try:
-            stats = {'creati': 0, 'duplicati': 0, 'errori': 0}
-            
             with open(file_path, 'r', encoding='utf-8-sig') as csvfile:
-                reader = csv.DictReader(csvfile)
-                
-                for row in reader:
-                    try:
-                        nome = row.get('Nome', '').strip()
-                        if not nome:
-                            continue
-                        
-                        email = row.get('Email', '').strip()
-                        telefono = row.get('Telefono', '').strip()
-                        cellulare = row.get('Cellulare', '').strip()
-                        
-                        # Verifica duplicato
-                        pms_esistenti = PM.get_all(self.db)
-                        duplicato = False
-                        
-                        for pm in pms_esistenti:
-                            if (pm.nome == nome and
-                                pm.email == email and
-                                pm.telefono == telefono and
-                                pm.cellulare == cellulare):
-                                duplicato = True
-                                stats['duplicati'] += 1
-                                break
-                        
-                        if not duplicato:
-                            PM.create(self.db, nome, email, telefono, cellulare)
-                            stats['creati'] += 1
-                    
-                    except Exception as e:
-                        stats['errori'] += 1
-                        print(f"Errore riga: {e}")
-            
-            msg = f"Import completato:\n- Creati: {stats['creati']}\n- Duplicati: {stats['duplicati']}"
-            if stats['errori'] > 0:
-                msg += f"\n- Errori: {stats['errori']}"
-            
-            return True, msg, stats
+                return self._import_risorse(csv.DictReader(csvfile), self.COLONNE_PM, PM.upsert_many)
         except Exception as e:
             return False, f"Errore durante l'import: {str(e)}", {}
     
     def _import_pm_from_excel(self, file_path: str) -> Tuple[bool, str, Dict[str, int]]:
         """Importa PM da file Excel"""
         try:
-            import pandas as pd
-            
-            df = pd.read_excel(file_path, engine='openpyxl')
-            df = df.fillna('')
-            
-            stats = {'creati': 0, 'duplicati': 0, 'errori': 0}
-            
-            for _, row in df.iterrows():
-                try:
-                    nome = str(row.get('Nome', '')).strip()
-                    if not nome:
-                        continue
-                    
-                    email = str(row.get('Email', '')).strip()
-                    telefono = str(row.get('Telefono', '')).strip()
-                    cellulare = str(row.get('Cellulare', '')).strip()
-                    
-                    # Verifica duplicato
-                    pms_esistenti = PM.get_all(self.db)
-                    duplicato = False
-                    
-                    for pm in pms_esistenti:
-                        if (pm.nome == nome and
-                            pm.email == email and
-                            pm.telefono == telefono and
-                            pm.cellulare == cellulare):
-                            duplicato = True
-                            stats['duplicati'] += 1
-                            break
-                    
-                    if not duplicato:
-                        PM.create(self.db, nome, email, telefono, cellulare)
-                        stats['creati'] += 1
-                
-                except Exception as e:
-                    stats['errori'] += 1
-                    print(f"Errore riga: {e}")
-            
-            msg = f"Import completato:\n- Creati: {stats['creati']}\n- Duplicati: {stats['duplicati']}"
-            if stats['errori'] > 0:
-                msg += f"\n- Errori: {stats['errori']}"
-            
-            return True, msg, stats
+            return self._import_risorse(self._righe_excel(file_path), self.COLONNE_PM, PM.upsert_many)
         except ImportError:
-            return False, "Errore: pandas e openpyxl non installati. Usa import CSV.", {}
+            return False, "Errore: openpyxl non installato. Usa import CSV.", {}
         except Exception as e:
             return False, f"Errore durante l'import: {str(e)}", {}
     
+    def _import_risorse(self, righe: Iterable, colonne: Tuple[str, ...],
+                        upsert: Callable) -> Tuple[bool, str, Dict[str, int]]:
+        """
+        Importa PM o consulenti con un upsert in blocco sul nome
+        
+        Le righe senza nome vengono ignorate; quelle identiche a un record
+        esistente (o ripetute nel file) contano come duplicati, quelle con lo
+        stesso nome ma dati diversi aggiornano il record. Colonne assenti dal
+        file e celle vuote lasciano invariati i dati già memorizzati.
+        
+        Args:
+            righe: Righe del file (mapping colonna -> valore)
+            colonne: Colonne da leggere, la prima è il nome
+            upsert: PM.upsert_many o Consulente.upsert_many
+            
+        Returns:
+            Tupla (successo, messaggio, statistiche)
+        """
+        valori = []
+        for row in righe:
+            valore = tuple(str(row.get(colonna, '') or '').strip() for colonna in colonne)
+            if valore[0]:
+                valori.append(valore)
+        
+        creati, aggiornati, invariati = upsert(self.db, valori)
+        stats = {
+            'creati': creati,
+            'aggiornati': aggiornati,
+            'duplicati': len(valori) - creati - aggiornati,
+            'errori': 0
+        }
+        
+        msg = (f"Import completato:\n- Creati: {stats['creati']}\n"
+               f"- Aggiornati: {stats['aggiornati']}\n- Duplicati: {stats['duplicati']}")
+        return True, msg, stats
+    
     def export_consulenti_to_csv(self, file_path: str) -> Tuple[bool, str]:
         """Esporta tutti i Consulenti in formato CSV"""
         try:
-            consulenti = Consulente.get_all(self.db)
-            
             with open(file_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
                 fieldnames = ['Nome', 'Email', 'Telefono', 'Cellulare', 'Competenza']
                 writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
                 writer.writeheader()
                 
-                for consulente in consulenti:
+                esportati = 0
+                for esportati, consulente in enumerate(Consulente.iter_all(self.db), 1):
                     writer.writerow({
                         'Nome': consulente.nome,
                         'Email': consulente.email or '',
@@ -701,7 +495,7 @@ class ImportExportManager:
                         'Competenza': consulente.competenza or ''
                     })
                 
-                return True, f"Export completato: {len(consulenti)} Consulenti esportati"
+                return True, f"Export completato: {esportati} Consulenti esportati"
         except Exception as e:
             return False, f"Errore durante l'export: {str(e)}"
     
@@ -742,101 +536,18 @@ class ImportExportManager:
     def _import_consulenti_from_csv(self, file_path: str) -> Tuple[bool, str, Dict[str, int]]:
         """Importa Consulenti da file CSV"""
         try:
-            stats = {'creati': 0, 'duplicati': 0, 'errori': 0}
-            
             with open(file_path, 'r', encoding='utf-8-sig') as csvfile:
-                reader = csv.DictReader(csvfile)
-                
-                for row in reader:
-                    try:
-                        nome = row.get('Nome', '').strip()
-                        if not nome:
-                            continue
-                        
-                        email = row.get('Email', '').strip()
-                        telefono = row.get('Telefono', '').strip()
-                        cellulare = row.get('Cellulare', '').strip()
-                        competenza = row.get('Competenza', '').strip()
-                        
-                        # Verifica duplicato
-                        consulenti_esistenti = Consulente.get_all(self.db)
-                        duplicato = False
-                        
-                        for cons in consulenti_esistenti:
-                            if (cons.nome == nome and
-                                cons.email == email and
-                                cons.telefono == telefono and
-                                cons.cellulare == cellulare and
-                                cons.competenza == competenza):
-                                duplicato = True
-                                stats['duplicati'] += 1
-                                break
-                        
-                        if not duplicato:
-                            Consulente.create(self.db, nome, email, telefono, cellulare, competenza)
-                            stats['creati'] += 1
-                    
-                    except Exception as e:
-                        stats['errori'] += 1
-                        print(f"Errore riga: {e}")
-            
-            msg = f"Import completato:\n- Creati: {stats['creati']}\n- Duplicati: {stats['duplicati']}"
-            if stats['errori'] > 0:
-                msg += f"\n- Errori: {stats['errori']}"
-            
-            return True, msg, stats
+                return self._import_risorse(csv.DictReader(csvfile), self.COLONNE_CONSULENTI,
+                                            Consulente.upsert_many)
         except Exception as e:
             return False, f"Errore durante l'import: {str(e)}", {}
     
     def _import_consulenti_from_excel(self, file_path: str) -> Tuple[bool, str, Dict[str, int]]:
         """Importa Consulenti da file Excel"""
         try:
-            import pandas as pd
-            
-            df = pd.read_excel(file_path, engine='openpyxl')
-            df = df.fillna('')
-            
-            stats = {'creati': 0, 'duplicati': 0, 'errori': 0}
-            
-            for _, row in df.iterrows():
-                try:
-                    nome = str(row.get('Nome', '')).strip()
-                    if not nome:
-                        continue
-                    
-                    email = str(row.get('Email', '')).strip()
-                    telefono = str(row.get('Telefono', '')).strip()
-                    cellulare = str(row.get('Cellulare', '')).strip()
-                    competenza = str(row.get('Competenza', '')).strip()
-                    
-                    # Verifica duplicato
-                    consulenti_esistenti = Consulente.get_all(self.db)
-                    duplicato = False
-                    
-                    for cons in consulenti_esistenti:
-                        if (cons.nome == nome and
-                            cons.email == email and
-                            cons.telefono == telefono and
-                            cons.cellulare == cellulare and
-                            cons.competenza == competenza):
-                            duplicato = True
-                            stats['duplicati'] += 1
-                            break
-                    
-                    if not duplicato:
-                        Consulente.create(self.db, nome, email, telefono, cellulare, competenza)
-                        stats['creati'] += 1
-                
-                except Exception as e:
-                    stats['errori'] += 1
-                    print(f"Errore riga: {e}")
-            
-            msg = f"Import completato:\n- Creati: {stats['creati']}\n- Duplicati: {stats['duplicati']}"
-            if stats['errori'] > 0:
-                msg += f"\n- Errori: {stats['errori']}"
-            
-            return True, msg, stats
+            return self._import_risorse(self._righe_excel(file_path), self.COLONNE_CONSULENTI,
+                                        Consulente.upsert_many)
         except ImportError:
-            return False, "Errore: pandas e openpyxl non installati. Usa import CSV.", {}
+            return False, "Errore: openpyxl non installato. Usa import CSV.", {}
         except Exception as e:
             return False, f"Errore durante l'import: {str(e)}", {}
@@ -0,0 +1,268 @@
+"""
+Rotazione della chiave dati (DEK), cifratura delle password legacy in chiaro
+e conversione in blocco al formato binario (BLOB AES-GCM)
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from models.database import DatabaseManager
+
+
+class KeyRotationManager:
+    """
+    Ricifra tutti i segreti del vault con la DEK di una rotazione avviata
+    da CryptoManager.avvia_rotazione
+    
+    Le righe vengono lette a blocchi (paginazione keyset sull'id), decifrate
+    e ricifrate su un pool di thread e scritte con un'unica transazione per
+    blocco, insieme al checkpoint in rotazione_chiave: una rotazione
+    interrotta riprende dall'ultimo blocco salvato. Ogni UPDATE verifica che
+    il valore non sia cambiato nel frattempo (le scritture concorrenti usano
+    già la nuova DEK). Al termine la nuova DEK diventa quella principale.
+    
+    Lo stesso ciclo converte le password salvate come testo (token Fernet
+    legacy o in chiaro) nel formato BLOB, vedi converti_formato.
+    """
+    
+    # (tabella, colonna, colonna gestita dall'applicazione)
+    # Le password delle credenziali sono cifrate dall'applicazione come BLOB
+    # (i valori in chiaro vengono cifrati). Password template e VPN sono
+    # salvate in chiaro: si ricifrano solo i valori già cifrati, in forma testuale.
+    COLONNE = (
+        ('credenziali', 'password', True),
+        ('template_credenziali', 'password', False),
+        ('clienti', 'vpn_password', False),
+    )
+    
+    # Righe lette e scritte per transazione
+    DIMENSIONE_BLOCCO = 2000
+    
+    # Password non ancora nel formato binario, escluse quelle già risultate
+    # non decifrabili (con lo stesso valore) in una conversione precedente
+    FILTRO_TESTO = """AND typeof(password) = 'text' AND password != ''
+        AND NOT EXISTS (SELECT 1 FROM password_non_convertibili n
+                        WHERE n.credenziale_id = credenziali.id AND n.password = credenziali.password)"""
+    
+    def __init__(self, db: DatabaseManager, crypto_manager, workers: Optional[int] = None):
+        """
+        Inizializza il gestore della rotazione
+        
+        Args:
+            db: Gestore del database (usato solo dal thread chiamante)
+            crypto_manager: CryptoManager sbloccato con una rotazione in corso
+            workers: Thread per decifrare/cifrare (default: CPU disponibili, max 8)
+        """
+        self.db = db
+        self.crypto_manager = crypto_manager
+        self.workers = workers or min(8, os.cpu_count() or 2)
+    
+    def esegui(self, avanzamento: Optional[Callable[[str, int, int], None]] = None,
+               interrompi: Optional[Callable[[], bool]] = None) -> Dict[str, object]:
+        """
+        Esegue (o riprende) la rotazione
+        
+        Args:
+            avanzamento: Chiamata dopo ogni blocco con (tabella, segreti elaborati, totale)
+            interrompi: Se restituisce True la rotazione si ferma dopo il blocco corrente
+        
+        Returns:
+            Statistiche: segreti, ruotati, cifrati (erano in chiaro), invariati
+            (vuoti o non decifrabili), saltati (modificati durante la rotazione),
+            secondi, al_secondo, completata
+        
+        Raises:
+            ValueError: Se non c'è una rotazione in corso
+        """
+        crypto = self.crypto_manager
+        if not crypto or not crypto.rotazione_in_corso():
+            raise ValueError("Nessuna rotazione della chiave in corso")
+        rotazione_id = crypto.id_rotazione()
+        
+        stats = self._elabora(self.COLONNE, "", self._carica_checkpoint(rotazione_id),
+                              rotazione_id, avanzamento, interrompi)
+        if stats['completata']:
+            crypto.completa_rotazione()
+            crypto.salva_config()
+            self.db.execute_update("DELETE FROM rotazione_chiave")
+        return stats
+    
+    def conta_da_convertire(self) -> int:
+        """Password delle credenziali ancora salvate come testo (formato legacy)"""
+        return self._conta('credenziali', 'password', 0, self.FILTRO_TESTO)
+    
+    def converti_formato(self, avanzamento: Optional[Callable[[str, int, int], None]] = None,
+                         interrompi: Optional[Callable[[], bool]] = None) -> Dict[str, object]:
+        """
+        Converte in blocco le password delle credenziali salvate come testo
+        (token Fernet legacy in base64 o in chiaro) in BLOB AES-GCM
+        
+        Non serve un checkpoint: le righe convertite escono dal filtro, quindi
+        una conversione interrotta riprende da sola al lancio successivo. Le
+        password cifrate con una chiave non più disponibile restano come sono
+        e vengono registrate in password_non_convertibili: escono anch'esse
+        dal filtro, così conta_da_convertire arriva a 0.
+        
+        Args:
+            avanzamento: Chiamata dopo ogni blocco con (tabella, segreti elaborati, totale)
+            interrompi: Se restituisce True la conversione si ferma dopo il blocco corrente
+        
+        Returns:
+            Statistiche come esegui
+        """
+        if not self.crypto_manager:
+            raise ValueError("Sistema di crittografia non inizializzato")
+        colonne = tuple(c for c in self.COLONNE if c[2])
+        return self._elabora(colonne, self.FILTRO_TESTO, {}, None, avanzamento, interrompi)
+    
+    def _elabora(self, colonne: tuple, filtro: str, checkpoint: Dict[str, int],
+                 rotazione_id: Optional[str], avanzamento, interrompi) -> Dict[str, object]:
+        """
+        Ciclo comune: legge a blocchi, ricifra sul pool e scrive
+        
+        Args:
+            colonne: Sottoinsieme di COLONNE da elaborare
+            filtro: Condizione SQL aggiuntiva sulle righe
+            checkpoint: Ultimo id già elaborato per tabella
+            rotazione_id: Rotazione a cui legare i checkpoint (None = nessun checkpoint)
+        """
+        stats = {'segreti': 0, 'ruotati': 0, 'cifrati': 0, 'invariati': 0, 'saltati': 0}
+        inizio = time.perf_counter()
+        totale = sum(self._conta(tabella, colonna, checkpoint.get(tabella, 0), filtro)
+                     for tabella, colonna, _ in colonne)
+        completata = True
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for tabella, colonna, cifra_in_chiaro in colonne:
+                ultimo_id = checkpoint.get(tabella, 0)
+                while True:
+                    if interrompi and interrompi():
+                        completata = False
+                        break
+                    righe = self._leggi_blocco(tabella, colonna, ultimo_id, filtro)
+                    if not righe:
+                        break
+                    ultimo_id = righe[-1][0]
+                    
+                    # Decifratura e cifratura in parallelo su porzioni del blocco
+                    passo = -(-len(righe) // self.workers)
+                    porzioni = [righe[i:i + passo] for i in range(0, len(righe), passo)]
+                    aggiornamenti = []
+                    for parziale, conteggi in pool.map(
+                            lambda p: self._ruota(tabella, p, cifra_in_chiaro), porzioni):
+                        aggiornamenti.extend(parziale)
+                        for chiave, valore in conteggi.items():
+                            stats[chiave] += valore
+                    
+                    stats['saltati'] += self._scrivi_blocco(tabella, colonna, aggiornamenti,
+                                                            rotazione_id, ultimo_id)
+                    stats['segreti'] += len(righe)
+                    if avanzamento:
+                        avanzamento(tabella, stats['segreti'], totale)
+                if not completata:
+                    break
+        
+        stats['secondi'] = round(time.perf_counter() - inizio, 2)
+        stats['al_secondo'] = int(stats['segreti'] / stats['secondi']) if stats['secondi'] else 0
+        stats['completata'] = completata
+        return stats
+    
+    def _carica_checkpoint(self, rotazione_id: str) -> Dict[str, int]:
+        """Ultimo id elaborato per tabella (solo per la rotazione corrente)"""
+        rows = self.db.execute_query(
+            "SELECT tabella, ultimo_id FROM rotazione_chiave WHERE rotazione_id = ?",
+            (rotazione_id,))
+        return {row['tabella']: row['ultimo_id'] for row in rows}
+    
+    @staticmethod
+    def _filtro(tabella: str, colonna: str) -> str:
+        """Le credenziali si leggono tutte (l'impronta va ricalcolata); altrove solo i valori non vuoti"""
+        if tabella == 'credenziali':
+            return ""
+        return f"AND {colonna} IS NOT NULL AND {colonna} != ''"
+    
+    def _conta(self, tabella: str, colonna: str, ultimo_id: int, filtro: str = "") -> int:
+        """Segreti ancora da elaborare in una tabella"""
+        rows = self.db.execute_query(
+            f"SELECT COUNT(*) AS n FROM {tabella} WHERE id > ? {self._filtro(tabella, colonna)} {filtro}",
+            (ultimo_id,))
+        return rows[0]['n']
+    
+    def _leggi_blocco(self, tabella: str, colonna: str, ultimo_id: int,
+                      filtro: str = "") -> List[tuple]:
+        """Blocco successivo di righe (id, valore[, campi per l'impronta])"""
+        extra = ", username, host, porta, note, rdp_configurata" if tabella == 'credenziali' else ""
+        rows = self.db.execute_query(f"""
+            SELECT id, {colonna}{extra} FROM {tabella}
+            WHERE id > ? {self._filtro(tabella, colonna)} {filtro}
+            ORDER BY id LIMIT ?
+        """, (ultimo_id, self.DIMENSIONE_BLOCCO))
+        return [tuple(row) for row in rows]
+    
+    def _ruota(self, tabella: str, righe: List[tuple],
+               gestita: bool) -> Tuple[List[tuple], Dict[str, int]]:
+        """
+        Ricifra una porzione di blocco (eseguito nei thread del pool)
+        
+        Returns:
+            Tupla (aggiornamenti, conteggi); per le credenziali gli
+            aggiornamenti sono (nuovo, impronta, id, vecchio), altrimenti
+            (nuovo, id, vecchio)
+        """
+        crypto = self.crypto_manager
+        cripta = crypto.cripta if gestita else crypto.cripta_testo
+        conteggi = {'ruotati': 0, 'cifrati': 0, 'invariati': 0}
+        aggiornamenti = []
+        for riga in righe:
+            id_riga, vecchio = riga[0], riga[1] or ""
+            chiaro = crypto.prova_decripta(vecchio) if vecchio else None
+            if chiaro is not None:
+                nuovo = cripta(chiaro)
+                conteggi['ruotati'] += 1
+            elif vecchio and gestita and not crypto.sembra_cifrato(vecchio):
+                chiaro, nuovo = vecchio, cripta(vecchio)
+                conteggi['cifrati'] += 1
+            else:
+                # Vuoto o cifrato con una chiave non più disponibile: invariato.
+                # L'impronta si calcola sulla forma testuale (il valore può essere un BLOB)
+                chiaro, nuovo = crypto.a_testo(vecchio) if vecchio else "", vecchio
+                conteggi['invariati'] += 1
+            
+            if tabella == 'credenziali':
+                username, host, porta, note, rdp = riga[2:]
+                impronta = crypto.calcola_impronta(username, chiaro, host, porta, note, bool(rdp))
+                aggiornamenti.append((nuovo, impronta, id_riga, riga[1]))
+            elif nuovo != vecchio:
+                aggiornamenti.append((nuovo, id_riga, riga[1]))
+        return aggiornamenti, conteggi
+    
+    def _scrivi_blocco(self, tabella: str, colonna: str, aggiornamenti: List[tuple],
+                       rotazione_id: Optional[str], ultimo_id: int) -> int:
+        """
+        Scrive un blocco e il checkpoint (se c'è una rotazione) nella stessa transazione
+        
+        Returns:
+            Numero di righe saltate perché modificate nel frattempo
+        """
+        impronta = ", impronta = ?" if tabella == 'credenziali' else ""
+        with self.db.transaction() as cursor:
+            cursor.executemany(f"""
+                UPDATE {tabella} SET {colonna} = ?{impronta}
+                WHERE id = ? AND {colonna} IS ?
+            """, aggiornamenti)
+            scritte = cursor.rowcount if aggiornamenti else 0
+            if tabella == 'credenziali':
+                # Testo rimasto invariato = non decifrabile: escluso da FILTRO_TESTO
+                cursor.executemany("""
+                    INSERT OR REPLACE INTO password_non_convertibili (credenziale_id, password)
+                    VALUES (?, ?)
+                """, [(id_riga, vecchio) for nuovo, _, id_riga, vecchio in aggiornamenti
+                      if nuovo == vecchio and isinstance(vecchio, str) and vecchio])
+            if rotazione_id is not None:
+                cursor.execute("""
+                    INSERT INTO rotazione_chiave (tabella, rotazione_id, ultimo_id) VALUES (?, ?, ?)
+                    ON CONFLICT(tabella) DO UPDATE SET
+                        rotazione_id = excluded.rotazione_id, ultimo_id = excluded.ultimo_id
+                """, (tabella, rotazione_id, ultimo_id))
+        return len(aggiornamenti) - scritte
@@ -0,0 +1,199 @@
+"""
+Verifica concorrente della raggiungibilità TCP di host e porte
+"""
+
+import asyncio
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Coppia (host, porta) da verificare
+Destinazione = Tuple[str, int]
+
+
+class ReachabilityProbe:
+    """
+    Prova la connessione TCP a molte coppie (host, porta) in parallelo
+    
+    Un solo event loop asyncio tiene aperte al massimo `concorrenza`
+    connessioni alla volta; ogni destinazione ha un proprio timeout, DNS
+    compreso, quindi un host che non risponde non rallenta gli altri. Le
+    risoluzioni DNS girano in thread dedicati e restano in cache per
+    `ttl_dns` secondi (gli errori per TTL_DNS_ERRORE); le destinazioni con
+    lo stesso host ne fanno una sola, anche tra esecuzioni successive.
+    Dopo l'handshake la connessione viene chiusa senza inviare dati.
+    """
+    
+    # Connessioni contemporanee
+    CONCORRENZA = 64
+    
+    # Secondi concessi a ogni destinazione (risoluzione + connessione)
+    TIMEOUT = 3.0
+    
+    # Validità in secondi delle risoluzioni DNS riuscite e di quelle fallite
+    TTL_DNS = 300
+    TTL_DNS_ERRORE = 30
+    
+    # Risoluzioni DNS contemporanee: getaddrinfo è bloccante e l'executor
+    # predefinito di asyncio ha pochi thread, quindi i nomi lenti
+    # esaurirebbero il timeout delle destinazioni in coda. I thread sono
+    # daemon: una risoluzione bloccata non ritarda l'uscita dalla CLI
+    THREAD_DNS = 16
+    
+    def __init__(self, concorrenza: int = CONCORRENZA, timeout: float = TIMEOUT,
+                 ttl_dns: float = TTL_DNS):
+        """
+        Inizializza il prober
+        
+        Args:
+            concorrenza: Numero massimo di connessioni contemporanee
+            timeout: Secondi concessi a ogni destinazione
+            ttl_dns: Validità in secondi della cache DNS
+        """
+        self.concorrenza = max(1, concorrenza)
+        self.timeout = timeout
+        self.ttl_dns = ttl_dns
+        # host -> (scadenza, indirizzi, errore): condivisa tra le esecuzioni
+        self._dns: Dict[str, Tuple[float, List[str], Optional[str]]] = {}
+        self._annullato = threading.Event()
+        self._slot_dns = threading.BoundedSemaphore(self.THREAD_DNS)
+        self._in_risoluzione: Dict[str, Future] = {}
+        self._lock_dns = threading.Lock()
+    
+    def verifica(self, destinazioni: Iterable[Destinazione],
+                 callback: Optional[Callable[[dict], None]] = None) -> Dict[Destinazione, dict]:
+        """
+        Verifica le destinazioni e attende tutti gli esiti
+        
+        Crea un event loop proprio: va chiamata da un thread senza loop
+        attivo (es. CLI o thread worker).
+        
+        Args:
+            destinazioni: Coppie (host, porta); i duplicati sono verificati una volta
+            callback: Funzione chiamata con ogni esito appena disponibile
+        
+        Returns:
+            Dizionario (host, porta) -> esito (vedi verifica_async)
+        """
+        return asyncio.run(self.verifica_async(destinazioni, callback))
+    
+    async def verifica_async(self, destinazioni: Iterable[Destinazione],
+                             callback: Optional[Callable[[dict], None]] = None
+                             ) -> Dict[Destinazione, dict]:
+        """
+        Verifica le destinazioni nel loop corrente
+        
+        Ogni esito è un dizionario con host, porta, raggiungibile (bool),
+        latenza_ms (tempo dell'handshake TCP, None se fallito), indirizzo
+        (IP contattato) ed errore (None se raggiungibile). Le destinazioni
+        ancora in attesa quando viene chiamato annulla() non hanno esito.
+        
+        Args:
+            destinazioni: Coppie (host, porta); i duplicati sono verificati una volta
+            callback: Funzione chiamata con ogni esito appena disponibile
+        
+        Returns:
+            Dizionario (host, porta) -> esito
+        """
+        self._annullato.clear()
+        semaforo = asyncio.Semaphore(self.concorrenza)
+        esiti: Dict[Destinazione, dict] = {}
+        
+        async def verifica_una(host: str, porta: int):
+            async with semaforo:
+                if self._annullato.is_set():
+                    return
+                try:
+                    esito = await asyncio.wait_for(
+                        self._connetti(host, porta), self.timeout)
+                except asyncio.TimeoutError:
+                    esito = self._esito(host, porta, errore=f"Timeout dopo {self.timeout:g} s")
+                except Exception as e:  # un esito anomalo non deve fermare le altre verifiche
+                    esito = self._esito(host, porta, errore=str(e) or type(e).__name__)
+            esiti[(host, porta)] = esito
+            if callback:
+                callback(esito)
+        
+        await asyncio.gather(*(verifica_una(host, porta)
+                               for host, porta in dict.fromkeys(destinazioni)))
+        return esiti
+    
+    def annulla(self):
+        """Salta le destinazioni non ancora avviate (chiamabile da qualsiasi thread)"""
+        self._annullato.set()
+    
+    def svuota_cache_dns(self):
+        """Dimentica le risoluzioni DNS memorizzate"""
+        self._dns.clear()
+    
+    # ===== Interni =====
+    
+    async def _connetti(self, host: str, porta: int) -> dict:
+        """Risolve l'host e prova i suoi indirizzi finché uno accetta la connessione"""
+        indirizzi, errore = await self._risolvi(host)
+        if not indirizzi and not errore:
+            errore = "Nessun indirizzo per l'host"
+        for indirizzo in indirizzi:
+            inizio = time.perf_counter()
+            try:
+                _, writer = await asyncio.open_connection(indirizzo, porta)
+            except ConnectionRefusedError:
+                errore = "Connessione rifiutata"
+            except OSError as e:
+                errore = e.strerror or str(e)
+            else:
+                latenza = (time.perf_counter() - inizio) * 1000
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except OSError:
+                    pass
+                return self._esito(host, porta, True, round(latenza, 1), indirizzo)
+        return self._esito(host, porta, errore=errore)
+    
+    async def _risolvi(self, host: str) -> Tuple[List[str], Optional[str]]:
+        """Indirizzi dell'host dalla cache DNS o da una risoluzione condivisa"""
+        try:
+            return [ipaddress.ip_address(host.strip('[]')).compressed], None
+        except ValueError:
+            pass
+        voce = self._dns.get(host)
+        if voce and voce[0] > time.monotonic():
+            return voce[1], voce[2]
+        with self._lock_dns:
+            futuro = self._in_risoluzione.get(host)
+            if futuro is None:
+                futuro = self._in_risoluzione[host] = Future()
+                threading.Thread(target=self._getaddrinfo, args=(host, futuro),
+                                 name="dns", daemon=True).start()
+        # shield: il timeout di una destinazione non annulla la risoluzione per le altre
+        return await asyncio.shield(asyncio.wrap_future(futuro))
+    
+    def _getaddrinfo(self, host: str, futuro: Future):
+        """
+        Risolve l'host in un thread DNS e aggiorna la cache, anche in caso di
+        errore: il risultato resta disponibile se le destinazioni che lo
+        aspettavano sono già scadute
+        """
+        try:
+            with self._slot_dns:
+                risultati = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+            indirizzi = list(dict.fromkeys(r[4][0] for r in risultati))
+            errore, ttl = None, self.ttl_dns
+        except (OSError, UnicodeError) as e:
+            indirizzi, errore, ttl = [], f"Host non risolto: {e}", self.TTL_DNS_ERRORE
+        self._dns[host] = (time.monotonic() + ttl, indirizzi, errore)
+        with self._lock_dns:
+            self._in_risoluzione.pop(host, None)
+        futuro.set_result((indirizzi, errore))
+    
+    @staticmethod
+    def _esito(host: str, porta: int, raggiungibile: bool = False,
+               latenza_ms: Optional[float] = None, indirizzo: Optional[str] = None,
+               errore: Optional[str] = None) -> dict:
+        """Dizionario dell'esito di una destinazione"""
+        return {'host': host, 'porta': porta, 'raggiungibile': raggiungibile,
+                'latenza_ms': latenza_ms, 'indirizzo': indirizzo, 'errore': errore}
@@ -0,0 +1,597 @@
+"""
+Servizio JSON-RPC locale (HTTP su localhost)
+
+Espone in sola lettura clienti, servizi, credenziali, contatti e ricerca
+ad altri strumenti della stessa macchina, usando gli stessi controller
+della GUI. Le richieste sono gestite da un ciclo asyncio (molte
+connessioni keep-alive senza un thread ciascuna); le query girano su un
+pool di thread, ognuno con una propria connessione di sola lettura,
+quindi non passano mai dalla connessione della GUI.
+
+Le risposte dei metodi di lettura restano in una cache LRU marcata con
+PRAGMA data_version del file: appena un'altra connessione (GUI, CLI,
+import) salva una modifica, le voci vecchie non vengono più usate.
+Le password in chiaro non finiscono mai in cache.
+
+Ogni richiesta deve portare l'intestazione
+"Authorization: Bearer <token>"; URL e token vengono scritti in un file
+leggibile solo dall'utente (vedi TOKEN_FILE) e cancellati all'arresto.
+
+Avvio:
+    python cli.py servizio --porta 8765
+"""
+
+import asyncio
+import hmac
+import inspect
+import json
+import os
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from models.database import DatabaseManager
+
+# File con URL e token del servizio (relativo come security_config.json)
+TOKEN_FILE = 'servizio_rpc.token'
+
+PORTA_PREDEFINITA = 8765
+
+# Dimensione massima del corpo di una richiesta (byte)
+DIMENSIONE_MASSIMA = 1024 * 1024
+
+# Secondi di inattività dopo i quali una connessione keep-alive viene chiusa
+TIMEOUT_INATTIVITA = 30
+
+# Risultati massimi di una ricerca
+LIMITE_RICERCA = 200
+
+# Codici di errore JSON-RPC 2.0 (-32000 = errore applicativo, es. ValueError)
+ERRORE_PARSING = -32700
+RICHIESTA_NON_VALIDA = -32600
+METODO_INESISTENTE = -32601
+PARAMETRI_NON_VALIDI = -32602
+ERRORE_INTERNO = -32603
+ERRORE_APPLICATIVO = -32000
+
+_MOTIVI_HTTP = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 401: 'Unauthorized',
+                404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+# Campi mai restituiti dal servizio (segreti, anche se cifrati)
+_CAMPI_RISERVATI = ('password', 'vpn_password')
+
+
+def _dizionario(oggetto) -> Optional[Dict[str, Any]]:
+    """Attributi pubblici di un modello (senza segreti) come dizionario"""
+    if oggetto is None:
+        return None
+    return {campo: getattr(oggetto, campo) for campo in type(oggetto).__slots__
+            if campo not in _CAMPI_RISERVATI}
+
+
+def _trovato(oggetto, descrizione: str, id: int):
+    """Restituisce l'oggetto o solleva ValueError se non esiste"""
+    if oggetto is None:
+        raise ValueError(f"{descrizione} {id} non trovato")
+    return oggetto
+
+
+class _Contesto:
+    """Connessione di sola lettura e controller di un thread del pool"""
+    
+    def __init__(self, servizio: 'ServizioRPC', db: DatabaseManager):
+        from controllers.cliente_controller import ClienteController
+        from controllers.credenziale_controller import CredenzialeController
+        from controllers.risorse_controller import RisorseController
+        self.servizio = servizio
+        self.db = db
+        self.clienti = ClienteController(db)
+        self.credenziali = CredenzialeController(db, servizio.crypto_manager)
+        self.risorse = RisorseController(db)
+
+
+# ===== Metodi esposti: funzione(contesto, parametri...) =====
+
+def _stato(ctx: _Contesto) -> Dict[str, Any]:
+    return {'versione_dati': ctx.servizio.versione_dati(),
+            'password_disponibili': ctx.servizio.crypto_manager is not None,
+            'cache': dict(ctx.servizio.statistiche),
+            'metodi': sorted(METODI)}
+
+
+def _clienti_elenco(ctx: _Contesto) -> List[dict]:
+    return [_dizionario(c) for c in ctx.clienti.ottieni_riepilogo_clienti()]
+
+
+def _clienti_dettaglio(ctx: _Contesto, id: int) -> dict:
+    return _dizionario(_trovato(ctx.clienti.ottieni_cliente(int(id)), "Cliente", id))
+
+
+def _servizi_elenco(ctx: _Contesto, cliente_id: int) -> List[dict]:
+    return [_dizionario(s) for s in ctx.clienti.ottieni_riepilogo_servizi_cliente(int(cliente_id))]
+
+
+def _servizi_dettaglio(ctx: _Contesto, id: int) -> dict:
+    return _dizionario(_trovato(ctx.credenziali.ottieni_servizio(int(id)), "Servizio", id))
+
+
+def _credenziali_elenco(ctx: _Contesto, servizio_id: int) -> List[dict]:
+    return [_dizionario(c) for c in
+            ctx.credenziali.ottieni_riepilogo_credenziali_servizio(int(servizio_id))]
+
+
+def _credenziali_dettaglio(ctx: _Contesto, id: int) -> dict:
+    credenziale = ctx.credenziali.ottieni_credenziale(int(id), decripta=False)
+    return _dizionario(_trovato(credenziale, "Credenziale", id))
+
+
+def _credenziali_password(ctx: _Contesto, id: int) -> str:
+    if ctx.servizio.crypto_manager is None:
+        raise ValueError("Servizio avviato senza chiavi: password non disponibili")
+    credenziale = ctx.credenziali.ottieni_credenziale(int(id), decripta=False)
+    return ctx.credenziali.rivela_password(_trovato(credenziale, "Credenziale", id))
+
+
+def _credenziali_per_url(ctx: _Contesto, url: str, limite: int = 10) -> List[dict]:
+    limite = max(1, min(int(limite), LIMITE_RICERCA))
+    return ctx.credenziali.trova_credenziali_per_url(str(url), limite)
+
+
+def _credenziali_per_rete(ctx: _Contesto, rete: Any, limite: int = LIMITE_RICERCA) -> List[dict]:
+    reti = [rete] if isinstance(rete, str) else [str(r) for r in rete]
+    return ctx.credenziali.trova_credenziali_per_rete(reti, max(1, int(limite)))
+
+
+def _contatti_elenco(ctx: _Contesto, cliente_id: int) -> List[dict]:
+    return [_dizionario(c) for c in ctx.risorse.ottieni_riepilogo_contatti_cliente(int(cliente_id))]
+
+
+def _contatti_dettaglio(ctx: _Contesto, id: int) -> dict:
+    return _dizionario(_trovato(ctx.risorse.ottieni_contatto(int(id)), "Contatto", id))
+
+
+def _pm_elenco(ctx: _Contesto) -> List[dict]:
+    return [_dizionario(p) for p in ctx.risorse.ottieni_tutti_pm()]
+
+
+def _consulenti_elenco(ctx: _Contesto, cliente_id: Optional[int] = None) -> List[dict]:
+    if cliente_id is None:
+        consulenti = ctx.risorse.ottieni_tutti_consulenti()
+    else:
+        consulenti = ctx.risorse.ottieni_consulenti_cliente(int(cliente_id))
+    return [_dizionario(c) for c in consulenti]
+
+
+def _cerca(ctx: _Contesto, testo: str, limite: int = 50) -> List[dict]:
+    from models.credenziale import Credenziale
+    limite = max(1, min(int(limite), LIMITE_RICERCA))
+    return [dict(row) for row in Credenziale.search(ctx.db, str(testo), limite)]
+
+
+# nome -> (funzione, risultato da tenere in cache)
+METODI: Dict[str, Tuple[Callable, bool]] = {
+    'stato': (_stato, False),
+    'clienti.elenco': (_clienti_elenco, True),
+    'clienti.dettaglio': (_clienti_dettaglio, True),
+    'servizi.elenco': (_servizi_elenco, True),
+    'servizi.dettaglio': (_servizi_dettaglio, True),
+    'credenziali.elenco': (_credenziali_elenco, True),
+    'credenziali.dettaglio': (_credenziali_dettaglio, True),
+    'credenziali.password': (_credenziali_password, False),
+    'credenziali.per_url': (_credenziali_per_url, True),
+    'credenziali.per_rete': (_credenziali_per_rete, True),
+    'contatti.elenco': (_contatti_elenco, True),
+    'contatti.dettaglio': (_contatti_dettaglio, True),
+    'pm.elenco': (_pm_elenco, True),
+    'consulenti.elenco': (_consulenti_elenco, True),
+    'cerca': (_cerca, True),
+}
+
+_FIRME = {nome: inspect.signature(funzione) for nome, (funzione, _) in METODI.items()}
+
+
+class ServizioRPC:
+    """
+    Server JSON-RPC 2.0 su HTTP (POST /) in ascolto su localhost
+    
+    Richieste singole e batch; i metodi accettano parametri per nome o
+    posizione (vedi METODI). Errori applicativi (es. elemento non trovato)
+    hanno codice ERRORE_APPLICATIVO e il messaggio dell'eccezione.
+    """
+    
+    # Risposte tenute nella cache dei metodi di lettura
+    MAX_CACHE = 1024
+    
+    def __init__(self, db_path: str, crypto_manager=None, host: str = '127.0.0.1',
+                 porta: int = PORTA_PREDEFINITA, workers: Optional[int] = None,
+                 percorso_token: Optional[str] = TOKEN_FILE, token: Optional[str] = None,
+                 max_cache: int = MAX_CACHE):
+        """
+        Inizializza il servizio
+        
+        Args:
+            db_path: Database da servire (deve esistere)
+            crypto_manager: CryptoManager sbloccato (None = credenziali.password non disponibile)
+            host: Indirizzo di ascolto (solo loopback, salvo esigenze particolari)
+            porta: Porta TCP (0 = scelta dal sistema)
+            workers: Thread e connessioni di lettura (default: CPU disponibili, max 8)
+            percorso_token: File in cui scrivere URL e token (None = non scriverlo)
+            token: Token di autenticazione (default: generato a caso)
+            max_cache: Risposte massime in cache
+        
+        Raises:
+            ValueError: Se il database non esiste
+        """
+        if not os.path.exists(db_path):
+            raise ValueError(f"Database non trovato: {db_path}")
+        self.db_path = db_path
+        self.crypto_manager = crypto_manager
+        self.host = host
+        self.porta = porta
+        self.workers = workers or min(8, os.cpu_count() or 2)
+        self.percorso_token = percorso_token
+        self.token = token or secrets.token_urlsafe(32)
+        self.max_cache = max_cache
+        self.statistiche = {'richieste': 0, 'da_cache': 0}
+        
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._locale = threading.local()
+        self._database = None
+        self._pool = None
+        self._sentinella = None
+        self._lock_sentinella = threading.Lock()
+        self._loop = None
+        self._fermo = None
+        self._thread = None
+        self._connessioni: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+    
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.porta}/"
+    
+    # ===== Avvio e arresto =====
+    
+    def esegui(self):
+        """Serve le richieste fino a ferma() o Ctrl+C (bloccante)"""
+        try:
+            asyncio.run(self.servi())
+        except KeyboardInterrupt:
+            pass
+    
+    def avvia_in_thread(self) -> str:
+        """
+        Avvia il servizio in un thread dello stesso processo (es. test)
+        
+        Returns:
+            URL del servizio
+        """
+        pronto = threading.Event()
+        errori = []
+        
+        def esegui():
+            try:
+                asyncio.run(self.servi(pronto.set))
+            except Exception as e:
+                errori.append(e)
+                pronto.set()
+        
+        self._thread = threading.Thread(target=esegui, name="servizio-rpc", daemon=True)
+        self._thread.start()
+        pronto.wait()
+        if errori:
+            raise errori[0]
+        return self.url
+    
+    def ferma(self):
+        """Ferma il servizio (da qualunque thread) e attende la chiusura"""
+        if self._loop and self._fermo:
+            self._loop.call_soon_threadsafe(self._fermo.set)
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+            self._thread = None
+    
+    async def servi(self, pronto: Optional[Callable[[], None]] = None):
+        """Ciclo del servizio: ascolta, scrive il token e attende l'arresto"""
+        # Schema e migrazioni una sola volta, poi solo connessioni di lettura
+        self._database = DatabaseManager(self.db_path)
+        self._database.close()
+        self._sentinella = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rpc-lettura")
+        self._loop = asyncio.get_running_loop()
+        self._fermo = asyncio.Event()
+        server = await asyncio.start_server(self._gestisci_connessione, self.host, self.porta)
+        self.porta = server.sockets[0].getsockname()[1]
+        try:
+            self._scrivi_token()
+            if pronto:
+                pronto()
+            async with server:
+                await self._fermo.wait()
+                # Le connessioni keep-alive inattive si chiudono con EOF, non cancellate
+                for writer in list(self._connessioni.values()):
+                    writer.close()
+                await asyncio.gather(*self._connessioni, return_exceptions=True)
+        finally:
+            server.close()
+            self._pool.shutdown(wait=True)
+            self._sentinella.close()
+            with self._lock:
+                self._cache.clear()
+            if self.percorso_token:
+                try:
+                    os.remove(self.percorso_token)
+                except OSError:
+                    pass
+    
+    def _scrivi_token(self):
+        """Scrive URL e token in un file leggibile solo dall'utente (sostituzione atomica)"""
+        if not self.percorso_token:
+            return
+        temporaneo = self.percorso_token + '.tmp'
+        fd = os.open(temporaneo, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'url': self.url, 'token': self.token}, f)
+        os.replace(temporaneo, self.percorso_token)
+    
+    # ===== Letture (thread del pool) =====
+    
+    def versione_dati(self) -> int:
+        """
+        PRAGMA data_version della connessione sentinella
+        
+        Il servizio non scrive mai, quindi il valore cambia solo quando
+        un'altra connessione salva modifiche nel file.
+        """
+        with self._lock_sentinella:
+            return self._sentinella.execute("PRAGMA data_version").fetchone()[0]
+    
+    def _contesto(self) -> _Contesto:
+        """Contesto del thread corrente (connessione aperta al primo utilizzo)"""
+        contesto = getattr(self._locale, 'contesto', None)
+        if contesto is None:
+            db = self._database.open_reader()
+            db.connect().execute("PRAGMA query_only = ON")
+            contesto = self._locale.contesto = _Contesto(self, db)
+        return contesto
+    
+    def _esegui_metodo(self, nome: str, args: list, kwargs: dict) -> bytes:
+        """Esegue un metodo e restituisce il risultato serializzato (dalla cache se valido)"""
+        funzione, in_cache = METODI[nome]
+        if in_cache:
+            chiave = (nome, json.dumps([args, kwargs], sort_keys=True))
+            versione = self.versione_dati()
+            with self._lock:
+                voce = self._cache.get(chiave)
+                if voce and voce[0] == versione:
+                    self._cache.move_to_end(chiave)
+                    self.statistiche['da_cache'] += 1
+                    return voce[1]
+        
+        risultato = json.dumps(funzione(self._contesto(), *args, **kwargs), ensure_ascii=False,
+                               separators=(',', ':'), default=str).encode()
+        if in_cache:
+            # Marcata con la versione letta prima della query: una modifica
+            # salvata nel frattempo rende comunque la voce non valida
+            with self._lock:
+                self._cache[chiave] = (versione, risultato)
+                self._cache.move_to_end(chiave)
+                while len(self._cache) > self.max_cache:
+                    self._cache.popitem(last=False)
+        return risultato
+    
+    # ===== JSON-RPC =====
+    
+    async def _elabora_rpc(self, corpo: bytes) -> Optional[bytes]:
+        """Risposta a un messaggio JSON-RPC (None se erano solo notifiche)"""
+        try:
+            messaggio = json.loads(corpo)
+        except ValueError:
+            return self._errore(None, ERRORE_PARSING, "JSON non valido")
+        if isinstance(messaggio, list):
+            if not messaggio:
+                return self._errore(None, RICHIESTA_NON_VALIDA, "Batch vuoto")
+            risposte = [r for r in await asyncio.gather(*(self._chiama(m) for m in messaggio))
+                        if r is not None]
+            return b'[' + b','.join(risposte) + b']' if risposte else None
+        return await self._chiama(messaggio)
+    
+    async def _chiama(self, messaggio: Any) -> Optional[bytes]:
+        """Esegue una singola chiamata; None per le notifiche (senza id)"""
+        if not isinstance(messaggio, dict) or messaggio.get('jsonrpc') != '2.0' \
+                or not isinstance(messaggio.get('method'), str):
+            id_ = messaggio.get('id') if isinstance(messaggio, dict) else None
+            return self._errore(id_, RICHIESTA_NON_VALIDA, "Richiesta JSON-RPC 2.0 non valida")
+        notifica = 'id' not in messaggio
+        id_ = messaggio.get('id')
+        nome = messaggio['method']
+        self.statistiche['richieste'] += 1
+        
+        if nome not in METODI:
+            risposta = self._errore(id_, METODO_INESISTENTE, f"Metodo non supportato: {nome}")
+            return None if notifica else risposta
+        parametri = messaggio.get('params', [])
+        args, kwargs = (parametri, {}) if isinstance(parametri, list) else ([], parametri)
+        try:
+            if not isinstance(kwargs, dict):
+                raise TypeError("params deve essere una lista o un oggetto")
+            _FIRME[nome].bind(None, *args, **kwargs)
+        except TypeError as e:
+            risposta = self._errore(id_, PARAMETRI_NON_VALIDI, str(e))
+            return None if notifica else risposta
+        
+        try:
+            risultato = await self._loop.run_in_executor(self._pool, self._esegui_metodo,
+                                                         nome, args, kwargs)
+            risposta = (b'{"jsonrpc":"2.0","id":' + json.dumps(id_).encode()
+                        + b',"result":' + risultato + b'}')
+        except (ValueError, TypeError) as e:
+            risposta = self._errore(id_, ERRORE_APPLICATIVO, str(e))
+        except Exception as e:
+            risposta = self._errore(id_, ERRORE_INTERNO, f"Errore interno: {e}")
+        return None if notifica else risposta
+    
+    @staticmethod
+    def _errore(id_: Any, codice: int, messaggio: str) -> bytes:
+        return json.dumps({'jsonrpc': '2.0', 'id': id_,
+                           'error': {'code': codice, 'message': messaggio}},
+                          ensure_ascii=False, separators=(',', ':')).encode()
+    
+    # ===== HTTP =====
+    
+    async def _gestisci_connessione(self, reader: asyncio.StreamReader,
+                                    writer: asyncio.StreamWriter):
+        """Serve le richieste HTTP di una connessione (keep-alive) finché resta aperta"""
+        task = asyncio.current_task()
+        self._connessioni[task] = writer
+        try:
+            while not self._fermo.is_set():
+                try:
+                    testa = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), TIMEOUT_INATTIVITA)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                righe = testa.decode('latin-1').split('\r\n')
+                parti = righe[0].split()
+                if len(parti) != 3:
+                    writer.write(self._http(400, b'', True))
+                    break
+                metodo, percorso, versione = parti
+                intestazioni = {}
+                for riga in righe[1:]:
+                    nome, _, valore = riga.partition(':')
+                    if nome:
+                        intestazioni[nome.strip().lower()] = valore.strip()
+                connessione = intestazioni.get('connection', '').lower()
+                chiudi = connessione == 'close' or (versione == 'HTTP/1.0' and connessione != 'keep-alive')
+                
+                try:
+                    lunghezza = int(intestazioni.get('content-length') or 0)
+                except ValueError:
+                    lunghezza = -1
+                if lunghezza < 0 or lunghezza > DIMENSIONE_MASSIMA:
+                    writer.write(self._http(413 if lunghezza > 0 else 400, b'', True))
+                    break
+                corpo = await reader.readexactly(lunghezza) if lunghezza else b''
+                
+                stato, risposta = await self._rispondi(metodo, percorso, intestazioni, corpo)
+                writer.write(self._http(stato, risposta, chiudi))
+                await writer.drain()
+                if chiudi:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            del self._connessioni[task]
+            writer.close()
+    
+    async def _rispondi(self, metodo: str, percorso: str, intestazioni: Dict[str, str],
+                        corpo: bytes) -> Tuple[int, bytes]:
+        """Stato HTTP e corpo della risposta a una richiesta"""
+        if percorso.split('?')[0] not in ('/', '/rpc'):
+            return 404, b''
+        autorizzazione = intestazioni.get('authorization', '')
+        if not hmac.compare_digest(autorizzazione.encode(), f"Bearer {self.token}".encode()):
+            return 401, b''
+        if metodo != 'POST':
+            return 405, b''
+        risposta = await self._elabora_rpc(corpo)
+        return (204, b'') if risposta is None else (200, risposta)
+    
+    @staticmethod
+    def _http(stato: int, corpo: bytes, chiudi: bool) -> bytes:
+        intestazioni = [f"HTTP/1.1 {stato} {_MOTIVI_HTTP[stato]}",
+                        "Content-Type: application/json",
+                        f"Content-Length: {len(corpo)}"]
+        if stato == 401:
+            intestazioni.append("WWW-Authenticate: Bearer")
+        if stato == 405:
+            intestazioni.append("Allow: POST")
+        if chiudi:
+            intestazioni.append("Connection: close")
+        return ("\r\n".join(intestazioni) + "\r\n\r\n").encode() + corpo
+
+
+class ClientRPC:
+    """
+    Client minimo del servizio (una connessione HTTP keep-alive)
+    
+    Non thread-safe: usare un client per thread.
+    """
+    
+    def __init__(self, url: Optional[str] = None, token: Optional[str] = None,
+                 percorso_token: str = TOKEN_FILE, timeout: float = 30):
+        """
+        Inizializza il client
+        
+        Args:
+            url: URL del servizio (default: letto da percorso_token)
+            token: Token di autenticazione (default: letto da percorso_token)
+            percorso_token: File scritto dal servizio all'avvio
+            timeout: Secondi massimi di attesa di una risposta
+        
+        Raises:
+            ConnectionError: Se URL o token mancano e il file non è leggibile
+        """
+        if url is None or token is None:
+            try:
+                with open(percorso_token) as f:
+                    dati = json.load(f)
+            except (OSError, ValueError) as e:
+                raise ConnectionError(f"Servizio RPC non disponibile: {e}") from e
+            url, token = url or dati['url'], token or dati['token']
+        from urllib.parse import urlsplit
+        parti = urlsplit(url)
+        self.host, self.porta = parti.hostname, parti.port or 80
+        self.token = token
+        self.timeout = timeout
+        self._conn = None
+        self._id = 0
+    
+    def chiama(self, metodo: str, *args, **kwargs) -> Any:
+        """
+        Chiama un metodo del servizio
+        
+        Returns:
+            Risultato del metodo
+        
+        Raises:
+            ConnectionError: Se il servizio non risponde o rifiuta il token
+            ValueError: Se il metodo restituisce un errore
+        """
+        import http.client
+        if args and kwargs:
+            raise TypeError("JSON-RPC: parametri per nome o per posizione, non entrambi")
+        self._id += 1
+        corpo = json.dumps({'jsonrpc': '2.0', 'id': self._id, 'method': metodo,
+                            'params': kwargs or list(args)}).encode()
+        intestazioni = {'Content-Type': 'application/json',
+                        'Authorization': f"Bearer {self.token}"}
+        for tentativo in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.porta, timeout=self.timeout)
+            try:
+                self._conn.request('POST', '/', corpo, intestazioni)
+                risposta = self._conn.getresponse()
+                dati = risposta.read()
+                break
+            except (OSError, http.client.HTTPException) as e:
+                # Connessione keep-alive chiusa dal server: un secondo tentativo
+                self.chiudi()
+                if tentativo:
+                    raise ConnectionError(f"Servizio RPC non disponibile: {e}") from e
+        if risposta.status == 401:
+            raise ConnectionError("Token del servizio RPC non valido")
+        if risposta.status != 200:
+            raise ConnectionError(f"Risposta HTTP inattesa: {risposta.status}")
+        messaggio = json.loads(dati)
+        if 'error' in messaggio:
+            raise ValueError(messaggio['error'].get('message') or "Errore del servizio RPC")
+        return messaggio.get('result')
+    
+    def chiudi(self):
+        """Chiude la connessione"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
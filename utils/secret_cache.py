@@ -0,0 +1,89 @@
+"""
+Cache a breve scadenza per i segreti decriptati
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class SecretCache:
+    """
+    Cache LRU limitata per dimensione e durata delle password in chiaro
+
+    Le chiavi sono i ciphertext: se una password cambia il nuovo ciphertext
+    non trova la vecchia voce, che scade da sola. Le voci scadute vengono
+    rimosse alla lettura e a ogni inserimento.
+    """
+
+    # Valori predefiniti: poche voci, vita breve
+    MAX_VOCI = 32
+    DURATA_SECONDI = 60.0
+
+    def __init__(self, max_voci: int = MAX_VOCI, durata_secondi: float = DURATA_SECONDI):
+        """
+        Inizializza la cache
+
+        Args:
+            max_voci: Numero massimo di segreti conservati
+            durata_secondi: Secondi dopo i quali un segreto viene scartato
+        """
+        self.max_voci = max_voci
+        self.durata_secondi = durata_secondi
+        self._voci: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ottieni(self, chiave: str) -> Optional[str]:
+        """
+        Restituisce il segreto associato alla chiave se presente e non scaduto
+
+        Args:
+            chiave: Ciphertext della password
+
+        Returns:
+            Password in chiaro o None
+        """
+        with self._lock:
+            voce = self._voci.get(chiave)
+            if voce is None:
+                return None
+            scadenza, segreto = voce
+            if scadenza <= time.monotonic():
+                del self._voci[chiave]
+                return None
+            self._voci.move_to_end(chiave)
+            return segreto
+
+    def memorizza(self, chiave: str, segreto: str):
+        """
+        Memorizza un segreto, scartando le voci scadute o meno recenti
+
+        Args:
+            chiave: Ciphertext della password
+            segreto: Password in chiaro
+        """
+        if self.max_voci <= 0:
+            return
+        with self._lock:
+            adesso = time.monotonic()
+            self._voci[chiave] = (adesso + self.durata_secondi, segreto)
+            self._voci.move_to_end(chiave)
+            for k in [k for k, (scadenza, _) in self._voci.items() if scadenza <= adesso]:
+                del self._voci[k]
+            while len(self._voci) > self.max_voci:
+                self._voci.popitem(last=False)
+
+    def rimuovi(self, chiave: str):
+        """Rimuove un singolo segreto dalla cache"""
+        with self._lock:
+            self._voci.pop(chiave, None)
+
+    def svuota(self):
+        """Rimuove tutti i segreti (es. al cambio della master password)"""
+        with self._lock:
+            self._voci.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._voci)
@@ -0,0 +1,475 @@
+"""
+Agente di sblocco locale (in stile ssh-agent)
+
+Un processo separato mantiene in memoria le chiavi del vault sbloccato per
+un tempo limitato e risponde alle richieste di GUI, script e integrazioni
+su un socket Unix (Windows: named pipe). Ogni richiesta usa una propria
+connessione autenticata con challenge-response HMAC sul token segreto
+scritto dall'agente in un file leggibile solo dall'utente: chi non
+conosce il token non ottiene risposta. Ogni connessione è servita in un
+thread proprio con un timeout, quindi un client bloccato non ferma gli
+altri né la scadenza.
+
+L'operazione 'chiavi' consegna la DEK a chi la chiede (GUI e CLI la usano
+per sbloccarsi senza password): il client la conserva finché resta
+aperto, anche dopo la scadenza o il blocco dell'agente, che limitano solo
+gli sblocchi successivi. Con --senza-chiavi l'agente serve solo le
+operazioni derivate (cifratura, ricerca, password) e la DEK non esce dal
+suo processo.
+
+Avvio da terminale (chiede la master password):
+    python -m utils.unlock_agent --durata 3600
+"""
+
+import argparse
+import getpass
+import hashlib
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge
+from typing import Any, Dict, List, Optional, Tuple
+from utils.crypto_manager import CryptoManager
+
+# File con il token di autenticazione (relativo come security_config.json)
+TOKEN_FILE = 'agente_sblocco.token'
+
+# Durata predefinita dello sblocco (secondi)
+DURATA_PREDEFINITA = 3600
+
+# Risultati massimi di una ricerca
+LIMITE_RICERCA = 200
+
+# Secondi concessi a una connessione (autenticazione, richiesta e risposta)
+TIMEOUT_CONNESSIONE = 5.0
+
+# Connessioni servite contemporaneamente (le altre vengono chiuse subito)
+MAX_CONNESSIONI = 32
+
+
+def indirizzo_predefinito(percorso_config: str = CryptoManager.CONFIG_FILE) -> Tuple[str, str]:
+    """
+    Indirizzo dell'agente per un vault (uno per utente e per configurazione)
+    
+    Returns:
+        Tupla (indirizzo, famiglia per multiprocessing.connection)
+    """
+    vault = hashlib.sha256(os.path.abspath(percorso_config).encode()).hexdigest()[:12]
+    if sys.platform == 'win32':
+        return rf'\\.\pipe\accesscentral-{getpass.getuser()}-{vault}', 'AF_PIPE'
+    cartella = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(cartella, f'accesscentral-{os.getuid()}-{vault}.sock'), 'AF_UNIX'
+
+
+class AgenteSblocco:
+    """
+    Server dell'agente: serve una richiesta per connessione fino alla
+    scadenza (o a una richiesta 'blocca'), poi dimentica le chiavi
+    
+    Il thread principale accetta soltanto le connessioni: autenticazione e
+    richiesta avvengono in un thread per connessione, con TIMEOUT_CONNESSIONE.
+    
+    Richieste (JSON con campo 'op'):
+        stato: secondi rimanenti e vault servito
+        chiavi: chiavi del vault (per avviare la GUI senza derivazione); il
+                client le conserva oltre la scadenza. Rifiutata se
+                l'agente è avviato con consenti_chiavi=False
+        decripta / cripta: liste di valori (forma testuale dei BLOB); decripta
+                           fallisce se un valore cifrato non è decifrabile
+        cerca: credenziali per testo (senza password)
+        password: password in chiaro di una credenziale
+        blocca: termina l'agente
+    """
+    
+    def __init__(self, crypto_manager: CryptoManager, db_path: Optional[str] = None,
+                 durata: int = DURATA_PREDEFINITA,
+                 percorso_config: str = CryptoManager.CONFIG_FILE,
+                 percorso_token: str = TOKEN_FILE, consenti_chiavi: bool = True):
+        """
+        Inizializza l'agente
+        
+        Args:
+            crypto_manager: CryptoManager già sbloccato
+            db_path: Database per le ricerche (None = solo operazioni di cifratura)
+            durata: Secondi dopo i quali l'agente si blocca
+            percorso_config: Configurazione del vault servito
+            percorso_token: File in cui scrivere il token di autenticazione
+            consenti_chiavi: Serve l'operazione 'chiavi' (False = la DEK
+                             non lascia il processo dell'agente)
+        """
+        self.crypto_manager = crypto_manager
+        self.db_path = db_path
+        self.durata = durata
+        self.percorso_config = percorso_config
+        self.percorso_token = percorso_token
+        self.consenti_chiavi = consenti_chiavi
+        self.scadenza = None
+        self._token = None
+        self._attivo = False
+        self._lock = threading.Lock()  # una richiesta alla volta sulle chiavi
+        self._slot = threading.BoundedSemaphore(MAX_CONNESSIONI)
+    
+    def esegui(self):
+        """Scrive il token, resta in ascolto fino alla scadenza e ripulisce"""
+        token = os.urandom(32)
+        indirizzo, famiglia = indirizzo_predefinito(self.percorso_config)
+        if famiglia == 'AF_UNIX' and os.path.exists(indirizzo):
+            os.unlink(indirizzo)  # socket di un agente terminato male
+        
+        maschera = os.umask(0o077)  # socket e token accessibili solo all'utente
+        try:
+            # Senza authkey: l'autenticazione avviene nel thread della connessione
+            listener = Listener(indirizzo, famiglia)
+            self._token = token
+            self._scrivi_token(token)
+        finally:
+            os.umask(maschera)
+        
+        self.scadenza = time.monotonic() + self.durata
+        self._attivo = True
+        timer = threading.Timer(self.durata, self._scadi)
+        timer.daemon = True
+        timer.start()
+        try:
+            while self._attivo:
+                try:
+                    conn = listener.accept()
+                except OSError:
+                    continue
+                if not self._attivo or not self._slot.acquire(blocking=False):
+                    conn.close()  # agente bloccato o troppe connessioni aperte
+                    continue
+                threading.Thread(target=self._servi, args=(conn,),
+                                 name="agente-connessione", daemon=True).start()
+        finally:
+            timer.cancel()
+            listener.close()
+            self._dimentica()
+    
+    def _scrivi_token(self, token: bytes):
+        """Scrive il token in un file leggibile solo dall'utente (sostituzione atomica)"""
+        temporaneo = self.percorso_token + '.tmp'
+        fd = os.open(temporaneo, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(token.hex())
+        os.replace(temporaneo, self.percorso_token)
+    
+    def _scadi(self):
+        """Allo scadere della durata dimentica subito le chiavi e ferma l'accept"""
+        self._dimentica()
+        self._risveglia()
+    
+    def _risveglia(self):
+        """Connessione vuota (senza autenticazione) che sblocca listener.accept()"""
+        try:
+            Client(*indirizzo_predefinito(self.percorso_config)).close()
+        except OSError:
+            pass
+    
+    def _dimentica(self):
+        """Cancella chiavi e token (le richieste successive falliscono)"""
+        self._attivo = False
+        with self._lock:
+            self.crypto_manager = None
+        try:
+            os.remove(self.percorso_token)
+        except OSError:
+            pass
+    
+    def _servi(self, conn):
+        """Autentica il client, legge una richiesta, la esegue e invia la risposta"""
+        try:
+            with conn:
+                _imposta_timeout(conn, TIMEOUT_CONNESSIONE)
+                try:
+                    deliver_challenge(conn, self._token)
+                    answer_challenge(conn, self._token)
+                    if not conn.poll(TIMEOUT_CONNESSIONE):
+                        return
+                    richiesta = json.loads(conn.recv_bytes(1024 * 1024))
+                except (AuthenticationError, EOFError, OSError, ValueError):
+                    return  # client senza token valido, disconnesso o troppo lento
+                try:
+                    with self._lock:
+                        risposta = {'ok': True, 'risultato': self._esegui_richiesta(richiesta)}
+                except Exception as e:
+                    # Richiesta non valida o errore del database: l'agente resta attivo
+                    risposta = {'ok': False, 'errore': str(e)}
+                try:
+                    conn.send_bytes(json.dumps(risposta).encode())
+                except OSError:
+                    pass
+            if not self._attivo:
+                self._risveglia()  # richiesta 'blocca': termina il ciclo di accept
+        finally:
+            self._slot.release()
+    
+    def _esegui_richiesta(self, richiesta: Dict[str, Any]) -> Any:
+        """Esegue un'operazione; ValueError per richieste non valide"""
+        op = richiesta.get('op')
+        crypto = self.crypto_manager
+        if op == 'stato':
+            return {'secondi_rimanenti': max(0, int(self.scadenza - time.monotonic())),
+                    'vault': os.path.abspath(self.percorso_config)}
+        if crypto is None:
+            raise ValueError("Agente bloccato")
+        if op == 'blocca':
+            self._attivo = False
+            return True
+        if op == 'chiavi':
+            if not self.consenti_chiavi:
+                raise ValueError("Agente avviato senza consegna delle chiavi")
+            return crypto.esporta_chiavi()
+        if op == 'decripta':
+            return [crypto.decripta(crypto.da_testo(v)) for v in self._valori(richiesta)]
+        if op == 'cripta':
+            return [crypto.cripta_testo(v) for v in self._valori(richiesta)]
+        if op == 'cerca':
+            limite = min(int(richiesta.get('limite') or LIMITE_RICERCA), LIMITE_RICERCA)
+            from models.credenziale import Credenziale
+            with self._database() as db:
+                return [dict(row) for row in Credenziale.search(db, str(richiesta.get('testo', '')),
+                                                                limite)]
+        if op == 'password':
+            from models.credenziale import Credenziale
+            with self._database() as db:
+                credenziale = Credenziale.get_by_id(db, int(richiesta.get('id') or 0))
+            if not credenziale:
+                raise ValueError("Credenziale non trovata")
+            return crypto.decripta(credenziale.password) if credenziale.password else ""
+        raise ValueError(f"Operazione non supportata: {op}")
+    
+    @staticmethod
+    def _valori(richiesta: Dict[str, Any]) -> List[str]:
+        """Lista di valori testuali di una richiesta"""
+        valori = richiesta.get('valori')
+        if not isinstance(valori, list) or not all(isinstance(v, str) for v in valori):
+            raise ValueError("'valori' deve essere una lista di stringhe")
+        return valori
+    
+    @contextmanager
+    def _database(self):
+        """
+        Connessione al database delle ricerche per una richiesta: le
+        richieste arrivano da thread diversi e una connessione SQLite
+        appartiene al thread che l'ha aperta
+        """
+        if not self.db_path:
+            raise ValueError("Agente avviato senza database")
+        from models.database import DatabaseManager
+        db = DatabaseManager(self.db_path, inizializza=False)
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+def _imposta_timeout(conn, secondi: float):
+    """
+    Timeout di lettura e scrittura sul socket di una connessione: le
+    letture bloccate falliscono con OSError invece di restare appese (sulle
+    named pipe di Windows resta appeso solo il thread della connessione)
+    """
+    if sys.platform == 'win32':
+        return
+    s = socket.fromfd(conn.fileno(), socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        intervallo = struct.pack('ll', int(secondi), int(secondi % 1 * 1_000_000))
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, intervallo)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, intervallo)
+    finally:
+        s.close()  # chiude il duplicato, le opzioni restano sul socket
+
+
+class ClientAgente:
+    """Client dell'agente di sblocco: una connessione autenticata per richiesta"""
+    
+    def __init__(self, percorso_config: str = CryptoManager.CONFIG_FILE,
+                 percorso_token: str = TOKEN_FILE, timeout: float = TIMEOUT_CONNESSIONE):
+        """
+        Inizializza il client
+        
+        Args:
+            percorso_config: Configurazione del vault (determina l'indirizzo)
+            percorso_token: File con il token scritto dall'agente
+            timeout: Secondi massimi per connessione, autenticazione e risposta
+        """
+        self.percorso_config = percorso_config
+        self.percorso_token = percorso_token
+        self.timeout = timeout
+    
+    def richiesta(self, op: str, **argomenti) -> Any:
+        """
+        Invia una richiesta all'agente
+        
+        Returns:
+            Risultato dell'operazione
+        
+        Raises:
+            ConnectionError: Se l'agente non è attivo, non risponde entro il
+                             timeout o il token non è valido
+            ValueError: Se l'agente rifiuta la richiesta
+        """
+        # Client() non ha timeout (connessione e autenticazione possono
+        # restare appese su un agente bloccato): lo scambio avviene in un
+        # thread daemon abbandonato allo scadere del timeout
+        esito = {}
+        
+        def scambia():
+            try:
+                with open(self.percorso_token) as f:
+                    token = bytes.fromhex(f.read().strip())
+                indirizzo, famiglia = indirizzo_predefinito(self.percorso_config)
+                with Client(indirizzo, famiglia, authkey=token) as conn:
+                    conn.send_bytes(json.dumps(dict(argomenti, op=op)).encode())
+                    esito['risposta'] = json.loads(conn.recv_bytes())
+            except (OSError, EOFError, AuthenticationError, ValueError) as e:
+                esito['errore'] = e
+        
+        thread = threading.Thread(target=scambia, name="client-agente", daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+        if 'errore' in esito:
+            errore = esito['errore']
+            raise ConnectionError(f"Agente di sblocco non disponibile: {errore}") from errore
+        if 'risposta' not in esito:
+            raise ConnectionError(
+                f"Agente di sblocco non disponibile: nessuna risposta in {self.timeout:g} s")
+        risposta = esito['risposta']
+        if not risposta.get('ok'):
+            raise ValueError(risposta.get('errore') or "Richiesta rifiutata dall'agente")
+        return risposta.get('risultato')
+    
+    def disponibile(self) -> bool:
+        """Indica se un agente è attivo e accetta il token"""
+        try:
+            self.stato()
+            return True
+        except (ConnectionError, ValueError):
+            return False
+    
+    def stato(self) -> Dict[str, Any]:
+        """Secondi rimanenti e vault servito"""
+        return self.richiesta('stato')
+    
+    def chiavi(self) -> Dict[str, Optional[str]]:
+        """
+        Chiavi del vault (vedi CryptoManager.importa_chiavi); restano valide
+        nel processo chiamante anche dopo la scadenza dell'agente
+        """
+        return self.richiesta('chiavi')
+    
+    def decripta(self, valori: List[str]) -> List[str]:
+        """Decifra valori nella forma testuale (o token legacy); ValueError se uno non è decifrabile"""
+        return self.richiesta('decripta', valori=list(valori))
+    
+    def cripta(self, valori: List[str]) -> List[str]:
+        """Cifra testi in chiaro (restituisce la forma testuale dei BLOB)"""
+        return self.richiesta('cripta', valori=list(valori))
+    
+    def cerca(self, testo: str, limite: int = LIMITE_RICERCA) -> List[Dict[str, Any]]:
+        """Credenziali che corrispondono al testo (senza password)"""
+        return self.richiesta('cerca', testo=testo, limite=limite)
+    
+    def password(self, credenziale_id: int) -> str:
+        """Password in chiaro di una credenziale"""
+        return self.richiesta('password', id=credenziale_id)
+    
+    def blocca(self) -> bool:
+        """Termina l'agente (le chiavi vengono dimenticate)"""
+        return self.richiesta('blocca')
+
+
+def avvia_processo(crypto_manager: CryptoManager, durata: int = DURATA_PREDEFINITA,
+                   db_path: Optional[str] = None, attesa: float = 5.0) -> bool:
+    """
+    Avvia l'agente in un processo separato passandogli le chiavi già sbloccate
+    (via stdin, senza nuova derivazione)
+    
+    Args:
+        crypto_manager: CryptoManager sbloccato
+        durata: Secondi di validità dello sblocco
+        db_path: Database per le ricerche
+        attesa: Secondi massimi di attesa dell'avvio
+    
+    Returns:
+        True se l'agente risponde entro il tempo di attesa
+    """
+    comando = [sys.executable, '-m', 'utils.unlock_agent', '--stdin', '--durata', str(durata)]
+    if db_path:
+        comando += ['--db', os.path.abspath(db_path)]
+    opzioni = {}
+    if sys.platform == 'win32':
+        opzioni['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        opzioni['start_new_session'] = True
+    processo = subprocess.Popen(comando, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                **opzioni)
+    chiavi = dict(crypto_manager.esporta_chiavi(),
+                  config=os.path.abspath(CryptoManager.CONFIG_FILE),
+                  token=os.path.abspath(TOKEN_FILE))
+    processo.stdin.write(json.dumps(chiavi).encode())
+    processo.stdin.close()
+    
+    client = ClientAgente()
+    limite = time.monotonic() + attesa
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            return False
+        if client.disponibile():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Avvio dell'agente da riga di comando"""
+    parser = argparse.ArgumentParser(description="Agente di sblocco di AccessCentral")
+    parser.add_argument('--durata', type=int, default=DURATA_PREDEFINITA,
+                        help="secondi di validità dello sblocco (default %(default)s)")
+    parser.add_argument('--db', default='credenziali_suite.db', help="database per le ricerche")
+    parser.add_argument('--config', default=CryptoManager.CONFIG_FILE)
+    parser.add_argument('--token', default=TOKEN_FILE)
+    parser.add_argument('--stdin', action='store_true',
+                        help="legge le chiavi già sbloccate da stdin (avvio dalla GUI)")
+    parser.add_argument('--senza-chiavi', action='store_true',
+                        help="non consegna la DEK ai client: solo cifratura, ricerca e password")
+    args = parser.parse_args(argv)
+    
+    crypto_manager = CryptoManager()
+    if args.stdin:
+        chiavi = json.loads(sys.stdin.read())
+        args.config = chiavi.pop('config', args.config)
+        args.token = chiavi.pop('token', args.token)
+        if not crypto_manager.carica_config(args.config) or not crypto_manager.importa_chiavi(chiavi):
+            return 1
+    else:
+        if not crypto_manager.carica_config(args.config):
+            print("Configurazione di sicurezza non trovata o corrotta", file=sys.stderr)
+            return 1
+        if crypto_manager.is_legacy():
+            print("Aprire prima l'applicazione per aggiornare la configurazione", file=sys.stderr)
+            return 1
+        if not crypto_manager.sblocca(getpass.getpass("Master password: ")):
+            print("Password errata", file=sys.stderr)
+            return 1
+        print(f"Vault sbloccato per {args.durata} secondi")
+    
+    db_path = args.db if os.path.exists(args.db) else None
+    AgenteSblocco(crypto_manager, db_path, args.durata, args.config, args.token,
+                  consenti_chiavi=not args.senza_chiavi).esegui()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
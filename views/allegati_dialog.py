@@ -96,7 +96,7 @@ class AllegatiDialog(QDialog):
     def carica_allegati(self):
         """Carica gli allegati del cliente nella tabella"""
         self.tabella.setRowCount(0)
-        allegati = Allegato.get_by_cliente(self.db, self.cliente_id)
+        allegati = Allegato.get_by_cliente_summary(self.db, self.cliente_id)
         
         dimensione_totale = 0
         for allegato in allegati:
@@ -4,7 +4,8 @@ Dialog per gestire Consulenti e Contatti del Cliente
 
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
                              QListWidget, QLabel, QMessageBox, QFormLayout,
-                             QLineEdit, QListWidgetItem, QWidget, QTextBrowser)
+                             QLineEdit, QListWidgetItem, QWidget, QTextBrowser,
+                             QAbstractItemView)
 from PyQt5.QtCore import Qt, QUrl
 from PyQt5.QtGui import QDesktopServices, QFont, QColor
 from controllers.risorse_controller import RisorseController
@@ -44,6 +45,7 @@ class GestioneConsulentiClienteDialog(QDialog):
         left_layout = QVBoxLayout()
         left_layout.addWidget(QLabel("<b>Consulenti Disponibili:</b>"))
         self.list_disponibili = QListWidget()
+        self.list_disponibili.setSelectionMode(QAbstractItemView.ExtendedSelection)
         left_layout.addWidget(self.list_disponibili)
         
         btn_aggiungi = QPushButton("➡️ Aggiungi")
@@ -57,6 +59,7 @@ class GestioneConsulentiClienteDialog(QDialog):
         right_layout = QVBoxLayout()
         right_layout.addWidget(QLabel("<b>Consulenti Associati:</b>"))
         self.list_associati = QListWidget()
+        self.list_associati.setSelectionMode(QAbstractItemView.ExtendedSelection)
         right_layout.addWidget(self.list_associati)
         
         btn_rimuovi = QPushButton("⬅️ Rimuovi")
@@ -105,25 +108,25 @@ class GestioneConsulentiClienteDialog(QDialog):
             self.list_associati.addItem(item)
     
     def aggiungi_consulente(self):
-        """Associa il consulente selezionato al cliente"""
-        item = self.list_disponibili.currentItem()
-        if not item:
+        """Associa i consulenti selezionati al cliente"""
+        items = self.list_disponibili.selectedItems()
+        if not items:
             QMessageBox.warning(self, "Attenzione", "Seleziona un consulente da aggiungere")
             return
         
-        consulente_id = item.data(Qt.UserRole)
-        self.risorse_controller.associa_consulente_cliente(self.cliente_id, consulente_id)
+        consulenti_ids = [item.data(Qt.UserRole) for item in items]
+        self.risorse_controller.associa_consulenti_clienti(consulenti_ids, [self.cliente_id])
         self.carica_dati()
     
     def rimuovi_consulente(self):
-        """Disassocia il consulente selezionato dal cliente"""
-        item = self.list_associati.currentItem()
-        if not item:
+        """Disassocia i consulenti selezionati dal cliente"""
+        items = self.list_associati.selectedItems()
+        if not items:
             QMessageBox.warning(self, "Attenzione", "Seleziona un consulente da rimuovere")
             return
         
-        consulente_id = item.data(Qt.UserRole)
-        self.risorse_controller.disassocia_consulente_cliente(self.cliente_id, consulente_id)
+        consulenti_ids = [item.data(Qt.UserRole) for item in items]
+        self.risorse_controller.disassocia_consulenti_clienti(consulenti_ids, [self.cliente_id])
         self.carica_dati()
 
 
@@ -193,7 +196,7 @@ class GestioneContattiDialog(QDialog):
     
     def carica_dati(self):
         """Carica i contatti del cliente"""
-        contatti = self.risorse_controller.ottieni_contatti_cliente(self.cliente_id)
+        contatti = self.risorse_controller.ottieni_riepilogo_contatti_cliente(self.cliente_id)
         
         self.list_contatti.clear()
         for contatto in contatti:
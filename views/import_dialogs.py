@@ -0,0 +1,100 @@
+"""
+Dialog di anteprima dell'import di clienti, servizi e credenziali
+"""
+
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QLabel)
+from PyQt5.QtGui import QColor
+from utils.import_diff import DiffImport, NUOVI, MODIFICATI, CONFLITTI
+
+
+class AnteprimaImportDialog(QDialog):
+    """Mostra il diff calcolato dal dry-run e chiede conferma prima di applicarlo"""
+    
+    # Righe mostrate al massimo nella tabella (i conteggi restano completi)
+    MAX_RIGHE = 2000
+    
+    ESITI = {
+        NUOVI: ("➕ Nuovo", "#E8F5E9"),
+        MODIFICATI: ("✏️ Modificato", "#FFF8E1"),
+        CONFLITTI: ("⚠️ Conflitto", "#FFEBEE"),
+    }
+    
+    def __init__(self, parent, diff: DiffImport):
+        super().__init__(parent)
+        self.diff = diff
+        self.setWindowTitle("Anteprima Import")
+        self.setMinimumSize(950, 600)
+        
+        # Applica stile dalla finestra principale
+        if hasattr(parent, 'styleSheet') and parent.styleSheet():
+            self.setStyleSheet(parent.styleSheet())
+        
+        self.init_ui()
+    
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(15)
+        layout.setContentsMargins(20, 20, 20, 20)
+        
+        titolo = QLabel("<h2 style='color: #1976D2;'>📥 Anteprima Import</h2>")
+        layout.addWidget(titolo)
+        
+        riepilogo = QLabel(self.diff.riepilogo().replace("\n", "<br>"))
+        layout.addWidget(riepilogo)
+        layout.addWidget(QLabel(
+            "<i>Gli elementi identici e quelli in conflitto non verranno modificati. "
+            "Tutte le modifiche vengono applicate in un'unica transazione.</i>"
+        ))
+        
+        tabella = QTableWidget()
+        tabella.setColumnCount(4)
+        tabella.setHorizontalHeaderLabels(["Esito", "Tipo", "Elemento", "Dettaglio"])
+        tabella.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        tabella.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+        tabella.setEditTriggers(QTableWidget.NoEditTriggers)
+        tabella.verticalHeader().setVisible(False)
+        
+        omesse = 0
+        for categoria in (CONFLITTI, MODIFICATI, NUOVI):
+            esito, colore = self.ESITI[categoria]
+            for voce in self.diff.voci(categoria):
+                if tabella.rowCount() >= self.MAX_RIGHE:
+                    omesse += 1
+                    continue
+                if categoria == CONFLITTI:
+                    dettaglio = voce.motivo
+                elif categoria == MODIFICATI:
+                    dettaglio = "; ".join(f"{campo}: '{attuale}' → '{nuovo}'"
+                                          for campo, attuale, nuovo in voce.modifiche())
+                else:
+                    dettaglio = ""
+                row = tabella.rowCount()
+                tabella.insertRow(row)
+                for col, testo in enumerate((esito, voce.tipo.capitalize(), voce.etichetta, dettaglio)):
+                    item = QTableWidgetItem(testo)
+                    item.setBackground(QColor(colore))
+                    tabella.setItem(row, col, item)
+        tabella.resizeColumnToContents(0)
+        tabella.resizeColumnToContents(1)
+        layout.addWidget(tabella)
+        
+        if omesse:
+            layout.addWidget(QLabel(f"<i>... e altre {omesse} voci non mostrate</i>"))
+        
+        btn_layout = QHBoxLayout()
+        btn_layout.setSpacing(10)
+        
+        btn_applica = QPushButton("✅ Applica Import")
+        btn_applica.setObjectName("btn_success")
+        btn_applica.setEnabled(self.diff.ha_modifiche())
+        btn_applica.clicked.connect(self.accept)
+        
+        btn_annulla = QPushButton("❌ Annulla")
+        btn_annulla.setObjectName("btn_neutral")
+        btn_annulla.clicked.connect(self.reject)
+        
+        btn_layout.addStretch()
+        btn_layout.addWidget(btn_applica)
+        btn_layout.addWidget(btn_annulla)
+        layout.addLayout(btn_layout)
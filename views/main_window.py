@@ -10,8 +10,8 @@ from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QFileDialog, QMenu, QAction, QSplitter, QTabWidget,
                              QTableWidget, QTableWidgetItem, QHeaderView, QMenuBar,
                              QTextBrowser, QListWidget, QListWidgetItem, QFrame, QGridLayout,
-                             QApplication, QCheckBox)
-from PyQt5.QtCore import Qt, pyqtSignal, QUrl
+                             QApplication, QCheckBox, QAbstractItemView)
+from PyQt5.QtCore import Qt, pyqtSignal, QUrl, QTimer
 from PyQt5.QtGui import QIcon, QDesktopServices
 from models.database import DatabaseManager
 from models.cliente import Cliente
@@ -23,6 +23,8 @@ from models.contatto import Contatto
 from controllers.cliente_controller import ClienteController
 from controllers.credenziale_controller import CredenzialeController
 from controllers.risorse_controller import RisorseController
+from controllers.prefetch_controller import PrefetchController
+from controllers.raggiungibilita_controller import RaggiungibilitaController
 from utils.vpn_launcher import VPNLauncher
 from utils.rdp_launcher import RDPLauncher
 from views.template_dialogs import GestioneTemplateDialog, SelezionaTemplateDialog
@@ -34,19 +36,44 @@ from views.allegati_dialog import AllegatiDialog
 class MainWindow(QMainWindow):
     """Finestra principale dell'applicazione"""
     
+    # Testo mostrato al posto delle password non rivelate
+    PASSWORD_MASCHERATA = "••••••••"
+    
+    # Impronte calcolate per ogni passo del timer all'avvio
+    BLOCCO_IMPRONTE = 200
+    
     def __init__(self, crypto_manager=None, backup_manager=None):
         super().__init__()
         self.db = DatabaseManager()
         self.cliente_controller = ClienteController(self.db)
         self.credenziale_controller = CredenzialeController(self.db, crypto_manager)
         self.risorse_controller = RisorseController(self.db)
+        self.prefetch_controller = PrefetchController(self.db)
+        self.raggiungibilita_controller = RaggiungibilitaController(self.db)
         self.vpn_launcher = VPNLauncher()
         self.rdp_launcher = RDPLauncher()
         self.crypto_manager = crypto_manager
         self.backup_manager = backup_manager
         
+        # Esiti delle verifiche di raggiungibilità raccolti mentre arrivano
+        self.timer_raggiungibilita = QTimer(self)
+        self.timer_raggiungibilita.setInterval(200)
+        self.timer_raggiungibilita.timeout.connect(self.aggiorna_raggiungibilita)
+        
         self.init_ui()
         self.carica_dati()
+        
+        # Impronte mancanti (database precedenti): calcolate a blocchi dal timer
+        QTimer.singleShot(0, self.aggiorna_impronte_a_blocchi)
+        
+        # Rotazione della chiave interrotta: proponi di riprenderla
+        if self.crypto_manager and self.crypto_manager.rotazione_in_corso():
+            QTimer.singleShot(0, self.riprendi_rotazione_chiave)
+        elif self.crypto_manager:
+            # Password ancora nel formato testuale legacy: conversione in BLOB
+            from utils.key_rotation import KeyRotationManager
+            if KeyRotationManager(self.db, self.crypto_manager).conta_da_convertire():
+                QTimer.singleShot(0, self.converti_formato_password)
     
     def init_ui(self):
         """Inizializza l'interfaccia utente"""
@@ -116,9 +143,11 @@ class MainWindow(QMainWindow):
         # Tree widget clienti
         self.tree_clienti = QTreeWidget()
         self.tree_clienti.setHeaderLabels(["Clienti e Servizi"])
+        self.tree_clienti.setSelectionMode(QAbstractItemView.ExtendedSelection)  # Ctrl/Shift per spostamenti in blocco
         self.tree_clienti.setContextMenuPolicy(Qt.CustomContextMenu)
         self.tree_clienti.customContextMenuRequested.connect(self.mostra_menu_contestuale)
         self.tree_clienti.itemClicked.connect(self.cliente_selezionato)
+        self.tree_clienti.currentItemChanged.connect(self.cliente_evidenziato)
         left_layout.addWidget(self.tree_clienti)
         
         splitter.addWidget(left_panel)
@@ -289,7 +318,7 @@ class MainWindow(QMainWindow):
         
         # Tree widget credenziali con colonna azione
         self.tree_credenziali = QTreeWidget()
-        self.tree_credenziali.setHeaderLabels(["Username", "Host", "Porta", "Password", "Note", "Link", "Azione"])
+        self.tree_credenziali.setHeaderLabels(["Username", "Host", "Porta", "Password", "Note", "Link", "Azione", "Stato"])
         self.tree_credenziali.setColumnWidth(0, 150)
         self.tree_credenziali.setColumnWidth(1, 120)
         self.tree_credenziali.setColumnWidth(2, 60)
@@ -297,6 +326,7 @@ class MainWindow(QMainWindow):
         self.tree_credenziali.setColumnWidth(4, 150)
         self.tree_credenziali.setColumnWidth(5, 200)
         self.tree_credenziali.setColumnWidth(6, 120)
+        self.tree_credenziali.setColumnWidth(7, 110)
         self.tree_credenziali.setUniformRowHeights(False)
         self.tree_credenziali.setStyleSheet(self.tree_credenziali.styleSheet() + """
             QTreeWidget::item {
@@ -304,6 +334,9 @@ class MainWindow(QMainWindow):
                 padding: 5px 2px;
             }
         """)
+        self.tree_credenziali.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.tree_credenziali.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.tree_credenziali.customContextMenuRequested.connect(self.mostra_menu_credenziali)
         self.tree_credenziali.itemClicked.connect(self.credenziale_selezionata)
         self.tree_credenziali.itemDoubleClicked.connect(self.copia_password)
         right_layout.addWidget(self.tree_credenziali)
@@ -357,6 +390,7 @@ class MainWindow(QMainWindow):
         self.cliente_corrente = None
         self.servizio_corrente = None
         self.credenziale_corrente = None
+        self.credenziali_visualizzate = {}  # id -> credenziale (password cifrata)
     
     def applica_stile(self):
         """Applica lo stile CSS all'applicazione"""
@@ -621,6 +655,22 @@ class MainWindow(QMainWindow):
         azione_cambia_master.triggered.connect(self.cambia_master_password)
         menu_sicurezza.addAction(azione_cambia_master)
         
+        azione_parametri_sblocco = QAction("⏱️ Parametri di Sblocco...", self)
+        azione_parametri_sblocco.triggered.connect(self.imposta_parametri_sblocco)
+        menu_sicurezza.addAction(azione_parametri_sblocco)
+        
+        azione_avvia_agente = QAction("🔓 Avvia Agente di Sblocco...", self)
+        azione_avvia_agente.triggered.connect(self.avvia_agente_sblocco)
+        menu_sicurezza.addAction(azione_avvia_agente)
+        
+        azione_blocca_agente = QAction("🔒 Blocca Agente di Sblocco", self)
+        azione_blocca_agente.triggered.connect(self.blocca_agente_sblocco)
+        menu_sicurezza.addAction(azione_blocca_agente)
+        
+        azione_ruota_chiave = QAction("🔄 Ruota Chiave di Cifratura...", self)
+        azione_ruota_chiave.triggered.connect(self.ruota_chiave_cifratura)
+        menu_sicurezza.addAction(azione_ruota_chiave)
+        
         # Menu Backup
         menu_backup = menubar.addMenu("Backup")
         
@@ -653,6 +703,10 @@ class MainWindow(QMainWindow):
         azione_template_cliente.triggered.connect(self.apri_gestione_template_cliente)
         menu_gestione.addAction(azione_template_cliente)
         
+        azione_onboarding = QAction("👥 Crea Più Clienti da Template...", self)
+        azione_onboarding.triggered.connect(self.nuovi_clienti_da_template)
+        menu_gestione.addAction(azione_onboarding)
+        
         menu_gestione.addSeparator()
         
         azione_allegati_info = QAction("📎 Info Allegati", self)
@@ -670,6 +724,11 @@ class MainWindow(QMainWindow):
         azione_consulenti.triggered.connect(self.apri_gestione_consulenti)
         menu_risorse.addAction(azione_consulenti)
         
+        menu_risorse.addSeparator()
+        azione_matrice = QAction("Assegnazioni Clienti (Matrice)...", self)
+        azione_matrice.triggered.connect(self.apri_matrice_assegnazioni)
+        menu_risorse.addAction(azione_matrice)
+        
         # Menu Info
         menu_info = menubar.addMenu("Info")
         azione_about = QAction("Informazioni", self)
@@ -710,6 +769,13 @@ class MainWindow(QMainWindow):
         dialog = GestioneConsulentiDialog(self, self.risorse_controller)
         dialog.exec_()
     
+    def apri_matrice_assegnazioni(self):
+        """Apre l'editor a matrice di PM e consulenti per tutti i clienti"""
+        from views.risorse_dialogs import MatriceAssegnazioniDialog
+        dialog = MatriceAssegnazioniDialog(self, self.risorse_controller, self.cliente_controller)
+        if dialog.exec_() == QDialog.Accepted:
+            self.carica_dati()
+    
     def gestisci_consulenti_cliente(self, cliente_id: int):
         """Apre il dialog per gestire i consulenti di un cliente specifico"""
         cliente = self.cliente_controller.ottieni_cliente(cliente_id)
@@ -871,31 +937,33 @@ class MainWindow(QMainWindow):
         )
         
         if file_path:
-            reply = QMessageBox.question(
-                self, 
-                "Conferma Import",
-                "Sei sicuro di voler importare i dati?\n\n"
-                "Verranno creati nuovi clienti, servizi e credenziali.\n"
-                "Gli elementi esistenti non verranno modificati.",
-                QMessageBox.Yes | QMessageBox.No,
-                QMessageBox.No
-            )
+            from utils.import_export import ImportExportManager
+            from views.import_dialogs import AnteprimaImportDialog
+            manager = ImportExportManager(self.db, self.crypto_manager)
             
-            if reply == QMessageBox.Yes:
-                from utils.import_export import ImportExportManager
-                manager = ImportExportManager(self.db)
-                successo, messaggio, stats = manager.import_from_file(file_path)
-                
-                if successo:
-                    QMessageBox.information(self, "Import Completato", messaggio)
-                    self.carica_dati()  # Ricarica i dati per mostrare le nuove entità
-                else:
-                    QMessageBox.warning(self, "Errore Import", messaggio)
+            # Dry-run: nessuna scrittura finché l'utente non conferma l'anteprima
+            successo, messaggio, diff = manager.analizza_import(file_path)
+            if not successo:
+                QMessageBox.warning(self, "Errore Import", messaggio)
+                return
+            
+            dialog = AnteprimaImportDialog(self, diff)
+            if dialog.exec_() != QDialog.Accepted:
+                return
+            
+            successo, messaggio, stats = manager.applica_import(diff)
+            if successo:
+                QMessageBox.information(self, "Import Completato", messaggio)
+                self.carica_dati()  # Ricarica i dati per mostrare le nuove entità
+            else:
+                QMessageBox.warning(self, "Errore Import", messaggio)
     
     def carica_dati(self):
         """Carica i dati nel tree widget"""
+        self.prefetch_controller.svuota()
         self.tree_clienti.clear()
-        clienti = self.cliente_controller.ottieni_tutti_clienti()
+        # Solo colonne di riepilogo: il dettaglio viene caricato alla selezione
+        clienti = self.cliente_controller.ottieni_riepilogo_clienti()
         
         for cliente in clienti:
             item_cliente = QTreeWidgetItem(self.tree_clienti)
@@ -903,7 +971,7 @@ class MainWindow(QMainWindow):
             item_cliente.setData(0, Qt.UserRole, {'tipo': 'cliente', 'id': cliente.id})
             
             # Aggiungi servizi
-            servizi = self.cliente_controller.ottieni_servizi_cliente(cliente.id)
+            servizi = self.cliente_controller.ottieni_riepilogo_servizi_cliente(cliente.id)
             for servizio in servizi:
                 item_servizio = QTreeWidgetItem(item_cliente)
                 icona = self.get_icona_servizio(servizio.tipo)
@@ -929,6 +997,25 @@ class MainWindow(QMainWindow):
         }
         return icone.get(tipo, '🔧')
     
+    def cliente_evidenziato(self, current, previous):
+        """Precarica in background servizi e credenziali del cliente evidenziato e dei vicini"""
+        if current is None:
+            self.prefetch_controller.annulla()
+            return
+        
+        # Risale al nodo cliente (anche se è evidenziato un servizio)
+        while current.parent() is not None:
+            current = current.parent()
+        
+        indice = self.tree_clienti.indexOfTopLevelItem(current)
+        cliente_ids = []
+        for i in (indice, indice + 1, indice - 1):
+            if 0 <= i < self.tree_clienti.topLevelItemCount():
+                data = self.tree_clienti.topLevelItem(i).data(0, Qt.UserRole)
+                if data and data.get('tipo') == 'cliente':
+                    cliente_ids.append(data['id'])
+        self.prefetch_controller.richiedi(cliente_ids)
+    
     def cliente_selezionato(self, item, column):
         """Gestisce la selezione di un elemento nel tree"""
         data = item.data(0, Qt.UserRole)
@@ -950,7 +1037,8 @@ class MainWindow(QMainWindow):
         
         elif data['tipo'] == 'servizio':
             self.cliente_corrente = self.cliente_controller.ottieni_cliente(data['cliente_id'])
-            self.servizio_corrente = self.credenziale_controller.ottieni_servizio(data['id'])
+            self.servizio_corrente = (self.prefetch_controller.ottieni_servizio(data['id'])
+                                      or self.credenziale_controller.ottieni_servizio(data['id']))
             self.mostra_info_servizio()
             self.carica_credenziali()
             self.btn_nuova_credenziale.setEnabled(True)
@@ -986,9 +1074,9 @@ class MainWindow(QMainWindow):
             info += "</p>"
         
         # Contatti
-        contatti = self.risorse_controller.ottieni_contatti_cliente(self.cliente_corrente.id)
-        if contatti:
-            info += f"<p><b>Contatti in rubrica:</b> {len(contatti)}</p>"
+        num_contatti = self.risorse_controller.conta_contatti_cliente(self.cliente_corrente.id)
+        if num_contatti:
+            info += f"<p><b>Contatti in rubrica:</b> {num_contatti}</p>"
         
         num_servizi = self.cliente_controller.conta_servizi_cliente(self.cliente_corrente.id)
         info += f"<p><b>Numero servizi:</b> {num_servizi}</p>"
@@ -1023,7 +1111,11 @@ class MainWindow(QMainWindow):
         if self.servizio_corrente.link and self.servizio_corrente.tipo in ["CRM", "Web"]:
             info += f"<p><b>Link:</b> <a href='{self.servizio_corrente.link}'>{self.servizio_corrente.link}</a></p>"
         
-        num_cred = self.credenziale_controller.conta_credenziali_servizio(self.servizio_corrente.id)
+        precaricate = self.prefetch_controller.ottieni_credenziali_servizio(self.servizio_corrente.id)
+        if precaricate is not None:
+            num_cred = len(precaricate)
+        else:
+            num_cred = self.credenziale_controller.conta_credenziali_servizio(self.servizio_corrente.id)
         info += f"<p><b>Credenziali disponibili:</b> {num_cred}</p>"
         
         self.lbl_info.setText(info)
@@ -1042,19 +1134,26 @@ class MainWindow(QMainWindow):
         if not self.servizio_corrente:
             return
         
-        credenziali = self.credenziale_controller.ottieni_credenziali_servizio(
-            self.servizio_corrente.id
-        )
+        # Le password restano cifrate: si decriptano solo su rivela/copia/connetti.
+        # Se il cliente è stato precaricato in background la lista arriva dalla memoria
+        credenziali = self.prefetch_controller.ottieni_credenziali_servizio(self.servizio_corrente.id)
+        if credenziali is None:
+            credenziali = self.credenziale_controller.ottieni_riepilogo_credenziali_servizio(
+                self.servizio_corrente.id
+            )
+        self.credenziali_visualizzate = {cred.id: cred for cred in credenziali}
         
         for cred in credenziali:
             item = QTreeWidgetItem(self.tree_credenziali)
             item.setText(0, cred.username)
             item.setText(1, cred.host or "")
             item.setText(2, str(cred.porta) if cred.porta else "")
-            item.setText(3, cred.password)  # Mostra password visibile
+            item.setText(3, self.PASSWORD_MASCHERATA)  # Click sulla colonna per mostrarla
             item.setText(4, cred.note or "")
             item.setText(5, cred.link or "")  # Mostra link
             item.setData(0, Qt.UserRole, cred.id)
+            item.setData(7, Qt.UserRole, RaggiungibilitaController.destinazione(
+                cred.host, cred.porta, cred.link))
             
             # Aggiungi bottone azione nella colonna Azione
             widget_container = QWidget()
@@ -1101,6 +1200,55 @@ class MainWindow(QMainWindow):
             layout_container.addWidget(btn_azione, 0, Qt.AlignVCenter)
             
             self.tree_credenziali.setItemWidget(item, 6, widget_container)
+        
+        self.verifica_raggiungibilita()
+    
+    def verifica_raggiungibilita(self, forza: bool = False, items: list = None):
+        """
+        Mostra lo stato delle destinazioni delle credenziali visualizzate:
+        subito gli esiti ancora validi, poi quelli verificati in background
+        """
+        if items is None:
+            items = [self.tree_credenziali.topLevelItem(i)
+                     for i in range(self.tree_credenziali.topLevelItemCount())]
+        destinazioni = [item.data(7, Qt.UserRole) for item in items]
+        validi = self.raggiungibilita_controller.avvia([d for d in destinazioni if d], forza)
+        for item, destinazione in zip(items, destinazioni):
+            if destinazione in validi:
+                self._mostra_raggiungibilita(item, validi[destinazione])
+            elif destinazione:
+                item.setText(7, "⏳")
+                item.setToolTip(7, f"Verifica di {RaggiungibilitaController.etichetta(destinazione)} in corso...")
+        if self.raggiungibilita_controller.in_corso():
+            self.timer_raggiungibilita.start()
+    
+    def aggiorna_raggiungibilita(self):
+        """Applica alla lista gli esiti arrivati dal worker (timer)"""
+        in_corso = self.raggiungibilita_controller.in_corso()
+        esiti = {(e['host'], e['porta']): e for e in self.raggiungibilita_controller.raccogli()}
+        for i in range(self.tree_credenziali.topLevelItemCount()):
+            item = self.tree_credenziali.topLevelItem(i)
+            esito = esiti.get(item.data(7, Qt.UserRole))
+            if esito:
+                self._mostra_raggiungibilita(item, esito)
+            elif not in_corso and item.text(7) == "⏳":
+                item.setText(7, "")  # Verifica annullata
+                item.setToolTip(7, "")
+        if not in_corso:
+            self.timer_raggiungibilita.stop()
+    
+    @staticmethod
+    def _mostra_raggiungibilita(item: QTreeWidgetItem, esito: dict):
+        """Scrive l'esito di una verifica nella colonna Stato"""
+        destinazione = RaggiungibilitaController.etichetta((esito['host'], esito['porta']))
+        if esito['raggiungibile']:
+            item.setText(7, f"🟢 {esito['latenza_ms']:.0f} ms")
+            item.setToolTip(7, f"{destinazione} raggiungibile ({esito['indirizzo']})")
+        else:
+            item.setText(7, "🔴 Non raggiungibile")
+            item.setToolTip(7, f"{destinazione}: {esito['errore']}")
+        if esito.get('verificato_il'):
+            item.setToolTip(7, item.toolTip(7) + f"\nVerificato il {esito['verificato_il']} (UTC)")
     
     def connetti_rdp_diretta(self, credenziale: 'Credenziale'):
         """Connette a RDP con la credenziale specificata"""
@@ -1109,10 +1257,22 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, "Attenzione", "La credenziale non ha un host configurato")
                 return
             
+            # Evita di attendere il timeout di mstsc su un host già risultato irraggiungibile
+            destinazione = RaggiungibilitaController.destinazione(credenziale.host, credenziale.porta, None)
+            esito = self.raggiungibilita_controller.stato([destinazione]).get(destinazione)
+            if esito and not esito['raggiungibile']:
+                risposta = QMessageBox.question(
+                    self, "Host non raggiungibile",
+                    f"All'ultima verifica {RaggiungibilitaController.etichetta(destinazione)} non era raggiungibile "
+                    f"({esito['errore']}).\n\nConnettere comunque?",
+                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+                if risposta != QMessageBox.Yes:
+                    return
+            
             success, message = self.rdp_launcher.connetti_rdp(
                 credenziale.host,
                 credenziale.username,
-                credenziale.password,
+                self.credenziale_controller.rivela_password(credenziale),
                 credenziale.porta
             )
             
@@ -1165,15 +1325,27 @@ class MainWindow(QMainWindow):
     def credenziale_selezionata(self, item, column):
         """Gestisce la selezione di una credenziale"""
         credenziale_id = item.data(0, Qt.UserRole)
-        self.credenziale_corrente = self.credenziale_controller.ottieni_credenziale(credenziale_id)
+        self.credenziale_corrente = self.credenziale_controller.ottieni_credenziale(
+            credenziale_id, decripta=False
+        )
         self.btn_duplica_credenziale.setEnabled(True)
         self.btn_modifica_credenziale.setEnabled(True)
         self.btn_elimina_credenziale.setEnabled(True)
+        
+        # Click sulla colonna Password: mostra/nasconde la password
+        if column == 3 and self.credenziale_corrente:
+            if item.text(3) == self.PASSWORD_MASCHERATA:
+                try:
+                    item.setText(3, self.credenziale_controller.rivela_password(self.credenziale_corrente))
+                except ValueError as e:
+                    QMessageBox.warning(self, "Password non disponibile", str(e))
+            else:
+                item.setText(3, self.PASSWORD_MASCHERATA)
     
     def copia_password(self, item, column):
         """Copia il campo specifico negli appunti con doppio click"""
         credenziale_id = item.data(0, Qt.UserRole)
-        cred = self.credenziale_controller.ottieni_credenziale(credenziale_id)
+        cred = self.credenziali_visualizzate.get(credenziale_id)
         
         if cred:
             clipboard = QApplication.clipboard()
@@ -1188,7 +1360,11 @@ class MainWindow(QMainWindow):
                 QMessageBox.information(self, "Host Copiato",
                                       f"Host '{cred.host}' copiato negli appunti!")
             elif column == 3:  # Password
-                clipboard.setText(cred.password)
+                try:
+                    clipboard.setText(self.credenziale_controller.rivela_password(cred))
+                except ValueError as e:
+                    QMessageBox.warning(self, "Password non disponibile", str(e))
+                    return
                 QMessageBox.information(self, "Password Copiata",
                                       f"Password copiata negli appunti!")
             else:
@@ -1213,8 +1389,7 @@ class MainWindow(QMainWindow):
                 
                 # Associa i consulenti selezionati
                 consulenti_ids = dialog.get_consulenti_selezionati()
-                for consulente_id in consulenti_ids:
-                    self.risorse_controller.associa_consulente_cliente(cliente_id, consulente_id)
+                self.risorse_controller.associa_consulenti_clienti(consulenti_ids, [cliente_id])
                 
                 self.carica_dati()
                 QMessageBox.information(self, "Successo", "Cliente creato con successo!")
@@ -1251,19 +1426,81 @@ class MainWindow(QMainWindow):
                 
                 self.carica_dati()
                 
-                # Conta servizi creati
-                servizi = self.credenziale_controller.ottieni_servizi_template_cliente(template.id)
+                # Conta servizi e credenziali creati
+                num_servizi = self.cliente_controller.conta_servizi_cliente(cliente_id)
                 
                 QMessageBox.information(
                     self,
                     "Successo",
                     f"Cliente '{nome_cliente}' creato con successo!\n\n"
-                    f"📋 Servizi aggiunti: {len(servizi)}\n"
-                    f"💡 Ricorda di aggiungere le credenziali per ogni servizio"
+                    f"📋 Servizi aggiunti: {num_servizi}\n"
+                    f"💡 Completa le credenziali copiate dal template dove necessario"
                 )
             except Exception as e:
                 QMessageBox.critical(self, "Errore", f"Errore durante la creazione del cliente:\n{str(e)}")
     
+    def nuovi_clienti_da_template(self):
+        """Crea più clienti dallo stesso template in un'unica operazione"""
+        dialog = SelezionaTemplateClienteDialog(self, self.credenziale_controller)
+        if dialog.exec_() != QDialog.Accepted or not dialog.template_selezionato:
+            return
+        template = dialog.template_selezionato
+        
+        testo, ok = QInputDialog.getMultiLineText(
+            self,
+            "Nomi Clienti",
+            f"Inserisci i nomi dei nuovi clienti, uno per riga:\n(Template: {template.nome_template})"
+        )
+        nomi = [riga.strip() for riga in testo.splitlines() if riga.strip()] if ok else []
+        if not nomi:
+            return
+        
+        try:
+            esiti = self.cliente_controller.crea_clienti_da_template(
+                nomi, template.id, self.credenziale_controller
+            )
+        except Exception as e:
+            QMessageBox.critical(self, "Errore", f"Errore durante la creazione dei clienti:\n{str(e)}")
+            return
+        
+        self.carica_dati()
+        
+        creati = sum(1 for _, cliente_id, _ in esiti if cliente_id is not None)
+        scartati = [f"• {nome}: {messaggio}" for nome, cliente_id, messaggio in esiti if cliente_id is None]
+        messaggio = f"Clienti creati: {creati} su {len(esiti)}"
+        if scartati:
+            messaggio += "\n\nNon creati:\n" + "\n".join(scartati[:20])
+            if len(scartati) > 20:
+                messaggio += f"\n... e altri {len(scartati) - 20}"
+        QMessageBox.information(self, "Creazione Clienti da Template", messaggio)
+    
+    def clona_cliente(self, cliente_id: int):
+        """Clona un cliente con servizi, credenziali, contatti e consulenti"""
+        cliente = self.cliente_controller.ottieni_cliente(cliente_id)
+        if not cliente:
+            return
+        
+        nome, ok = QInputDialog.getText(
+            self,
+            "Clona Cliente",
+            f"Nome del nuovo cliente (copia di '{cliente.nome}'):",
+            text=f"{cliente.nome} (copia)"
+        )
+        if not ok or not nome.strip():
+            return
+        
+        try:
+            nuovo_id = self.cliente_controller.clona_cliente(cliente_id, nome)
+            self.carica_dati()
+            QMessageBox.information(
+                self, "Successo",
+                f"Cliente '{nome.strip()}' creato come copia di '{cliente.nome}'.\n\n"
+                f"📋 Servizi: {self.cliente_controller.conta_servizi_cliente(nuovo_id)}\n"
+                f"📎 Gli allegati restano condivisi con il cliente di origine"
+            )
+        except ValueError as e:
+            QMessageBox.warning(self, "Errore", str(e))
+    
     def modifica_cliente(self):
         """Modifica il cliente selezionato"""
         if not self.cliente_corrente:
@@ -1283,16 +1520,10 @@ class MainWindow(QMainWindow):
                     pm_id
                 )
                 
-                # Aggiorna associazioni consulenti
-                # Prima rimuovi tutte le associazioni esistenti
-                consulenti_attuali = self.risorse_controller.ottieni_consulenti_cliente(self.cliente_corrente.id)
-                for consulente in consulenti_attuali:
-                    self.risorse_controller.disassocia_consulente_cliente(self.cliente_corrente.id, consulente.id)
-                
-                # Poi aggiungi le nuove associazioni
-                consulenti_ids = dialog.get_consulenti_selezionati()
-                for consulente_id in consulenti_ids:
-                    self.risorse_controller.associa_consulente_cliente(self.cliente_corrente.id, consulente_id)
+                # Aggiorna associazioni consulenti (solo le differenze, in una transazione)
+                self.risorse_controller.imposta_consulenti_cliente(
+                    self.cliente_corrente.id, dialog.get_consulenti_selezionati()
+                )
                 
                 self.carica_dati()
                 QMessageBox.information(self, "Successo", "Cliente modificato con successo!")
@@ -1446,7 +1677,12 @@ class MainWindow(QMainWindow):
             return
         
         # Apre il dialog in modalità duplica con i dati della credenziale selezionata
-        dialog = CredenzialeDialog(self, self.credenziale_corrente, duplica_mode=True)
+        try:
+            credenziale = self.credenziale_controller.ottieni_credenziale(self.credenziale_corrente.id)
+        except ValueError as e:
+            QMessageBox.warning(self, "Password non disponibile", str(e))
+            return
+        dialog = CredenzialeDialog(self, credenziale, duplica_mode=True)
         if dialog.exec_() == QDialog.Accepted:
             try:
                 porta = dialog.porta_spin.value() if dialog.porta_spin.value() > 0 else None
@@ -1471,7 +1707,12 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Attenzione", "Seleziona una credenziale da modificare")
             return
         
-        dialog = CredenzialeDialog(self, self.credenziale_corrente)
+        try:
+            credenziale = self.credenziale_controller.ottieni_credenziale(self.credenziale_corrente.id)
+        except ValueError as e:
+            QMessageBox.warning(self, "Password non disponibile", str(e))
+            return
+        dialog = CredenzialeDialog(self, credenziale)
         if dialog.exec_() == QDialog.Accepted:
             try:
                 porta = dialog.porta_spin.value() if dialog.porta_spin.value() > 0 else None
@@ -1531,7 +1772,7 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Errore Critico", 
                                f"Errore durante il lancio della VPN:\n{str(e)}")
-
+    
     
     def lancia_vpn_windows(self):
         """Lancia VPN Windows"""
@@ -1593,7 +1834,7 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Errore Critico", 
                                f"Errore durante la gestione accessi VPN:\n{str(e)}")
-
+    
     
     def apri_link_servizio(self):
         """Apre il link del servizio nel browser predefinito"""
@@ -1632,7 +1873,7 @@ class MainWindow(QMainWindow):
             success, message = self.rdp_launcher.connetti_rdp(
                 self.credenziale_corrente.host,
                 self.credenziale_corrente.username,
-                self.credenziale_corrente.password,
+                self.credenziale_controller.rivela_password(self.credenziale_corrente),
                 self.credenziale_corrente.porta
             )
             
@@ -1674,7 +1915,7 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Errore", 
                                f"Errore durante il lancio della RDP:\n{str(e)}")
-
+    
     
     def mostra_menu_contestuale(self, position):
         """Mostra menu contestuale sul tree"""
@@ -1698,6 +1939,7 @@ class MainWindow(QMainWindow):
             azione_rubrica = menu.addAction("📇 Rubrica Contatti")
             menu.addSeparator()
             azione_modifica = menu.addAction("✏️ Modifica Cliente")
+            azione_clona = menu.addAction("🧬 Clona Cliente...")
             azione_elimina = menu.addAction("🗑️ Elimina Cliente")
             
             azione = menu.exec_(self.tree_clienti.viewport().mapToGlobal(position))
@@ -1715,12 +1957,18 @@ class MainWindow(QMainWindow):
             elif azione == azione_modifica:
                 self.cliente_corrente = self.cliente_controller.ottieni_cliente(data['id'])
                 self.modifica_cliente()
+            elif azione == azione_clona:
+                self.clona_cliente(data['id'])
             elif azione == azione_elimina:
                 self.cliente_corrente = self.cliente_controller.ottieni_cliente(data['id'])
                 self.elimina_cliente()
         
         elif data['tipo'] == 'servizio':
             azione_duplica = menu.addAction("📋 Duplica Servizio")
+            servizi_ids = self._servizi_selezionati(data['id'])
+            etichetta = f"{len(servizi_ids)} Servizi" if len(servizi_ids) > 1 else "Servizio"
+            azione_sposta = menu.addAction(f"📦 Sposta {etichetta} in Altro Cliente...")
+            azione_copia = menu.addAction(f"📑 Copia {etichetta} in Cliente...")
             menu.addSeparator()
             azione_allegati = menu.addAction("📎 Gestisci Allegati Cliente...")
             menu.addSeparator()
@@ -1733,6 +1981,10 @@ class MainWindow(QMainWindow):
                 self.servizio_corrente = self.credenziale_controller.ottieni_servizio(data['id'])
                 self.cliente_corrente = self.cliente_controller.ottieni_cliente(data['cliente_id'])
                 self.duplica_servizio()
+            elif azione == azione_sposta:
+                self.trasferisci_servizi(servizi_ids, sposta=True)
+            elif azione == azione_copia:
+                self.trasferisci_servizi(servizi_ids, sposta=False)
             elif azione == azione_allegati:
                 self.apri_gestione_allegati(data['cliente_id'])
             elif azione == azione_modifica:
@@ -1742,6 +1994,118 @@ class MainWindow(QMainWindow):
                 self.servizio_corrente = self.credenziale_controller.ottieni_servizio(data['id'])
                 self.elimina_servizio()
     
+    def _servizi_selezionati(self, servizio_id: int) -> list:
+        """ID dei servizi selezionati nel tree (include sempre quello cliccato)"""
+        ids = [servizio_id]
+        for item in self.tree_clienti.selectedItems():
+            data = item.data(0, Qt.UserRole)
+            if data and data.get('tipo') == 'servizio' and data['id'] not in ids:
+                ids.append(data['id'])
+        return ids
+    
+    def _scegli_cliente(self, titolo: str, escludi_id=None):
+        """Chiede all'utente un cliente di destinazione; restituisce il Cliente o None"""
+        clienti = [c for c in self.cliente_controller.ottieni_riepilogo_clienti() if c.id != escludi_id]
+        if not clienti:
+            QMessageBox.information(self, titolo, "Nessun cliente di destinazione disponibile")
+            return None
+        nome, ok = QInputDialog.getItem(self, titolo, "Cliente di destinazione:",
+                                        [c.nome for c in clienti], 0, False)
+        if not ok:
+            return None
+        return next(c for c in clienti if c.nome == nome)
+    
+    def trasferisci_servizi(self, servizi_ids: list, sposta: bool):
+        """Sposta o copia i servizi selezionati (con le credenziali) in un cliente"""
+        titolo = "Sposta Servizi" if sposta else "Copia Servizi"
+        # Spostando, il cliente di origine di un singolo servizio non è una destinazione
+        escludi = None
+        if sposta and len(servizi_ids) == 1:
+            servizio = self.credenziale_controller.ottieni_servizio(servizi_ids[0])
+            escludi = servizio.cliente_id if servizio else None
+        cliente = self._scegli_cliente(titolo, escludi)
+        if not cliente:
+            return
+        
+        try:
+            if sposta:
+                esiti = self.credenziale_controller.sposta_servizi(servizi_ids, cliente.id)
+            else:
+                esiti = self.credenziale_controller.copia_servizi(servizi_ids, cliente.id)
+        except ValueError as e:
+            QMessageBox.warning(self, "Errore", str(e))
+            return
+        
+        self.carica_dati()
+        rinominati = [f"• {nome} → {nuovo}" for _, _, nome, nuovo in esiti if nome != nuovo]
+        messaggio = (f"{len(esiti)} servizi {'spostati' if sposta else 'copiati'} "
+                     f"in '{cliente.nome}'.")
+        if rinominati:
+            messaggio += "\n\nRinominati per evitare duplicati:\n" + "\n".join(rinominati)
+        QMessageBox.information(self, titolo, messaggio)
+    
+    def mostra_menu_credenziali(self, position):
+        """Menu contestuale delle credenziali: sposta/copia in blocco"""
+        ids = [item.data(0, Qt.UserRole) for item in self.tree_credenziali.selectedItems()]
+        item = self.tree_credenziali.itemAt(position)
+        if item and item.data(0, Qt.UserRole) not in ids:
+            ids = [item.data(0, Qt.UserRole)]
+        if not ids:
+            return
+        
+        etichetta = f"{len(ids)} Credenziali" if len(ids) > 1 else "Credenziale"
+        menu = QMenu()
+        azione_sposta = menu.addAction(f"📦 Sposta {etichetta} in Servizio...")
+        azione_copia = menu.addAction(f"📑 Copia {etichetta} in Servizio...")
+        menu.addSeparator()
+        azione_verifica = menu.addAction("📡 Verifica raggiungibilità")
+        azione = menu.exec_(self.tree_credenziali.viewport().mapToGlobal(position))
+        
+        if azione == azione_verifica:
+            items = [self.tree_credenziali.topLevelItem(i)
+                     for i in range(self.tree_credenziali.topLevelItemCount())]
+            self.verifica_raggiungibilita(forza=True,
+                                          items=[i for i in items if i.data(0, Qt.UserRole) in ids])
+        elif azione == azione_sposta:
+            self.trasferisci_credenziali(ids, sposta=True)
+        elif azione == azione_copia:
+            self.trasferisci_credenziali(ids, sposta=False)
+    
+    def trasferisci_credenziali(self, credenziali_ids: list, sposta: bool):
+        """Sposta o copia le credenziali selezionate in un servizio di un cliente"""
+        titolo = "Sposta Credenziali" if sposta else "Copia Credenziali"
+        cliente = self._scegli_cliente(titolo)
+        if not cliente:
+            return
+        servizi = self.credenziale_controller.ottieni_servizi_cliente(cliente.id)
+        if sposta and self.servizio_corrente:
+            servizi = [s for s in servizi if s.id != self.servizio_corrente.id]
+        if not servizi:
+            QMessageBox.information(self, titolo, f"Nessun servizio di destinazione in '{cliente.nome}'")
+            return
+        voci = [f"{s.nome} ({s.tipo})" for s in servizi]
+        voce, ok = QInputDialog.getItem(self, titolo, "Servizio di destinazione:", voci, 0, False)
+        if not ok:
+            return
+        servizio = servizi[voci.index(voce)]
+        
+        try:
+            if sposta:
+                numero = self.credenziale_controller.sposta_credenziali(credenziali_ids, servizio.id)
+            else:
+                numero = self.credenziale_controller.copia_credenziali(credenziali_ids, servizio.id)
+        except ValueError as e:
+            QMessageBox.warning(self, "Errore", str(e))
+            return
+        
+        self.prefetch_controller.svuota()
+        self.carica_credenziali()
+        QMessageBox.information(
+            self, titolo,
+            f"{numero} credenziali {'spostate' if sposta else 'copiate'} in "
+            f"'{cliente.nome} / {servizio.nome}'."
+        )
+    
     # === FUNZIONALITÀ DI RICERCA GLOBALE ===
     
     def ricerca_globale(self, testo):
@@ -1758,8 +2122,8 @@ class MainWindow(QMainWindow):
         # Pulisci la tree
         self.tree_clienti.clear()
         
-        # Cerca tra i clienti
-        clienti = self.cliente_controller.ottieni_tutti_clienti()
+        # Cerca tra i clienti (basta il nome: riepilogo)
+        clienti = self.cliente_controller.ottieni_riepilogo_clienti()
         clienti_trovati = []
         
         for cliente in clienti:
@@ -1790,16 +2154,17 @@ class MainWindow(QMainWindow):
                         servizi_matchati.append(servizio)
                         match_cliente = True
             
-            # Cerca nelle credenziali
-            credenziali = self.credenziale_controller.ottieni_credenziali_servizio(cliente.id)
+            # Cerca nelle credenziali dei servizi (senza decriptare le password)
             credenziali_matchate = []
             
-            for cred in credenziali:
-                if (testo in cred.username.lower() or 
-                    (cred.host and testo in cred.host.lower()) or
-                    (cred.note and testo in cred.note.lower())):
-                    credenziali_matchate.append(cred)
-                    match_cliente = True
+            for servizio in servizi:
+                credenziali = self.credenziale_controller.ottieni_credenziali_servizio(servizio.id)
+                for cred in credenziali:
+                    if (testo in cred.username.lower() or 
+                        (cred.host and testo in cred.host.lower()) or
+                        (cred.note and testo in cred.note.lower())):
+                        credenziali_matchate.append(cred)
+                        match_cliente = True
             
             # Se c'è almeno una corrispondenza, aggiungi il cliente
             if match_cliente:
@@ -1844,8 +2209,7 @@ class MainWindow(QMainWindow):
     
     def cambia_master_password(self):
         """Cambia la master password"""
-        from views.security_dialogs import MasterPasswordDialog
-        import json
+        from views.security_dialogs import MasterPasswordDialog, esegui_in_attesa
         
         if not self.crypto_manager:
             QMessageBox.warning(
@@ -1879,7 +2243,9 @@ class MainWindow(QMainWindow):
             return
         
         vecchia_password = txt_vecchia.text()
-        if not self.crypto_manager.verifica_password(vecchia_password):
+        if not esegui_in_attesa(self, "Verifica della password...",
+                                self.crypto_manager.verifica_password, vecchia_password,
+                                durata_stimata_ms=self.crypto_manager.durata_stimata_ms()):
             QMessageBox.critical(self, "Errore", "Password corrente errata!")
             return
         
@@ -1890,20 +2256,282 @@ class MainWindow(QMainWindow):
         
         nuova_password = dialog_nuova.get_password()
         
-        # Salva nuova configurazione
-        salt = self.crypto_manager.inizializza_con_password(nuova_password)
-        config = {
-            'salt': salt.hex(),
-            'password_hash': self.crypto_manager.master_password_hash
-        }
-        with open('security_config.json', 'w') as f:
-            json.dump(config, f)
+        # La chiave dati non cambia: viene solo riavvolta con la nuova password
+        try:
+            esegui_in_attesa(self, "Cifratura della chiave con la nuova password...",
+                             self.crypto_manager.cambia_password, nuova_password,
+                             durata_stimata_ms=self.crypto_manager.durata_stimata_ms())
+            self.crypto_manager.salva_config()
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Errore", f"Impossibile salvare la nuova password:\n{e}")
+            return
         
         QMessageBox.information(
             self, "Successo",
             "Master password cambiata con successo!\n"
-            "Riavvia l'applicazione per applicare le modifiche."
+            "Il codice di recupero resta valido."
+        )
+    
+    def imposta_parametri_sblocco(self):
+        """Ricalibra la derivazione della chiave (algoritmo e durata dello sblocco)"""
+        from views.security_dialogs import ParametriSbloccoDialog, esegui_in_attesa
+        
+        if not self.crypto_manager:
+            QMessageBox.warning(
+                self, "Attenzione",
+                "Sistema di crittografia non disponibile"
+            )
+            return
+        
+        kdf_attuale = self.crypto_manager.config.get('kdf', self.crypto_manager.KDF_PREDEFINITO)
+        dialog = ParametriSbloccoDialog(self, kdf_attuale)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        algoritmo, durata_ms, password = dialog.get_valori()
+        
+        def calibra_e_applica():
+            kdf = self.crypto_manager.calibra_kdf(algoritmo, durata_ms)
+            self.crypto_manager.imposta_kdf(password, kdf)
+            return kdf
+        
+        try:
+            kdf = esegui_in_attesa(
+                self, "Calibrazione in corso...", calibra_e_applica,
+                durata_stimata_ms=self.crypto_manager.durata_stimata_ms() + 2 * durata_ms)
+            self.crypto_manager.salva_config()
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Errore", str(e))
+            return
+        
+        QMessageBox.information(
+            self, "Parametri di Sblocco",
+            f"Nuovi parametri: {ParametriSbloccoDialog.descrivi(kdf)}.\n\n"
+            "Il codice di recupero mantiene i parametri con cui è stato creato."
+        )
+    
+    def avvia_agente_sblocco(self):
+        """Avvia l'agente che mantiene il vault sbloccato per GUI e script"""
+        from utils.unlock_agent import ClientAgente, avvia_processo, DURATA_PREDEFINITA
+        
+        if not self.crypto_manager:
+            QMessageBox.warning(
+                self, "Attenzione",
+                "Sistema di crittografia non disponibile"
+            )
+            return
+        
+        client = ClientAgente()
+        if client.disponibile():
+            minuti_rimanenti = client.stato()['secondi_rimanenti'] // 60
+            QMessageBox.information(
+                self, "Agente di Sblocco",
+                f"L'agente è già attivo (scade tra {minuti_rimanenti} minuti)."
+            )
+            return
+        
+        minuti, ok = QInputDialog.getInt(
+            self, "Avvia Agente di Sblocco",
+            "Per quanti minuti mantenere il vault sbloccato?\n"
+            "Nel frattempo l'applicazione e gli script non chiederanno la master password.",
+            DURATA_PREDEFINITA // 60, 1, 24 * 60
+        )
+        if not ok:
+            return
+        
+        if not avvia_processo(self.crypto_manager, minuti * 60, self.db.db_path):
+            QMessageBox.critical(self, "Errore", "Impossibile avviare l'agente di sblocco")
+            return
+        QMessageBox.information(
+            self, "Agente di Sblocco",
+            f"Vault sbloccato per {minuti} minuti.\n\n"
+            "Puoi bloccarlo prima dal menu Sicurezza → Blocca Agente di Sblocco."
+        )
+    
+    def blocca_agente_sblocco(self):
+        """Termina l'agente di sblocco (le chiavi vengono dimenticate)"""
+        from utils.unlock_agent import ClientAgente
+        
+        try:
+            ClientAgente().blocca()
+        except (ConnectionError, ValueError):
+            QMessageBox.information(self, "Agente di Sblocco", "Nessun agente di sblocco attivo.")
+            return
+        QMessageBox.information(self, "Agente di Sblocco", "Agente di sblocco terminato.")
+    
+    def ruota_chiave_cifratura(self):
+        """Genera una nuova chiave dati e vi ricifra tutte le password"""
+        if not self.crypto_manager:
+            QMessageBox.warning(
+                self, "Attenzione",
+                "Sistema di crittografia non disponibile"
+            )
+            return
+        
+        if self.crypto_manager.rotazione_in_corso():
+            self._esegui_rotazione_chiave()
+            return
+        
+        risposta = QMessageBox.question(
+            self, "Ruota Chiave di Cifratura",
+            "Tutte le password verranno ricifrate con una nuova chiave e verrà "
+            "generato un nuovo codice di recupero.\n\n"
+            "I backup creati prima della rotazione restano cifrati con la chiave "
+            "attuale: crea un nuovo backup al termine.\n\n"
+            "Continuare?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
         )
+        if risposta != QMessageBox.Yes:
+            return
+        
+        password, ok = QInputDialog.getText(
+            self, "Ruota Chiave di Cifratura",
+            "Inserisci la master password:", QLineEdit.Password
+        )
+        if not ok:
+            return
+        
+        from views.security_dialogs import esegui_in_attesa
+        try:
+            recovery_code = esegui_in_attesa(
+                self, "Generazione della nuova chiave...", self.crypto_manager.avvia_rotazione,
+                password, durata_stimata_ms=3 * self.crypto_manager.durata_stimata_ms())
+            self.crypto_manager.salva_config()
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Errore", str(e))
+            return
+        
+        # Un agente di sblocco attivo conosce solo la chiave precedente
+        from utils.unlock_agent import ClientAgente
+        try:
+            ClientAgente().blocca()
+        except (ConnectionError, ValueError):
+            pass
+        
+        QMessageBox.information(
+            self, "⚠️ NUOVO CODICE DI RECUPERO - SALVALO!",
+            f"🔑 NUOVO CODICE DI RECUPERO:\n{recovery_code}\n\n"
+            f"Il codice attuale resta valido fino al termine della rotazione.\n\n"
+            f"Questo codice verrà mostrato solo ora!"
+        )
+        self._esegui_rotazione_chiave()
+    
+    def riprendi_rotazione_chiave(self):
+        """Propone di riprendere una rotazione della chiave interrotta"""
+        risposta = QMessageBox.question(
+            self, "Rotazione Chiave Interrotta",
+            "Una rotazione della chiave di cifratura non è stata completata.\n\n"
+            "Riprenderla ora?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if risposta == QMessageBox.Yes:
+            self._esegui_rotazione_chiave()
+    
+    def _esegui_rotazione_chiave(self):
+        """Esegue o riprende la ricifratura mostrando l'avanzamento"""
+        from utils.key_rotation import KeyRotationManager
+        
+        progress, avanzamento = self._dialogo_ricifratura(
+            "Ruota Chiave di Cifratura", "Rotazione della chiave in corso...")
+        progress.setMinimumDuration(0)
+        
+        manager = KeyRotationManager(self.db, self.crypto_manager)
+        try:
+            stats = manager.esegui(avanzamento, progress.wasCanceled)
+        except Exception as e:
+            progress.close()
+            QMessageBox.critical(
+                self, "Errore",
+                f"Rotazione della chiave interrotta:\n{e}\n\n"
+                "Potrai riprenderla dal menu Sicurezza."
+            )
+            return
+        progress.close()
+        self.credenziale_controller.svuota_cache_password()
+        
+        if not stats['completata']:
+            QMessageBox.information(
+                self, "Rotazione Interrotta",
+                f"Segreti ricifrati finora: {stats['segreti']}.\n\n"
+                "Riprendi la rotazione dal menu Sicurezza → Ruota Chiave di Cifratura."
+            )
+            return
+        
+        QMessageBox.information(
+            self, "Rotazione Completata",
+            f"Chiave di cifratura ruotata: {stats['segreti']} segreti in "
+            f"{stats['secondi']} s ({stats['al_secondo']}/s).\n\n"
+            f"- Ricifrati: {stats['ruotati']}\n"
+            f"- Cifrati (erano in chiaro): {stats['cifrati']}\n"
+            f"- Vuoti o non decifrabili: {stats['invariati']}\n"
+            f"- Modificati durante la rotazione: {stats['saltati']}"
+        )
+    
+    def converti_formato_password(self):
+        """Converte in blocco le password legacy (testo) nel formato binario e, se ne ha convertite, compatta il database"""
+        from utils.key_rotation import KeyRotationManager
+        
+        progress, avanzamento = self._dialogo_ricifratura(
+            "Aggiornamento Archivio Password", "Conversione delle password in corso...")
+        
+        try:
+            stats = KeyRotationManager(self.db, self.crypto_manager).converti_formato(
+                avanzamento, progress.wasCanceled)
+            convertite = stats['ruotati'] + stats['cifrati']
+            if convertite:
+                progress.setLabelText("Compattazione del database...")
+                QApplication.processEvents()
+                prima, dopo = self.db.compatta()
+        except Exception as e:
+            progress.close()
+            QMessageBox.critical(
+                self, "Errore",
+                f"Conversione delle password interrotta:\n{e}\n\n"
+                "Verrà ripresa al prossimo avvio."
+            )
+            return
+        progress.close()
+        self.credenziale_controller.svuota_cache_password()
+        
+        if stats['completata'] and convertite:
+            QMessageBox.information(
+                self, "Archivio Password Aggiornato",
+                f"Password convertite nel nuovo formato: {convertite} "
+                f"in {stats['secondi']} s.\n\n"
+                f"Dimensione del database: {prima // 1024} KB → {dopo // 1024} KB"
+            )
+    
+    def aggiorna_impronte_a_blocchi(self):
+        """
+        Calcola un blocco di impronte mancanti e, se ne restano, si
+        ripianifica: l'interfaccia resta reattiva tra un blocco e l'altro
+        """
+        blocco = self.BLOCCO_IMPRONTE
+        try:
+            calcolate = self.credenziale_controller.aggiorna_blocco_impronte(blocco)
+        except Exception:
+            return  # Riprovato al prossimo avvio
+        if calcolate == blocco:
+            QTimer.singleShot(0, self.aggiorna_impronte_a_blocchi)
+    
+    def _dialogo_ricifratura(self, titolo: str, testo: str):
+        """
+        Dialog di avanzamento per KeyRotationManager
+        
+        Returns:
+            Tupla (dialog, callback di avanzamento da passare al manager)
+        """
+        from PyQt5.QtWidgets import QProgressDialog
+        
+        progress = QProgressDialog(testo, "Interrompi", 0, 100, self)
+        progress.setWindowTitle(titolo)
+        progress.setWindowModality(Qt.WindowModal)
+        
+        def avanzamento(tabella, fatti, totale):
+            progress.setValue(int(fatti * 100 / totale) if totale else 100)
+            progress.setLabelText(f"Ricifratura {tabella}: {fatti} / {totale}")
+            QApplication.processEvents()
+        
+        return progress, avanzamento
     
     # === FUNZIONALITÀ DI BACKUP ===
     
@@ -2098,6 +2726,8 @@ class MainWindow(QMainWindow):
     
     def closeEvent(self, event):
         """Chiude il database quando si chiude l'applicazione"""
+        self.prefetch_controller.ferma()
+        self.raggiungibilita_controller.ferma()
         self.db.close()
         event.accept()
 
@@ -2559,7 +3189,7 @@ class CredenzialeDialog(QDialog):
             return self.file_rdp_edit.text()
         else:
             return self.host_edit.text()
-
+    
     def get_username(self):
         """Costruisce username nel formato DOMINIO\\Utente"""
         dominio = self.dominio_edit.text().strip()
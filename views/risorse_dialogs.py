@@ -5,7 +5,7 @@ Dialog per gestire PM, Consulenti e Contatti
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
                              QTableWidget, QTableWidgetItem, QHeaderView,
                              QMessageBox, QFormLayout, QLineEdit, QLabel,
-                             QFileDialog)
+                             QFileDialog, QComboBox, QAbstractItemView)
 from PyQt5.QtCore import Qt, QUrl
 from PyQt5.QtGui import QDesktopServices
 from models.pm import PM
@@ -236,7 +236,7 @@ class GestionePMDialog(QDialog):
             reply = QMessageBox.question(
                 self,
                 "Conferma Import",
-                "Sei sicuro di voler importare i PM?\n\nI duplicati verranno ignorati.",
+                "Sei sicuro di voler importare i PM?\n\nI nomi già presenti verranno aggiornati, le righe identiche ignorate.",
                 QMessageBox.Yes | QMessageBox.No,
                 QMessageBox.No
             )
@@ -509,7 +509,7 @@ class GestioneConsulentiDialog(QDialog):
             reply = QMessageBox.question(
                 self,
                 "Conferma Import",
-                "Sei sicuro di voler importare i Consulenti?\n\nI duplicati verranno ignorati.",
+                "Sei sicuro di voler importare i Consulenti?\n\nI nomi già presenti verranno aggiornati, le righe identiche ignorate.",
                 QMessageBox.Yes | QMessageBox.No,
                 QMessageBox.No
             )
@@ -568,3 +568,186 @@ class ConsulenteDialog(QDialog):
         btn_layout.addWidget(btn_salva)
         btn_layout.addWidget(btn_annulla)
         layout.addRow(btn_layout)
+
+
+class MatriceAssegnazioniDialog(QDialog):
+    """Editor a matrice clienti × (PM, consulenti) con salvataggio in blocco"""
+    
+    # Colonne fisse prima di quelle dei consulenti
+    COL_CLIENTE = 0
+    COL_PM = 1
+    PRIMA_COL_CONSULENTE = 2
+    
+    def __init__(self, parent, risorse_controller: RisorseController, cliente_controller):
+        super().__init__(parent)
+        self.risorse_controller = risorse_controller
+        self.cliente_controller = cliente_controller
+        self.setWindowTitle("Assegnazioni Clienti")
+        self.setMinimumSize(1100, 650)
+        
+        # Applica stile dalla finestra principale
+        if hasattr(parent, 'styleSheet') and parent.styleSheet():
+            self.setStyleSheet(parent.styleSheet())
+        
+        self.init_ui()
+        self.carica_dati()
+    
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(15)
+        layout.setContentsMargins(20, 20, 20, 20)
+        
+        titolo = QLabel("<h2 style='color: #1976D2;'>🧩 Assegnazioni PM e Consulenti</h2>")
+        layout.addWidget(titolo)
+        layout.addWidget(QLabel(
+            "Seleziona più clienti (Ctrl/Shift) e applica PM o consulenti in blocco; "
+            "le modifiche vengono salvate tutte insieme."
+        ))
+        
+        # Azioni sulle righe selezionate
+        azioni_layout = QHBoxLayout()
+        azioni_layout.setSpacing(8)
+        
+        azioni_layout.addWidget(QLabel("PM:"))
+        self.pm_combo = QComboBox()
+        azioni_layout.addWidget(self.pm_combo)
+        btn_assegna_pm = QPushButton("👤 Assegna alle righe selezionate")
+        btn_assegna_pm.setObjectName("btn_secondary")
+        btn_assegna_pm.clicked.connect(self.assegna_pm_selezionati)
+        azioni_layout.addWidget(btn_assegna_pm)
+        
+        azioni_layout.addSpacing(20)
+        azioni_layout.addWidget(QLabel("Consulente:"))
+        self.consulente_combo = QComboBox()
+        azioni_layout.addWidget(self.consulente_combo)
+        btn_associa = QPushButton("➕ Associa")
+        btn_associa.setObjectName("btn_success")
+        btn_associa.clicked.connect(lambda: self.imposta_consulente_selezionati(True))
+        azioni_layout.addWidget(btn_associa)
+        btn_rimuovi = QPushButton("➖ Rimuovi")
+        btn_rimuovi.setObjectName("btn_danger")
+        btn_rimuovi.clicked.connect(lambda: self.imposta_consulente_selezionati(False))
+        azioni_layout.addWidget(btn_rimuovi)
+        azioni_layout.addStretch()
+        layout.addLayout(azioni_layout)
+        
+        self.table = QTableWidget()
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+        
+        # Pulsanti salva/annulla
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        btn_salva = QPushButton("💾 Salva")
+        btn_salva.setObjectName("btn_primary")
+        btn_salva.clicked.connect(self.salva)
+        btn_annulla = QPushButton("❌ Annulla")
+        btn_annulla.setObjectName("btn_neutral")
+        btn_annulla.clicked.connect(self.reject)
+        btn_layout.addWidget(btn_salva)
+        btn_layout.addWidget(btn_annulla)
+        layout.addLayout(btn_layout)
+    
+    def carica_dati(self):
+        """Carica clienti, PM, consulenti e lo stato attuale delle associazioni"""
+        self.clienti = self.cliente_controller.ottieni_tutti_clienti()
+        self.pms = self.risorse_controller.ottieni_tutti_pm()
+        self.consulenti = self.risorse_controller.ottieni_tutti_consulenti()
+        self.associazioni_iniziali = self.risorse_controller.ottieni_matrice_consulenti()
+        self.pm_iniziali = {cliente.id: cliente.pm_id for cliente in self.clienti}
+        
+        self.pm_combo.clear()
+        self.pm_combo.addItem("(Nessun PM)", None)
+        for pm in self.pms:
+            self.pm_combo.addItem(pm.nome, pm.id)
+        self.consulente_combo.clear()
+        for consulente in self.consulenti:
+            self.consulente_combo.addItem(consulente.nome, consulente.id)
+        
+        self.table.clear()
+        self.table.setColumnCount(self.PRIMA_COL_CONSULENTE + len(self.consulenti))
+        self.table.setHorizontalHeaderLabels(
+            ["Cliente", "PM"] + [c.nome for c in self.consulenti]
+        )
+        self.table.setRowCount(len(self.clienti))
+        
+        for row, cliente in enumerate(self.clienti):
+            item_cliente = QTableWidgetItem(cliente.nome)
+            item_cliente.setData(Qt.UserRole, cliente.id)
+            self.table.setItem(row, self.COL_CLIENTE, item_cliente)
+            
+            pm_combo = QComboBox()
+            pm_combo.addItem("(Nessun PM)", None)
+            for pm in self.pms:
+                pm_combo.addItem(pm.nome, pm.id)
+            indice = pm_combo.findData(cliente.pm_id)
+            pm_combo.setCurrentIndex(indice if indice >= 0 else 0)
+            self.table.setCellWidget(row, self.COL_PM, pm_combo)
+            
+            for col, consulente in enumerate(self.consulenti, self.PRIMA_COL_CONSULENTE):
+                item = QTableWidgetItem()
+                item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable)
+                associato = (cliente.id, consulente.id) in self.associazioni_iniziali
+                item.setCheckState(Qt.Checked if associato else Qt.Unchecked)
+                self.table.setItem(row, col, item)
+        
+        self.table.horizontalHeader().setSectionResizeMode(self.COL_CLIENTE, QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(self.COL_PM, QHeaderView.ResizeToContents)
+    
+    def _righe_selezionate(self) -> list:
+        """Indici delle righe selezionate"""
+        return sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+    
+    def assegna_pm_selezionati(self):
+        """Imposta il PM scelto su tutte le righe selezionate"""
+        righe = self._righe_selezionate()
+        if not righe:
+            QMessageBox.warning(self, "Attenzione", "Seleziona almeno un cliente")
+            return
+        pm_id = self.pm_combo.currentData()
+        for row in righe:
+            combo = self.table.cellWidget(row, self.COL_PM)
+            combo.setCurrentIndex(combo.findData(pm_id))
+    
+    def imposta_consulente_selezionati(self, associato: bool):
+        """Spunta o toglie il consulente scelto su tutte le righe selezionate"""
+        righe = self._righe_selezionate()
+        if not righe or self.consulente_combo.currentIndex() < 0:
+            QMessageBox.warning(self, "Attenzione", "Seleziona almeno un cliente e un consulente")
+            return
+        col = self.PRIMA_COL_CONSULENTE + self.consulente_combo.currentIndex()
+        for row in righe:
+            self.table.item(row, col).setCheckState(Qt.Checked if associato else Qt.Unchecked)
+    
+    def salva(self):
+        """Calcola le differenze rispetto allo stato iniziale e le salva in blocco"""
+        associazioni = set()
+        pm_per_cliente = {}
+        for row, cliente in enumerate(self.clienti):
+            pm_per_cliente[cliente.id] = self.table.cellWidget(row, self.COL_PM).currentData()
+            for col, consulente in enumerate(self.consulenti, self.PRIMA_COL_CONSULENTE):
+                if self.table.item(row, col).checkState() == Qt.Checked:
+                    associazioni.add((cliente.id, consulente.id))
+        
+        aggiunte = associazioni - self.associazioni_iniziali
+        rimozioni = self.associazioni_iniziali - associazioni
+        aggiunte_n, rimosse_n = self.risorse_controller.applica_matrice_consulenti(
+            sorted(aggiunte), sorted(rimozioni)
+        )
+        
+        # PM: un UPDATE per ogni PM di destinazione
+        cambi_pm = {}
+        for cliente_id, pm_id in pm_per_cliente.items():
+            if pm_id != self.pm_iniziali.get(cliente_id):
+                cambi_pm.setdefault(pm_id, []).append(cliente_id)
+        clienti_pm = sum(self.risorse_controller.assegna_pm_clienti(pm_id, ids)
+                         for pm_id, ids in cambi_pm.items())
+        
+        QMessageBox.information(
+            self, "Assegnazioni Salvate",
+            f"Consulenti: {aggiunte_n} associazioni aggiunte, {rimosse_n} rimosse\n"
+            f"PM: {clienti_pm} clienti aggiornati"
+        )
+        self.accept()
@@ -3,10 +3,62 @@ Dialog per gestire la master password
 """
 
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QLabel, QLineEdit, 
-                             QPushButton, QHBoxLayout, QMessageBox, QCheckBox)
-from PyQt5.QtCore import Qt
+                             QPushButton, QHBoxLayout, QMessageBox, QCheckBox,
+                             QApplication, QProgressDialog, QFormLayout, QComboBox, QSpinBox)
+from PyQt5.QtCore import Qt, QEventLoop
 import os
 import json
+import threading
+import time
+
+
+def esegui_in_attesa(parent, testo: str, funzione, *args, durata_stimata_ms: int = 0):
+    """
+    Esegue funzione(*args) in un thread mostrando un dialog di avanzamento
+    
+    Serve per le derivazioni della chiave (KDF), volutamente lente: la
+    finestra resta reattiva invece di bloccarsi per tutta la durata.
+    
+    Args:
+        parent: Widget padre del dialog (anche None)
+        testo: Messaggio mostrato durante l'attesa
+        funzione: Funzione da eseguire nel thread
+        durata_stimata_ms: Durata prevista (0 = avanzamento indeterminato)
+    
+    Returns:
+        Valore restituito dalla funzione
+    
+    Raises:
+        Exception: L'eccezione sollevata dalla funzione nel thread
+    """
+    esito = {}
+    
+    def lavoro():
+        try:
+            esito['valore'] = funzione(*args)
+        except Exception as e:
+            esito['errore'] = e
+    
+    progress = QProgressDialog(testo, "", 0, 100 if durata_stimata_ms else 0, parent)
+    progress.setWindowTitle("AccessCentral")
+    progress.setWindowModality(Qt.ApplicationModal)
+    progress.setCancelButton(None)
+    progress.setMinimumDuration(200)
+    
+    thread = threading.Thread(target=lavoro, name="kdf", daemon=True)
+    inizio = time.monotonic()
+    thread.start()
+    while thread.is_alive():
+        if durata_stimata_ms:
+            trascorsi = (time.monotonic() - inizio) * 1000
+            progress.setValue(min(99, int(trascorsi * 100 / durata_stimata_ms)))
+        QApplication.processEvents(QEventLoop.AllEvents, 20)
+        thread.join(0.02)
+    progress.close()
+    
+    if 'errore' in esito:
+        raise esito['errore']
+    return esito.get('valore')
 
 
 class MasterPasswordDialog(QDialog):
@@ -379,3 +431,100 @@ class RecoveryCodeDialog(QDialog):
     def get_code(self):
         """Ritorna il codice inserito"""
         return self.recovery_code
+
+
+class ParametriSbloccoDialog(QDialog):
+    """Dialog per scegliere algoritmo KDF e durata dello sblocco (calibrazione)"""
+    
+    ALGORITMI = (
+        ('pbkdf2', "PBKDF2-HMAC-SHA256"),
+        ('scrypt', "scrypt (resistente agli attacchi con GPU)"),
+    )
+    
+    def __init__(self, parent=None, kdf_attuale=None):
+        super().__init__(parent)
+        self.kdf_attuale = kdf_attuale or {}
+        self.init_ui()
+    
+    def init_ui(self):
+        """Inizializza l'interfaccia"""
+        self.setWindowTitle("Parametri di Sblocco")
+        self.setModal(True)
+        self.setMinimumWidth(450)
+        
+        layout = QVBoxLayout(self)
+        layout.setSpacing(15)
+        
+        titolo = QLabel("<h2>⏱️ Parametri di Sblocco</h2>")
+        titolo.setAlignment(Qt.AlignCenter)
+        layout.addWidget(titolo)
+        
+        descrizione = QLabel(
+            "La master password viene trasformata nella chiave del vault con una "
+            "funzione volutamente lenta. I parametri vengono calibrati su questo "
+            "computer per ottenere la durata indicata: più è lunga, più è difficile "
+            "indovinare la password per forza bruta."
+        )
+        descrizione.setWordWrap(True)
+        descrizione.setStyleSheet("color: #666; padding: 10px;")
+        layout.addWidget(descrizione)
+        
+        form = QFormLayout()
+        self.combo_algoritmo = QComboBox()
+        for chiave, etichetta in self.ALGORITMI:
+            self.combo_algoritmo.addItem(etichetta, chiave)
+        indice = self.combo_algoritmo.findData(self.kdf_attuale.get('algoritmo', 'pbkdf2'))
+        self.combo_algoritmo.setCurrentIndex(max(indice, 0))
+        form.addRow("Algoritmo:", self.combo_algoritmo)
+        
+        self.spin_durata = QSpinBox()
+        self.spin_durata.setRange(100, 5000)
+        self.spin_durata.setSingleStep(100)
+        self.spin_durata.setSuffix(" ms")
+        self.spin_durata.setValue(self.kdf_attuale.get('obiettivo_ms', 500))
+        form.addRow("Durata sblocco:", self.spin_durata)
+        
+        self.txt_password = QLineEdit()
+        self.txt_password.setEchoMode(QLineEdit.Password)
+        form.addRow("Master password:", self.txt_password)
+        layout.addLayout(form)
+        
+        attuali = QLabel(f"<i>Parametri attuali: {self.descrivi(self.kdf_attuale)}</i>")
+        attuali.setWordWrap(True)
+        layout.addWidget(attuali)
+        
+        btn_layout = QHBoxLayout()
+        
+        btn_annulla = QPushButton("Annulla")
+        btn_annulla.setObjectName("btn_neutral")
+        btn_annulla.clicked.connect(self.reject)
+        
+        btn_ok = QPushButton("Calibra e Applica")
+        btn_ok.setObjectName("btn_primary")
+        btn_ok.clicked.connect(self.conferma)
+        
+        btn_layout.addWidget(btn_annulla)
+        btn_layout.addWidget(btn_ok)
+        layout.addLayout(btn_layout)
+        
+        self.txt_password.setFocus()
+    
+    @staticmethod
+    def descrivi(kdf) -> str:
+        """Descrizione leggibile dei parametri KDF"""
+        if kdf.get('algoritmo') == 'scrypt':
+            memoria = 128 * kdf['r'] * kdf['n'] // (1024 * 1024)
+            return f"scrypt, N={kdf['n']} ({memoria} MiB), r={kdf['r']}, p={kdf['p']}"
+        return f"PBKDF2-HMAC-SHA256, {kdf.get('iterazioni', 100000):,} iterazioni".replace(",", ".")
+    
+    def conferma(self):
+        """Verifica che la password sia stata inserita"""
+        if not self.txt_password.text():
+            QMessageBox.warning(self, "Errore", "Inserisci la master password")
+            return
+        self.accept()
+    
+    def get_valori(self):
+        """Ritorna (algoritmo, durata in ms, master password)"""
+        return (self.combo_algoritmo.currentData(), self.spin_durata.value(),
+                self.txt_password.text())
@@ -62,6 +62,11 @@ class GestioneTemplateDialog(QDialog):
         btn_elimina.setObjectName("btn_danger")
         btn_elimina.clicked.connect(self.elimina_template)
         
+        btn_propaga = QPushButton("🔄 Propaga ai Servizi")
+        btn_propaga.setObjectName("btn_action")
+        btn_propaga.setToolTip("Applica tipo, descrizione e link del template a tutti i servizi derivati")
+        btn_propaga.clicked.connect(self.propaga_template)
+        
         btn_chiudi = QPushButton("✅ Chiudi")
         btn_chiudi.setObjectName("btn_neutral")
         btn_chiudi.clicked.connect(self.accept)
@@ -69,6 +74,7 @@ class GestioneTemplateDialog(QDialog):
         btn_layout.addWidget(btn_nuovo)
         btn_layout.addWidget(btn_modifica)
         btn_layout.addWidget(btn_elimina)
+        btn_layout.addWidget(btn_propaga)
         btn_layout.addStretch()
         btn_layout.addWidget(btn_chiudi)
         
@@ -159,6 +165,91 @@ class GestioneTemplateDialog(QDialog):
                 QMessageBox.information(self, "Successo", "Template eliminato con successo!")
             except Exception as e:
                 QMessageBox.critical(self, "Errore", f"Errore eliminazione template: {e}")
+    
+    def propaga_template(self):
+        """Propaga le modifiche del template selezionato ai servizi derivati"""
+        row = self.tabella.currentRow()
+        if row < 0:
+            QMessageBox.warning(self, "Attenzione", "Seleziona un template da propagare")
+            return
+        
+        template_id = int(self.tabella.item(row, 0).text())
+        nome = self.tabella.item(row, 1).text()
+        
+        try:
+            # Servizi creati prima del lineage: proponi di collegarli per nome
+            omonimi = self.credenziale_controller.conta_servizi_omonimi_non_collegati(template_id)
+            if omonimi:
+                risposta = QMessageBox.question(
+                    self, "Servizi non collegati",
+                    f"Ci sono {omonimi} servizi chiamati '{nome}' non collegati al template.\n"
+                    f"Vuoi collegarli così da includerli nella propagazione?",
+                    QMessageBox.Yes | QMessageBox.No
+                )
+                if risposta == QMessageBox.Yes:
+                    self.credenziale_controller.collega_servizi_omonimi(template_id)
+            
+            anteprima = self.credenziale_controller.anteprima_propagazione_template(template_id)
+            if not anteprima:
+                QMessageBox.information(self, "Propagazione",
+                                        "Tutti i servizi derivati sono già allineati al template.")
+                return
+            
+            dialog = AnteprimaPropagazioneDialog(self, nome, anteprima)
+            if dialog.exec_() == QDialog.Accepted:
+                aggiornati = self.credenziale_controller.propaga_template(template_id)
+                QMessageBox.information(self, "Successo", f"{aggiornati} servizi aggiornati dal template '{nome}'")
+        except Exception as e:
+            QMessageBox.critical(self, "Errore", f"Errore propagazione template: {e}")
+
+
+class AnteprimaPropagazioneDialog(QDialog):
+    """Dialog con l'anteprima delle modifiche che la propagazione applicherà"""
+    
+    def __init__(self, parent, nome_template: str, anteprima: list):
+        super().__init__(parent)
+        self.setWindowTitle(f"Anteprima propagazione - {nome_template}")
+        self.setMinimumSize(800, 500)
+        
+        layout = QVBoxLayout(self)
+        layout.setSpacing(15)
+        layout.setContentsMargins(20, 20, 20, 20)
+        
+        titolo = QLabel(f"<h3>🔄 {len(anteprima)} servizi verranno aggiornati</h3>")
+        layout.addWidget(titolo)
+        
+        tabella = QTableWidget()
+        tabella.setColumnCount(5)
+        tabella.setHorizontalHeaderLabels(["Cliente", "Servizio", "Campo", "Valore attuale", "Nuovo valore"])
+        tabella.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        tabella.setEditTriggers(QTableWidget.NoEditTriggers)
+        tabella.verticalHeader().setVisible(False)
+        for voce in anteprima:
+            for campo, attuale, nuovo in voce['modifiche']:
+                row = tabella.rowCount()
+                tabella.insertRow(row)
+                tabella.setItem(row, 0, QTableWidgetItem(voce['cliente']))
+                tabella.setItem(row, 1, QTableWidgetItem(voce['servizio']))
+                tabella.setItem(row, 2, QTableWidgetItem(campo))
+                tabella.setItem(row, 3, QTableWidgetItem(attuale))
+                tabella.setItem(row, 4, QTableWidgetItem(nuovo))
+        layout.addWidget(tabella)
+        
+        btn_layout = QHBoxLayout()
+        btn_layout.setSpacing(10)
+        
+        btn_applica = QPushButton("✅ Applica")
+        btn_applica.setObjectName("btn_success")
+        btn_applica.clicked.connect(self.accept)
+        
+        btn_annulla = QPushButton("❌ Annulla")
+        btn_annulla.setObjectName("btn_neutral")
+        btn_annulla.clicked.connect(self.reject)
+        
+        btn_layout.addStretch()
+        btn_layout.addWidget(btn_applica)
+        btn_layout.addWidget(btn_annulla)
+        layout.addLayout(btn_layout)
 
 
 class TemplateDialog(QDialog):